@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Channel resolution benchmark.
+#
+# Times util.calculate_ul_earfcn() and the band, frequency and DL/UL channel
+# lookups of channels.py in lookups/s, on the handful of channels seen in a
+# capture (capture/*) and on sweeps over all channels of a RAT (sweep/*):
+#
+#   $ python3 benchmarks/bench_channels.py -o before.json
+#   $ python3 benchmarks/bench_channels.py -o after.json
+#   $ python3 benchmarks/bench_channels.py --compare before.json after.json
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import util
+from bench_decode import git_revision, compare
+
+try:
+    import channels
+except ImportError:
+    channels = None
+
+# Serving and neighbor cell channels of a capture in a LTE/UMTS/GSM/NR NSA network
+capture_earfcns = [1300, 1300, 1300, 3350, 6300, 1300, 100, 1300, 9410, 66786, 1300, 3350]
+capture_uarfcns = [10713, 10713, 10738, 2963, 10713, 3011]
+capture_arfcns = [17, 17, 621, 43, 17, 520, 975, 17]
+capture_nr_arfcns = [632628, 632628, 428000, 632628, 645600]
+
+def sweep(first, last, count):
+    rng = random.Random(1)
+    return [rng.randint(first, last) for i in range(count)]
+
+def lookups(count):
+    # name -> (function, channels)
+    cases = {
+        'capture/lte_ul_earfcn': (util.calculate_ul_earfcn, capture_earfcns),
+        'sweep/lte_ul_earfcn': (util.calculate_ul_earfcn, sweep(0, 70645, count)),
+    }
+    if channels is not None:
+        cases.update({
+            'capture/lte_frequency': (channels.lte.frequency, capture_earfcns),
+            'capture/umts_ul_channel': (channels.umts.ul_channel, capture_uarfcns),
+            'capture/gsm_band': (channels.gsm.band, capture_arfcns),
+            'capture/nr_band': (channels.nr.band, capture_nr_arfcns),
+            'sweep/lte_band': (channels.lte.band, sweep(0, 70645, count)),
+            'sweep/nr_frequency': (channels.nr.frequency, sweep(123400, 2279165, count)),
+        })
+    return cases
+
+def run_case(function, channel_list, count, repeat):
+    channel_list = (channel_list * (count // len(channel_list) + 1))[:count]
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for channel in channel_list:
+            function(channel)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return {
+        'elapsed': best,
+        'lookups_per_sec': count / best,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SCAT channel resolution benchmark')
+    parser.add_argument('-n', '--lookups', help='Number of lookups per case', type=int, default=200000)
+    parser.add_argument('-r', '--repeat', help='Number of runs per case, best run is reported', type=int, default=3)
+    parser.add_argument('-o', '--output', help='Store results as JSON')
+    parser.add_argument('--compare', help='Compare two result files', nargs=2)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    results = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'lookups': args.lookups,
+        'cases': {},
+    }
+    for name, (function, channel_list) in lookups(args.lookups).items():
+        case = run_case(function, channel_list, args.lookups, args.repeat)
+        results['cases'][name] = case
+        print('{:<28} {:>12.0f} lookups/s'.format(name, case['lookups_per_sec']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# End-to-end decode benchmark.
+#
+# Generates deterministic corpora (see corpus.py), decodes them with each
+# vendor parser and writer in a separate process, and stores frames/s, MB/s
+# and peak RSS as JSON. The start-up time and peak RSS of short scat.py
+# conversions are measured as the cold/* cases:
+#
+#   $ python3 benchmarks/bench_decode.py -o before.json
+#   $ python3 benchmarks/bench_decode.py -o after.json
+#   $ python3 benchmarks/bench_decode.py --compare before.json after.json
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+writer_names = ['null', 'pcap', 'socket']
+
+def run_case(vendor, writer_name, corpus_fname, result_fname):
+    # Runs inside a dedicated process so that peak RSS is per case
+    import resource
+    import iodevices
+    import writers
+    import parsers
+
+    if vendor == 'qc':
+        current_parser = parsers.QualcommParser()
+        current_parser.set_parameter({'events': True})
+    elif vendor == 'sec':
+        current_parser = parsers.SamsungParser()
+        current_parser.set_parameter({'model': 'e5123'})
+    else:
+        current_parser = parsers.HisiliconParser()
+
+    if writer_name == 'null':
+        writer = writers.NullWriter()
+    elif writer_name == 'pcap':
+        writer = writers.PcapWriter(os.path.join(os.path.dirname(result_fname), 'out.pcap'))
+    else:
+        writer = writers.SocketWriter('127.0.0.1', 4729, 47290)
+
+    current_parser.set_io_device(iodevices.FileIO([corpus_fname]))
+    current_parser.set_writer(writer)
+
+    start = time.perf_counter()
+    current_parser.read_dump()
+    elapsed = time.perf_counter() - start
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    with open(result_fname, 'w') as f:
+        json.dump({'elapsed': elapsed, 'max_rss_kb': usage.ru_maxrss}, f)
+
+def run_cold_start(vendor, corpus_fname, out_fname):
+    # Full scat.py run on a small dump: interpreter start, imports and decode
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(base_dir, 'scat.py'), '-t', vendor, '-d', corpus_fname, '-F', out_fname],
+        stdout=subprocess.DEVNULL)
+    pid, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+    return {'elapsed': elapsed, 'max_rss_kb': usage.ru_maxrss}
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=base_dir, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(vendors, writer_list, num_frames, repeat, cold_frames=100):
+    import corpus
+
+    results = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'frames': num_frames,
+        'cases': {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for vendor in vendors:
+            ext, generator = corpus.generators[vendor]
+            corpus_fname = os.path.join(tmpdir, 'corpus.' + ext)
+            corpus_bytes = generator(corpus_fname, num_frames)
+
+            for writer_name in writer_list:
+                result_fname = os.path.join(tmpdir, 'result.json')
+                best = None
+                for i in range(repeat):
+                    subprocess.check_call([sys.executable, os.path.abspath(__file__), '--run-case', vendor, writer_name, corpus_fname, result_fname],
+                        stdout=subprocess.DEVNULL)
+                    with open(result_fname) as f:
+                        case = json.load(f)
+                    if best is None or case['elapsed'] < best['elapsed']:
+                        best = case
+
+                name = '{}/{}'.format(vendor, writer_name)
+                results['cases'][name] = {
+                    'elapsed': best['elapsed'],
+                    'frames_per_sec': num_frames / best['elapsed'],
+                    'mb_per_sec': corpus_bytes / best['elapsed'] / 1e6,
+                    'max_rss_kb': best['max_rss_kb'],
+                }
+                print('{:<12} {:>10.0f} frames/s {:>8.2f} MB/s {:>8} kB RSS'.format(name,
+                    results['cases'][name]['frames_per_sec'], results['cases'][name]['mb_per_sec'], best['max_rss_kb']))
+
+            cold_fname = os.path.join(tmpdir, 'cold.' + ext)
+            generator(cold_fname, cold_frames)
+            best = None
+            for i in range(repeat):
+                case = run_cold_start(vendor, cold_fname, os.path.join(tmpdir, 'cold.pcap'))
+                if best is None or case['elapsed'] < best['elapsed']:
+                    best = case
+
+            name = 'cold/{}'.format(vendor)
+            results['cases'][name] = {
+                'startup_ms': best['elapsed'] * 1000,
+                'max_rss_kb': best['max_rss_kb'],
+            }
+            print('{:<12} {:>10.1f} ms start-up {:>8} kB RSS'.format(name, best['elapsed'] * 1000, best['max_rss_kb']))
+
+    return results
+
+def compare(old_fname, new_fname):
+    with open(old_fname) as f:
+        old = json.load(f)
+    with open(new_fname) as f:
+        new = json.load(f)
+
+    print('{:<16} {:>12} {:>12} {:>8}'.format('Case', old.get('revision'), new.get('revision'), 'Change'))
+    for name in sorted(set(old['cases'].keys()) | set(new['cases'].keys())):
+        for key in old['cases'].get(name, new['cases'].get(name)).keys():
+            if key == 'elapsed':
+                continue
+            old_value = old['cases'].get(name, {}).get(key)
+            new_value = new['cases'].get(name, {}).get(key)
+            if old_value is None or new_value is None:
+                print('{:<16} {:>12} {:>12}'.format(name + ' ' + key, str(old_value), str(new_value)))
+                continue
+            change = (new_value - old_value) / old_value * 100 if old_value else 0
+            print('{:<28} {:>12.1f} {:>12.1f} {:>+7.1f}%'.format(name + ' ' + key, old_value, new_value, change))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SCAT decode benchmark')
+    parser.add_argument('-n', '--frames', help='Number of frames per corpus', type=int, default=20000)
+    parser.add_argument('-r', '--repeat', help='Number of runs per case, best run is reported', type=int, default=3)
+    parser.add_argument('-t', '--type', help='Baseband types to benchmark', nargs='*', default=['qc', 'sec', 'hisi'])
+    parser.add_argument('-w', '--writer', help='Writers to benchmark', nargs='*', default=writer_names, choices=writer_names)
+    parser.add_argument('-o', '--output', help='Store results as JSON')
+    parser.add_argument('--compare', help='Compare two result files', nargs=2)
+    parser.add_argument('--run-case', help=argparse.SUPPRESS, nargs=4)
+    args = parser.parse_args()
+
+    if args.run_case:
+        run_case(*args.run_case)
+    elif args.compare:
+        compare(*args.compare)
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        results = run_benchmarks(args.type, args.writer, args.frames, args.repeat)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
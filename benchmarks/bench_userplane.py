@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# User plane decode throughput.
+#
+# Decodes frames carrying user plane data in-process and reports the
+# payload rate (PDCP PDUs, IP packets, MAC transport blocks) in Mbit/s,
+# next to the peak rate of an LTE category 12 UE (600 Mbit/s downlink,
+# 100 Mbit/s uplink). DIAG frames are passed without HDLC encoding and CRC,
+# like DLF dumps, so that the rates reflect the decoding of the user plane
+# data rather than the framing. SDM frames are read from a raw SDM dump.
+#
+#   $ python3 benchmarks/bench_userplane.py -o before.json
+#   $ python3 benchmarks/bench_userplane.py -o after.json
+#   $ python3 benchmarks/bench_userplane.py --compare before.json after.json
+
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+import platform
+import tempfile
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus
+import iodevices
+import writers
+import parsers
+from bench_decode import git_revision, compare
+
+cat12_mbps = {'dl': 600, 'ul': 100}
+
+def qc_frames(log_id, bodies, num_frames):
+    return [struct.pack('<BBHHHQ', 0x10, 0, len(x) + 12, len(x) + 12, log_id, i << 16) + x
+        for i in range(num_frames) for x in bodies]
+
+def decode_frames(parser, frames):
+    for frame in frames:
+        parse_result = parser.parse_diag(frame, hdlc_encoded=False, check_crc=False)
+        if parse_result is not None:
+            parser.postprocess_parse_result(parse_result)
+
+def qc_pdcp_case(log_id, generator):
+    def build(num_pdus, pdu_size, num_frames, tmpdir):
+        parser = parsers.QualcommParser()
+        parser.set_writer(writers.NullWriter())
+        frames = qc_frames(log_id, [generator(num_pdus, pdu_size)], num_frames)
+        return lambda: decode_frames(parser, frames), num_frames * num_pdus * pdu_size, num_frames * num_pdus
+    return build
+
+def qc_mac_case(log_id, generator):
+    # Payload is the size of the transport blocks described by the samples
+    def build(num_pdus, pdu_size, num_frames, tmpdir):
+        parser = parsers.QualcommParser()
+        parser.set_writer(writers.NullWriter())
+        frames = qc_frames(log_id, [generator(num_pdus, pdu_size)], num_frames)
+        return lambda: decode_frames(parser, frames), num_frames * num_pdus * pdu_size, num_frames * num_pdus
+    return build
+
+def qc_1x_ip(num_pdus, pdu_size, num_frames, tmpdir):
+    # Each IP packet in num_pdus segments of Protocol Services Data
+    parser = parsers.QualcommParser()
+    parser.set_writer(writers.NullWriter())
+    segment_size = pdu_size // num_pdus
+    segments = []
+    for i in range(num_pdus):
+        is_final = 0x8000 if i == num_pdus - 1 else 0
+        segments.append(struct.pack('<BBBBHH', 0, 0x01, 2, 0x00, 1, i | is_final) + bytes(segment_size))
+    frames = qc_frames(0x11EB, segments, num_frames)
+    return lambda: decode_frames(parser, frames), num_frames * num_pdus * segment_size, num_frames
+
+def sec_sdm_ip_data(num_pdus, pdu_size, num_frames, tmpdir):
+    # Raw SDM dump read through SamsungParser.run_diag(), one IP packet per frame
+    fname = os.path.join(tmpdir, 'ip.sdmraw')
+    with open(fname, 'wb') as f:
+        frame = corpus.sdm_ip_frame(1, pdu_size - 20)
+        for i in range(num_frames):
+            f.write(frame)
+
+    def run():
+        parser = parsers.SamsungParser()
+        parser.set_parameter({'model': 'e5123'})
+        parser.set_io_device(iodevices.FileIO([fname]))
+        parser.set_writer(writers.NullWriter())
+        parser.read_dump()
+    return run, num_frames * pdu_size, num_frames
+
+# name -> (direction, function(num_pdus, pdu_size, num_frames, tmpdir) -> (run, payload bytes, number of PDUs))
+cases = {
+    'qc/lte_pdcp_dl_cip': ('dl', qc_pdcp_case(0xB0A3, corpus.lte_pdcp_dl_cip)),
+    'qc/lte_pdcp_ul_cip': ('ul', qc_pdcp_case(0xB0B3, corpus.lte_pdcp_ul_cip)),
+    'qc/lte_mac_dl_tb': ('dl', qc_mac_case(0xB063, corpus.lte_mac_dl_tb)),
+    'qc/lte_mac_ul_tb': ('ul', qc_mac_case(0xB064, corpus.lte_mac_ul_tb)),
+    'qc/1x_ip': ('dl', qc_1x_ip),
+    'sec/sdm_ip_data': ('dl', sec_sdm_ip_data),
+}
+
+def run_case(build, num_pdus, pdu_size, num_frames, repeat):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        run, payload_len, pdus = build(num_pdus, pdu_size, num_frames, tmpdir)
+        best = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+    return {
+        'elapsed': best,
+        'mbit_per_sec': payload_len * 8 / best / 1e6,
+        'pdus_per_sec': pdus / best,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SCAT user plane throughput benchmark')
+    parser.add_argument('-n', '--frames', help='Number of frames per case', type=int, default=5000)
+    parser.add_argument('-r', '--repeat', help='Number of runs per case, best run is reported', type=int, default=3)
+    parser.add_argument('--pdus', help='Number of PDUs or transport blocks per log packet, segments per 1x IP packet', type=int, default=8)
+    parser.add_argument('--pdu-size', help='PDU, transport block and IP packet size in bytes', type=int, default=1500)
+    parser.add_argument('-c', '--case', help='Cases to run', nargs='*', default=list(cases.keys()), choices=list(cases.keys()))
+    parser.add_argument('-o', '--output', help='Store results as JSON')
+    parser.add_argument('--compare', help='Compare two result files', nargs=2)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    results = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'frames': args.frames,
+        'cases': {},
+    }
+    for name in args.case:
+        direction, build = cases[name]
+        case = run_case(build, args.pdus, args.pdu_size, args.frames, args.repeat)
+        results['cases'][name] = case
+        print('{:<24} {:>10.1f} Mbit/s {:>10.0f} PDUs/s {:>6.2f}x LTE Cat-12 {}'.format(name,
+            case['mbit_per_sec'], case['pdus_per_sec'], case['mbit_per_sec'] / cat12_mbps[direction], direction.upper()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Deterministic synthetic baseband dumps for the decode benchmarks.
+# Packet bodies are taken from the unit tests and wrapped with the regular
+# packet builders, so the corpora exercise the same code paths as real dumps.
+
+import os
+import sys
+import random
+import struct
+import binascii
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import util
+from parsers.samsung.sdmcmd import generate_sdm_packet
+
+def qc_log(log_id, ts, body, radio_id=None):
+    pkt = struct.pack('<BBHHHQ', 0x10, 0, len(body) + 12, len(body) + 12, log_id, ts) + body
+    if radio_id is not None:
+        pkt = struct.pack('<BBHL', 0x98, 0x01, 0x0000, radio_id) + pkt
+    return util.generate_packet(pkt)
+
+def qc_events(ts, events):
+    # events: list of (event_id, payload), payload of 0, 1, 2 bytes or longer (length prefixed)
+    body = b''
+    for event_id, payload in events:
+        if len(payload) <= 2:
+            payload_len = len(payload)
+        else:
+            payload_len = 3
+            payload = bytes([len(payload)]) + payload
+        body += struct.pack('<HQ', event_id | (payload_len << 13), ts) + payload
+    return util.generate_packet(struct.pack('<BH', 0x60, len(body)) + body)
+
+def lte_pdcp_dl_cip(num_pdus, pdu_size):
+    pdus = b''
+    for i in range(num_pdus):
+        # rbid 2 (DRB), 12 bit SN, valid
+        cfg = (1 << 14) | (2 << 9) | (2 << 7) | 0x3
+        pdu = struct.pack('!H', 0x8000 | (i & 0xfff)) + bytes([(i + x) & 0xff for x in range(pdu_size - 2)])
+        pdus += struct.pack('<HHHHLB', cfg, len(pdu), len(pdu), 0x2217, i, 0) + pdu
+    subpkt = b'\x11' * 16 + b'\x22' * 16 + struct.pack('<BBH', 0x03, 0x03, num_pdus) + pdus
+    return struct.pack('<BBH', 0x01, 0x01, 0x0000) + struct.pack('<BBH', 0xC3, 0x18, len(subpkt) + 4) + subpkt
+
+def lte_pdcp_ul_cip(num_pdus, pdu_size):
+    pdus = b''
+    for i in range(num_pdus):
+        # rbid 3 (DRB), 12 bit SN, valid
+        cfg = (1 << 14) | (3 << 9) | (2 << 7) | 0x4
+        pdu = struct.pack('!H', 0x8000 | (i & 0xfff)) + bytes([(i * 3 + x) & 0xff for x in range(pdu_size - 2)])
+        pdus += struct.pack('<HHHHLB', cfg, len(pdu), len(pdu), 0x2210, i, 0) + pdu
+    subpkt = b'\x11' * 16 + b'\x22' * 16 + struct.pack('<BBH', 0x03, 0x03, num_pdus) + pdus
+    return struct.pack('<BBH', 0x01, 0x01, 0x0000) + struct.pack('<BBH', 0xC3, 0x1A, len(subpkt) + 4) + subpkt
+
+def lte_mac_dl_tb(num_samples, tb_size, header_len=8):
+    # Subpacket version 4, samples of tb_size bytes with the first header_len bytes logged
+    body = bytes([num_samples])
+    for i in range(num_samples):
+        body += struct.pack('<BBHBBHHBHB', 0, 0, ((i * 7) & 0x3ff) << 4 | (i % 10), (0, 2, 3, 5)[i % 4], i % 8, 0,
+            tb_size, 1, 0, header_len) + bytes([(i + x) & 0xff for x in range(header_len)])
+    subpkt = struct.pack('<BBH', 0x07, 0x04, len(body) + 4) + body
+    return struct.pack('<BBH', 0x01, 0x01, 0x0000) + subpkt
+
+def lte_mac_ul_tb(num_samples, tb_size, header_len=8):
+    # Subpacket version 2, samples of tb_size bytes with the first header_len bytes logged
+    body = bytes([num_samples])
+    for i in range(num_samples):
+        body += struct.pack('<BBBBHHBHBBB', 0, 0, i % 8, 0, ((i * 7) & 0x3ff) << 4 | (i % 10),
+            tb_size, 1, 0, 0, 0, header_len) + bytes([(i * 3 + x) & 0xff for x in range(header_len)])
+    subpkt = struct.pack('<BBH', 0x08, 0x02, len(body) + 4) + body
+    return struct.pack('<BBH', 0x01, 0x01, 0x0000) + subpkt
+
+def wcdma_rlc_dl_am_signaling(num_pdus, pdu_size):
+    body = bytes([num_pdus])
+    for i in range(num_pdus):
+        body += struct.pack('<BHH', 16, i, pdu_size * 8) + bytes([0x80 | (i & 0x7f)] + [0x2b] * (pdu_size - 1))
+    return body
+
+unhex = binascii.unhexlify
+
+# (weight, name, log_id, body)
+qc_log_mix = [
+    (20, 'LTE RRC', 0xB0C0, unhex('1a0f400f40010e011307000000000b0000000002001015')),
+    (8, 'LTE NAS', 0xB0EC, b'\x01\x09\x05\x00' + unhex('0741720bf662f2200001c0000a8c0f0a5200000000000000')),
+    (15, 'LTE MAC DL', 0xB063, unhex('01011c36070458000402001527030100000900000000095800611418120e7f00020028270407000029000102000a3c201d1f408c61ca51e602004527000700000700000400033d1f1f020049270006000007000102000321021f0000')),
+    (12, 'LTE PDCP DL', 0xB0A3, lte_pdcp_dl_cip(4, 120)),
+    (10, 'LTE ML1 SCell', 0xB17F, unhex('040100009C18D60AECC44E00E2244E00FFFCE30FFED80A0047AD56021D310100A2624100')),
+    (6, 'LTE ML1 NCell', 0xB180, unhex('040100009C1847008348E44DDEA44C00CAB4CC32B6D8420300000000FF773301FF77330122020100')),
+    (8, 'WCDMA RLC DL', 0x4135, wcdma_rlc_dl_am_signaling(2, 40)),
+    (4, 'WCDMA RRC', 0x412F, unhex('84281f00a7298d01a143f686e52a22282f36928cc1852026d2519830afacda4a330614909b4944')),
+    (8, 'GSM burst metrics', 0x506C, unhex('03c30407002580985c3f0036fb2b0048fe040000008e6e00c4040700258066a8390031fbfe00e2fd02000000af4f0000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000ff0000')),
+    (4, 'GSM RR', 0x512F, unhex('811b1749061b761762f2200141c8010a156544b800004e072b2b')),
+]
+
+# Handled LTE events mixed with events decoded by the fallback parser
+qc_event_mix = [
+    [(1605, b'\x01\x02\x03\x04'), (1606, b'\x02')],
+    [(1609, b'\x03\x01'), (1610, b'\x03\x02')],
+    [(1629, b'\x41\x07\x00\x00'), (1994, b'\x01')],
+    [(1003, b''), (1004, b'\x01'), (1005, b'\x01\x02\x03\x04\x05\x06')],
+]
+
+sdm_frame_mix = [
+    (10, 'LTE RRC state', unhex('7f0f00000c0050ffa00251de8b892e027e')),
+    (6, 'LTE RRC BCCH', unhex('7f1900001600bbffa00252701ebd2f0100070040031e080597e07e')),
+    (6, 'LTE RRC DCCH', unhex('7f2b000028004fffa00252de79892e0000190070129813fd94049b7065972ae10c3ece0587600250d08c43007e')),
+    (6, 'LTE RRC PCCH', unhex('7f180000150034ffa002523f10892e0001060051793604aaa67e')),
+    (10, 'HSPA UL1', unhex('7f1300001000c0ffa004205b942c0f00000000007e')),
+    (5, 'HSPA URRC', unhex('7f1600001300e9ffa00422e6c4ec3586263c2a500408007e')),
+]
+
+def hisi_log(cmd, ts, body):
+    pkt = b'\x00' + struct.pack('<LQLLL', 0x01032002, ts, 0, cmd, len(body)) + body
+    return util.generate_packet(pkt)
+
+# (weight, name, cmd, body), LTE OTA bodies without the log header
+hisi_log_mix = [
+    (10, 'LTE BCCH BCH', 0x20010000, unhex('AB0000000100000011000000C60F0000076A9000')),
+    (10, 'LTE BCCH DL-SCH', 0x20010000, unhex('AB0000000100000012000000D90F00000640498805BFCD0322F0382130A0818C4326C0')),
+    (6, 'LTE PCCH', 0x20010000, unhex('AB0000000100000001000000C90F00000540065CBCDB0FD0')),
+    (4, 'LTE DL CCCH', 0x20010000, unhex('AB0000000100000004000000D30F00000368129808FDCE0183B0BA083E8BFF44AE618531B3806009420A1A004220')),
+    (4, 'LTE UL CCCH', 0x20010000, unhex('AB0000000200000003000000D20F000004465CB8470A08')),
+    (8, 'LTE DL DCCH', 0x20010000, unhex('AB0000000100000006000000D50F000001320220')),
+    (4, 'NAS EMM DL', 0x20010000, unhex('AD00000001000000DD0000004D100000075503')),
+    # Not decoded, dropped by the parser
+    (6, 'LTE 0x20020000', 0x20020000, unhex('B3000000AC0000008A020000C106000000000000B300000000000000AC00000022000000C106000000059202010083001200000040498805BFCD0322F0382130A0818C4326C0')),
+]
+
+def sdm_ip_frame(seq_num, length):
+    ip_pkt = struct.pack('!BBHHHBBHLL', 0x45, 0, 20 + length, seq_num & 0xffff, 0, 64, 17, 0, 0x0a000001, 0x0a000002) + bytes(length)
+    return generate_sdm_packet(0xa0, 0x07, 0x00, struct.pack('<HHHH', seq_num & 0xffff, 0, 0, len(ip_pkt)) + ip_pkt)
+
+def weighted(rng, mix):
+    total = sum(x[0] for x in mix)
+    r = rng.uniform(0, total)
+    for x in mix:
+        r -= x[0]
+        if r <= 0:
+            return x
+    return mix[-1]
+
+def generate_qmdl(fname, num_frames, seed=1):
+    """Writes a QMDL corpus: log packets (20% multi-SIM wrapped) and event reports."""
+    rng = random.Random(seed)
+    ts = util.create_qxdm_ts(util.parse_qxdm_ts(0).replace(year=2023))
+    total = 0
+    with open(fname, 'wb') as f:
+        for i in range(num_frames):
+            ts += rng.randint(1, 80) << 16
+            if rng.random() < 0.1:
+                frame = qc_events(ts, qc_event_mix[rng.randrange(len(qc_event_mix))])
+            else:
+                weight, name, log_id, body = weighted(rng, qc_log_mix)
+                radio_id = rng.choice((1, 2)) if rng.random() < 0.2 else None
+                frame = qc_log(log_id, ts, body, radio_id)
+            f.write(frame)
+            total += len(frame)
+    return total
+
+def generate_sdmraw(fname, num_frames, seed=1):
+    """Writes a raw SDM corpus: LTE/HSPA measurement and signaling frames and IP data."""
+    rng = random.Random(seed)
+    total = 0
+    with open(fname, 'wb') as f:
+        for i in range(num_frames):
+            if rng.random() < 0.2:
+                frame = sdm_ip_frame(i, rng.randint(40, 1400))
+            else:
+                frame = weighted(rng, sdm_frame_mix)[2]
+            f.write(frame)
+            total += len(frame)
+    return total
+
+def generate_lpd(fname, num_frames, seed=1):
+    """Writes a HiSilicon LPD corpus: LTE OTA messages and undecoded logs."""
+    rng = random.Random(seed)
+    ts = 0
+    total = 0
+    with open(fname, 'wb') as f:
+        for i in range(num_frames):
+            ts += rng.randint(1, 80)
+            weight, name, cmd, body = weighted(rng, hisi_log_mix)
+            frame = hisi_log(cmd, ts, body)
+            f.write(frame)
+            total += len(frame)
+    return total
+
+generators = {
+    'qc': ('qmdl', generate_qmdl),
+    'sec': ('sdmraw', generate_sdmraw),
+    'hisi': ('lpd', generate_lpd),
+}
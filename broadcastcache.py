@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+from collections import OrderedDict
+
+class BroadcastCache:
+    """Suppresses byte-identical repeats of broadcast messages.
+
+    While camped on a cell, the MIB and SIBs are received again every few
+    hundred milliseconds. The first copy of a message is emitted, further
+    copies of the same content on the same radio, cell and channel within
+    window seconds are suppressed. The next copy after the window is emitted
+    again, together with the number of copies suppressed in between. The
+    window is measured in device time, so that dumps and live captures are
+    treated alike.
+
+    The cache is keyed by (radio ID, cell, channel) and the message content,
+    so that different SIBs sent on the same channel are tracked separately.
+    At most max_entries messages are tracked, the least recently received
+    one is dropped first.
+    """
+    def __init__(self, window, max_entries=1024, metric=None):
+        self.window = window
+        self.max_entries = max_entries
+        # metrics.Counter of the suppressed messages
+        self.metric = metric
+        # (radio ID, cell, channel, content) -> [time of the last emitted copy, suppressed copies since]
+        self.entries = OrderedDict()
+
+    def check(self, radio_id, cell, channel, content, ts):
+        """Returns None if the message is a repeat to suppress, otherwise the
+        number of copies suppressed since the last emitted one.
+
+        Parameters:
+        radio_id (int): radio ID
+        cell (hashable): cell identity, e.g. (PCI, EARFCN)
+        channel (int): GSMTAP channel or sub type
+        content (bytes): message, or a tuple of its fields without the frame number
+        ts (float): device time in seconds
+        """
+        key = (radio_id, cell, channel, content)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = [ts, 0]
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return 0
+
+        self.entries.move_to_end(key)
+        if 0 <= ts - entry[0] < self.window:
+            entry[1] += 1
+            if self.metric is not None:
+                self.metric.value += 1
+            return None
+
+        repeats = entry[1]
+        entry[0] = ts
+        entry[1] = 0
+        return repeats
+
+    def clear(self):
+        self.entries.clear()
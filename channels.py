@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+from collections import namedtuple
+import bisect
+
+# Channel number to band, frequency and DL/UL channel resolution for GSM
+# (ARFCN), UMTS (UARFCN), LTE (EARFCN) and NR (NR-ARFCN).
+#
+# Each band is a range of DL channels and a range of UL channels. TDD bands
+# use the same range for both directions, SDL bands have no UL range.
+# Frequencies are linear within a band: dl_freq/ul_freq is the center
+# frequency (MHz) of the first channel, step the channel spacing (MHz).
+ChannelBand = namedtuple('ChannelBand', 'band dl_first dl_last ul_first ul_last dl_freq ul_freq step')
+
+def fdd(band, dl_first, dl_last, ul_first, ul_last, dl_freq, ul_freq, step):
+    return ChannelBand(band, dl_first, dl_last, ul_first, ul_last, dl_freq, ul_freq, step)
+
+def tdd(band, first, last, freq, step):
+    return ChannelBand(band, first, last, first, last, freq, freq, step)
+
+def sdl(band, dl_first, dl_last, dl_freq, step):
+    return ChannelBand(band, dl_first, dl_last, None, None, dl_freq, None, step)
+
+class ChannelTable:
+    """Resolves the channel numbers of one RAT with a band table.
+
+    The DL and UL ranges of the bands are flattened into sorted, disjoint
+    segments, which are looked up with bisect. Where the ranges of several
+    bands overlap, the band listed first wins. The results of band(),
+    frequency(), ul_channel() and dl_channel() are memoized per channel.
+
+    Parameters:
+    rat (str): name of the RAT
+    bands (list): ChannelBand of each band, in order of precedence
+    """
+    # Memoized results per function and direction, a cache is reset when full
+    cache_size = 4096
+
+    def __init__(self, rat, bands):
+        self.rat = rat
+        self.bands = tuple(bands)
+        self.dl_starts, self.dl_segments = self.build_segments([(x.dl_first, x.dl_last, x) for x in self.bands])
+        self.ul_starts, self.ul_segments = self.build_segments([(x.ul_first, x.ul_last, x) for x in self.bands if x.ul_first is not None])
+        self.dl_bands = {}
+        self.ul_bands = {}
+        self.dl_frequencies = {}
+        self.ul_frequencies = {}
+        self.ul_channels = {}
+        self.dl_channels = {}
+
+    def build_segments(self, ranges):
+        # Splits the ranges at every range start and end, so that each
+        # segment is covered by one band (or none, then it is not stored)
+        bounds = sorted({x[0] for x in ranges} | {x[1] + 1 for x in ranges})
+        starts = []
+        segments = []
+        for start, end in zip(bounds, bounds[1:]):
+            band = None
+            for first, last, x in ranges:
+                if first <= start <= last:
+                    band = x
+                    break
+            if band is None:
+                continue
+            if len(segments) > 0 and segments[-1][2] is band and segments[-1][1] == start - 1:
+                segments[-1] = (segments[-1][0], end - 1, band)
+            else:
+                starts.append(start)
+                segments.append((start, end - 1, band))
+        return starts, segments
+
+    def memoize(self, cache, channel, value):
+        if len(cache) >= self.cache_size:
+            cache.clear()
+        cache[channel] = value
+        return value
+
+    def lookup(self, channel, uplink=False):
+        """Returns the ChannelBand of a channel, None for unknown channels.
+
+        Parameters:
+        channel (int): channel number
+        uplink (bool): True if channel is an UL channel
+        """
+        if uplink:
+            starts, segments = self.ul_starts, self.ul_segments
+        else:
+            starts, segments = self.dl_starts, self.dl_segments
+        i = bisect.bisect_right(starts, channel) - 1
+        if i >= 0 and channel <= segments[i][1]:
+            return segments[i][2]
+        return None
+
+    def band(self, channel, uplink=False):
+        """Returns the band number of a channel, None for unknown channels.
+
+        Parameters:
+        channel (int): channel number
+        uplink (bool): True if channel is an UL channel
+        """
+        cache = self.ul_bands if uplink else self.dl_bands
+        if channel in cache:
+            return cache[channel]
+
+        band = self.lookup(channel, uplink)
+        return self.memoize(cache, channel, band.band if band is not None else None)
+
+    def frequency(self, channel, uplink=False):
+        """Returns the center frequency of a channel in MHz, None for unknown channels.
+
+        Parameters:
+        channel (int): channel number
+        uplink (bool): True if channel is an UL channel
+        """
+        cache = self.ul_frequencies if uplink else self.dl_frequencies
+        if channel in cache:
+            return cache[channel]
+
+        band = self.lookup(channel, uplink)
+        if band is None:
+            frequency = None
+        elif uplink:
+            frequency = round(band.ul_freq + (channel - band.ul_first) * band.step, 3)
+        else:
+            frequency = round(band.dl_freq + (channel - band.dl_first) * band.step, 3)
+        return self.memoize(cache, channel, frequency)
+
+    def ul_channel(self, dl_channel):
+        """Returns the UL channel paired with a DL channel.
+
+        Returns the input for TDD, SDL and unknown channels, and for DL
+        channels beyond the UL range of the band.
+
+        Parameters:
+        dl_channel (int): DL channel number
+        """
+        ul_channel = self.ul_channels.get(dl_channel)
+        if ul_channel is not None:
+            return ul_channel
+
+        ul_channel = dl_channel
+        band = self.lookup(dl_channel, False)
+        if band is not None and band.ul_first is not None:
+            if dl_channel - band.dl_first + band.ul_first <= band.ul_last:
+                ul_channel = dl_channel - band.dl_first + band.ul_first
+        return self.memoize(self.ul_channels, dl_channel, ul_channel)
+
+    def dl_channel(self, ul_channel):
+        """Returns the DL channel paired with an UL channel, the input for unknown channels.
+
+        Parameters:
+        ul_channel (int): UL channel number
+        """
+        dl_channel = self.dl_channels.get(ul_channel)
+        if dl_channel is not None:
+            return dl_channel
+
+        dl_channel = ul_channel
+        band = self.lookup(ul_channel, True)
+        if band is not None:
+            dl_channel = ul_channel - band.ul_first + band.dl_first
+        return self.memoize(self.dl_channels, ul_channel, dl_channel)
+
+# 3GPP TS 45.005, Section 2. The ARFCN is shared by DL and UL, bands are
+# named after their frequency (900 includes E-GSM and R-GSM). DCS 1800 takes
+# precedence over PCS 1900, which uses the same ARFCNs.
+gsm = ChannelTable('GSM', [
+    fdd(900, 1, 124, 1, 124, 935.2, 890.2, 0.2),
+    fdd(900, 975, 1023, 975, 1023, 925.2, 880.2, 0.2),
+    fdd(900, 0, 0, 0, 0, 935.0, 890.0, 0.2),
+    fdd(900, 955, 974, 955, 974, 921.2, 876.2, 0.2),
+    fdd(1800, 512, 885, 512, 885, 1805.2, 1710.2, 0.2),
+    fdd(1900, 512, 810, 512, 810, 1930.2, 1850.2, 0.2),
+    fdd(850, 128, 251, 128, 251, 869.2, 824.2, 0.2),
+    fdd(450, 259, 293, 259, 293, 460.6, 450.6, 0.2),
+    fdd(480, 306, 340, 306, 340, 489.0, 479.0, 0.2),
+])
+
+# 3GPP TS 25.101, Table 5.2 (general UARFCNs, without additional channels)
+umts = ChannelTable('UMTS', [
+    fdd(1, 10562, 10838, 9612, 9888, 2112.4, 1922.4, 0.2),
+    fdd(2, 9662, 9938, 9262, 9538, 1932.4, 1852.4, 0.2),
+    fdd(3, 1162, 1513, 937, 1288, 1807.4, 1712.4, 0.2),
+    fdd(4, 1537, 1738, 1312, 1513, 2112.4, 1712.4, 0.2),
+    fdd(5, 4357, 4458, 4132, 4233, 871.4, 826.4, 0.2),
+    fdd(6, 4387, 4413, 4162, 4188, 877.4, 832.4, 0.2),
+    fdd(7, 2237, 2563, 2012, 2338, 2622.4, 2502.4, 0.2),
+    fdd(8, 2937, 3088, 2712, 2863, 927.4, 882.4, 0.2),
+    fdd(9, 9237, 9387, 8762, 8912, 1847.4, 1752.4, 0.2),
+    fdd(10, 3112, 3388, 2887, 3163, 2112.4, 1712.4, 0.2),
+    fdd(11, 3712, 3787, 3487, 3562, 1478.4, 1430.4, 0.2),
+    fdd(12, 3842, 3903, 3617, 3678, 731.4, 701.4, 0.2),
+    fdd(13, 4017, 4043, 3792, 3818, 748.4, 779.4, 0.2),
+    fdd(14, 4117, 4143, 3892, 3918, 760.4, 790.4, 0.2),
+    fdd(19, 712, 763, 312, 363, 877.4, 832.4, 0.2),
+    fdd(20, 4512, 4638, 4287, 4413, 793.4, 834.4, 0.2),
+    fdd(21, 862, 912, 462, 512, 1498.4, 1450.4, 0.2),
+    fdd(22, 4662, 5038, 4437, 4813, 3512.4, 3412.4, 0.2),
+    fdd(25, 5112, 5413, 4887, 5188, 1932.4, 1852.4, 0.2),
+    fdd(26, 5762, 5913, 5537, 5688, 861.4, 816.4, 0.2),
+])
+
+# 3GPP TS 36.101, Table 5.7.3-1
+lte = ChannelTable('LTE', [
+    fdd(1, 0, 599, 18000, 18599, 2110, 1920, 0.1),
+    fdd(2, 600, 1199, 18600, 19199, 1930, 1850, 0.1),
+    fdd(3, 1200, 1949, 19200, 19949, 1805, 1710, 0.1),
+    fdd(4, 1950, 2399, 19950, 20399, 2110, 1710, 0.1),
+    fdd(5, 2400, 2649, 20400, 20649, 869, 824, 0.1),
+    fdd(6, 2650, 2749, 20650, 20749, 875, 830, 0.1),
+    fdd(7, 2750, 3449, 20750, 21449, 2620, 2500, 0.1),
+    fdd(8, 3450, 3799, 21450, 21799, 925, 880, 0.1),
+    fdd(9, 3800, 4149, 21800, 22149, 1844.9, 1749.9, 0.1),
+    fdd(10, 4150, 4749, 22150, 22749, 2110, 1710, 0.1),
+    fdd(11, 4750, 4949, 22750, 22949, 1475.9, 1427.9, 0.1),
+    fdd(12, 5010, 5179, 23010, 23179, 729, 699, 0.1),
+    fdd(13, 5180, 5279, 23180, 23279, 746, 777, 0.1),
+    fdd(14, 5280, 5379, 23280, 23379, 758, 788, 0.1),
+    fdd(17, 5730, 5849, 23730, 23849, 734, 704, 0.1),
+    fdd(18, 5850, 5999, 23850, 23999, 860, 815, 0.1),
+    fdd(19, 6000, 6149, 24000, 24149, 875, 830, 0.1),
+    fdd(20, 6150, 6449, 24150, 24449, 791, 832, 0.1),
+    fdd(21, 6450, 6599, 24450, 24599, 1495.9, 1447.9, 0.1),
+    fdd(22, 6600, 7399, 24600, 25399, 3510, 3410, 0.1),
+    fdd(23, 7500, 7699, 25500, 25699, 2180, 2000, 0.1),
+    fdd(24, 7700, 8039, 25700, 26039, 1525, 1626.5, 0.1),
+    fdd(25, 8040, 8689, 26040, 26689, 1930, 1850, 0.1),
+    fdd(26, 8690, 9039, 26690, 27039, 859, 814, 0.1),
+    fdd(27, 9040, 9209, 27040, 27209, 852, 807, 0.1),
+    fdd(28, 9210, 9659, 27210, 27659, 758, 703, 0.1),
+    sdl(29, 9660, 9769, 717, 0.1),
+    fdd(30, 9770, 9869, 27660, 27759, 2350, 2305, 0.1),
+    fdd(31, 9870, 9919, 27760, 27809, 462.5, 452.5, 0.1),
+    sdl(32, 9920, 10359, 1452, 0.1),
+    tdd(33, 36000, 36199, 1900, 0.1),
+    tdd(34, 36200, 36349, 2010, 0.1),
+    tdd(35, 36350, 36949, 1850, 0.1),
+    tdd(36, 36950, 37549, 1930, 0.1),
+    tdd(37, 37550, 37749, 1910, 0.1),
+    tdd(38, 37750, 38249, 2570, 0.1),
+    tdd(39, 38250, 38649, 1880, 0.1),
+    tdd(40, 38650, 39649, 2300, 0.1),
+    tdd(41, 39650, 41589, 2496, 0.1),
+    tdd(42, 41590, 43589, 3400, 0.1),
+    tdd(43, 43590, 45589, 3600, 0.1),
+    tdd(44, 45590, 46589, 703, 0.1),
+    tdd(45, 46590, 46789, 1447, 0.1),
+    tdd(46, 46790, 54539, 5150, 0.1),
+    tdd(47, 54540, 55239, 5855, 0.1),
+    tdd(48, 55240, 56739, 3550, 0.1),
+    tdd(49, 56740, 58239, 3550, 0.1),
+    tdd(50, 58240, 59089, 1432, 0.1),
+    tdd(51, 59090, 59139, 1427, 0.1),
+    tdd(52, 59140, 60139, 3300, 0.1),
+    tdd(53, 60140, 60254, 2483.5, 0.1),
+    fdd(65, 65536, 66435, 131072, 131971, 2110, 1920, 0.1),
+    # DL 2180-2200 MHz has no UL
+    fdd(66, 66436, 67335, 131972, 132671, 2110, 1710, 0.1),
+    sdl(67, 67336, 67535, 738, 0.1),
+    fdd(68, 67536, 67835, 132672, 132971, 753, 698, 0.1),
+    sdl(69, 67836, 68335, 2570, 0.1),
+    # DL 2010-2020 MHz has no UL
+    fdd(70, 68336, 68585, 132972, 133121, 1995, 1695, 0.1),
+    fdd(71, 68586, 68935, 133122, 133471, 617, 663, 0.1),
+    fdd(72, 68936, 68985, 133472, 133521, 461, 451, 0.1),
+    fdd(73, 68986, 69035, 133522, 133571, 460, 450, 0.1),
+    fdd(74, 69036, 69465, 133572, 134001, 1475, 1427, 0.1),
+    sdl(75, 69466, 70315, 1432, 0.1),
+    sdl(76, 70316, 70365, 1427, 0.1),
+    fdd(85, 70366, 70545, 134002, 134181, 728, 698, 0.1),
+    fdd(87, 70546, 70595, 134182, 134231, 420, 410, 0.1),
+    fdd(88, 70596, 70645, 134231, 134280, 422, 412, 0.1),
+])
+
+def nr_frequency(nr_arfcn):
+    """Returns the frequency of a NR-ARFCN in MHz, following the global raster of 3GPP TS 38.104, Table 5.4.2.1-1.
+
+    Parameters:
+    nr_arfcn (int): NR-ARFCN
+    """
+    if nr_arfcn < 600000:
+        return round(nr_arfcn * 0.005, 3)
+    elif nr_arfcn < 2016667:
+        return round(3000 + (nr_arfcn - 600000) * 0.015, 3)
+    return round(24250.08 + (nr_arfcn - 2016667) * 0.06, 3)
+
+def nr_fdd(band, dl_first, dl_last, ul_first, ul_last):
+    return fdd(band, dl_first, dl_last, ul_first, ul_last, nr_frequency(dl_first), nr_frequency(ul_first), 0.005)
+
+def nr_tdd(band, first, last):
+    return tdd(band, first, last, nr_frequency(first), round(nr_frequency(first + 1) - nr_frequency(first), 3))
+
+# 3GPP TS 38.101-1 Table 5.4.2.3-1 and TS 38.101-2 Table 5.4.2.3-1
+nr = ChannelTable('NR', [
+    nr_fdd(1, 422000, 434000, 384000, 396000),
+    nr_fdd(2, 386000, 398000, 370000, 382000),
+    nr_fdd(3, 361000, 376000, 342000, 357000),
+    nr_fdd(5, 173800, 178800, 164800, 169800),
+    nr_fdd(7, 524000, 538000, 500000, 514000),
+    nr_fdd(8, 185000, 192000, 176000, 183000),
+    nr_fdd(12, 145800, 149200, 139800, 143200),
+    nr_fdd(20, 158200, 164200, 166400, 172400),
+    nr_fdd(25, 386000, 399000, 370000, 383000),
+    nr_fdd(28, 151600, 160600, 140600, 149600),
+    nr_tdd(38, 514000, 524000),
+    nr_tdd(40, 460000, 480000),
+    nr_tdd(41, 499200, 537999),
+    nr_fdd(66, 422000, 440000, 342000, 356000),
+    nr_fdd(71, 123400, 130400, 132600, 139600),
+    nr_tdd(77, 620000, 680000),
+    nr_tdd(78, 620000, 653333),
+    nr_tdd(79, 693334, 733333),
+    nr_tdd(257, 2054166, 2104165),
+    nr_tdd(258, 2016667, 2070832),
+    nr_tdd(260, 2229166, 2279165),
+    nr_tdd(261, 2070833, 2084999),
+])
+
+def unpack_arfcn_band(arfcn_band):
+    """Splits an ARFCN with the band in the upper 4 bits, as in Qualcomm GSM logs.
+
+    Returns (arfcn, band).
+
+    Parameters:
+    arfcn_band (int): ARFCN in bits 0-11, band in bits 12-15
+    """
+    return (arfcn_band & 0xfff, arfcn_band >> 12)
+
+def gsmtap_arfcn(arfcn, uplink):
+    """Returns the ARFCN field of a GSMTAP header, with the uplink flag set for UL messages.
+
+    Parameters:
+    arfcn (int): ARFCN
+    uplink (bool): True for UL messages
+    """
+    if uplink:
+        return arfcn | (1 << 14)
+    return arfcn
@@ -1,6 +1,16 @@
 #!/usr/bin/env python3
 # coding: utf8
 
-from .usbio import USBIO
-from .serialio import SerialIO
 from .fileio import FileIO
+from .dumpindex import DumpIndex
+from .dumpstats import DumpStats
+
+def __getattr__(name):
+    # USB and serial backends need pyusb and pyserial, import them only when used
+    if name == 'USBIO':
+        from .usbio import USBIO
+        return USBIO
+    elif name == 'SerialIO':
+        from .serialio import SerialIO
+        return SerialIO
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import os
+import mmap
+import struct
+import hashlib
+from collections import namedtuple
+
+import util
+from .fileio import FileIO
+
+# Sidecar index for baseband dumps. The index file consists of a fixed header
+# followed by fixed size records, one per frame found in the dump:
+#   offset (Q): byte offset of the frame in the (decompressed) dump
+#   length (L): length of the frame including framing bytes
+#   id (L): DIAG log ID, first event ID, SDM (group << 8) | command or HiSilicon command
+#   ts (Q): raw device timestamp, carried over from the previous frame if the frame has none
+#   cmd (B): DIAG command code, SDM direction or HiSilicon packet type
+#   radio_id (B): radio ID (0-based) as sent by the device, mapping it to the
+#                 configured number of radios is left to the parser
+# The header holds a fingerprint of the scanned part of the dump, so that an
+# index is rebuilt instead of extended if the dump is replaced by another one.
+
+index_header = namedtuple('DumpIndexHeader', 'magic fmt scanned_bytes last_ts ts_sorted fingerprint')
+index_record = namedtuple('DumpIndexRecord', 'offset length id ts cmd radio_id')
+
+index_header_struct = struct.Struct('<8s8sQQB7x20s')
+index_record_struct = struct.Struct('<QLLQBB2x')
+index_magic = b'SCATIDX2'
+fingerprint_size = 0x1000
+
+def guess_dump_format(fname):
+    if fname.find('.qmdl') > 0:
+        return 'qmdl'
+    elif fname.find('.sdmraw') > 0:
+        return 'sdmraw'
+    elif fname.find('.sdm') > 0:
+        return 'sdm'
+    elif fname.find('.lpd') > 0:
+        return 'lpd'
+    else:
+        return None
+
+def raw_radio_id(subscription_id):
+    # Base 1 subscription ID to 0-based radio ID, clamped to the record field
+    if subscription_id <= 0 or subscription_id > 0x7fffffff:
+        return 0
+    return min(subscription_id - 1, 0xff)
+
+def qualcomm_frame_info(frame, last_ts):
+    # frame: HDLC encoded DIAG packet without trailing 0x7e
+    # Only the beginning of the frame is needed for the headers
+    pkt = util.unwrap(bytes(frame[0:64]))
+    radio_id = 0
+    log_id = 0
+    ts = last_ts
+
+    if len(pkt) >= 8 and pkt[0] == 0x98:
+        # DIAG_MULTI_RADIO_CMD_F, subscription ID is base 1
+        radio_id = raw_radio_id(struct.unpack('<L', pkt[4:8])[0])
+        pkt = pkt[8:]
+
+    if len(pkt) == 0:
+        return (0, ts, 0, radio_id)
+
+    cmd = pkt[0]
+    if cmd == 0x10 and len(pkt) >= 16:
+        # DIAG_LOG_F
+        log_id, ts = struct.unpack('<HQ', pkt[6:16])
+    elif cmd == 0x79 and len(pkt) >= 12:
+        # DIAG_EXT_MSG_F
+        ts = struct.unpack('<Q', pkt[4:12])[0]
+    elif cmd == 0x60 and len(pkt) >= 5:
+        # DIAG_EVENT_REPORT_F, first event only
+        _eid = struct.unpack('<H', pkt[3:5])[0]
+        log_id = _eid & 0xfff
+        if (_eid & 0x8000) == 0 and len(pkt) >= 13:
+            ts = struct.unpack('<Q', pkt[5:13])[0]
+
+    return (log_id, ts, cmd, radio_id)
+
+def scan_qmdl(buf, base, last_ts):
+    records = []
+    pos = 0
+    while True:
+        end = buf.find(b'\x7e', pos)
+        if end < 0:
+            break
+        if end > pos:
+            log_id, last_ts, cmd, radio_id = qualcomm_frame_info(buf[pos:end], last_ts)
+            records.append((base + pos, end + 1 - pos, log_id, last_ts, cmd, radio_id))
+        pos = end + 1
+    return records, pos, last_ts
+
+def scan_sdmraw(buf, base, last_ts):
+    from parsers.samsung.sdmcmd import parse_sdm_header
+
+    records = []
+    pos = 0
+    while True:
+        start = buf.find(b'\x7f', pos)
+        if start < 0:
+            pos = len(buf)
+            break
+        if len(buf) < start + 15:
+            pos = start
+            break
+        sdm_pkt_hdr = parse_sdm_header(buf[start+1:start+15])
+        if len(buf) < start + 2 + sdm_pkt_hdr.length1:
+            pos = start
+            break
+        if buf[start+1+sdm_pkt_hdr.length1] != 0x7e or sdm_pkt_hdr.length2 + 3 != sdm_pkt_hdr.length1:
+            pos = start + 1
+            continue
+
+        last_ts = sdm_pkt_hdr.timestamp
+        # parse_sdm_header() clamps the radio ID, take it from the raw group byte
+        records.append((base + start, sdm_pkt_hdr.length1 + 2, (sdm_pkt_hdr.group << 8) | sdm_pkt_hdr.command,
+            last_ts, sdm_pkt_hdr.direction, raw_radio_id(buf[start+9] >> 5)))
+        pos = start + sdm_pkt_hdr.length1 + 2
+    return records, pos, last_ts
+
+def scan_sdm(buf, base, last_ts):
+    # Samsung logger output: 2 bytes length followed by the logger header
+    records = []
+    pos = 0
+    while pos + 2 <= len(buf):
+        pkt_len = struct.unpack('<H', buf[pos:pos+2])[0]
+        if pos + 2 + pkt_len > len(buf):
+            break
+        if pkt_len >= 17:
+            magic, streamid, logger_version, seqnr, direction, group, command, timestamp = struct.unpack('<HLHHBBBL', buf[pos+2:pos+19])
+            if magic == 0x7f39:
+                last_ts = timestamp
+                records.append((base + pos, pkt_len + 2, ((group & 0x1f) << 8) | command, last_ts, direction, raw_radio_id(group >> 5)))
+        pos += 2 + pkt_len
+    return records, pos, last_ts
+
+def scan_lpd(buf, base, last_ts):
+    records = []
+    pos = 0
+    while True:
+        end = buf.find(b'\x7e', pos)
+        if end < 0:
+            break
+        if end > pos:
+            pkt = util.unwrap(bytes(buf[pos:min(end, pos + 64)]))
+            cmd = 0
+            if pkt[0] == 0x00 and len(pkt) >= 25:
+                unk2, last_ts, unk3, cmd, pkt_len = struct.unpack('<LQLLL', pkt[1:25])
+            elif pkt[0] == 0x01 and len(pkt) >= 29:
+                unk1, unk2, magic, nested_len1, cmd, nested_len2, last_ts = struct.unpack('<LLLHLHQ', pkt[1:29])
+            records.append((base + pos, end + 1 - pos, cmd & 0xffffffff, last_ts, pkt[0], 0))
+        pos = end + 1
+    return records, pos, last_ts
+
+scanners = {
+    'qmdl': scan_qmdl,
+    'sdmraw': scan_sdmraw,
+    'sdm': scan_sdm,
+    'lpd': scan_lpd,
+}
+
+def scan_dump(fname, fmt, start=0, last_ts=0, chunk_size=0x100000):
+    """Walks the frames of a dump without decoding their bodies.
+
+    Yields (buf, base, records, scanned_bytes, last_ts) per chunk, where records
+    are the index record tuples of the complete frames found in buf, base is
+    the dump offset of buf and scanned_bytes is the offset after the last frame.
+    """
+    scanner = scanners[fmt]
+    io_device = FileIO([fname])
+    io_device.seek(start)
+
+    scanned_bytes = start
+    oldbuf = b''
+    try:
+        while True:
+            buf = io_device.read(chunk_size)
+            if len(buf) == 0:
+                break
+            buf = oldbuf + buf
+            records, consumed, last_ts = scanner(buf, scanned_bytes, last_ts)
+            base = scanned_bytes
+            scanned_bytes += consumed
+            yield buf, base, records, scanned_bytes, last_ts
+            oldbuf = buf[consumed:]
+    finally:
+        io_device.__exit__(None, None, None)
+
+def dump_fingerprint(fname, scanned_bytes):
+    """Returns the SHA-1 of the first and the last fingerprint_size bytes of the
+    first scanned_bytes of a dump."""
+    io_device = FileIO([fname])
+    try:
+        h = hashlib.sha1(struct.pack('<Q', scanned_bytes))
+        head_len = min(scanned_bytes, fingerprint_size)
+        h.update(io_device.read_at(0, head_len))
+        tail_start = max(head_len, scanned_bytes - fingerprint_size)
+        h.update(io_device.read_at(tail_start, scanned_bytes - tail_start))
+    finally:
+        io_device.__exit__(None, None, None)
+    return h.digest()
+
+class DumpIndex:
+    """Offset index of the frames in a QMDL, SDM or LPD dump, stored as a sidecar file.
+
+    Parameters:
+    fname (str): dump file name
+    index_fname (str): sidecar file name, defaults to fname + '.idx'
+    fmt (str): dump format (qmdl, sdmraw, sdm, lpd), guessed from the file name by default
+    """
+    scan_chunk_size = 0x100000
+
+    def __init__(self, fname, index_fname=None, fmt=None):
+        self.fname = fname
+        self.index_fname = index_fname if index_fname else fname + '.idx'
+        self.fmt = fmt if fmt else guess_dump_format(fname)
+        if self.fmt not in scanners:
+            raise ValueError('Unsupported dump format for {}'.format(fname))
+
+        self.header = index_header(index_magic, self.fmt, 0, 0, 1, b'')
+        self.mm = None
+        self.index_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read_header(self):
+        with open(self.index_fname, 'rb') as f:
+            buf = f.read(index_header_struct.size)
+        if len(buf) < index_header_struct.size:
+            return None
+        header = index_header._make(index_header_struct.unpack(buf))
+        if header.magic != index_magic:
+            return None
+        return header._replace(fmt=header.fmt.rstrip(b'\x00').decode())
+
+    def write_header(self, f):
+        f.seek(0)
+        f.write(index_header_struct.pack(self.header.magic, self.header.fmt.encode(),
+            self.header.scanned_bytes, self.header.last_ts, self.header.ts_sorted, self.header.fingerprint))
+
+    def update(self):
+        """Builds the index, or extends it if the dump has grown since the last call.
+
+        Returns the number of new records.
+        """
+        self.close()
+
+        header = None
+        if os.path.exists(self.index_fname):
+            header = self.read_header()
+        if (header is None or header.fmt != self.fmt or header.scanned_bytes > os.path.getsize(self.fname) or
+                header.fingerprint != dump_fingerprint(self.fname, header.scanned_bytes)):
+            # Missing, foreign or stale index, or the dump was replaced: start over
+            header = None
+            with open(self.index_fname, 'wb') as f:
+                self.header = index_header(index_magic, self.fmt, 0, 0, 1, b'')
+                self.write_header(f)
+        else:
+            self.header = header
+            # Drop any partially written record
+            num_records = (os.path.getsize(self.index_fname) - index_header_struct.size) // index_record_struct.size
+            os.truncate(self.index_fname, index_header_struct.size + num_records * index_record_struct.size)
+
+        num_new = 0
+        scanned_bytes = self.header.scanned_bytes
+        last_ts = self.header.last_ts
+        ts_sorted = self.header.ts_sorted
+        with open(self.index_fname, 'r+b') as f:
+            f.seek(0, os.SEEK_END)
+            for buf, base, records, scanned_bytes, new_last_ts in scan_dump(self.fname, self.fmt, scanned_bytes, last_ts, self.scan_chunk_size):
+                for x in records:
+                    if x[3] < last_ts:
+                        ts_sorted = 0
+                    last_ts = x[3]
+                last_ts = new_last_ts
+                f.write(b''.join([index_record_struct.pack(*x) for x in records]))
+                num_new += len(records)
+
+            self.header = self.header._replace(scanned_bytes=scanned_bytes, last_ts=last_ts, ts_sorted=ts_sorted,
+                fingerprint=dump_fingerprint(self.fname, scanned_bytes))
+            self.write_header(f)
+
+        return num_new
+
+    def load(self):
+        """Maps the index file into memory. Builds the index first if it does not exist."""
+        if self.mm is not None:
+            return
+        if not os.path.exists(self.index_fname):
+            self.update()
+
+        header = self.read_header()
+        if header is None:
+            raise ValueError('Invalid index file {}'.format(self.index_fname))
+        self.header = header
+        self.index_file = open(self.index_fname, 'rb')
+        if os.path.getsize(self.index_fname) > index_header_struct.size:
+            self.mm = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.mm = b''
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self.mm = None
+        if self.index_file:
+            self.index_file.close()
+        self.index_file = None
+
+    def __len__(self):
+        self.load()
+        return max(0, len(self.mm) - index_header_struct.size) // index_record_struct.size
+
+    def __getitem__(self, i):
+        self.load()
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError('index out of range')
+        return index_record._make(index_record_struct.unpack_from(self.mm, index_header_struct.size + i * index_record_struct.size))
+
+    def __iter__(self):
+        self.load()
+        end = index_header_struct.size + len(self) * index_record_struct.size
+        for x in index_record_struct.iter_unpack(self.mm[index_header_struct.size:end]):
+            yield index_record._make(x)
+
+    def ts_at(self, i):
+        return struct.unpack_from('<Q', self.mm, index_header_struct.size + i * index_record_struct.size + 16)[0]
+
+    def find_ts(self, ts):
+        """Returns the position of the first record with a timestamp not earlier than ts.
+        Only valid if the timestamps in the dump are non-decreasing."""
+        self.load()
+        lo = 0
+        hi = len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ts_at(mid) < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def select(self, ts_start=None, ts_end=None, ids=None, cmds=None, radio_id=None):
+        """Yields the records matching all given conditions.
+
+        Parameters:
+        ts_start, ts_end (int): raw device timestamp range, inclusive
+        ids (set): log IDs, event IDs, SDM (group << 8) | command or HiSilicon commands
+        cmds (set): DIAG command codes, SDM directions or HiSilicon packet types
+        radio_id (int): radio ID
+        """
+        self.load()
+        start = 0
+        if self.header.ts_sorted and ts_start is not None:
+            start = self.find_ts(ts_start)
+
+        for i in range(start, len(self)):
+            x = self[i]
+            if ts_start is not None and x.ts < ts_start:
+                continue
+            if ts_end is not None and x.ts > ts_end:
+                if self.header.ts_sorted:
+                    break
+                continue
+            if ids is not None and x.id not in ids:
+                continue
+            if cmds is not None and x.cmd not in cmds:
+                continue
+            if radio_id is not None and x.radio_id != radio_id:
+                continue
+            yield x
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import struct
+
+import util
+from .dumpindex import guess_dump_format, scan_dump
+
+def walk_diag_events(pkt, ts):
+    # pkt: unwrapped DIAG_EVENT_REPORT_F packet
+    # Yields (event_id, length, ts) without decoding the payloads
+    pos = 3
+    while pos + 2 <= len(pkt):
+        start = pos
+        _eid = struct.unpack('<H', pkt[pos:pos+2])[0]
+        event_id = _eid & 0xfff
+        payload_len = (_eid & 0x6000) >> 13
+        if (_eid & 0x8000) == 0:
+            if pos + 10 > len(pkt):
+                break
+            ts = struct.unpack('<Q', pkt[pos+2:pos+10])[0]
+            pos += 10
+        else:
+            pos += 4
+
+        if payload_len == 3:
+            if pos >= len(pkt):
+                break
+            pos += 1 + pkt[pos]
+        else:
+            pos += payload_len
+        yield event_id, pos - start, ts
+
+class DumpStats:
+    """Per-ID packet counts, sizes and device time span of baseband dumps.
+
+    Only the frame and packet headers are decoded, no body parser is run.
+    """
+    def __init__(self):
+        # (category, id) -> [count, bytes, first_ts, last_ts]
+        self.stats = {}
+        self.files = []
+        self.qxdm_ts = False
+
+    def add(self, category, item_id, length, ts):
+        # ts 0: no timestamp seen yet
+        key = (category, item_id)
+        if key in self.stats:
+            item = self.stats[key]
+            item[0] += 1
+            item[1] += length
+            if ts > 0:
+                if item[2] is None or ts < item[2]:
+                    item[2] = ts
+                if item[3] is None or ts > item[3]:
+                    item[3] = ts
+        elif ts > 0:
+            self.stats[key] = [1, length, ts, ts]
+        else:
+            self.stats[key] = [1, length, None, None]
+
+    def scan(self, fname, fmt=None):
+        if fmt is None:
+            fmt = guess_dump_format(fname)
+        if fmt is None:
+            raise ValueError('Unsupported dump format for {}'.format(fname))
+        self.files.append(fname)
+
+        if fmt == 'qmdl':
+            self.qxdm_ts = True
+            for buf, base, records, scanned_bytes, last_ts in scan_dump(fname, fmt):
+                for offset, length, item_id, ts, cmd, radio_id in records:
+                    if cmd == 0x10:
+                        self.add('log', item_id, length, ts)
+                    elif cmd == 0x60:
+                        pkt = util.unwrap(buf[offset - base:offset - base + length - 1])
+                        if len(pkt) > 0 and pkt[0] == 0x98:
+                            pkt = pkt[8:]
+                        for event_id, event_len, event_ts in walk_diag_events(pkt[:-2], ts):
+                            self.add('event', event_id, event_len, event_ts)
+                    else:
+                        self.add('cmd', cmd, length, ts)
+        elif fmt == 'sdmraw' or fmt == 'sdm':
+            for buf, base, records, scanned_bytes, last_ts in scan_dump(fname, fmt):
+                for offset, length, item_id, ts, cmd, radio_id in records:
+                    self.add('sdm', item_id, length, ts)
+        else:
+            for buf, base, records, scanned_bytes, last_ts in scan_dump(fname, fmt):
+                for offset, length, item_id, ts, cmd, radio_id in records:
+                    self.add('hisi', item_id, length, ts)
+
+    def format_ts(self, ts):
+        if ts is None:
+            return None
+        if self.qxdm_ts:
+            return util.parse_qxdm_ts(ts).isoformat()
+        return ts
+
+    def to_dict(self):
+        result = {'files': self.files, 'packets': 0, 'bytes': 0, 'first_ts': None, 'last_ts': None}
+        first_ts = None
+        last_ts = None
+
+        for key in sorted(self.stats.keys()):
+            category, item_id = key
+            count, length, item_first_ts, item_last_ts = self.stats[key]
+            if category not in result:
+                result[category] = {}
+            result[category]['0x{:04x}'.format(item_id)] = {
+                'count': count,
+                'bytes': length,
+                'first_ts': self.format_ts(item_first_ts),
+                'last_ts': self.format_ts(item_last_ts),
+            }
+            result['packets'] += count
+            result['bytes'] += length
+            if item_first_ts is None:
+                continue
+            if first_ts is None or item_first_ts < first_ts:
+                first_ts = item_first_ts
+            if last_ts is None or item_last_ts > last_ts:
+                last_ts = item_last_ts
+
+        if first_ts is not None:
+            result['first_ts'] = self.format_ts(first_ts)
+            result['last_ts'] = self.format_ts(last_ts)
+        return result
@@ -37,6 +37,14 @@ class FileIO:
             buf = util.unwrap(buf)
         return buf
 
+    def seek(self, offset):
+        self.f.seek(offset)
+
+    def read_at(self, offset, length, decode_hdlc = False):
+        # Random access read, e.g. for frames located through DumpIndex
+        self.f.seek(offset)
+        return self.read(length, decode_hdlc)
+
     def open_next_file(self):
         try:
             self.fname = self.fnames.pop()
@@ -3,11 +3,13 @@
 
 import serial
 import util
+import metrics
 
 class SerialIO:
     def __init__(self, port_name, baudrate=115200, rts=True, dsr=True):
         self.port = serial.Serial(port_name, baudrate=baudrate, timeout=0.5, rtscts=rts, dsrdtr=dsr)
         self.block_until_data = True
+        self.metric_read_bytes = metrics.registry.counter('scat_device_read_bytes_total', 'Bytes read from the diagnostic device', device='serial')
 
     def __enter__(self):
         return self
@@ -16,6 +18,7 @@ class SerialIO:
         buf = b''
         buf = self.port.read(read_size)
         buf = bytes(buf)
+        self.metric_read_bytes.value += len(buf)
         if decode_hdlc:
             buf = util.unwrap(buf)
         return buf
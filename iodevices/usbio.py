@@ -3,12 +3,14 @@
 
 import usb
 import util
+import metrics
 import logging
 
 class USBIO:
     def __init__(self):
         self.usb_dev = None
         self.block_until_data = True
+        self.metric_read_bytes = metrics.registry.counter('scat_device_read_bytes_total', 'Bytes read from the diagnostic device', device='usb')
 
     def __enter__(self):
         return self
@@ -20,6 +22,7 @@ class USBIO:
             buf = bytes(buf)
         except usb.core.USBError:
             return b''
+        self.metric_read_bytes.value += len(buf)
         if decode_hdlc:
             buf = util.unwrap(buf)
         return buf
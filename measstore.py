@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import os
+import glob
+import math
+import array
+
+import measurements
+
+class MeasTable:
+    """Columns of one measurement record type and radio.
+
+    Scalar fields are stored as one column each. Sequence fields (one value
+    per neighbor cell) go to separate cell tables, see
+    measurements.meas_cell_groups, whose 'row' column refers to the row of
+    the record they belong to.
+    """
+    def __init__(self, meas_type):
+        self.fields = meas_type._fields
+        self.cell_groups = measurements.meas_cell_groups.get(meas_type)
+        # name -> array.array, created with the first value
+        self.columns = {'ts': array.array('d')}
+        # cell table name -> columns
+        self.cell_columns = {}
+        # Rows of the previous chunks, so that 'row' stays valid across chunks
+        self.row_base = 0
+        self.rows = 0
+
+    def append_value(self, columns, name, value):
+        column = columns.get(name)
+        if column is None:
+            column = array.array('d' if type(value) == float else 'q')
+            columns[name] = column
+        try:
+            column.append(value)
+        except TypeError:
+            # Integer column receiving a float: widen the column to double
+            column = array.array('d', column)
+            columns[name] = column
+            column.append(value)
+
+    def append(self, meas, ts):
+        if self.cell_groups is None:
+            self.cell_groups = {'cells': tuple(x for x in self.fields if hasattr(getattr(meas, x), '__len__'))}
+            if len(self.cell_groups['cells']) == 0:
+                self.cell_groups = {}
+        if len(self.cell_columns) == 0:
+            self.cell_columns = {x: {'row': array.array('q')} for x in self.cell_groups.keys()}
+
+        self.columns['ts'].append(math.nan if ts is None else ts.timestamp())
+        values = meas._asdict()
+        for group_name, group_fields in self.cell_groups.items():
+            columns = self.cell_columns[group_name]
+            for name in group_fields:
+                cell_values = values.pop(name)
+                if hasattr(cell_values, 'tolist'):
+                    # NumPy arrays of the vectorized decoders
+                    cell_values = cell_values.tolist()
+                for x in cell_values:
+                    self.append_value(columns, name, x)
+            columns['row'].extend([self.row_base + self.rows] * (len(getattr(meas, group_fields[0]))))
+        for name, value in values.items():
+            self.append_value(self.columns, name, value)
+        self.rows += 1
+
+    def extend_values(self, columns, name, values):
+        column = columns.get(name)
+        typecode = 'd' if values.dtype.kind == 'f' else 'q'
+        if column is None:
+            column = array.array(typecode)
+            columns[name] = column
+        elif column.typecode != typecode and typecode == 'd':
+            column = array.array('d', column)
+            columns[name] = column
+        column.frombytes(values.astype(column.typecode).tobytes())
+
+    def extend(self, ts, columns, cells=None, cell_counts=None):
+        """Appends records given as NumPy columns.
+
+        Parameters:
+        ts: POSIX seconds of the records
+        columns (dict): field name -> values of the scalar fields
+        cells (dict): field name -> 2-D array (records, cells) of the sequence fields,
+            or 1-D array of the cells of all records if cell_counts is given
+        cell_counts: number of cells per record, for records with varying number of cells
+        """
+        import numpy
+
+        if cells is None:
+            cells = {}
+        if self.cell_groups is None:
+            self.cell_groups = {'cells': tuple(x for x in self.fields if x in cells)} if len(cells) > 0 else {}
+        if len(self.cell_columns) == 0:
+            self.cell_columns = {x: {'row': array.array('q')} for x in self.cell_groups.keys()}
+
+        num_rows = len(ts)
+        self.extend_values(self.columns, 'ts', ts)
+        for group_name, group_fields in self.cell_groups.items():
+            group_columns = self.cell_columns[group_name]
+            for name in group_fields:
+                self.extend_values(group_columns, name, cells[name].ravel())
+            cells_per_row = cells[group_fields[0]].shape[1] if cell_counts is None else cell_counts
+            self.extend_values(group_columns, 'row', numpy.repeat(numpy.arange(num_rows) + self.row_base + self.rows, cells_per_row))
+        for name in self.fields:
+            if name in columns:
+                self.extend_values(self.columns, name, columns[name])
+        self.rows += num_rows
+
+    def clear(self):
+        self.row_base += self.rows
+        self.rows = 0
+        for columns in [self.columns] + list(self.cell_columns.values()):
+            for name in columns.keys():
+                columns[name] = array.array(columns[name].typecode)
+
+class MeasurementStore:
+    """Appendable columnar store of measurement records.
+
+    Records are appended per record type and radio to growable typed
+    arrays. Every chunk_rows records the columns are flushed to
+    <path>/chunk-NNNNN/<table>.<column>.npy, or to <path>-NNNNN.npz if path
+    ends with .npz, and load_measurements() reads them back, memory-mapped
+    for .npy chunks.
+
+    Tables are named <record type>.r<radio>, e.g. LteNcellMeas.r0, cell
+    tables <record type>.r<radio>.<group>, e.g. LteNcellMeas.r0.cells.
+    Timestamps are POSIX seconds, NaN if unknown.
+
+    Flushing and to_numpy() need NumPy, appending only the standard library.
+
+    Parameters:
+    path (str): output directory or .npz file name prefix, None to keep all records in memory
+    chunk_rows (int): number of records per flushed chunk
+    """
+    def __init__(self, path=None, chunk_rows=100000):
+        if path is not None:
+            # Fail early rather than at the first flush
+            import numpy
+
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.tables = {}
+        self.rows = 0
+        self.chunk_index = 0
+
+    def __enter__(self):
+        return self
+
+    def append(self, meas, radio_id=0, ts=None):
+        """Appends a measurement record.
+
+        Parameters:
+        meas: record of the measurements module
+        radio_id (int): radio the record belongs to
+        ts (datetime.datetime): timestamp of the record
+        """
+        key = (type(meas), radio_id)
+        table = self.tables.get(key)
+        if table is None:
+            table = MeasTable(type(meas))
+            self.tables[key] = table
+        table.append(meas, ts)
+        self.rows += 1
+
+        if self.path is not None and self.rows >= self.chunk_rows:
+            self.flush()
+
+    def extend(self, meas_type, columns, cells=None, radio_id=0, ts=None, cell_counts=None):
+        """Appends records of one type given as NumPy columns, e.g. of batch decoders.
+
+        Parameters:
+        meas_type: record type of the measurements module
+        columns (dict): field name -> values of the scalar fields
+        cells (dict): field name -> 2-D array (records, cells) of the sequence fields,
+            or 1-D array of the cells of all records if cell_counts is given
+        radio_id (int): radio the records belong to
+        ts: POSIX seconds of the records
+        cell_counts: number of cells per record, for records with varying number of cells
+        """
+        key = (meas_type, radio_id)
+        table = self.tables.get(key)
+        if table is None:
+            table = MeasTable(meas_type)
+            self.tables[key] = table
+        table.extend(ts, columns, cells, cell_counts)
+        self.rows += len(ts)
+
+        if self.path is not None and self.rows >= self.chunk_rows:
+            self.flush()
+
+    def table_name(self, key):
+        return '{}.r{}'.format(key[0].__name__, key[1])
+
+    def to_numpy(self, copy=True):
+        """Returns the records not flushed yet as {table: {column: numpy array}}.
+
+        Parameters:
+        copy (bool): copy the columns. Without copying, the arrays must be
+            released before appending further records.
+        """
+        import numpy
+
+        result = {}
+        for key, table in self.tables.items():
+            if table.rows == 0:
+                continue
+            name = self.table_name(key)
+            result[name] = {x: numpy.array(y, dtype=y.typecode, copy=copy) for x, y in table.columns.items()}
+            for group_name, columns in table.cell_columns.items():
+                if len(columns['row']) > 0:
+                    result[name + '.' + group_name] = {x: numpy.array(y, dtype=y.typecode, copy=copy) for x, y in columns.items()}
+        return result
+
+    def flush(self):
+        """Writes the buffered records as a new chunk and clears the buffers."""
+        if self.path is None or self.rows == 0:
+            return
+        import numpy
+
+        columns = {}
+        for table_name, table_columns in self.to_numpy(copy=False).items():
+            for column_name, column in table_columns.items():
+                columns['{}.{}'.format(table_name, column_name)] = column
+
+        if self.path.endswith('.npz'):
+            numpy.savez('{}-{:05d}.npz'.format(self.path[:-4], self.chunk_index), **columns)
+        else:
+            chunk_dir = os.path.join(self.path, 'chunk-{:05d}'.format(self.chunk_index))
+            os.makedirs(chunk_dir, exist_ok=True)
+            for name, column in columns.items():
+                numpy.save(os.path.join(chunk_dir, name + '.npy'), column)
+
+        self.chunk_index += 1
+        self.rows = 0
+        for table in self.tables.values():
+            table.clear()
+
+    def close(self):
+        self.flush()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def load_measurements(path, mmap_mode='r'):
+    """Loads the chunks written by MeasurementStore.
+
+    Returns {table: {column: numpy array}}. Columns of a single chunk are
+    memory-mapped .npy files, columns of several chunks are concatenated.
+
+    Parameters:
+    path (str): directory or .npz file name prefix passed to MeasurementStore
+    mmap_mode: passed to numpy.load() for .npy chunks, None to read into memory
+    """
+    import numpy
+
+    chunks = []
+    if path.endswith('.npz'):
+        for fname in sorted(glob.glob(glob.escape(path[:-4]) + '-[0-9]*.npz')):
+            with numpy.load(fname) as npz:
+                chunks.append({x: npz[x] for x in npz.files})
+    else:
+        for chunk_dir in sorted(glob.glob(os.path.join(glob.escape(path), 'chunk-[0-9]*'))):
+            chunk = {}
+            for fname in glob.glob(os.path.join(glob.escape(chunk_dir), '*.npy')):
+                chunk[os.path.basename(fname)[:-4]] = numpy.load(fname, mmap_mode=mmap_mode)
+            chunks.append(chunk)
+
+    columns = {}
+    for chunk in chunks:
+        for name, column in chunk.items():
+            if name not in columns:
+                columns[name] = []
+            columns[name].append(column)
+
+    result = {}
+    for name, parts in columns.items():
+        table_name, column_name = name.rsplit('.', 1)
+        if table_name not in result:
+            result[table_name] = {}
+        result[table_name][column_name] = parts[0] if len(parts) == 1 else numpy.concatenate(parts)
+    return result
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+from collections import namedtuple
+
+# Measurement records returned by the parsers under the 'meas' key of the
+# parse result. Values are in physical units (dBm, dB). Fields of the
+# neighbor cells are sequences with one value per cell.
+
+LteScellMeas = namedtuple('LteScellMeas',
+    'earfcn pci serv_layer_prio rsrp avg_rsrp rsrq avg_rsrq rssi q_rxlevmin p_max max_ue_tx_pwr s_rxlev num_drx_s_fail s_intra_search s_non_intra_search')
+LteNcellMeas = namedtuple('LteNcellMeas',
+    'earfcn q_rxlevmin pci rssi rsrp avg_rsrp rsrq avg_rsrq s_rxlev ant0_frame_offset ant0_sample_offset ant1_frame_offset ant1_sample_offset')
+LteScellMeasResponse = namedtuple('LteScellMeasResponse',
+    'earfcn num_cells valid_rx pci scell_idx is_scell sfn subfn rsrp frsrp rsrq frsrq rssi')
+WcdmaCellMeas = namedtuple('WcdmaCellMeas',
+    'num_wcdma_cells num_gsm_cells uarfcn psc rscp rank_rscp ecio rank_ecio arfcn bsic rssi rank')
+GsmServAuxMeas = namedtuple('GsmServAuxMeas', 'rxpwr snr_is_bad')
+GsmNeigAuxMeas = namedtuple('GsmNeigAuxMeas', 'arfcn band rxpwr')
+# One value per burst for all fields except channel
+GsmBurstMetrics = namedtuple('GsmBurstMetrics', 'channel sfn arfcn band rssi rxpwr')
+GsmNewBurstMetrics = namedtuple('GsmNewBurstMetrics', 'channel sfn arfcn band rssi rxpwr')
+LtePhyCellMeas = namedtuple('LtePhyCellMeas',
+    'earfcn pci plmn rsrp rsrq ncell_type ncell_earfcn ncell_pci ncell_rsrp ncell_rsrq')
+HspaServingCellMeas = namedtuple('HspaServingCellMeas', 'psc rscp delta_rscp ecno drx_cycle')
+
+def format_lte_scell_meas(meas):
+    return 'LTE SCell: EARFCN {}, PCI {:3d}, Measured RSRP {:.2f}, Measured RSSI {:.2f}'.format(meas.earfcn, meas.pci, meas.rsrp, meas.rssi)
+
+def format_lte_ncell_meas(meas):
+    lines = ['LTE NCell: EARFCN {}, number of cells: {}'.format(meas.earfcn, len(meas.pci))]
+    for i in range(len(meas.pci)):
+        lines.append('└── Neighbor cell {}: PCI {:3d}, RSRP {:.2f}, RSSI {:.2f}'.format(i, meas.pci[i], meas.rsrp[i], meas.rssi[i]))
+    return '\n'.join(lines)
+
+def format_lte_scell_meas_response(meas):
+    lines = ['LTE ML1 SCell Meas Response: EARFCN {}, Number of cells = {}, Valid RX = {}'.format(meas.earfcn, meas.num_cells, meas.valid_rx)]
+    for i in range(len(meas.pci)):
+        lines.append('LTE ML1 SCell Meas Response (Cell {}): PCI {}, Serving cell index {}, is_serving_cell = {}'.format(i, meas.pci[i], meas.scell_idx[i], meas.is_scell[i]))
+    return '\n'.join(lines)
+
+def format_wcdma_cell_meas(meas):
+    lines = ['WCDMA Search Cell: {} 3G cells, {} 2G cells'.format(meas.num_wcdma_cells, meas.num_gsm_cells)]
+    for i in range(len(meas.psc)):
+        lines.append('WCDMA Search Cell: 3G Cell {}: UARFCN {}, PSC {:3d}, RSCP {}, Ec/Io {:.2f}'.format(i,
+            meas.uarfcn[i], meas.psc[i], meas.rscp[i], meas.ecio[i]))
+    # 2G cells were always printed on a single line
+    lines.append(''.join('WCDMA Search Cell: 2G Cell {}: ARFCN {}, RSSI {:.2f}, Rank {}'.format(i,
+        meas.arfcn[i], meas.rssi[i], meas.rank[i]) for i in range(len(meas.arfcn))))
+    return '\n'.join(lines).rstrip()
+
+def format_gsm_serv_aux_meas(meas):
+    return 'GSM Serving Cell Aux Measurement: RxPwr {:.2f}'.format(meas.rxpwr)
+
+def format_gsm_neig_aux_meas(meas):
+    lines = ['GSM Neighbor Cell Aux: {} cells'.format(len(meas.arfcn))]
+    for i in range(len(meas.arfcn)):
+        lines.append('GSM Neighbor Cell Aux {}: ARFCN {}/BC {}, RxPwr {:.2f}'.format(i, meas.arfcn[i], meas.band[i], meas.rxpwr[i]))
+    return '\n'.join(lines)
+
+def format_gsm_burst_metrics(meas, name='Burst Metric'):
+    # Bursts without RX power are not printed
+    return '\n'.join('GSM Serving Cell {}: ARFCN {}/BC {}, RSSI {}, RxPwr {:.2f}'.format(name,
+        meas.arfcn[i], meas.band[i], meas.rssi[i], meas.rxpwr[i]) for i in range(len(meas.arfcn)) if meas.rxpwr[i] != 0)
+
+def format_gsm_new_burst_metrics(meas):
+    return format_gsm_burst_metrics(meas, 'New Burst Metric')
+
+def format_lte_phy_cell_meas(meas):
+    lines = ['LTE PHY Cell Info: EARFCN {}, PCI {}, PLMN {}, RSRP: {:.2f}, RSRQ: {:.2f}'.format(meas.earfcn, meas.pci, meas.plmn, meas.rsrp, meas.rsrq)]
+    for i in range(len(meas.ncell_type)):
+        if meas.ncell_type[i] == 0:
+            cell_type = ''
+            cell_name = 'EARFCN {}, PCI {}'
+        elif meas.ncell_type[i] == 1:
+            cell_type = ' (WCDMA)'
+            cell_name = 'UARFCN {}, PSC {}'
+        elif meas.ncell_type[i] == 3:
+            cell_type = ' (GSM)'
+            cell_name = 'ARFCN {}, PCI {}'
+        else:
+            cell_type = ' (Type {})'.format(meas.ncell_type[i])
+            cell_name = 'ARFCN {}, PCI {}'
+        lines.append('LTE PHY Cell Info: NCell {}{}: {}, RSRP: {:.2f}, RSRQ: {:.2f}'.format(i, cell_type,
+            cell_name.format(meas.ncell_earfcn[i], meas.ncell_pci[i]), meas.ncell_rsrp[i], meas.ncell_rsrq[i]))
+    return '\n'.join(lines)
+
+def format_hspa_serving_cell_meas(meas):
+    return 'HSPA UL1 Serving Cell: PSC {}, CPICH RSCP {:.2f}, Delta RSCP {:.2f}, Ec/No {:.2f}, DRX {} ms'.format(
+        meas.psc, meas.rscp, meas.delta_rscp, meas.ecno, meas.drx_cycle)
+
+# Sequence fields of the same length, stored together per cell. Records
+# not listed here have a single group 'cells' of all sequence fields.
+meas_cell_groups = {
+    WcdmaCellMeas: {
+        'cells': ('uarfcn', 'psc', 'rscp', 'rank_rscp', 'ecio', 'rank_ecio'),
+        'gsm_cells': ('arfcn', 'bsic', 'rssi', 'rank'),
+    },
+}
+
+meas_formatters = {
+    LteScellMeas: format_lte_scell_meas,
+    LteNcellMeas: format_lte_ncell_meas,
+    LteScellMeasResponse: format_lte_scell_meas_response,
+    WcdmaCellMeas: format_wcdma_cell_meas,
+    GsmServAuxMeas: format_gsm_serv_aux_meas,
+    GsmNeigAuxMeas: format_gsm_neig_aux_meas,
+    GsmBurstMetrics: format_gsm_burst_metrics,
+    GsmNewBurstMetrics: format_gsm_new_burst_metrics,
+    LtePhyCellMeas: format_lte_phy_cell_meas,
+    HspaServingCellMeas: format_hspa_serving_cell_meas,
+}
+
+def format_meas(meas):
+    """Formats a measurement record as text, as printed by the parsers. Might be empty.
+
+    Parameters:
+    meas: one of the measurement records of this module
+    """
+    return meas_formatters[type(meas)](meas)
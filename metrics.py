@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import threading
+
+class Counter:
+    """Monotonic counter. Hot paths update it with `counter.value += n`."""
+    __slots__ = ('name', 'help', 'labels', 'value')
+    metric_type = 'counter'
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+
+    def get(self):
+        return self.value
+
+class Gauge:
+    """Current value, either set directly or read from func at scrape time."""
+    __slots__ = ('name', 'help', 'labels', 'value', 'func')
+    metric_type = 'gauge'
+
+    def __init__(self, name, help, labels, func=None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+        self.func = func
+
+    def get(self):
+        if self.func is not None:
+            return self.func()
+        return self.value
+
+def format_labels(labels):
+    if len(labels) == 0:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels) + '}'
+
+class MetricsRegistry:
+    """In-process registry of capture health metrics.
+
+    Metrics are created once, when a parser, I/O device or writer is set up,
+    and updated as plain integer attributes afterwards. Formatting only
+    happens when the metrics are scraped.
+    """
+    def __init__(self):
+        # (name, labels) -> metric, in creation order
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def get_metric(self, metric_class, name, help, labels, **kwargs):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.metrics:
+                self.metrics[key] = metric_class(name, help, key[1], **kwargs)
+            return self.metrics[key]
+
+    def counter(self, name, help, **labels):
+        """Returns the counter with the given name and labels, creating it if needed."""
+        return self.get_metric(Counter, name, help, labels)
+
+    def gauge(self, name, help, func=None, **labels):
+        """Returns the gauge with the given name and labels, creating it if needed.
+
+        Parameters:
+        func (callable): returns the current value at scrape time, replaces the previous one
+        """
+        gauge = self.get_metric(Gauge, name, help, labels)
+        if func is not None:
+            gauge.func = func
+        return gauge
+
+    def format(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+
+        families = {}
+        for metric in metrics:
+            if metric.name not in families:
+                families[metric.name] = []
+            families[metric.name].append(metric)
+
+        lines = []
+        for name, family in families.items():
+            lines.append('# HELP {} {}'.format(name, family[0].help))
+            lines.append('# TYPE {} {}'.format(name, family[0].metric_type))
+            for metric in family:
+                lines.append('{}{} {}'.format(name, format_labels(metric.labels), metric.get()))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serves the metrics over HTTP from a background thread.
+
+        Parameters:
+        port (int): TCP port, 0 to pick a free one
+        host (str): listen address, localhost by default
+        """
+        # Imported on first use, http.server is slow to import
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.format().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        return self.server.server_address
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+# Process-wide registry used by the parsers, I/O devices and writers
+registry = MetricsRegistry()
@@ -1,5 +1,25 @@
 #!/usr/bin/env python3
 
-from .qualcomm.qualcommparser import QualcommParser
-from .samsung.samsungparser import SamsungParser
-from .hisilicon.hisiliconparser import HisiliconParser
+import importlib
+
+# Static vendor metadata, so that only the selected parser module is imported
+# shortname -> (module, class name, description)
+parser_registry = {
+    'qc': ('.qualcomm.qualcommparser', 'QualcommParser', 'Qualcomm'),
+    'sec': ('.samsung.samsungparser', 'SamsungParser', 'Samsung'),
+    'hisi': ('.hisilicon.hisiliconparser', 'HisiliconParser', 'HiSilicon'),
+}
+
+def get_parser_class(shortname):
+    module_name, class_name, description = parser_registry[shortname]
+    return getattr(importlib.import_module(module_name, __name__), class_name)
+
+def create_parser(shortname):
+    return get_parser_class(shortname)()
+
+def __getattr__(name):
+    # parsers.QualcommParser and such are imported on first access
+    for shortname, (module_name, class_name, description) in parser_registry.items():
+        if class_name == name:
+            return get_parser_class(shortname)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
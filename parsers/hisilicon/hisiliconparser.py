@@ -2,6 +2,7 @@
 # coding: utf8
 
 import util
+import radiostate
 import struct
 import logging
 import binascii
@@ -13,24 +14,8 @@ from .hisinestedparser import HisiNestedParser
 class HisiliconParser:
 
     def __init__(self):
-        self.gsm_last_cell_id = [0, 0]
-        self.gsm_last_arfcn = [0, 0]
-
-        self.umts_last_cell_id = [0, 0]
-        self.umts_last_psc = [0, 0]
-        self.umts_last_uarfcn_dl = [0, 0]
-        self.umts_last_uarfcn_ul = [0, 0]
-
-        self.lte_last_cell_id = [0, 0]
-        self.lte_last_pci = [0, 0]
-        self.lte_last_earfcn_dl = [0, 0]
-        self.lte_last_earfcn_ul = [0, 0]
-        self.lte_last_earfcn_tdd = [0, 0]
-        self.lte_last_sfn = [0, 0]
-        self.lte_last_tx_ant = [0, 0]
-        self.lte_last_bw_dl = [0, 0]
-        self.lte_last_bw_ul = [0, 0]
-        self.lte_last_band_ind = [0, 0]
+        # Last serving cell per radio, see radiostate.RadioState
+        self.radio_states = radiostate.RadioStates()
 
         self.io_device = None
         self.writer = None
@@ -76,6 +61,11 @@ class HisiliconParser:
                 self.logger.setLevel(params[p])
             elif p == 'msgs':
                 self.msgs = params[p]
+            elif p == 'profiler':
+                params[p].instrument_table(self.process, 'log')
+                params[p].instrument_table(self.process_nested, 'nested')
+            elif p == 'radio-states':
+                self.radio_states.restore(params[p])
 
     def init_diag(self):
         pass
@@ -142,6 +132,19 @@ class HisiliconParser:
         except KeyboardInterrupt:
             return
 
+    def run_indexed(self, records, writer_lpd=None):
+        # Parses only the frames referenced by the DumpIndex records of the current dump file
+        for x in records:
+            buf = self.io_device.read_at(x.offset, x.length)
+            if len(buf) < 2:
+                continue
+            if writer_lpd:
+                writer_lpd.write_cp(buf)
+
+            parse_result = self.parse_diag(buf[:-1])
+            if parse_result is not None:
+                self.postprocess_parse_result(parse_result)
+
     def read_dump(self):
         while self.io_device.file_available:
             self.logger.log(logging.INFO, "Reading from {}".format(self.io_device.fname))
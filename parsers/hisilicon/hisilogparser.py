@@ -61,7 +61,7 @@ class HisiLogParser:
             gsmtap_hdr = util.create_gsmtap_header(
                 version = 2,
                 payload_type = util.gsmtap_type.LTE_RRC,
-                arfcn = self.parent.lte_last_earfcn_dl[0] if self.parent else 0,
+                arfcn = self.parent.radio_states[0].lte_earfcn_dl if self.parent else 0,
                 sub_type = rrc_subtype_map[rrc_chan_type])
 
             return {'cp': [gsmtap_hdr + pkt_content]}
@@ -99,20 +99,21 @@ class HisiLogParser:
                 100: 20 }
 
         if self.parent:
-            self.parent.lte_last_earfcn_ul[0] = cell_info.ul_earfcn
-            self.parent.lte_last_earfcn_dl[0] = cell_info.dl_earfcn
+            state = self.parent.radio_states[0]
+            state.lte_earfcn_ul = cell_info.ul_earfcn
+            state.lte_earfcn_dl = cell_info.dl_earfcn
 
             if cell_info.ul_bw in nrb_to_bw:
-                self.parent.lte_last_bw_ul[0] = nrb_to_bw[cell_info.ul_bw]
+                state.lte_bw_ul = nrb_to_bw[cell_info.ul_bw]
             else:
-                self.parent.lte_last_bw_ul[0] = 0
+                state.lte_bw_ul = 0
 
             if cell_info.dl_bw in nrb_to_bw:
-                self.parent.lte_last_bw_dl[0] = nrb_to_bw[cell_info.dl_bw]
+                state.lte_bw_dl = nrb_to_bw[cell_info.dl_bw]
             else:
-                self.parent.lte_last_bw_dl[0] = 0
+                state.lte_bw_dl = 0
 
-            self.parent.lte_last_band_ind[0] = cell_info.band_ind
+            state.lte_band_ind = cell_info.band_ind
 
         stdout = 'LTE Current Cell Info: EARFCN {}/{} ({:.1f}/{:.1f} MHz), Bandwidth {}/{} MHz, Band {}'.format(
             cell_info.dl_earfcn, cell_info.ul_earfcn, cell_info.dl_freq / 10, cell_info.ul_freq / 10,
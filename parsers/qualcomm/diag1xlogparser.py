@@ -8,6 +8,9 @@ import logging
 from collections import namedtuple
 
 class Diag1xLogParser:
+    ip_data_header = namedtuple('QcDiag1xProtocolData', 'instance protocol ifnameid direction sequence_num segment_num_is_final')
+    ip_data_struct = struct.Struct('<BBBBHH')
+
     def __init__(self, parent):
         self.parent = parent
 
@@ -27,16 +30,15 @@ class Diag1xLogParser:
 
     def parse_ip(self, pkt_header, pkt_body, args):
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        item_struct = namedtuple('QcDiag1xProtocolData', 'instance protocol ifnameid direction sequence_num segment_num_is_final')
-        item = item_struct._make(struct.unpack('<BBBBHH', pkt_body[0:8]))
-        item_data = pkt_body[8:]
+        item = self.ip_data_header._make(self.ip_data_struct.unpack_from(pkt_body, 0))
+        # Segments are kept as views of the log body until the packet is complete
+        item_data = memoryview(pkt_body)[8:]
 
         # pkt[3] = 0a00 0000 [a: direction, 0=RX, 1=TX]
         is_tx = True if (item.direction & 0x40 == 0x40) else False
         segment_num = item.segment_num_is_final & 0x7fff
         # pkt[5]: segn/fin_seg (0x8000: fin_seg, 0x7fff: segn)
         is_final_segment = True if (item.segment_num_is_final & 0x8000 == 0x8000) else False
-        pkt_buf = b''
         pkt_id = (item.ifnameid, is_tx, item.sequence_num)
 
         if item.protocol != 0x01:
@@ -49,15 +51,22 @@ class Diag1xLogParser:
             else:
                 if not (pkt_id in self.pending_pkts.keys()):
                     return {'up': [item_data], 'ts': pkt_ts}
-                pending_pkt = self.pending_pkts.get(pkt_id)
+                pending_pkt = self.pending_pkts.pop(pkt_id)
+                segments = []
                 for x in range(segment_num):
                     if not (x in pending_pkt.keys()):
                         if self.parent:
                             self.parent.logger.log(logging.WARNING, "Segment {} for data packet ({}, {}, {}) missing".format(x, item.ifnameid, is_tx, item.sequence_num))
                         continue
-                    pkt_buf += pending_pkt[x]
-                del self.pending_pkts[pkt_id]
-                pkt_buf += item_data
+                    segments.append(pending_pkt[x])
+                segments.append(item_data)
+
+                # The final segment completes the packet: copy all segments once into a buffer of the packet size
+                pkt_buf = bytearray(sum(len(x) for x in segments))
+                pos = 0
+                for x in segments:
+                    pkt_buf[pos:pos + len(x)] = x
+                    pos += len(x)
                 return {'up': [pkt_buf], 'ts': pkt_ts}
         else:
             if pkt_id in self.pending_pkts.keys():
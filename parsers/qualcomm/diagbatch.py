@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Batch decoding of measurement logs into the measurement store.
+# Requires NumPy.
+
+from collections import namedtuple
+import numpy
+
+import util
+import channels
+import measurements
+from . import diagmeasvec
+
+# meas_type: record type, fields: (name, offset, format) in the log body,
+# min_size: smallest body decoded, decode: function(records) -> (columns, cells)
+BatchLayout = namedtuple('BatchLayout', 'meas_type fields min_size decode')
+
+# (log ID, version) -> BatchLayout. Version None for logs without version byte.
+batch_layouts = {}
+
+def register_layout(log_id, version, layout):
+    batch_layouts[(log_id, version)] = layout
+
+def decode_lte_scell_meas(records):
+    pci_serv_layer_prio = records['pci_serv_layer_prio']
+    rsrq = records['rsrq']
+    rxlev = records['rxlev']
+    s_search = records['s_search']
+    return {
+        'earfcn': records['earfcn'],
+        'pci': pci_serv_layer_prio & 0x1ff,
+        'serv_layer_prio': pci_serv_layer_prio >> 9,
+        'rsrp': (records['meas_rsrp'] & 0xfff) * 0.0625 - 180,
+        'avg_rsrp': (records['avg_rsrp'] & 0xfff) * 0.0625 - 180,
+        'rsrq': (rsrq & 0x3ff) * 0.0625 - 30,
+        'avg_rsrq': ((rsrq >> 20) & 0x3ff) * 0.0625 - 30,
+        'rssi': (records['rssi'] >> 10) * 0.0625 - 110,
+        'q_rxlevmin': rxlev & 0x3f,
+        'p_max': (rxlev >> 6) & 0x7f,
+        'max_ue_tx_pwr': (rxlev >> 13) & 0x3f,
+        's_rxlev': (rxlev >> 19) & 0x7f,
+        'num_drx_s_fail': rxlev >> 26,
+        's_intra_search': s_search & 0x3f,
+        's_non_intra_search': (s_search >> 6) & 0x3f,
+    }, None
+
+def decode_gsm_burst_metrics(records):
+    bursts = records['bursts']
+    arfcn, band = channels.unpack_arfcn_band(bursts['arfcn_band'])
+    return {'channel': records['channel']}, {
+        'sfn': bursts['sfn'],
+        'arfcn': arfcn,
+        'band': band,
+        'rssi': bursts['rssi'],
+        'rxpwr': bursts['rxpwr'] * 0.0625,
+    }
+
+def burst_dtype(size):
+    return numpy.dtype({
+        'names': ['sfn', 'arfcn_band', 'rssi', 'rxpwr'],
+        'formats': ['<u4', '<u2', '<u4', '<i2'],
+        'offsets': [0, 4, 6, 10],
+        'itemsize': size,
+    })
+
+lte_scell_meas_v4_fields = (('earfcn', 4, '<u2'), ('pci_serv_layer_prio', 6, '<u2'),
+    ('meas_rsrp', 8, '<u4'), ('avg_rsrp', 12, '<u4'), ('rsrq', 16, '<u4'), ('rssi', 20, '<u4'),
+    ('rxlev', 24, '<u4'), ('s_search', 28, '<u4'))
+lte_scell_meas_v5_fields = (('earfcn', 4, '<u4'), ('pci_serv_layer_prio', 8, '<u4'),
+    ('meas_rsrp', 12, '<u4'), ('avg_rsrp', 16, '<u4'), ('rsrq', 20, '<u4'), ('rssi', 24, '<u4'),
+    ('rxlev', 28, '<u4'), ('s_search', 32, '<u4'))
+
+# LTE ML1 Serving Cell Meas and Eval
+register_layout(0xB17F, 4, BatchLayout(measurements.LteScellMeas, lte_scell_meas_v4_fields, 32, decode_lte_scell_meas))
+register_layout(0xB17F, 5, BatchLayout(measurements.LteScellMeas, lte_scell_meas_v5_fields, 36, decode_lte_scell_meas))
+# GSM L1 Burst Metrics: channel, 4 bursts of 23 bytes
+register_layout(0x506C, None, BatchLayout(measurements.GsmBurstMetrics,
+    (('channel', 0, 'u1'), ('bursts', 1, (burst_dtype(23), (4, )))), 93, decode_gsm_burst_metrics))
+# GSM L1 New Burst Metrics: version, channel, 4 bursts of 37 bytes
+register_layout(0x506A, 4, BatchLayout(measurements.GsmNewBurstMetrics,
+    (('channel', 1, 'u1'), ('bursts', 2, (burst_dtype(37), (4, )))), 150, decode_gsm_burst_metrics))
+
+class DiagBatchDecoder:
+    """Decodes fixed-size measurement logs in batches.
+
+    Log bodies with a layout in batch_layouts are buffered per log ID,
+    version, body size and radio. Once a bucket holds batch_size bodies,
+    the buckets of its record type and radio are decoded with one
+    numpy.frombuffer() call each, and the records are appended to the
+    measurement store in device timestamp order.
+
+    LTE ML1 Neighbor Measurements have a varying number of cells. They are
+    buffered per radio and decoded with diagmeasvec.decode_ncell_meas_columns().
+
+    Parameters:
+    meas_store (measstore.MeasurementStore): store receiving the records
+    batch_size (int): number of bodies per bucket
+    """
+    def __init__(self, meas_store, batch_size=4096):
+        self.meas_store = meas_store
+        self.batch_size = batch_size
+        self.log_ids = {x[0] for x in batch_layouts.keys()}
+        self.versioned = {x[0]: x[1] is not None for x in batch_layouts.keys()}
+        # (log ID, version, body size, radio ID) -> ([bodies], [timestamps])
+        self.buckets = {}
+        # (layout, body size) -> numpy.dtype
+        self.dtypes = {}
+        # radio ID -> ([bodies], [timestamps]) of LTE ML1 Neighbor Measurements
+        self.ncell_meas = {}
+        self.log_ids.add(0xB180)
+
+    def add(self, log_id, timestamp, pkt_body, radio_id=0):
+        """Buffers a log body.
+
+        Returns False if there is no layout for the log, which then has to
+        be decoded by its handler.
+
+        Parameters:
+        log_id (int): log ID
+        timestamp (int): 64-bit device timestamp of the log header
+        pkt_body (bytes): log body without the log header
+        radio_id (int): radio the log belongs to
+        """
+        if len(pkt_body) == 0:
+            return False
+        if log_id == 0xB180:
+            return self.add_ncell_meas(timestamp, pkt_body, radio_id)
+        version = pkt_body[0] if self.versioned[log_id] else None
+        layout = batch_layouts.get((log_id, version))
+        if layout is None or len(pkt_body) < layout.min_size:
+            return False
+
+        key = (log_id, version, len(pkt_body), radio_id)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = ([], [])
+            self.buckets[key] = bucket
+        bucket[0].append(pkt_body)
+        bucket[1].append(timestamp)
+
+        if len(bucket[0]) >= self.batch_size:
+            self.flush(layout.meas_type, radio_id)
+        return True
+
+    def add_ncell_meas(self, timestamp, pkt_body, radio_id):
+        header = diagmeasvec.ncell_header.get(pkt_body[0])
+        if header is None or len(pkt_body) < header[0]:
+            return False
+        pos, header_struct = header
+        n_cells = header_struct.unpack_from(pkt_body, 1)[3] >> 6
+        if len(pkt_body) < pos + 32 * n_cells:
+            return False
+
+        bucket = self.ncell_meas.get(radio_id)
+        if bucket is None:
+            bucket = ([], [])
+            self.ncell_meas[radio_id] = bucket
+        bucket[0].append(pkt_body)
+        bucket[1].append(timestamp)
+
+        if len(bucket[0]) >= self.batch_size:
+            self.flush_ncell_meas(radio_id)
+        return True
+
+    def flush_ncell_meas(self, radio_id):
+        bodies, timestamps = self.ncell_meas.pop(radio_id)
+        columns, cells, cell_counts = diagmeasvec.decode_ncell_meas_columns(bodies)
+        seconds = self.device_seconds(timestamps)
+
+        order = numpy.argsort(seconds, kind='stable')
+        # Index of the cells of the records in timestamp order
+        first_cell = numpy.cumsum(cell_counts) - cell_counts
+        counts = cell_counts[order]
+        cell_order = numpy.repeat(first_cell[order] - (numpy.cumsum(counts) - counts), counts) + numpy.arange(counts.sum())
+
+        self.meas_store.extend(measurements.LteNcellMeas, {x: y[order] for x, y in columns.items()},
+            {x: y[cell_order] for x, y in cells.items()}, radio_id, seconds[order], counts)
+
+    def layout_dtype(self, layout, size):
+        dtype = self.dtypes.get((layout, size))
+        if dtype is None:
+            dtype = numpy.dtype({
+                'names': [x[0] for x in layout.fields],
+                'formats': [x[2] for x in layout.fields],
+                'offsets': [x[1] for x in layout.fields],
+                'itemsize': size,
+            })
+            self.dtypes[(layout, size)] = dtype
+        return dtype
+
+    def device_seconds(self, timestamps):
+        # Same as util.parse_qxdm_ts(x).timestamp(), see MeasTable
+        raw = numpy.array(timestamps, dtype=numpy.uint64)
+        seconds = (raw >> 16) * 1.25e-3 + (raw & 0xffff) / 40960e3
+        return seconds + (util.parse_qxdm_ts(timestamps[0]).timestamp() - seconds[0])
+
+    def flush(self, meas_type=None, radio_id=None):
+        """Decodes the buffered bodies and appends them to the store.
+
+        Parameters:
+        meas_type: only decode the buckets of this record type, None for all
+        radio_id (int): only decode the buckets of this radio, None for all
+        """
+        # (record type, radio ID) -> [(seconds, columns, cells)]
+        decoded = {}
+        for key in list(self.buckets.keys()):
+            log_id, version, size, bucket_radio_id = key
+            layout = batch_layouts[(log_id, version)]
+            if meas_type is not None and layout.meas_type != meas_type:
+                continue
+            if radio_id is not None and bucket_radio_id != radio_id:
+                continue
+
+            bodies, timestamps = self.buckets.pop(key)
+            records = numpy.frombuffer(b''.join(bodies), dtype=self.layout_dtype(layout, size))
+            columns, cells = layout.decode(records)
+            group = (layout.meas_type, bucket_radio_id)
+            if group not in decoded:
+                decoded[group] = []
+            decoded[group].append((self.device_seconds(timestamps), columns, cells))
+
+        for (group_type, group_radio_id), parts in decoded.items():
+            seconds = numpy.concatenate([x[0] for x in parts])
+            columns = {x: numpy.concatenate([y[1][x] for y in parts]) for x in parts[0][1].keys()}
+            cells = None
+            if parts[0][2] is not None:
+                cells = {x: numpy.concatenate([y[2][x] for y in parts]) for x in parts[0][2].keys()}
+
+            order = numpy.argsort(seconds, kind='stable')
+            columns = {x: y[order] for x, y in columns.items()}
+            if cells is not None:
+                cells = {x: y[order] for x, y in cells.items()}
+            self.meas_store.extend(group_type, columns, cells, group_radio_id, seconds[order])
+
+        if meas_type is None or meas_type == measurements.LteNcellMeas:
+            for bucket_radio_id in list(self.ncell_meas.keys()):
+                if radio_id is None or bucket_radio_id == radio_id:
+                    self.flush_ncell_meas(bucket_radio_id)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import os
+import json
+import hashlib
+import binascii
+import tempfile
+
+def default_cache_fname():
+    cache_dir = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_dir, 'scat', 'diag_capabilities.json')
+
+class DiagCapabilityCache:
+    """Persistent cache of the DIAG capabilities discovered on a device.
+
+    Entries are keyed by the DIAG_VERNO_F and DIAG_EXT_BUILD_ID_F responses,
+    i.e. by firmware build, and hold the log ID ranges, extended message
+    SSID ranges and per-SSID message levels. The full responses are stored
+    next to the key and compared on lookup, so an entry is only used for the
+    exact same firmware.
+
+    Parameters:
+    fname (str): cache file, see default_cache_fname()
+    """
+    version = 1
+
+    def __init__(self, fname=None):
+        self.fname = fname if fname else default_cache_fname()
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.fname, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if type(data) == dict and data.get('version') == self.version:
+            self.entries = data.get('devices', {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.fname)), exist_ok=True)
+        # Replace the file atomically, sessions on other devices may share it
+        fd, tmp_fname = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.fname)), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': self.version, 'devices': self.entries}, f, indent=2)
+        os.replace(tmp_fname, self.fname)
+
+    def key(self, verno, build_id):
+        return hashlib.sha1(verno + b'\x00' + build_id).hexdigest()
+
+    def get(self, verno, build_id):
+        """Returns the cached capabilities of the firmware, None if unknown or mismatching."""
+        entry = self.entries.get(self.key(verno, build_id))
+        if entry is None:
+            return None
+        if entry.get('verno') != binascii.hexlify(verno).decode() or entry.get('build_id') != binascii.hexlify(build_id).decode():
+            return None
+        return entry.get('capabilities')
+
+    def put(self, verno, build_id, capabilities):
+        self.entries[self.key(verno, build_id)] = {
+            'verno': binascii.hexlify(verno).decode(),
+            'build_id': binascii.hexlify(build_id).decode(),
+            'capabilities': capabilities,
+        }
+
+    def invalidate(self, verno, build_id):
+        self.entries.pop(self.key(verno, build_id), None)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import util
+
+class DiagDeviceClock:
+    """Running device clock of a radio.
+
+    Full 64-bit timestamps of log packets and events update the clock.
+    Events with a truncated 16-bit timestamp only carry the lower 16 bits of
+    the 1.25 ms tick count (bits 16-31 of the full timestamp). They are
+    placed within +/- 2^15 ticks (about 41 s) of the last timestamp, which
+    also handles the wrap around of the truncated value.
+
+    The timestamp is converted to datetime once per distinct value.
+    """
+    __slots__ = ('raw', 'ts_raw', 'ts')
+
+    def __init__(self):
+        # Last 64-bit device timestamp, None until the first full timestamp
+        self.raw = None
+        self.ts_raw = None
+        self.ts = None
+
+    def update(self, raw):
+        self.raw = raw
+
+    def extend(self, ts_trunc):
+        """Reconstructs and returns the full timestamp of a 16-bit truncated timestamp.
+
+        Returns None if no full timestamp was seen yet.
+        """
+        if self.raw is None:
+            return None
+        ticks = self.raw >> 16
+        delta = (ts_trunc - ticks) & 0xffff
+        if delta >= 0x8000:
+            delta -= 0x10000
+        self.raw = (ticks + delta) << 16
+        return self.raw
+
+    def now(self):
+        """Returns the current device time as datetime, None if no timestamp was seen yet."""
+        if self.raw is None:
+            return None
+        if self.ts_raw != self.raw:
+            self.ts = util.parse_qxdm_ts(self.raw)
+            self.ts_raw = self.raw
+        return self.ts
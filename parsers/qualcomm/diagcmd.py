@@ -7,6 +7,9 @@ import struct
 
 DIAG_VERNO_F = 0x00
 DIAG_STATUS_F = 0x0c
+DIAG_BAD_CMD_F = 0x13        # Invalid command response
+DIAG_BAD_PARM_F = 0x14       # Invalid parameter response
+DIAG_BAD_LEN_F = 0x15        # Invalid packet length response
 DIAG_LOG_F = 0x10            # Log packet Request/Reponse
 DIAG_DIAG_VER_F = 0x1c       # Version response
 DIAG_TS_F = 0x1d
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+from . import diagcmd
+import util
+import time
+import logging
+import threading
+
+class DiagCommand:
+    """A DIAG command sent through DiagCommandChannel.
+
+    response holds the unwrapped response packet without CRC once matched,
+    error the reason of the failure otherwise. error_code is set when the
+    device rejected the command with an error response.
+    """
+    __slots__ = ('cmd_code', 'name', 'timeout', 'deadline', 'response', 'error', 'error_code', 'done')
+
+    def __init__(self, cmd_code, name, timeout):
+        self.cmd_code = cmd_code
+        self.name = name
+        self.timeout = timeout
+        self.deadline = 0.0
+        self.response = None
+        self.error = None
+        self.error_code = None
+        self.done = threading.Event()
+
+class DiagCommandChannel:
+    """Pipelined DIAG command channel.
+
+    Commands are written back-to-back without waiting for each response.
+    A reader thread matches the responses to the oldest outstanding command
+    with the same command code, or to the command echoed by a
+    DIAG_BAD_CMD_F/DIAG_BAD_PARM_F/DIAG_BAD_LEN_F error response. Other
+    packets, such as log packets still arriving from a previous session,
+    are passed to unsolicited or discarded.
+
+    The reader thread owns the I/O device between start() and stop(), so
+    it must be stopped before the regular capture loop starts reading.
+
+    Parameters:
+    io_device: USBIO or SerialIO
+    logger (logging.Logger): logger for failures
+    timeout (float): default response timeout per command in seconds
+    unsolicited (callable): called with packets not matching any command
+    """
+    error_codes = (diagcmd.DIAG_BAD_CMD_F, diagcmd.DIAG_BAD_PARM_F, diagcmd.DIAG_BAD_LEN_F)
+
+    def __init__(self, io_device, logger=None, timeout=1.0, unsolicited=None):
+        self.io_device = io_device
+        self.logger = logger if logger else logging.getLogger('scat.diagcmdchannel')
+        self.timeout = timeout
+        self.unsolicited = unsolicited
+
+        # command code -> outstanding commands, oldest first
+        self.pending = {}
+        self.failures = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Returns after the current read of the reader thread times out
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def send(self, pkt, name=None, timeout=None):
+        """Writes a command without waiting for the response.
+
+        Parameters:
+        pkt (bytes): DIAG command without CRC and HDLC framing
+        name (str): command name used in failure reports
+        timeout (float): response timeout, defaults to the channel timeout
+        """
+        cmd = DiagCommand(pkt[0], name if name else 'command 0x{:02x}'.format(pkt[0]),
+            self.timeout if timeout is None else timeout)
+        with self.lock:
+            if cmd.cmd_code not in self.pending:
+                self.pending[cmd.cmd_code] = []
+            self.pending[cmd.cmd_code].append(cmd)
+        # The timeout runs from the write, not from the queueing
+        cmd.deadline = time.monotonic() + cmd.timeout
+        self.io_device.write(util.generate_packet(pkt), False)
+        return cmd
+
+    def wait(self, commands=None):
+        """Waits for the response or timeout of the given commands, or of all outstanding ones.
+
+        Returns the list of failed commands.
+        """
+        if commands is None:
+            with self.lock:
+                commands = [cmd for cmds in self.pending.values() for cmd in cmds]
+
+        failed = []
+        for cmd in commands:
+            if not cmd.done.wait(max(cmd.deadline - time.monotonic(), 0)):
+                self.fail(cmd, 'timeout after {:.1f} s'.format(cmd.timeout))
+            if cmd.error is not None:
+                failed.append(cmd)
+        return failed
+
+    def fail(self, cmd, error):
+        with self.lock:
+            if cmd.done.is_set():
+                return
+            if cmd in self.pending.get(cmd.cmd_code, []):
+                self.pending[cmd.cmd_code].remove(cmd)
+            cmd.error = error
+            cmd.done.set()
+            self.failures.append(cmd)
+        self.logger.log(logging.WARNING, 'DIAG {} failed: {}'.format(cmd.name, error))
+
+    def match(self, pkt):
+        # pkt: unwrapped packet without CRC
+        cmd_code = pkt[0]
+        error_code = None
+        if cmd_code in self.error_codes and len(pkt) > 1 and pkt[1] in self.pending:
+            error_code = cmd_code
+            cmd_code = pkt[1]
+
+        with self.lock:
+            cmds = self.pending.get(cmd_code)
+            if not cmds:
+                return False
+            cmd = cmds.pop(0)
+            if error_code is None:
+                cmd.response = pkt
+            else:
+                cmd.error = 'error response 0x{:02x}'.format(error_code)
+                cmd.error_code = error_code
+                self.failures.append(cmd)
+            cmd.done.set()
+
+        if error_code is not None:
+            self.logger.log(logging.WARNING, 'DIAG {} failed: {}'.format(cmd.name, cmd.error))
+        return True
+
+    def run(self):
+        oldbuf = b''
+        while self.running:
+            buf = self.io_device.read(0x1000)
+            if len(buf) == 0:
+                continue
+            buf = oldbuf + buf
+            buf_atom = buf.split(b'\x7e')
+            oldbuf = buf_atom.pop()
+
+            for pkt in buf_atom:
+                pkt = util.unwrap(pkt)
+                if len(pkt) < 3:
+                    continue
+                if util.dm_crc16(pkt[:-2]) != ((pkt[-1] << 8) | pkt[-2]):
+                    self.logger.log(logging.DEBUG, 'Dropping packet with CRC mismatch during command exchange')
+                    continue
+                pkt = pkt[:-2]
+                if not self.match(pkt) and self.unsolicited:
+                    self.unsolicited(pkt)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -2,12 +2,21 @@
 
 from functools import wraps
 import util
+import struct
+import datetime
 import logging
 
 class DiagFallbackEventParser:
     def __init__(self, parent):
         self.parent = parent
         self.header = b''
+        self.gsmtap_hdr = util.create_gsmtap_header(
+            version = 2,
+            payload_type = util.gsmtap_type.OSMOCORE_LOG)
+        # sec, usec of the osmocore logging header
+        self.ts_struct = struct.Struct('!LL')
+        # Event ID -> header bytes following the timestamp
+        self.header_suffixes = {}
 
         # Event IDs are available at:
         # https://source.codeaurora.org/quic/la/platform/vendor/qcom-opensource/wlan/qcacld-2.0/tree/CORE/VOSS/inc/event_defs.h
@@ -1649,21 +1658,26 @@ class DiagFallbackEventParser:
             2747: 'EVENT_WLAN_LOW_RESOURCE_FAILURE', # 0xabb
         }
 
-    def parse_event_fallback(self, ts, event_id, *args):
-        gsmtap_hdr = util.create_gsmtap_header(
-            version = 2,
-            payload_type = util.gsmtap_type.OSMOCORE_LOG)
-        osmocore_log_hdr = util.create_osmocore_logging_header(
-            timestamp = ts,
-            process_name = b'Event',
-            pid = event_id,
-        )
+    def event_header_suffix(self, event_id):
+        # Everything of the GSMTAP and osmocore logging headers following the timestamp,
+        # plus the event name. Built once per event ID.
         if event_id in self.event_names:
             log_precontent = '{}: '.format(self.event_names[event_id]).encode('utf-8')
         else:
             log_precontent = 'Event {}: '.format(event_id).encode('utf-8')
+        suffix = util.create_osmocore_logging_header(
+            timestamp = datetime.datetime.fromtimestamp(0),
+            process_name = b'Event',
+            pid = event_id,
+        )[self.ts_struct.size:] + log_precontent
+        self.header_suffixes[event_id] = suffix
+        return suffix
 
-        header = gsmtap_hdr + osmocore_log_hdr + log_precontent
+    def parse_event_fallback(self, ts, event_id, *args):
+        suffix = self.header_suffixes.get(event_id)
+        if suffix is None:
+            suffix = self.event_header_suffix(event_id)
+        header = self.gsmtap_hdr + self.ts_struct.pack(int(ts.timestamp()), ts.microsecond) + suffix
         log_content = b''
 
         if len(args) == 2:
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 import util
+import channels
+import measurements
 
 import struct
 import calendar
@@ -59,11 +61,10 @@ class DiagGsmLogParser:
         item_struct = namedtuple('QcDiagGsmL1Fcch', 'arfcn_band tone_id msw lsw coarse_freq_offset fine_freq_offset afc_freq snr')
         item = item_struct._make(struct.unpack('<HHHHhhhH', pkt_body[0:16]))
 
-        band = (item.arfcn_band & 0xF000) >> 12
-        arfcn = (item.arfcn_band & 0x0FFF)
+        arfcn, band = channels.unpack_arfcn_band(item.arfcn_band)
 
         if self.parent:
-            self.parent.gsm_last_arfcn[radio_id] = arfcn
+            self.parent.radio_states[radio_id].gsm_arfcn = arfcn
         return {'stdout': 'GSM FCCH acquistion: ARFCN {}/Band {}'.format(arfcn, band), 'radio_id': radio_id}
 
     def parse_gsm_dsds_fcch(self, pkt_header, pkt_body, args):
@@ -78,13 +79,12 @@ class DiagGsmLogParser:
         item_struct = namedtuple('QcDiagGsmL1Sch', 'arfcn_band tone_id crc_pass dsp_rx bad_frame decoded_data_len decoded_data msw lsw peak_corr_energy freq_offset')
         item = item_struct._make(struct.unpack('<HHHHHHLHHHH', pkt_body[0:24]))
 
-        band = (item.arfcn_band & 0xF000) >> 12
-        arfcn = (item.arfcn_band & 0x0FFF)
+        arfcn, band = channels.unpack_arfcn_band(item.arfcn_band)
         sch_data = struct.unpack('>L', struct.pack('<L', item.decoded_data))[0]
         # SCH data 25bits: 19b reduced frame number, 6b BSIC
 
         if self.parent:
-            self.parent.gsm_last_arfcn[radio_id] = arfcn
+            self.parent.radio_states[radio_id].gsm_arfcn = arfcn
         return {'stdout': 'GSM SCH acquistion: ARFCN {}/Band {}, Data: {:025b}'.format(arfcn, band, sch_data), 'radio_id': radio_id}
 
     def parse_gsm_dsds_sch(self, pkt_header, pkt_body, args):
@@ -93,41 +93,44 @@ class DiagGsmLogParser:
 
     def parse_gsm_l1_new_burst_metric(self, pkt_header, pkt_body, args):
         item_struct_v4 = namedtuple('QcDiagGsmL1NewBurstMetricV4', 'sfn arfcn_band rssi rxpwr dcoff_i dcoff_q freq_offset time_offset snr_est gain_state aci q16 aqpsk timeslot jdet_reading_divrx wb_power ll_hl_state')
-        stdout = ''
 
         pkt_version = pkt_body[0]
         if pkt_version == 4: # Version 4
             chan = pkt_body[1]
+            bursts = [[] for x in range(5)]
             for i in range(4):
                 cell_pkt = pkt_body[2+37*i:2+37*(i+1)]
                 item = item_struct_v4._make(struct.unpack('<LHLhhhhhhbbLBBHLB', cell_pkt))
-                c_arfcn = item.arfcn_band & 0xfff
-                c_band = (item.arfcn_band >> 12)
-                if item.rxpwr != 0:
-                    c_rxpwr_real = item.rxpwr * 0.0625
-                    stdout += 'GSM Serving Cell New Burst Metric: ARFCN {}/BC {}, RSSI {}, RxPwr {:.2f}\n'.format(c_arfcn, c_band, item.rssi, c_rxpwr_real)
+                bursts[0].append(item.sfn)
+                arfcn, band = channels.unpack_arfcn_band(item.arfcn_band)
+                bursts[1].append(arfcn)
+                bursts[2].append(band)
+                bursts[3].append(item.rssi)
+                bursts[4].append(item.rxpwr * 0.0625)
         else:
             if self.parent:
                 self.parent.logger.log(logging.WARNING, 'Unsupported GSM Serving Cell L1 New Burst Metric version {}'.format(pkt_version))
+            return None
 
-        return {'stdout': stdout.rstrip()}
+        return {'meas': [measurements.GsmNewBurstMetrics(chan, *[tuple(x) for x in bursts])]}
 
     def parse_gsm_l1_burst_metric(self, pkt_header, pkt_body, args):
         channel = pkt_body[0]
         # for each 23 bytes
         item_struct = namedtuple('QcDiagGsmL1BurstMetric', 'sfn arfcn_band rssi rxpwr dcoff_i dcoff_q freq_offset time_offset snr_est gain_state')
-        stdout = ''
 
+        bursts = [[] for x in range(5)]
         for i in range(4):
             cell_pkt = pkt_body[1+23*i:1+23*(i+1)]
             item = item_struct._make(struct.unpack('<LHLhhhhhhb', cell_pkt))
-            c_arfcn = item.arfcn_band & 0xfff
-            c_band = (item.arfcn_band >> 12)
-            if item.rxpwr != 0:
-                c_rxpwr_real = item.rxpwr * 0.0625
-                stdout += 'GSM Serving Cell Burst Metric: ARFCN {}/BC {}, RSSI {}, RxPwr {:.2f}\n'.format(c_arfcn, c_band, item.rssi, c_rxpwr_real)
+            bursts[0].append(item.sfn)
+            arfcn, band = channels.unpack_arfcn_band(item.arfcn_band)
+            bursts[1].append(arfcn)
+            bursts[2].append(band)
+            bursts[3].append(item.rssi)
+            bursts[4].append(item.rxpwr * 0.0625)
 
-        return {'stdout': stdout.rstrip()}
+        return {'meas': [measurements.GsmBurstMetrics(channel, *[tuple(x) for x in bursts])]}
 
     def parse_gsm_dsds_l1_burst_metric(self, pkt_header, pkt_body, args):
         radio_id_pkt = self.parent.sanitize_radio_id(pkt_body[0])
@@ -141,8 +144,7 @@ class DiagGsmLogParser:
         for i in range(num_cells):
             cell_pkt = pkt_body[1 + 12 * i:1 + 12 * (i + 1)]
             item = item_struct._make(struct.unpack('<HhBBLH', cell_pkt))
-            s_arfcn = item.arfcn_band & 0xfff
-            s_band = (item.arfcn_band >> 12)
+            s_arfcn, s_band = channels.unpack_arfcn_band(item.arfcn_band)
             s_rxpwr_real = item.rxpwr * 0.0625
             if item.bsic_valid == 1:
                 stdout += 'GSM Surround Cell BA: Cell {}: ARFCN {}/BC {}/BSIC {}, RxPwr {:.2f}\n'.format(i, s_arfcn, s_band, item.bsic, s_rxpwr_real)
@@ -158,27 +160,27 @@ class DiagGsmLogParser:
     def parse_gsm_l1_serv_aux_meas(self, pkt_header, pkt_body, args):
         item_struct = namedtuple('QcDiagGsmL1ServAuxMeas', 'rxpwr snr_is_bad')
         item = item_struct._make(struct.unpack('<hB', pkt_body[0:3]))
-        rxpwr_real = item.rxpwr * 0.0625
-        return {'stdout': 'GSM Serving Cell Aux Measurement: RxPwr {:.2f}'.format(rxpwr_real)}
+        return {'meas': [measurements.GsmServAuxMeas(item.rxpwr * 0.0625, item.snr_is_bad)]}
 
     def parse_gsm_dsds_l1_serv_aux_meas(self, pkt_header, pkt_body, args):
         radio_id_pkt = self.parent.sanitize_radio_id(pkt_body[0])
         return self.parse_gsm_l1_serv_aux_meas(pkt_header, pkt_body[1:], {'radio_id': radio_id_pkt})
 
     def parse_gsm_l1_neig_aux_meas(self, pkt_header, pkt_body, args):
-        stdout = ''
         item_struct = namedtuple('QcDiagGsmL1NeigAuxMeas', 'arfcn_band rxpwr')
 
         num_cells = pkt_body[0]
-        stdout += 'GSM Neighbor Cell Aux: {} cells\n'.format(num_cells)
+        n_arfcn = []
+        n_band = []
+        n_rxpwr = []
         for i in range(num_cells):
             item = item_struct._make(struct.unpack('<Hh', pkt_body[1+4*i:1+4*(i+1)]))
-            n_arfcn = item.arfcn_band & 0xfff
-            n_band = (item.arfcn_band >> 12)
-            n_rxpwr_real = item.rxpwr * 0.0625
-            stdout += 'GSM Neighbor Cell Aux {}: ARFCN {}/BC {}, RxPwr {:.2f}\n'.format(i, n_arfcn, n_band, n_rxpwr_real)
+            arfcn, band = channels.unpack_arfcn_band(item.arfcn_band)
+            n_arfcn.append(arfcn)
+            n_band.append(band)
+            n_rxpwr.append(item.rxpwr * 0.0625)
 
-        return {'stdout': stdout.rstrip()}
+        return {'meas': [measurements.GsmNeigAuxMeas(tuple(n_arfcn), tuple(n_band), tuple(n_rxpwr))]}
 
     def parse_gsm_dsds_l1_neig_aux_meas(self, pkt_header, pkt_body, args):
         radio_id_pkt = self.parent.sanitize_radio_id(pkt_body[0])
@@ -192,12 +194,12 @@ class DiagGsmLogParser:
         item_struct = namedtuple('QcDiagGsmRrCellInfo', 'arfcn_band bcc ncc cid lai priority ncc_permitted')
         item = item_struct._make(struct.unpack('<HBBH5sBB', pkt_body[0:13]))
 
-        band = (item.arfcn_band & 0xF000) >> 12
-        arfcn = (item.arfcn_band & 0x0FFF)
+        arfcn, band = channels.unpack_arfcn_band(item.arfcn_band)
 
         if self.parent:
-            self.parent.gsm_last_arfcn[radio_id] = arfcn
-            self.parent.gsm_last_cell_id[radio_id] = item.cid
+            state = self.parent.radio_states[radio_id]
+            state.gsm_arfcn = arfcn
+            state.gsm_cell_id = item.cid
         return {'stdout': 'GSM RR Cell Info: ARFCN {}/Band {}, BCC {}, NCC {}, xCID {:x}, xLAI {}'.format(arfcn, band, item.bcc, item.ncc, item.cid, binascii.hexlify(item.lai).decode('utf-8'))}
 
     def parse_gsm_dsds_cell_info(self, pkt_header, pkt_body, args):
@@ -218,12 +220,11 @@ class DiagGsmLogParser:
             return None
 
         if self.parent:
-            arfcn = self.parent.gsm_last_arfcn[radio_id]
+            arfcn = self.parent.radio_states[radio_id].gsm_arfcn
         else:
             arfcn = 0
         # 0x80: downlink
-        if (item.channel_type_dir & 0x80) == 0x00:
-            arfcn = arfcn | (1 << 14)
+        arfcn = channels.gsmtap_arfcn(arfcn, (item.channel_type_dir & 0x80) == 0x00)
         chan = item.channel_type_dir & 0x7F
 
         # 0: DCCH, 1: BCCH, 2: RACH, 3: CCCH, 4: SACCH, 5: SDCCH, 6: FACCH
@@ -231,6 +232,13 @@ class DiagGsmLogParser:
         rr_channel_map = [8, util.gsmtap_channel.BCCH, util.gsmtap_channel.RACH, util.gsmtap_channel.CCCH, 0x88]
         channel_type = rr_channel_map[chan]
 
+        repeats = 0
+        if chan == 1 and self.parent and self.parent.broadcast_cache is not None:
+            repeats = self.parent.broadcast_cache.check(radio_id, (self.parent.radio_states[radio_id].gsm_cell_id, arfcn), channel_type,
+                l3_message, util.parse_qxdm_ts_sec(pkt_header.timestamp))
+            if repeats is None:
+                return None
+
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
         ts_sec = calendar.timegm(pkt_ts.timetuple())
         ts_usec = pkt_ts.microsecond
@@ -280,6 +288,9 @@ class DiagGsmLogParser:
             device_sec = ts_sec,
             device_usec = ts_usec)
 
+        if repeats:
+            return {'cp': [gsmtap_hdr + l3_message], 'ts': pkt_ts, 'radio_id': radio_id,
+                'stdout': 'GSM RR BCCH: ARFCN {}, {} repeats suppressed'.format(arfcn, repeats)}
         return {'cp': [gsmtap_hdr + l3_message], 'ts': pkt_ts, 'radio_id': radio_id}
 
     def parse_gsm_dsds_rr(self, pkt_header, pkt_body, args):
@@ -303,10 +314,9 @@ class DiagGsmLogParser:
                 self.parent.logger.log(logging.WARNING, 'Payload length ({}) does not match with expected ({})'.format(len(l3_message), item.message_len))
             return None
 
-        arfcn = self.parent.gsm_last_arfcn[radio_id]
+        arfcn = self.parent.radio_states[radio_id].gsm_arfcn
         # 0x80: downlink
-        if (item.chan_type_dir & 0x80) == 0x00:
-            arfcn = arfcn | (1 << 14)
+        arfcn = channels.gsmtap_arfcn(arfcn, (item.chan_type_dir & 0x80) == 0x00)
         chan = item.chan_type_dir & 0x7F
 
         # 3: PACCH, 4: Unknown
@@ -335,10 +345,9 @@ class DiagGsmLogParser:
         item = item_struct._make(struct.unpack('<BBH', pkt_body[0:4]))
         l3_message = pkt_body[4:]
 
-        arfcn = self.parent.gsm_last_arfcn[radio_id]
+        arfcn = self.parent.radio_states[radio_id].gsm_arfcn
         # 0: uplink, 1: downlink
-        if (item.msg_dir) == 0x00:
-            arfcn = arfcn | (1 << 14)
+        arfcn = channels.gsmtap_arfcn(arfcn, item.msg_dir == 0x00)
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
         ts_sec = calendar.timegm(pkt_ts.timetuple())
@@ -2,6 +2,8 @@
 
 from . import diagcmd
 import util
+import channels
+import measurements
 
 import struct
 import calendar
@@ -11,6 +13,12 @@ from collections import namedtuple
 class DiagLteLogParser:
     def __init__(self, parent):
         self.parent = parent
+        # Vectorized cell decoders, see load_meas_vec()
+        self.meas_vec = None
+        # (rbid, direction, SN length, plane) -> header, see pdcp_lte_header()
+        self.pdcp_headers = {}
+        # (is_downlink, RNTI type) -> header, see lte_mac_header()
+        self.mac_headers = {}
 
         self.no_process = {
         }
@@ -134,14 +142,50 @@ class DiagLteLogParser:
         real_rssi = -110 + meas_rssi * 0.0625
         real_rsrq = -30 + meas_rsrq * 0.0625
 
-        return {'stdout': 'LTE SCell: EARFCN {}, PCI {:3d}, Measured RSRP {:.2f}, Measured RSSI {:.2f}'.format(item.earfcn, pci, real_rsrp, real_rssi)}
+        meas = measurements.LteScellMeas(item.earfcn, pci, serv_layer_priority,
+            real_rsrp, -180 + avg_rsrp * 0.0625, real_rsrq, -30 + avg_rsrq * 0.0625, real_rssi,
+            q_rxlevmin, p_max, max_ue_tx_pwr, s_rxlev, num_drx_s_fail, s_intra_search, s_non_intra_search)
+        return {'meas': [meas]}
+
+    def load_meas_vec(self):
+        """Returns the vectorized cell decoders (diagmeasvec), None if NumPy is not available.
+
+        NumPy is only imported with the first measurement log.
+        """
+        if self.meas_vec is None:
+            try:
+                from . import diagmeasvec
+                self.meas_vec = diagmeasvec
+            except ImportError:
+                self.meas_vec = False
+        return self.meas_vec or None
+
+    def parse_lte_ml1_ncell_meas_cells(self, pkt_body, pos, n_cells):
+        n_cell_struct = namedtuple('QcDiagLteMl1NcellMeasNcell', 'val0 val1 val2 val3 n_freq_offset val5 ant0_offset ant1_offset')
+
+        # Per-cell fields
+        cells = [[] for x in range(11)]
+        for i in range(n_cells):
+            n_cell_pkt = pkt_body[pos + 32 * i:pos + 32 * (i + 1)]
+            n_cell = n_cell_struct._make(struct.unpack('<LLLLHHLL', n_cell_pkt[0:28]))
+
+            cells[0].append(n_cell.val0 & 0x1ff) # PCI
+            cells[1].append(-110 + ((n_cell.val0 >> 9) & 0x7ff) * 0.0625) # Measured RSSI
+            cells[2].append(-180 + (n_cell.val0 >> 20) * 0.0625) # Measured RSRP
+            cells[3].append(-180 + ((n_cell.val1 >> 12) & 0xfff) * 0.0625) # Average RSRP
+            cells[4].append(-30 + ((n_cell.val2 >> 12) & 0x3ff) * 0.0625) # Measured RSRQ
+            cells[5].append(-30 + (n_cell.val3 & 0x3ff) * 0.0625) # Average RSRQ
+            cells[6].append((n_cell.val3 >> 20) & 0x3f) # S_rxlev
+            cells[7].append(n_cell.ant0_offset & 0x7ff)
+            cells[8].append(n_cell.ant0_offset >> 11)
+            cells[9].append(n_cell.ant1_offset & 0x7ff)
+            cells[10].append(n_cell.ant1_offset >> 11)
+        return [tuple(x) for x in cells]
 
     def parse_lte_ml1_ncell_meas(self, pkt_header, pkt_body, args):
         pkt_version = pkt_body[0]
-        stdout = ''
 
         item_struct = namedtuple('QcDiagLteMl1NcellMeas', 'rrc_rel reserved1 earfcn q_rxlevmin_n_cells')
-        n_cell_struct = namedtuple('QcDiagLteMl1NcellMeasNcell', 'val0 val1 val2 val3 n_freq_offset val5 ant0_offset ant1_offset')
 
         pos = 0
         if pkt_version == 4: # Version 4
@@ -162,40 +206,43 @@ class DiagLteLogParser:
 
         q_rxlevmin = item.q_rxlevmin_n_cells & 0x3f
         n_cells = item.q_rxlevmin_n_cells >> 6
-        stdout += 'LTE NCell: EARFCN {}, number of cells: {}\n'.format(item.earfcn, n_cells)
-
-        for i in range(n_cells):
-            n_cell_pkt = pkt_body[pos + 32 * i:pos + 32 * (i + 1)]
-            n_cell = n_cell_struct._make(struct.unpack('<LLLLHHLL', n_cell_pkt[0:28]))
+        if n_cells > 0 and item.rrc_rel != 1: # Rel 9
+            self.parent.logger.log(logging.WARNING, 'Unknown LTE ML1 Neighbor Cell Meas packet - RRC version {}'.format(item.rrc_rel))
 
-            n_pci = n_cell.val0 & 0x1ff
-            n_meas_rssi = (n_cell.val0 >> 9) & 0x7ff
-            n_meas_rsrp = (n_cell.val0 >> 20)
-            n_avg_rsrp = (n_cell.val1 >> 12) & 0xfff
-            n_meas_rsrq = (n_cell.val2 >> 12) & 0x3ff
-            n_avg_rsrq = n_cell.val3 & 0x3ff
-            n_s_rxlev = (n_cell.val3 >> 20) & 0x3f
-            n_ant0_frame_offset = n_cell.ant0_offset & 0x7ff
-            n_ant0_sample_offset = (n_cell.ant0_offset >> 11)
-            n_ant1_frame_offset = n_cell.ant1_offset & 0x7ff
-            n_ant1_sample_offset = (n_cell.ant1_offset >> 11)
-
-            if item.rrc_rel == 1: # Rel 9
-                r9_info_interim = struct.unpack('<L', n_cell_pkt[28:])
-                n_s_qual = r9_info_interim[0]
-            else:
-                self.parent.logger.log(logging.WARNING, 'Unknown LTE ML1 Neighbor Cell Meas packet - RRC version {}'.format(item.rrc_rel))
-
-            n_real_rsrp = -180 + n_meas_rsrp * 0.0625
-            n_real_rssi = -110 + n_meas_rssi * 0.0625
-            n_real_rsrq = -30 + n_meas_rsrq * 0.0625
-
-            stdout += '└── Neighbor cell {}: PCI {:3d}, RSRP {:.2f}, RSSI {:.2f}\n'.format(i, n_pci, n_real_rsrp, n_real_rssi)
-        return {'stdout': stdout.rstrip()}
+        if self.load_meas_vec():
+            cells = [tuple(x.tolist()) for x in self.meas_vec.decode_ncells(pkt_body, pos, n_cells)]
+        else:
+            cells = self.parse_lte_ml1_ncell_meas_cells(pkt_body, pos, n_cells)
+        meas = measurements.LteNcellMeas(item.earfcn, q_rxlevmin, *cells)
+        return {'meas': [meas]}
+
+    def parse_lte_ml1_scell_meas_cells(self, subpkt_body, pos_meas, num_cells, cell_size):
+        if self.load_meas_vec():
+            return [tuple(x.tolist()) for x in self.meas_vec.decode_scell_meas_cells(subpkt_body, pos_meas, num_cells, cell_size)]
+
+        # Fields common to all versions of the Serving Cell Measurement Result subpacket
+        cells = [[] for x in range(10)]
+        for y in range(num_cells):
+            interim = struct.unpack('<HHH', subpkt_body[pos_meas:pos_meas+6])
+            cells[0].append(interim[0] & 0x1ff) # PCI
+            cells[1].append((interim[0] >> 9) & 7) # Serving cell index
+            cells[2].append((interim[0] >> 12) & 1) # Is serving cell
+            cells[3].append(interim[2] & 0x3ff) # SFN
+            cells[4].append((interim[2] >> 10) & 0xf) # Subframe number
+
+            interim = struct.unpack('<LLLLLLLLLLLL', subpkt_body[pos_meas+16:pos_meas+64])
+            cells[5].append((float((interim[4] >> 12) & 4095) + 640) * 0.0625 - 180.0) # RSRP
+            cells[6].append((float((interim[5] >> 12) & 4095)) * 0.0625 - 180.0) # Filtered RSRP
+            cells[7].append((float((interim[8]) & 1023)) * 0.0625 - 30.0) # RSRQ
+            cells[8].append((float((interim[8] >> 20) & 1023)) * 0.0625 - 30.0) # Filtered RSRQ
+            cells[9].append((float((interim[11]) & 1023)) * 0.0625 - 110.0) # RSSI
+
+            pos_meas += cell_size
+        return [tuple(x) for x in cells]
 
     def parse_lte_ml1_scell_meas_response(self, pkt_header, pkt_body, args):
         pkt_version = pkt_body[0]
-        stdout = ''
+        meas = []
 
         # First 4b: Version, Number of subpackets, reserved
         # 01 | 01 | 35 0c
@@ -217,123 +264,16 @@ class DiagLteLogParser:
                     if subpkt_header.version == 36:
                         subpkt_scell_meas_v36_struct = namedtuple('QcDiagLteMl1SubpktScellMeasV36', 'earfcn num_cells valid_rx')
                         subpkt_scell_meas_v36 = subpkt_scell_meas_v36_struct._make(struct.unpack('<LHH', subpkt_body[0:8]))
-                        stdout += 'LTE ML1 SCell Meas Response: EARFCN {}, Number of cells = {}, Valid RX = {}\n'.format(subpkt_scell_meas_v36.earfcn,
-                            subpkt_scell_meas_v36.num_cells, subpkt_scell_meas_v36.valid_rx)
-
-                        pos_meas = 8
-                        for y in range(subpkt_scell_meas_v36.num_cells):
-                            interim = struct.unpack('<HHH', subpkt_body[pos_meas:pos_meas+6])
-                            pci = interim[0] & 0x1ff
-                            scell_idx = (interim[0] >> 9) & 7
-                            is_scell = (interim[0] >> 12) & 1
-
-                            sfn = interim[2] & 0x3ff
-                            subfn = (interim[2] >> 10) & 0xf
-
-                            interim = struct.unpack('<LLLLLLLLLLLL', subpkt_body[pos_meas+16:pos_meas+64])
-                            rsrp0 = (float((interim[0] >> 10) & 4095)) * 0.0625 - 180.0
-                            rsrp1 = (float((interim[1] >> 12) & 4095)) * 0.0625 - 180.0
-                            rsrp2 = (float((interim[2] >> 12) & 4095)) * 0.0625 - 180.0
-                            rsrp3 = (float((interim[4]) & 4095)) * 0.0625 - 180.0
-                            rsrp = (float((interim[4] >> 12) & 4095) + 640) * 0.0625 - 180.0
-                            frsrp = (float((interim[5] >> 12) & 4095)) * 0.0625 - 180.0
-
-                            rsrq0 = (float((interim[6]) & 1023)) * 0.0625 - 30.0
-                            rsrq1 = (float((interim[6] >> 20) & 1023)) * 0.0625 - 30.0
-                            rsrq2 = (float((interim[7] >> 10) & 1023)) * 0.0625 - 30.0
-                            rsrq3 = (float((interim[7] >> 20) & 1023)) * 0.0625 - 30.0
-                            rsrq = (float((interim[8]) & 1023)) * 0.0625 - 30.0
-                            frsrq = (float((interim[8] >> 20) & 1023)) * 0.0625 - 30.0
-
-                            rssi0 = (float((interim[9]) & 2047)) * 0.0625 - 110.0
-                            rssi1 = (float((interim[9] >> 11) & 2047)) * 0.0625 - 110.0
-                            rssi2 = (float((interim[10]) & 2047)) * 0.0625 - 110.0
-                            rssi3 = (float((interim[10] >> 11) & 2047)) * 0.0625 - 110.0
-                            rssi = (float((interim[11]) & 1023)) * 0.0625 - 110.0
-                            resid_freq_error = struct.unpack('<H', subpkt_body[pos_meas+70:pos_meas+72])[0]
-
-                            interim = struct.unpack('<LL', subpkt_body[pos_meas+80:pos_meas+88])
-                            snr0 = (float((interim[0]) & 511)) * 0.1 - 20.0
-                            snr1 = (float((interim[0] >> 9) & 511)) * 0.1 - 20.0
-                            snr2 = (float((interim[1]) & 511)) * 0.1 - 20.0
-                            snr3 = (float((interim[1] >> 9) & 511)) * 0.1 - 20.0
-
-                            interim = struct.unpack('<LLllll', subpkt_body[pos_meas+104:pos_meas+128])
-                            prj_sir = interim[0]
-                            if prj_sir & (1 << 31):
-                                prj_sir = prj_sir - 4294967296
-                            prj_sir = prj_sir / 16
-
-                            posticrsrq = (float((interim[1]))) * 0.0625 - 30.0
-
-                            cinr0 = interim[2]
-                            cinr1 = interim[3]
-                            cinr2 = interim[4]
-                            cinr3 = interim[5]
-
-                            pos_meas += 128
-                            stdout += 'LTE ML1 SCell Meas Response (Cell {}): PCI {}, Serving cell index {}, is_serving_cell = {}\n'.format(y, pci, scell_idx, is_scell)
+                        cells = self.parse_lte_ml1_scell_meas_cells(subpkt_body, 8, subpkt_scell_meas_v36.num_cells, 128)
+                        meas.append(measurements.LteScellMeasResponse(subpkt_scell_meas_v36.earfcn,
+                            subpkt_scell_meas_v36.num_cells, subpkt_scell_meas_v36.valid_rx, *cells))
                     elif subpkt_header.version == 48:
                         # EARFCN, num of cell, valid RX data
                         subpkt_scell_meas_v48_struct = namedtuple('QcDiagLteMl1SubpktScellMeasV48', 'earfcn num_cells valid_rx rx_map')
                         subpkt_scell_meas_v48 = subpkt_scell_meas_v48_struct._make(struct.unpack('<LHHL', subpkt_body[0:12]))
-                        stdout += 'LTE ML1 SCell Meas Response: EARFCN {}, Number of cells = {}, Valid RX = {}\n'.format(subpkt_scell_meas_v48.earfcn,
-                            subpkt_scell_meas_v48.num_cells, subpkt_scell_meas_v48.valid_rx)
-
-                        pos_meas = 12
-                        for y in range(subpkt_scell_meas_v48.num_cells):
-                            interim = struct.unpack('<HHH', subpkt_body[pos_meas:pos_meas+6])
-                            pci = interim[0] & 0x1ff
-                            scell_idx = (interim[0] >> 9) & 7
-                            is_scell = (interim[0] >> 12) & 1
-
-                            sfn = interim[2] & 0x3ff
-                            subfn = (interim[2] >> 10) & 0xf
-
-                            interim = struct.unpack('<LLLLLLLLLLLL', subpkt_body[pos_meas+16:pos_meas+64])
-                            rsrp0 = (float((interim[0] >> 10) & 4095)) * 0.0625 - 180.0
-                            rsrp1 = (float((interim[1] >> 12) & 4095)) * 0.0625 - 180.0
-                            rsrp2 = (float((interim[2] >> 12) & 4095)) * 0.0625 - 180.0
-                            rsrp3 = (float((interim[4]) & 4095)) * 0.0625 - 180.0
-                            rsrp = (float((interim[4] >> 12) & 4095) + 640) * 0.0625 - 180.0
-                            frsrp = (float((interim[5] >> 12) & 4095)) * 0.0625 - 180.0
-
-                            rsrq0 = (float((interim[6]) & 1023)) * 0.0625 - 30.0
-                            rsrq1 = (float((interim[6] >> 20) & 1023)) * 0.0625 - 30.0
-                            rsrq2 = (float((interim[7] >> 10) & 1023)) * 0.0625 - 30.0
-                            rsrq3 = (float((interim[7] >> 20) & 1023)) * 0.0625 - 30.0
-                            rsrq = (float((interim[8]) & 1023)) * 0.0625 - 30.0
-                            frsrq = (float((interim[8] >> 20) & 1023)) * 0.0625 - 30.0
-
-                            rssi0 = (float((interim[9]) & 2047)) * 0.0625 - 110.0
-                            rssi1 = (float((interim[9] >> 11) & 2047)) * 0.0625 - 110.0
-                            rssi2 = (float((interim[10]) & 2047)) * 0.0625 - 110.0
-                            rssi3 = (float((interim[10] >> 11) & 2047)) * 0.0625 - 110.0
-                            rssi = (float((interim[11]) & 1023)) * 0.0625 - 110.0
-                            resid_freq_error = struct.unpack('<H', subpkt_body[pos_meas+84:pos_meas+86])[0]
-
-                            interim = struct.unpack('<LL', subpkt_body[pos_meas+92:pos_meas+100])
-                            snr0 = (float((interim[0]) & 511)) * 0.1 - 20.0
-                            snr1 = (float((interim[0] >> 9) & 511)) * 0.1 - 20.0
-                            snr2 = (float((interim[1]) & 511)) * 0.1 - 20.0
-                            snr3 = (float((interim[1] >> 9) & 511)) * 0.1 - 20.0
-
-                            interim = struct.unpack('<LLllll', subpkt_body[pos_meas+116:pos_meas+140])
-                            prj_sir = interim[0]
-                            if prj_sir & (1 << 31):
-                                prj_sir = prj_sir - 4294967296
-                            prj_sir = prj_sir / 16
-
-                            posticrsrq = (float((interim[1]))) * 0.0625 - 30.0
-
-                            cinr0 = interim[2]
-                            cinr1 = interim[3]
-                            cinr2 = interim[4]
-                            cinr3 = interim[5]
-
-                            pos_meas += 140
-                            stdout += 'LTE ML1 SCell Meas Response (Cell {}): PCI {}, Serving cell index {}, is_serving_cell = {}\n'.format(y, pci, scell_idx, is_scell)
-
+                        cells = self.parse_lte_ml1_scell_meas_cells(subpkt_body, 12, subpkt_scell_meas_v48.num_cells, 140)
+                        meas.append(measurements.LteScellMeasResponse(subpkt_scell_meas_v48.earfcn,
+                            subpkt_scell_meas_v48.num_cells, subpkt_scell_meas_v48.valid_rx, *cells))
                     else:
                         if self.parent:
                             self.parent.logger.log(logging.WARNING, 'Unknown LTE ML1 Serving Cell Meas Serving Cell Measurement Result subpacket version {}'.format(subpkt_header.version))
@@ -341,7 +281,7 @@ class DiagLteLogParser:
                     if self.parent:
                         self.parent.logger.log(logging.WARNING, 'Unknown LTE ML1 Serving Cell Meas subpacket ID 0x{:02x}'.format(subpkt_header.id))
 
-            return {'stdout': stdout.rstrip()}
+            return {'meas': meas}
         else:
             if self.parent:
                 self.parent.logger.log(logging.WARNING, 'Unknown LTE ML1 Serving Cell Meas Response packet version 0x{:02x}'.format(pkt_version))
@@ -375,9 +315,11 @@ class DiagLteLogParser:
         phich_resource = (item.pci_pbch_phich >> 13) & 0x7
 
         if self.parent:
-            self.parent.lte_last_bw_dl[radio_id] = item.dl_bandwidth
-            self.parent.lte_last_cell_id[radio_id] = pci
-            self.parent.lte_last_earfcn_dl[radio_id] = item.earfcn
+            state = self.parent.radio_states[radio_id]
+            state.lte_bw_dl = item.dl_bandwidth
+            state.lte_cell_id = pci
+            state.lte_earfcn_dl = item.earfcn
+            state.lte_earfcn_ul = channels.lte.ul_channel(item.earfcn)
 
         mib_payload = struct.pack('!L', item.mib_bytes)[0:3]
         if item.dl_bandwidth in prb_to_mhz:
@@ -533,143 +475,177 @@ class DiagLteLogParser:
             else:
                 self.parent.logger.log(logging.WARNING, 'Unexpected MAC RACH Response Subpacket ID 0x{:02x}'.format(subpkt_mac.id))
 
-    def create_lte_mac_gsmtap_packet(self, pkt_ts, is_downlink, header, body):
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
-
-        # RNTI Type: {0: C-RNTI, 2: P-RNTI, 3: RA-RNTI, 4: T-C-RNTI, 5: SI-RNTI}
-        rnti_type_map = {
-            0: util.mac_lte_rnti_types.C_RNTI,
-            2: util.mac_lte_rnti_types.P_RNTI,
-            3: util.mac_lte_rnti_types.RA_RNTI,
-            4: util.mac_lte_rnti_types.C_RNTI,
-            5: util.mac_lte_rnti_types.SI_RNTI}
-        ws_rnti_type = 0
-        if header['rnti_type'] in rnti_type_map:
-            ws_rnti_type = rnti_type_map[header['rnti_type']]
+    # RNTI Type: {0: C-RNTI, 2: P-RNTI, 3: RA-RNTI, 4: T-C-RNTI, 5: SI-RNTI}
+    mac_rnti_type_map = {
+        0: util.mac_lte_rnti_types.C_RNTI,
+        2: util.mac_lte_rnti_types.P_RNTI,
+        3: util.mac_lte_rnti_types.RA_RNTI,
+        4: util.mac_lte_rnti_types.C_RNTI,
+        5: util.mac_lte_rnti_types.SI_RNTI,
+    }
+
+    mac_subpkt_header = namedtuple('QcDiagLteMacSubpkt', 'id version size')
+    mac_subpkt_struct = struct.Struct('<BBH')
+
+    # Subpacket version -> (sample header, struct)
+    mac_dl_tb_samples = {
+        0x02: (namedtuple('QcDiagLteMacSubpktDlTransportBlock', 'sfn_subfn rnti_type harq_id pmch_id dl_tbs rlc_pdus padding header_len'),
+            struct.Struct('<HBBHHBHB')),
+        0x04: (namedtuple('QcDiagLteMacSubpktDlTransportBlockV4', 'subid cellid sfn_subfn rnti_type harq_id pmch_id dl_tbs rlc_pdus padding header_len'),
+            struct.Struct('<BBHBBHHBHB')),
+    }
+    # BSR Event: {0: None, 1: Periodic, 2: High Data Arrival}
+    # BSR Trig: {0: No BSR, 3: S-BSR, 4: Pad L-BSR}
+    mac_ul_tb_samples = {
+        0x01: (namedtuple('QcDiagLteMacSubpktUlTransportBlock', 'sfn_subfn rnti_type harq_id grant rlc_pdus padding bsr_event bsr_trig header_len'),
+            struct.Struct('<HBBHBHBBB')),
+        0x02: (namedtuple('QcDiagLteMacSubpktUlTransportBlockV4', 'subid cellid harq_id rnti_type sfn_subfn grant rlc_pdus padding bsr_event bsr_trig header_len'),
+            struct.Struct('<BBBBHHBHBBB')),
+    }
+
+    # SFN and subframe number of MAC_LTE_FRAME_SUBFRAME_TAG, followed by MAC_LTE_PAYLOAD_TAG
+    mac_sfn_payload_struct = struct.Struct('!HB')
+
+    def lte_mac_header(self, is_downlink, rnti_type):
+        """Returns the MAC-LTE header up to the SFN and subframe number, built once per direction and RNTI type.
+
+        Parameters:
+        is_downlink (bool): direction of the transport block
+        rnti_type (int): RNTI type field of the log
+        """
+        key = (is_downlink, rnti_type)
+        header = self.mac_headers.get(key)
+        if header is not None:
+            return header
 
         # MAC header required by Wireshark MAC-LTE: radioType, direction, rntiType
         # Additional headers required for each message types
-        mac_hdr = struct.pack('!BBBBHB',
+        header = struct.pack('!BBBB',
             util.mac_lte_radio_types.FDD_RADIO,
             util.mac_lte_direction_types.DIRECTION_DOWNLINK if is_downlink else util.mac_lte_direction_types.DIRECTION_UPLINK,
-            ws_rnti_type,
-            util.mac_lte_tags.MAC_LTE_FRAME_SUBFRAME_TAG,
-            (header['sfn'] << 4) | header['subfn'],
-            util.mac_lte_tags.MAC_LTE_PAYLOAD_TAG)
-
-        gsmtap_hdr = util.create_gsmtap_header(
-            version = 3,
-            payload_type = util.gsmtap_type.LTE_MAC,
-            arfcn = 0,
-            device_sec = ts_sec,
-            device_usec = ts_usec)
-
-        return gsmtap_hdr + mac_hdr + body
-
-    def parse_lte_mac_dl_block(self, pkt_header, pkt_body, args):
+            self.mac_rnti_type_map.get(rnti_type, 0),
+            util.mac_lte_tags.MAC_LTE_FRAME_SUBFRAME_TAG)
+        self.mac_headers[key] = header
+        return header
+
+    def parse_lte_mac_tb(self, pkt_header, pkt_body, is_downlink):
+        """Decodes all transport block samples of a LTE MAC DL/UL Transport Block log in one pass.
+
+        The GSMTAP header is built once per log packet, as all samples share
+        the log timestamp. Returns one GSMTAP MAC-LTE packet per sample.
+
+        Parameters:
+        pkt_header: log header
+        pkt_body (bytes): log body
+        is_downlink (bool): True for 0xB063, False for 0xB064
+        """
         pkt_version = pkt_body[0]
         num_subpacket = pkt_body[1]
         mac_pkts = []
 
         if pkt_version != 0x01:
-            self.parent.logger.log(logging.WARNING, 'Unknown LTE MAC DL transport block packet version 0x{:02x}'.format(pkt_version))
+            self.parent.logger.log(logging.WARNING, 'Unknown LTE MAC {} transport block packet version 0x{:02x}'.format('DL' if is_downlink else 'UL', pkt_version))
             return None
 
+        if is_downlink:
+            tb_subpkt_id = 0x07 # DL Transport Block
+            tb_samples = self.mac_dl_tb_samples
+        else:
+            tb_subpkt_id = 0x08 # UL Transport Block
+            tb_samples = self.mac_ul_tb_samples
+
+        pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
+        gsmtap_hdr = util.create_gsmtap_header(
+            version = 3,
+            payload_type = util.gsmtap_type.LTE_MAC,
+            arfcn = 0,
+            device_sec = calendar.timegm(pkt_ts.timetuple()),
+            device_usec = pkt_ts.microsecond)
+        payload_tag = util.mac_lte_tags.MAC_LTE_PAYLOAD_TAG
+        sfn_payload_struct = self.mac_sfn_payload_struct
+
         pos = 4
         for i in range(num_subpacket):
-            subpkt_mac_struct = namedtuple('QcDiagLteMacSubpkt', 'id version size')
-            subpkt_mac = subpkt_mac_struct._make(struct.unpack('<BBH', pkt_body[pos:pos+4]))
+            subpkt_mac = self.mac_subpkt_header._make(self.mac_subpkt_struct.unpack_from(pkt_body, pos))
             subpkt_body = pkt_body[pos+4:pos+4+subpkt_mac.size]
             pos += subpkt_mac.size
 
-            if subpkt_mac.id == 0x07: # DL Transport Block
-                n_samples = subpkt_body[0]
-                subpkt_mac_dl_tb_struct = namedtuple('QcDiagLteMacSubpktDlTransportBlock', 'sfn_subfn rnti_type harq_id pmch_id dl_tbs rlc_pdus padding header_len')
-                subpkt_mac_dl_tb_struct_v4 = namedtuple('QcDiagLteMacSubpktDlTransportBlockV4', 'subid cellid sfn_subfn rnti_type harq_id pmch_id dl_tbs rlc_pdus padding header_len')
-                subpkt_mac_dl_tb = None
-                mac_hdr = b''
-
-                subpkt_pos = 1
-                for j in range(n_samples):
-                    if subpkt_mac.version == 0x02:
-                        subpkt_mac_dl_tb = subpkt_mac_dl_tb_struct._make(struct.unpack('<HBBHHBHB', subpkt_body[subpkt_pos:subpkt_pos+12]))
-                        mac_hdr = subpkt_body[subpkt_pos+12:subpkt_pos+12+subpkt_mac_dl_tb.header_len]
-                        subpkt_pos += (12 + subpkt_mac_dl_tb.header_len)
-                    elif subpkt_mac.version == 0x04:
-                        subpkt_mac_dl_tb = subpkt_mac_dl_tb_struct_v4._make(struct.unpack('<BBHBBHHBHB', subpkt_body[subpkt_pos:subpkt_pos+14]))
-                        mac_hdr = subpkt_body[subpkt_pos+14:subpkt_pos+14+subpkt_mac_dl_tb.header_len]
-                        subpkt_pos += (14 + subpkt_mac_dl_tb.header_len)
-                    else:
-                        if self.parent:
-                            self.parent.logger.log(logging.WARNING, 'Unexpected MAC DL Subpacket version {}'.format(subpkt_mac.version))
-                            return None
-
-                    sfn = subpkt_mac_dl_tb.sfn_subfn >> 4
-                    subfn = subpkt_mac_dl_tb.sfn_subfn & 0xf
-
-                    pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-                    mac_pkts.append(self.create_lte_mac_gsmtap_packet(pkt_ts, True,
-                        {'sfn': sfn, 'subfn': subfn,
-                        'rnti_type': subpkt_mac_dl_tb.rnti_type, 'harq_id': subpkt_mac_dl_tb.harq_id,
-                        'pmch_id': subpkt_mac_dl_tb.pmch_id, 'dl_tbs': subpkt_mac_dl_tb.dl_tbs,
-                        'rlc_pdus': subpkt_mac_dl_tb.rlc_pdus, 'padding': subpkt_mac_dl_tb.padding},
-                        mac_hdr))
+            if subpkt_mac.id != tb_subpkt_id:
+                continue
 
-        return {'cp': mac_pkts, 'ts': pkt_ts}
+            if not (subpkt_mac.version in tb_samples):
+                if self.parent:
+                    self.parent.logger.log(logging.WARNING, 'Unexpected MAC {} Subpacket version {}'.format('DL' if is_downlink else 'UL', subpkt_mac.version))
+                return None
+            sample_header, sample_struct = tb_samples[subpkt_mac.version]
 
-    def parse_lte_mac_ul_block(self, pkt_header, pkt_body, args):
-        pkt_version = pkt_body[0]
-        num_subpacket = pkt_body[1]
-        mac_pkts = []
+            n_samples = subpkt_body[0]
+            subpkt_pos = 1
+            for j in range(n_samples):
+                sample = sample_header._make(sample_struct.unpack_from(subpkt_body, subpkt_pos))
+                subpkt_pos += sample_struct.size
+                mac_hdr = subpkt_body[subpkt_pos:subpkt_pos+sample.header_len]
+                subpkt_pos += sample.header_len
 
-        if pkt_version != 0x01:
-            self.parent.logger.log(logging.WARNING, 'Unknown LTE MAC DL transport block packet version 0x{:02x}'.format(pkt_version))
-            return None
+                mac_pkts.append(gsmtap_hdr + self.lte_mac_header(is_downlink, sample.rnti_type) +
+                    sfn_payload_struct.pack(sample.sfn_subfn, payload_tag) + mac_hdr)
 
-        pos = 4
-        for i in range(num_subpacket):
-            subpkt_mac_struct = namedtuple('QcDiagLteMacSubpkt', 'id version size')
-            subpkt_mac = subpkt_mac_struct._make(struct.unpack('<BBH', pkt_body[pos:pos+4]))
-            subpkt_body = pkt_body[pos+4:pos+4+subpkt_mac.size]
-            pos += subpkt_mac.size
+        return {'cp': mac_pkts, 'ts': pkt_ts}
 
-            if subpkt_mac.id == 0x08: # UL Transport Block
-                n_samples = subpkt_body[0]
-                subpkt_mac_ul_tb_struct = namedtuple('QcDiagLteMacSubpktUlTransportBlock', 'sfn_subfn rnti_type harq_id grant rlc_pdus padding bsr_event bsr_trig header_len')
-                subpkt_mac_ul_tb_struct_v2 = namedtuple('QcDiagLteMacSubpktUlTransportBlockV4', 'subid cellid harq_id rnti_type sfn_subfn grant rlc_pdus padding bsr_event bsr_trig header_len')
-                subpkt_mac_ul_tb = None
-                mac_hdr = b''
-
-                subpkt_pos = 1
-                for j in range(n_samples):
-                    if subpkt_mac.version == 0x01:
-                        subpkt_mac_ul_tb = subpkt_mac_ul_tb_struct._make(struct.unpack('<HBBHBHBBB', subpkt_body[subpkt_pos:subpkt_pos+12]))
-                        mac_hdr = subpkt_body[subpkt_pos+12:subpkt_pos+12+subpkt_mac_ul_tb.header_len]
-                        subpkt_pos += (12 + subpkt_mac_ul_tb.header_len)
-                    elif subpkt_mac.version == 0x02:
-                        subpkt_mac_ul_tb = subpkt_mac_ul_tb_struct_v2._make(struct.unpack('<BBBBHHBHBBB', subpkt_body[subpkt_pos:subpkt_pos+14]))
-                        mac_hdr = subpkt_body[subpkt_pos+14:subpkt_pos+14+subpkt_mac_ul_tb.header_len]
-                        subpkt_pos += (14 + subpkt_mac_ul_tb.header_len)
-                    else:
-                        if self.parent:
-                            self.parent.logger.log(logging.WARNING, 'Unexpected MAC UL Subpacket version {}'.format(subpkt_mac.version))
-                            return None
-
-                    sfn = subpkt_mac_ul_tb.sfn_subfn >> 4
-                    subfn = subpkt_mac_ul_tb.sfn_subfn & 0xf
-
-                    # BSR Event: {0: None, 1: Periodic, 2: High Data Arrival}
-                    # BSR Trig: {0: No BSR, 3: S-BSR, 4: Pad L-BSR}
-                    pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-                    mac_pkts.append(self.create_lte_mac_gsmtap_packet(pkt_ts, False,
-                        {'sfn': sfn, 'subfn': subfn,
-                        'rnti_type': subpkt_mac_ul_tb.rnti_type, 'harq_id': subpkt_mac_ul_tb.harq_id,
-                        'grant': subpkt_mac_ul_tb.grant, 'rlc_pdus': subpkt_mac_ul_tb.rlc_pdus,
-                        'padding': subpkt_mac_ul_tb.padding},
-                        mac_hdr))
+    def parse_lte_mac_dl_block(self, pkt_header, pkt_body, args):
+        return self.parse_lte_mac_tb(pkt_header, pkt_body, True)
 
-        return {'cp': mac_pkts, 'ts': pkt_ts}
+    def parse_lte_mac_ul_block(self, pkt_header, pkt_body, args):
+        return self.parse_lte_mac_tb(pkt_header, pkt_body, False)
+
+    pdcp_sn_length_map = {
+        0: util.pdcp_sn_length_types.PDCP_SN_LENGTH_5_BITS,
+        1: util.pdcp_sn_length_types.PDCP_SN_LENGTH_7_BITS,
+        2: util.pdcp_sn_length_types.PDCP_SN_LENGTH_12_BITS,
+        3: util.pdcp_sn_length_types.PDCP_SN_LENGTH_15_BITS,
+        4: util.pdcp_sn_length_types.PDCP_SN_LENGTH_18_BITS,
+    }
+
+    def pdcp_lte_header(self, rbid, direction, sn_length, plane=None):
+        """Returns the pdcp-lte UDP header preceding a PDCP PDU, built once per radio bearer, direction and SN length.
+
+        Parameters:
+        rbid (int): radio bearer ID - 1 as in the log, 0 and 1 are SRB1 and SRB2
+        direction (int): util.pdcp_lte_direction_types
+        sn_length (int): SN length field of the log
+        plane (int): util.pdcp_plane_types, None for signaling plane on SRBs and user plane otherwise
+        """
+        key = (rbid, direction, sn_length, plane)
+        header = self.pdcp_headers.get(key)
+        if header is not None:
+            return header
+
+        if plane is None:
+            plane = util.pdcp_plane_types.SIGNALING_PLANE if rbid == 0 or rbid == 1 else util.pdcp_plane_types.USER_PLANE
+
+        # Directly pack PDCP PDU on UDP packet, see epan/packet-pdcp-lte.h of Wireshark
+        # Has header on PDU, CP (0x01), no ROHC
+        ws_hdr = struct.pack('!BBBBBBB',
+            0x00,
+            plane,
+            0x00,
+            util.pdcp_lte_tags.PDCP_LTE_SEQNUM_LENGTH_TAG,
+            self.pdcp_sn_length_map.get(sn_length, sn_length),
+            util.pdcp_lte_tags.PDCP_LTE_DIRECTION_TAG,
+            direction)
+
+        if rbid == 0 or rbid == 1:
+            # SRB1, always DCCH
+            # SRB2, always DCCH
+            ws_hdr += struct.pack('!BB',
+                util.pdcp_lte_tags.PDCP_LTE_LOG_CHAN_TYPE_TAG,
+                util.pdcp_logical_channel_types.Channel_DCCH)
+
+        ws_hdr += struct.pack('!B',
+            util.pdcp_lte_tags.PDCP_LTE_PAYLOAD_TAG)
+        header = b'pdcp-lte' + ws_hdr
+        self.pdcp_headers[key] = header
+        return header
 
     def parse_lte_pdcp_dl_cip(self, pkt_header, pkt_body, args):
         pkt_version = pkt_body[0]
@@ -678,8 +654,6 @@ class DiagLteLogParser:
             radio_id = args['radio_id']
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
         rbid = -1
         pdcp_pkts = []
 
@@ -688,11 +662,12 @@ class DiagLteLogParser:
             # pkt[2:4]: Reserved
             n_subpackets = pkt_body[1]
             pos = 4
+            # PDUs are sliced without copying, each one is copied once after its header
+            pkt_view = memoryview(pkt_body)
 
             for x in range(n_subpackets):
                 subpkt_id, subpkt_version, subpkt_size = struct.unpack('<BBH', pkt_body[pos:pos+4])
-                subpkt = pkt_body[pos:pos+subpkt_size]
-                subpkt = subpkt[4:]
+                subpkt = pkt_view[pos+4:pos+subpkt_size]
 
                 pos += subpkt_size
 
@@ -717,39 +692,7 @@ class DiagLteLogParser:
                             rbid = (pdu_hdr[0] & 0x3e00) >> 9
                             valid = (pdu_hdr[0] & 0x4000) >> 14
 
-                            sn_length_map = {
-                                0: util.pdcp_sn_length_types.PDCP_SN_LENGTH_5_BITS,
-                                1: util.pdcp_sn_length_types.PDCP_SN_LENGTH_7_BITS,
-                                2: util.pdcp_sn_length_types.PDCP_SN_LENGTH_12_BITS,
-                                3: util.pdcp_sn_length_types.PDCP_SN_LENGTH_15_BITS,
-                                4: util.pdcp_sn_length_types.PDCP_SN_LENGTH_18_BITS,
-                            }
-
-                            if sn_length in sn_length_map:
-                                sn_length = sn_length_map[sn_length]
-
-                            # Directly pack PDCP PDU on UDP packet, see epan/packet-pdcp-lte.h of Wireshark
-                            # Has header on PDU, CP (0x01), no ROHC
-                            # Direction: Downlink (0x01)
-                            ws_hdr = struct.pack('!BBBBBBB',
-                                0x00,
-                                util.pdcp_plane_types.SIGNALING_PLANE if rbid == 0 or rbid == 1 else util.pdcp_plane_types.USER_PLANE,
-                                0x00,
-                                util.pdcp_lte_tags.PDCP_LTE_SEQNUM_LENGTH_TAG,
-                                sn_length,
-                                util.pdcp_lte_tags.PDCP_LTE_DIRECTION_TAG,
-                                util.pdcp_lte_direction_types.DIRECTION_DOWNLINK)
-
-                            if rbid == 0 or rbid == 1:
-                                # SRB1, always DCCH
-                                # SRB2, always DCCH
-                                ws_hdr += struct.pack('!BB',
-                                    util.pdcp_lte_tags.PDCP_LTE_LOG_CHAN_TYPE_TAG,
-                                    util.pdcp_logical_channel_types.Channel_DCCH)
-
-                            ws_hdr += struct.pack('!B',
-                                util.pdcp_lte_tags.PDCP_LTE_PAYLOAD_TAG)
-                            self.parent.writer.write_up(b'pdcp-lte' + ws_hdr + pdcp_pdu)
+                            pdcp_pkts.append(self.pdcp_lte_header(rbid, util.pdcp_lte_direction_types.DIRECTION_DOWNLINK, sn_length) + pdcp_pdu)
                             pos_sample += (13 + pdu_hdr[2])
 
                     else:
@@ -769,8 +712,6 @@ class DiagLteLogParser:
             radio_id = args['radio_id']
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
         pdcp_pkts = []
 
         if pkt_version == 1:
@@ -778,11 +719,12 @@ class DiagLteLogParser:
             # pkt[2:4]: Reserved
             n_subpackets = pkt_body[1]
             pos = 4
+            # PDUs are sliced without copying, each one is copied once after its header
+            pkt_view = memoryview(pkt_body)
 
             for x in range(n_subpackets):
                 subpkt_id, subpkt_version, subpkt_size = struct.unpack('<BBH', pkt_body[pos:pos+4])
-                subpkt = pkt_body[pos:pos+subpkt_size]
-                subpkt = subpkt[4:]
+                subpkt = pkt_view[pos+4:pos+subpkt_size]
 
                 pos += subpkt_size
 
@@ -807,39 +749,7 @@ class DiagLteLogParser:
                             rbid = (pdu_hdr[0] & 0x3e00) >> 9
                             valid = (pdu_hdr[0] & 0x4000) >> 14
 
-                            sn_length_map = {
-                                0: util.pdcp_sn_length_types.PDCP_SN_LENGTH_5_BITS,
-                                1: util.pdcp_sn_length_types.PDCP_SN_LENGTH_7_BITS,
-                                2: util.pdcp_sn_length_types.PDCP_SN_LENGTH_12_BITS,
-                                3: util.pdcp_sn_length_types.PDCP_SN_LENGTH_15_BITS,
-                                4: util.pdcp_sn_length_types.PDCP_SN_LENGTH_18_BITS,
-                            }
-
-                            if sn_length in sn_length_map:
-                                sn_length = sn_length_map[sn_length]
-
-                            # Directly pack PDCP PDU on UDP packet, see epan/packet-pdcp-lte.h of Wireshark
-                            # Has header on PDU, CP (0x01), no ROHC
-                            # Direction: Downlink (0x01)
-                            ws_hdr = struct.pack('!BBBBBBB',
-                                0x00,
-                                util.pdcp_plane_types.SIGNALING_PLANE if rbid == 0 or rbid == 1 else util.pdcp_plane_types.USER_PLANE,
-                                0x00,
-                                util.pdcp_lte_tags.PDCP_LTE_SEQNUM_LENGTH_TAG,
-                                sn_length,
-                                util.pdcp_lte_tags.PDCP_LTE_DIRECTION_TAG,
-                                util.pdcp_lte_direction_types.DIRECTION_UPLINK)
-
-                            if rbid == 0 or rbid == 1:
-                                # SRB1, always DCCH
-                                # SRB2, always DCCH
-                                ws_hdr += struct.pack('!BB',
-                                    util.pdcp_lte_tags.PDCP_LTE_LOG_CHAN_TYPE_TAG,
-                                    util.pdcp_logical_channel_types.Channel_DCCH)
-
-                            ws_hdr += struct.pack('!B',
-                                util.pdcp_lte_tags.PDCP_LTE_PAYLOAD_TAG)
-                            pdcp_pkts.append(b'pdcp-lte' + ws_hdr + pdcp_pdu)
+                            pdcp_pkts.append(self.pdcp_lte_header(rbid, util.pdcp_lte_direction_types.DIRECTION_UPLINK, sn_length) + pdcp_pdu)
                             pos_sample += (13 + pdu_hdr[2])
 
                     else:
@@ -871,8 +781,6 @@ class DiagLteLogParser:
             radio_id = args['radio_id']
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
         rbid = -1
         pdcp_pkts = []
 
@@ -881,11 +789,12 @@ class DiagLteLogParser:
             # pkt[2:4]: Reserved
             n_subpackets = pkt_body[1]
             pos = 4
+            # PDUs are sliced without copying, each one is copied once after its header
+            pkt_view = memoryview(pkt_body)
 
             for x in range(n_subpackets):
                 subpkt_id, subpkt_version, subpkt_size = struct.unpack('<BBH', pkt_body[pos:pos+4])
-                subpkt = pkt_body[pos:pos+subpkt_size]
-                subpkt = subpkt[4:]
+                subpkt = pkt_view[pos+4:pos+subpkt_size]
 
                 pos += subpkt_size
 
@@ -922,39 +831,7 @@ class DiagLteLogParser:
                                     self.parent.logger.log(logging.WARNING, 'Unexpected PDCP DL PDU Subpacket version %s' % subpkt_version)
                                 break
 
-                            sn_length_map = {
-                                0: util.pdcp_sn_length_types.PDCP_SN_LENGTH_5_BITS,
-                                1: util.pdcp_sn_length_types.PDCP_SN_LENGTH_7_BITS,
-                                2: util.pdcp_sn_length_types.PDCP_SN_LENGTH_12_BITS,
-                                3: util.pdcp_sn_length_types.PDCP_SN_LENGTH_15_BITS,
-                                4: util.pdcp_sn_length_types.PDCP_SN_LENGTH_18_BITS,
-                            }
-
-                            if sn_length in sn_length_map:
-                                sn_length = sn_length_map[sn_length]
-
-                            # Directly pack PDCP PDU on UDP packet, see epan/packet-pdcp-lte.h of Wireshark
-                            # Has header on PDU, CP (0x01), no ROHC
-                            # Direction: Downlink (0x01)
-                            ws_hdr = struct.pack('!BBBBBBB',
-                                0x00,
-                                util.pdcp_plane_types.SIGNALING_PLANE,
-                                0x00,
-                                util.pdcp_lte_tags.PDCP_LTE_SEQNUM_LENGTH_TAG,
-                                sn_length,
-                                util.pdcp_lte_tags.PDCP_LTE_DIRECTION_TAG,
-                                util.pdcp_lte_direction_types.DIRECTION_DOWNLINK)
-
-                            if rbid == 0 or rbid == 1:
-                                # SRB1, always DCCH
-                                # SRB2, always DCCH
-                                ws_hdr += struct.pack('!BB',
-                                    util.pdcp_lte_tags.PDCP_LTE_LOG_CHAN_TYPE_TAG,
-                                    util.pdcp_logical_channel_types.Channel_DCCH)
-
-                            ws_hdr += struct.pack('!B',
-                                util.pdcp_lte_tags.PDCP_LTE_PAYLOAD_TAG)
-                            pdcp_pkts.append(b'pdcp-lte' + ws_hdr + pdcp_pdu)
+                            pdcp_pkts.append(self.pdcp_lte_header(rbid, util.pdcp_lte_direction_types.DIRECTION_DOWNLINK, sn_length, util.pdcp_plane_types.SIGNALING_PLANE) + pdcp_pdu)
                             pos_sample += (20 + pdu_hdr[2])
 
                     else:
@@ -975,8 +852,6 @@ class DiagLteLogParser:
             radio_id = args['radio_id']
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
         rbid = -1
         pdcp_pkts = []
 
@@ -985,11 +860,12 @@ class DiagLteLogParser:
             # pkt[2:4]: Reserved
             n_subpackets = pkt_body[1]
             pos = 4
+            # PDUs are sliced without copying, each one is copied once after its header
+            pkt_view = memoryview(pkt_body)
 
             for x in range(n_subpackets):
                 subpkt_id, subpkt_version, subpkt_size = struct.unpack('<BBH', pkt_body[pos:pos+4])
-                subpkt = pkt_body[pos:pos+subpkt_size]
-                subpkt = subpkt[4:]
+                subpkt = pkt_view[pos+4:pos+subpkt_size]
 
                 pos += subpkt_size
 
@@ -1026,39 +902,7 @@ class DiagLteLogParser:
                                 self.parent.logger.log(logging.WARNING, 'Unexpected PDCP DL PDU Subpacket version %s' % subpkt_version)
                                 break
 
-                            sn_length_map = {
-                                0: util.pdcp_sn_length_types.PDCP_SN_LENGTH_5_BITS,
-                                1: util.pdcp_sn_length_types.PDCP_SN_LENGTH_7_BITS,
-                                2: util.pdcp_sn_length_types.PDCP_SN_LENGTH_12_BITS,
-                                3: util.pdcp_sn_length_types.PDCP_SN_LENGTH_15_BITS,
-                                4: util.pdcp_sn_length_types.PDCP_SN_LENGTH_18_BITS,
-                            }
-
-                            if sn_length in sn_length_map:
-                                sn_length = sn_length_map[sn_length]
-
-                            # Directly pack PDCP PDU on UDP packet, see epan/packet-pdcp-lte.h of Wireshark
-                            # Has header on PDU, CP (0x01), no ROHC
-                            # Direction: Uplink (0x00)
-                            ws_hdr = struct.pack('!BBBBBBB',
-                                0x00,
-                                util.pdcp_plane_types.SIGNALING_PLANE,
-                                0x00,
-                                util.pdcp_lte_tags.PDCP_LTE_SEQNUM_LENGTH_TAG,
-                                sn_length,
-                                util.pdcp_lte_tags.PDCP_LTE_DIRECTION_TAG,
-                                util.pdcp_lte_direction_types.DIRECTION_UPLINK)
-
-                            if rbid == 0 or rbid == 1:
-                                # SRB1, always DCCH
-                                # SRB2, always DCCH
-                                ws_hdr += struct.pack('!BB',
-                                    util.pdcp_lte_tags.PDCP_LTE_LOG_CHAN_TYPE_TAG,
-                                    util.pdcp_logical_channel_types.Channel_DCCH)
-
-                            ws_hdr += struct.pack('!B',
-                                util.pdcp_lte_tags.PDCP_LTE_PAYLOAD_TAG)
-                            pdcp_pkts.append(b'pdcp-lte' + ws_hdr + pdcp_pdu)
+                            pdcp_pkts.append(self.pdcp_lte_header(rbid, util.pdcp_lte_direction_types.DIRECTION_UPLINK, sn_length, util.pdcp_plane_types.SIGNALING_PLANE) + pdcp_pdu)
                             pos_sample += (16 + pdu_hdr[2])
 
                     else:
@@ -1074,6 +918,9 @@ class DiagLteLogParser:
 
     def parse_lte_mib(self, pkt_header, pkt_body, args):
         pkt_version = pkt_body[0]
+        radio_id = 0
+        if args is not None and 'radio_id' in args:
+            radio_id = args['radio_id']
         prb_to_mhz = {6: 1.4, 15: 3, 25: 5, 50: 10, 75: 15, 100: 20}
 
         item_struct = namedtuple('QcDiagLteMib', 'pci earfcn sfn tx_antenna bandwidth')
@@ -1090,6 +937,18 @@ class DiagLteLogParser:
             self.parent.logger.log(logging.WARNING, 'Unknown LTE MIB packet version 0x{:02x}'.format(pkt_version))
             return None
 
+        repeats = 0
+        if self.parent and self.parent.broadcast_cache is not None:
+            # The frame number changes with every MIB
+            if pkt_version == 17:
+                content = item._replace(sfn=0, sfn_msb4=0, hsfn_lsb2=0)
+            else:
+                content = item._replace(sfn=0)
+            repeats = self.parent.broadcast_cache.check(radio_id, (item.pci, item.earfcn), util.gsmtap_lte_rrc_types.BCCH_BCH,
+                content, util.parse_qxdm_ts_sec(pkt_header.timestamp))
+            if repeats is None:
+                return None
+
         stdout = ''
         if pkt_version == 1 or pkt_version == 2:
             if item.bandwidth in prb_to_mhz:
@@ -1101,6 +960,8 @@ class DiagLteLogParser:
             # MIB for NB-IoT (only 1 PRB)
             stdout = 'LTE MIB-NB Info: EARFCN {}, SFN {:4}, TX antennas {}'.format(item.earfcn, item.sfn, item.tx_antenna)
 
+        if repeats:
+            stdout += ', {} repeats suppressed'.format(repeats)
         return {'stdout': stdout}
 
     def parse_lte_rrc_cell_info(self, pkt_header, pkt_body, args):
@@ -1122,11 +983,12 @@ class DiagLteLogParser:
             return None
 
         if self.parent:
-            self.parent.lte_last_cell_id[radio_id] = item.pci
-            self.parent.lte_last_earfcn_dl[radio_id] = item.dl_earfcn
-            self.parent.lte_last_earfcn_ul[radio_id] = item.ul_earfcn
-            self.parent.lte_last_bw_dl[radio_id] = item.dl_bw
-            self.parent.lte_last_bw_ul[radio_id] = item.ul_bw
+            state = self.parent.radio_states[radio_id]
+            state.lte_cell_id = item.pci
+            state.lte_earfcn_dl = item.dl_earfcn
+            state.lte_earfcn_ul = item.ul_earfcn
+            state.lte_bw_dl = item.dl_bw
+            state.lte_bw_ul = item.ul_bw
 
         bw_str = ''
         if item.dl_bw in prb_to_mhz and item.ul_bw in prb_to_mhz:
@@ -1145,9 +1007,20 @@ class DiagLteLogParser:
                 item.ul_earfcn, item.band, bw_str, item.pci, item.tac, item.cell_id, item.mcc, item.mnc)
         return {'stdout': stdout}
 
+    # Broadcast channels, see BroadcastCache
+    broadcast_rrc_types = frozenset((
+        util.gsmtap_lte_rrc_types.BCCH_BCH,
+        util.gsmtap_lte_rrc_types.BCCH_DL_SCH,
+        util.gsmtap_lte_rrc_types.BCCH_BCH_NB,
+        util.gsmtap_lte_rrc_types.BCCH_DL_SCH_NB,
+    ))
+
     def parse_lte_rrc(self, pkt_header, pkt_body, args):
         pkt_version = pkt_body[0]
         msg_content = b''
+        radio_id = 0
+        if args is not None and 'radio_id' in args:
+            radio_id = args['radio_id']
 
         item_struct = namedtuple('QcDiagLteRrcOtaPacket', 'rrc_rel_maj rrc_rel_min rbid pci earfcn sfn_subfn pdu_num len')
         item_struct_v5 = namedtuple('QcDiagLteRrcOtaPacketV5', 'rrc_rel_maj rrc_rel_min rbid pci earfcn sfn_subfn pdu_num sib_mask len')
@@ -1271,10 +1144,6 @@ class DiagLteLogParser:
                 self.parent.logger.log(logging.DEBUG, util.xxd(pkt_body))
             return None
 
-        pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
-
         if not (item.pdu_num in rrc_subtype_map):
             if self.parent:
                 self.parent.logger.log(logging.WARNING, 'Payload type 0x{:02x} for LTE RRC OTA packet version 0x{:02x} is not known'.format(item.pdu_num, pkt_version))
@@ -1282,6 +1151,17 @@ class DiagLteLogParser:
             return None
         gsmtap_subtype = rrc_subtype_map[item.pdu_num]
 
+        repeats = 0
+        if gsmtap_subtype in self.broadcast_rrc_types and self.parent and self.parent.broadcast_cache is not None:
+            repeats = self.parent.broadcast_cache.check(radio_id, (item.pci, item.earfcn), gsmtap_subtype,
+                msg_content, util.parse_qxdm_ts_sec(pkt_header.timestamp))
+            if repeats is None:
+                return None
+
+        pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
+        ts_sec = calendar.timegm(pkt_ts.timetuple())
+        ts_usec = pkt_ts.microsecond
+
         gsmtap_hdr = util.create_gsmtap_header(
             version = 3,
             payload_type = util.gsmtap_type.LTE_RRC,
@@ -1292,6 +1172,9 @@ class DiagLteLogParser:
             device_sec = ts_sec,
             device_usec = ts_usec)
 
+        if repeats:
+            return {'cp': [gsmtap_hdr + msg_content], 'ts': pkt_ts,
+                'stdout': 'LTE RRC {}: PCI {}, EARFCN {}, {} repeats suppressed'.format(gsmtap_subtype.name, item.pci, item.earfcn, repeats)}
         return {'cp': [gsmtap_hdr + msg_content], 'ts': pkt_ts}
 
     def parse_lte_nas(self, pkt_header, pkt_body, args, plain = False):
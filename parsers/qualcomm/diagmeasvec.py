@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Vectorized decoders of the per-cell records of LTE ML1 measurement logs.
+# Requires NumPy, see DiagLteLogParser for the pure Python fallback.
+
+import struct
+import numpy
+
+import measurements
+
+# LTE ML1 Neighbor Measurements (0xB180): 32 bytes per cell
+ncell_dtype = numpy.dtype({
+    'names': ['val0', 'val1', 'val2', 'val3', 'ant0_offset', 'ant1_offset'],
+    'formats': ['<u4'] * 6,
+    'offsets': [0, 4, 8, 12, 20, 24],
+    'itemsize': 32,
+})
+
+# Header size and EARFCN format of 0xB180 per packet version
+ncell_header = {
+    4: (8, struct.Struct('<BHHH')),
+    5: (12, struct.Struct('<BHLL')),
+}
+
+def scell_meas_dtype(cell_size):
+    # LTE ML1 Serving Cell Measurement Result subpacket: fields common to all versions
+    return numpy.dtype({
+        'names': ['pci_idx', 'sfn', 'val4', 'val5', 'val8', 'val11'],
+        'formats': ['<u2', '<u2', '<u4', '<u4', '<u4', '<u4'],
+        'offsets': [0, 4, 32, 36, 48, 60],
+        'itemsize': cell_size,
+    })
+
+scell_meas_dtypes = {
+    128: scell_meas_dtype(128),
+    140: scell_meas_dtype(140),
+}
+
+def decode_ncells(pkt_body, pos, n_cells):
+    """Decodes the cells of a LTE ML1 Neighbor Measurements log body.
+
+    Returns the per-cell fields of LteNcellMeas after q_rxlevmin, as arrays.
+    """
+    return decode_ncell_records(numpy.frombuffer(pkt_body, dtype=ncell_dtype, count=n_cells, offset=pos))
+
+def decode_ncell_records(cells):
+    val0 = cells['val0']
+    val3 = cells['val3']
+    ant0_offset = cells['ant0_offset']
+    ant1_offset = cells['ant1_offset']
+    return (
+        val0 & 0x1ff, # PCI
+        ((val0 >> 9) & 0x7ff) * 0.0625 - 110, # Measured RSSI
+        (val0 >> 20) * 0.0625 - 180, # Measured RSRP
+        ((cells['val1'] >> 12) & 0xfff) * 0.0625 - 180, # Average RSRP
+        ((cells['val2'] >> 12) & 0x3ff) * 0.0625 - 30, # Measured RSRQ
+        (val3 & 0x3ff) * 0.0625 - 30, # Average RSRQ
+        (val3 >> 20) & 0x3f, # S_rxlev
+        ant0_offset & 0x7ff,
+        ant0_offset >> 11,
+        ant1_offset & 0x7ff,
+        ant1_offset >> 11,
+    )
+
+# Per-cell fields of LteNcellMeas, in the order of decode_ncell_records()
+ncell_cell_fields = measurements.LteNcellMeas._fields[2:]
+
+def decode_ncell_meas_fields(pkt_bodies):
+    # Headers (EARFCN, Q_rxlevmin, number of cells) and per-cell fields of all cells,
+    # of bodies with a known version
+    headers = []
+    cell_bufs = []
+    for pkt_body in pkt_bodies:
+        pos, header_struct = ncell_header[pkt_body[0]]
+        item = header_struct.unpack_from(pkt_body, 1)
+        n_cells = item[3] >> 6
+        # Truncated packets: decode the complete cells only, rather than failing the batch
+        n_cells = min(n_cells, (len(pkt_body) - pos) // 32)
+        headers.append((item[2], item[3] & 0x3f, n_cells))
+        cell_bufs.append(pkt_body[pos:pos + 32 * n_cells])
+    return headers, decode_ncell_records(numpy.frombuffer(b''.join(cell_bufs), dtype=ncell_dtype))
+
+def decode_ncell_meas_columns(pkt_bodies):
+    """Decodes LTE ML1 Neighbor Measurements log bodies of known versions into columns.
+
+    Returns (columns, cells, cell_counts) as taken by MeasurementStore.extend():
+    EARFCN and Q_rxlevmin per body, the per-cell fields of all bodies and the
+    number of cells per body.
+
+    Parameters:
+    pkt_bodies (list): log bodies without the log header
+    """
+    headers, fields = decode_ncell_meas_fields(pkt_bodies)
+    headers = numpy.array(headers, dtype=numpy.int64).reshape(-1, 3)
+    columns = {'earfcn': headers[:, 0], 'q_rxlevmin': headers[:, 1]}
+    return columns, dict(zip(ncell_cell_fields, fields)), headers[:, 2]
+
+def decode_ncell_meas_batch(pkt_bodies):
+    """Decodes LTE ML1 Neighbor Measurements log bodies with one vectorized pass over all cells.
+
+    Returns one LteNcellMeas per body, None for unknown versions. The
+    per-cell fields of the records are views into shared arrays.
+
+    Parameters:
+    pkt_bodies (list): log bodies without the log header
+    """
+    headers, fields = decode_ncell_meas_fields([x for x in pkt_bodies if x[0] in ncell_header])
+
+    result = []
+    headers = iter(headers)
+    pos = 0
+    for pkt_body in pkt_bodies:
+        if pkt_body[0] not in ncell_header:
+            result.append(None)
+            continue
+        earfcn, q_rxlevmin, n_cells = next(headers)
+        result.append(measurements.LteNcellMeas(earfcn, q_rxlevmin, *[x[pos:pos + n_cells] for x in fields]))
+        pos += n_cells
+    return result
+
+def decode_scell_meas_cells(subpkt_body, pos_meas, num_cells, cell_size):
+    """Decodes the cells of a LTE ML1 Serving Cell Measurement Result subpacket.
+
+    Returns the per-cell fields of LteScellMeasResponse after valid_rx, as arrays.
+    """
+    cells = numpy.frombuffer(subpkt_body, dtype=scell_meas_dtypes[cell_size], count=num_cells, offset=pos_meas)
+    pci_idx = cells['pci_idx']
+    sfn = cells['sfn']
+    val8 = cells['val8']
+    return (
+        pci_idx & 0x1ff, # PCI
+        (pci_idx >> 9) & 7, # Serving cell index
+        (pci_idx >> 12) & 1, # Is serving cell
+        sfn & 0x3ff, # SFN
+        (sfn >> 10) & 0xf, # Subframe number
+        (((cells['val4'] >> 12) & 4095) + 640) * 0.0625 - 180.0, # RSRP
+        ((cells['val5'] >> 12) & 4095) * 0.0625 - 180.0, # Filtered RSRP
+        (val8 & 1023) * 0.0625 - 30.0, # RSRQ
+        ((val8 >> 20) & 1023) * 0.0625 - 30.0, # Filtered RSRQ
+        (cells['val11'] & 1023) * 0.0625 - 110.0, # RSSI
+    )
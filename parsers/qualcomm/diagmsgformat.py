@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import re
+import functools
+
+# printf conversion: flags, width, precision, length modifier, conversion
+format_spec_re = re.compile(r'%([-+ #0]*)(\*|\d+)?(?:\.(\*|\d+))?(hh|h|ll|l|L|q|j|z|t)?([diouxXcspeEfgGn%])')
+
+def to_signed(bits):
+    sign = 1 << (bits - 1)
+    mask = (1 << bits) - 1
+    return lambda x: ((x & mask) ^ sign) - sign
+
+def to_unsigned(bits):
+    mask = (1 << bits) - 1
+    return lambda x: x & mask
+
+def to_char(x):
+    return chr(x & 0xff)
+
+def to_pointer(x):
+    # Strings and pointers are passed as target addresses, which can not be dereferenced
+    return '0x{:08x}'.format(x)
+
+def to_alternate(conv, precision, zero_width, bits):
+    # C alternate form: octal gets a leading 0, hex a 0x prefix unless the value is 0.
+    # Python's %#o and %#x differ, so the digits are formatted here.
+    mask = (1 << bits) - 1
+    digits_spec = '%' + ('.' + precision if precision else '') + conv
+    def convert(x):
+        x &= mask
+        digits = digits_spec % x
+        prefix = ''
+        if conv == 'o':
+            if not digits.startswith('0'):
+                digits = '0' + digits
+        elif x != 0:
+            prefix = '0' + conv
+        return prefix + digits.zfill(zero_width - len(prefix))
+    return convert
+
+class MessageFormat:
+    """A printf-style format string of a DIAG F3 message, compiled once.
+
+    The format string is split into a Python %-format template and one
+    converter per argument word, so formatting a message is a single %
+    operation. Every argument is a 32-bit word; 64-bit conversions (%ll,
+    %q, %j) take two words, low word first.
+    """
+    __slots__ = ('fmt', 'template', 'converters', 'num_words', 'word_converters')
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+        template = []
+        # (converter, number of 32-bit words)
+        self.converters = []
+        pos = 0
+
+        for m in format_spec_re.finditer(fmt):
+            template.append(fmt[pos:m.start()].replace('%', '%%'))
+            pos = m.end()
+            flags, width, precision, length, conv = m.groups()
+
+            if conv == '%':
+                template.append('%%')
+                continue
+            if width == '*' or precision == '*':
+                # Width from the argument list: consume it and ignore it
+                self.converters.append((to_unsigned(32), 1, None))
+                width = None if width == '*' else width
+                precision = None if precision == '*' else precision
+
+            if precision and conv in 'diouxX':
+                # C ignores the 0 flag of integer conversions with a precision
+                flags = flags.replace('0', '')
+            spec = '%' + flags + (width if width else '') + ('.' + precision if precision else '')
+            bits = 64 if length in ('ll', 'q', 'j', 'L') else 32
+            words = bits // 32
+
+            if conv in 'di':
+                bits = {'hh': 8, 'h': 16}.get(length, bits)
+                self.converters.append((to_signed(bits), words, True))
+                template.append(spec + 'd')
+            elif conv in 'oxX' and '#' in flags:
+                bits = {'hh': 8, 'h': 16}.get(length, bits)
+                zero_width = int(width) if width and '0' in flags and '-' not in flags else 0
+                self.converters.append((to_alternate(conv, precision, zero_width, bits), words, True))
+                template.append('%' + flags.replace('#', '').replace('0', '') + (width if width else '') + 's')
+            elif conv in 'ouxX':
+                bits = {'hh': 8, 'h': 16}.get(length, bits)
+                # Argument words are already unsigned 32-bit
+                self.converters.append((to_unsigned(bits) if bits != 32 else None, words, True))
+                template.append(spec + ('d' if conv == 'u' else conv))
+            elif conv == 'c':
+                self.converters.append((to_char, 1, True))
+                template.append(spec + 'c')
+            elif conv in 'sp':
+                self.converters.append((to_pointer, 1, True))
+                template.append('%' + flags.replace('#', '').replace('0', '') + (width if width else '') + 's')
+            elif conv in 'eEfgG':
+                # Floating point arguments are not supported by F3 messages, print the raw word
+                self.converters.append((to_unsigned(bits), words, True))
+                template.append('%#x')
+            else:
+                # %n
+                self.converters.append((to_unsigned(32), 1, None))
+
+        template.append(fmt[pos:].replace('%', '%%'))
+        self.template = ''.join(template)
+        self.num_words = sum(x[1] for x in self.converters)
+        # Common case: one word per conversion and no ignored arguments
+        if all(x[1] == 1 and x[2] for x in self.converters):
+            self.word_converters = tuple(x[0] for x in self.converters)
+            if all(x is None for x in self.word_converters):
+                # Only unsigned conversions, the arguments are formatted as they are
+                self.word_converters = ()
+        else:
+            self.word_converters = None
+
+    def format(self, args):
+        """Formats the message with the given 32-bit argument words.
+
+        Missing arguments are substituted by 0, extra ones are ignored.
+        """
+        if len(args) < self.num_words:
+            args = tuple(args) + (0, ) * (self.num_words - len(args))
+        if self.word_converters == ():
+            return self.template % tuple(args[:self.num_words])
+        elif self.word_converters is not None:
+            return self.template % tuple([x if converter is None else converter(x) for converter, x in zip(self.word_converters, args)])
+
+        values = []
+        i = 0
+        for converter, words, used in self.converters:
+            if words == 2:
+                value = args[i] | (args[i + 1] << 32)
+            else:
+                value = args[i]
+            i += words
+            if used:
+                values.append(value if converter is None else converter(value))
+        return self.template % tuple(values)
+
+@functools.lru_cache(maxsize=4096)
+def get_message_format(fmt):
+    """Returns the compiled MessageFormat of a format string, from an LRU cache.
+
+    Parameters:
+    fmt (bytes): format string as sent by the device
+    """
+    return MessageFormat(fmt.decode('utf-8', errors='replace'))
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import os
+import mmap
+import struct
+import logging
+from collections import namedtuple
+
+from .diagmsgformat import MessageFormat
+
+# Index file: header, records sorted by hash, then the string table
+qsr_index_magic = b'SCATQSR1'
+qsr_index_header_struct = struct.Struct('<8sLL')
+# hash, offset of 'format\0file\0' in the string table, line, SSID
+qsr_index_record_struct = struct.Struct('<LLLL')
+
+QsrMessage = namedtuple('QsrMessage', 'msg_hash fmt filename line ssid')
+
+def parse_hash_db_line(line):
+    """Parses a line of a QSR/QSR4 message hash database.
+
+    Lines are either "hash:format" or "hash:ssid:line:file:format", the hash
+    in decimal or 0x-prefixed hex. Empty lines and lines starting with # are
+    skipped. Returns a QsrMessage or None.
+    """
+    line = line.rstrip('\r\n')
+    if len(line) == 0 or line.startswith('#'):
+        return None
+    fields = line.split(':', maxsplit=4)
+    try:
+        msg_hash = int(fields[0], 0)
+    except ValueError:
+        return None
+
+    if len(fields) == 5 and fields[1].isdigit() and fields[2].isdigit():
+        return QsrMessage(msg_hash, fields[4], fields[3], int(fields[2]), int(fields[1]))
+    return QsrMessage(msg_hash, line[len(fields[0]) + 1:], '', 0, 0)
+
+def convert_hash_db(db_fname, index_fname):
+    """Converts a text message hash database into a sorted, memory-mappable index."""
+    messages = {}
+    with open(db_fname, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            msg = parse_hash_db_line(line)
+            if msg is not None:
+                messages[msg.msg_hash & 0xffffffff] = msg
+
+    records = []
+    strings = []
+    str_offset = 0
+    for msg_hash in sorted(messages.keys()):
+        msg = messages[msg_hash]
+        s = msg.fmt.encode('utf-8') + b'\0' + msg.filename.encode('utf-8') + b'\0'
+        records.append(qsr_index_record_struct.pack(msg_hash, str_offset, msg.line, msg.ssid))
+        strings.append(s)
+        str_offset += len(s)
+
+    tmp_fname = index_fname + '.tmp'
+    with open(tmp_fname, 'wb') as f:
+        f.write(qsr_index_header_struct.pack(qsr_index_magic, len(records),
+            qsr_index_header_struct.size + len(records) * qsr_index_record_struct.size))
+        f.write(b''.join(records))
+        f.write(b''.join(strings))
+    os.replace(tmp_fname, index_fname)
+    return len(records)
+
+def default_index_fname(db_fname):
+    return db_fname + '.idx'
+
+class QsrHashIndex:
+    """Message hash lookup for QSR and QSR4 terse F3 messages.
+
+    The text database is converted once into a sidecar index (<db>.idx),
+    which is memory-mapped and binary searched, so that the database is never
+    loaded as a whole. Compiled formats are cached per hash.
+
+    Parameters:
+    fname (str): text hash database, or an index created by convert_hash_db()
+    index_fname (str): index file, defaults to <fname>.idx
+    """
+    def __init__(self, fname, index_fname=None):
+        self.logger = logging.getLogger('scat.qsrhash')
+        self.cache = {}
+
+        with open(fname, 'rb') as f:
+            is_index = f.read(len(qsr_index_magic)) == qsr_index_magic
+        if is_index:
+            index_fname = fname
+        else:
+            if index_fname is None:
+                index_fname = default_index_fname(fname)
+            if not os.path.exists(index_fname) or os.path.getmtime(index_fname) < os.path.getmtime(fname):
+                self.logger.log(logging.INFO, 'Converting message hash database {} to {}'.format(fname, index_fname))
+                convert_hash_db(fname, index_fname)
+
+        self.file = open(index_fname, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.str_base = qsr_index_header_struct.unpack_from(self.map, 0)
+        if magic != qsr_index_magic:
+            raise ValueError('Invalid message hash index {}'.format(index_fname))
+
+    def __len__(self):
+        return self.count
+
+    def find(self, msg_hash):
+        # Binary search of the sorted records, returns the record or None
+        lo = 0
+        hi = self.count
+        base = qsr_index_header_struct.size
+        size = qsr_index_record_struct.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = qsr_index_record_struct.unpack_from(self.map, base + mid * size)
+            if record[0] < msg_hash:
+                lo = mid + 1
+            elif record[0] > msg_hash:
+                hi = mid
+            else:
+                return record
+        return None
+
+    def lookup(self, msg_hash):
+        """Returns (MessageFormat, filename, line, ssid) of the hash, None if unknown."""
+        if msg_hash in self.cache:
+            return self.cache[msg_hash]
+
+        record = self.find(msg_hash)
+        result = None
+        if record is not None:
+            pos = self.str_base + record[1]
+            fmt_end = self.map.find(b'\0', pos)
+            file_end = self.map.find(b'\0', fmt_end + 1)
+            fmt = self.map[pos:fmt_end].decode('utf-8', errors='replace')
+            filename = self.map[fmt_end + 1:file_end]
+            result = (MessageFormat(fmt), filename, record[2], record[3])
+        self.cache[msg_hash] = result
+        return result
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
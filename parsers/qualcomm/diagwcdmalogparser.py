@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import util
+import measurements
 
 import struct
 import calendar
@@ -45,7 +46,6 @@ class DiagWcdmaLogParser:
         pkt_version = (pkt_body[0] >> 6) # upper 2b
         num_wcdma_cells = pkt_body[0] & 0x3f # lower 6b
         num_gsm_cells = pkt_body[1] & 0x3f # lower 6b
-        stdout = ''
 
         cell_search_v0_3g = namedtuple('QcDiagWcdmaSearchCellReselectionV03G',
             'uarfcn psc rscp rank_rscp ecio rank_ecio')
@@ -65,7 +65,10 @@ class DiagWcdmaLogParser:
             self.parent.logger.log(logging.DEBUG, util.xxd(pkt_body))
             return None
 
-        stdout += 'WCDMA Search Cell: {} 3G cells, {} 2G cells\n'.format(num_wcdma_cells, num_gsm_cells)
+        # UARFCN, PSC, RSCP, Rank RSCP, Ec/Io, Rank Ec/Io of 3G cells
+        cells_3g = [[] for x in range(6)]
+        # ARFCN, BSIC, RSSI, Rank of 2G cells
+        cells_2g = [[] for x in range(4)]
         pos = 2
         if pkt_version == 2:
             pos += 5
@@ -81,9 +84,12 @@ class DiagWcdmaLogParser:
                 cell_3g = cell_search_v2_3g._make(struct.unpack('<HHbhbhbhhb', pkt_body[pos:pos+16]))
                 pos += 16
 
-            stdout += 'WCDMA Search Cell: 3G Cell {}: UARFCN {}, PSC {:3d}, RSCP {}, Ec/Io {:.2f}\n'.format(i,
-                    cell_3g.uarfcn, cell_3g.psc,
-                    self.get_real_rscp(cell_3g.rscp), self.get_real_ecio(cell_3g.ecio))
+            cells_3g[0].append(cell_3g.uarfcn)
+            cells_3g[1].append(cell_3g.psc)
+            cells_3g[2].append(self.get_real_rscp(cell_3g.rscp))
+            cells_3g[3].append(cell_3g.rank_rscp)
+            cells_3g[4].append(self.get_real_ecio(cell_3g.ecio))
+            cells_3g[5].append(cell_3g.rank_ecio)
 
         for i in range(num_gsm_cells):
             if pkt_version == 0:
@@ -96,10 +102,14 @@ class DiagWcdmaLogParser:
                 cell_2g = cell_search_v2_2g._make(struct.unpack('<HHbhbhhb', pkt_body[pos:pos+13]))
                 pos += 13
 
-            stdout += 'WCDMA Search Cell: 2G Cell {}: ARFCN {}, RSSI {:.2f}, Rank {}'.format(i,
-                    cell_2g.arfcn & 0xfff, cell_2g.rssi, cell_2g.rank)
+            cells_2g[0].append(cell_2g.arfcn & 0xfff)
+            cells_2g[1].append(cell_2g.bsic)
+            cells_2g[2].append(cell_2g.rssi)
+            cells_2g[3].append(cell_2g.rank)
 
-        return {'stdout': stdout.rstrip()}
+        meas = measurements.WcdmaCellMeas(num_wcdma_cells, num_gsm_cells,
+            *[tuple(x) for x in cells_3g], *[tuple(x) for x in cells_2g])
+        return {'meas': [meas]}
 
     # WCDMA Layer 2
     def parse_wcdma_rlc_dl_am_signaling_pdu(self, pkt_header, pkt_body, args):
@@ -215,13 +225,19 @@ class DiagWcdmaLogParser:
         # UARFCN UL, UARFCN DL, CID, URA_ID, FLAGS, PSC, PLMN_ID, LAC, RAC
         # PSC needs to be >>4'ed
         if self.parent:
-            self.parent.umts_last_uarfcn_ul[radio_id] = item.ul_uarfcn
-            self.parent.umts_last_uarfcn_dl[radio_id] = item.dl_uarfcn
-            self.parent.umts_last_cell_id[radio_id] = psc
+            state = self.parent.radio_states[radio_id]
+            state.umts_uarfcn_ul = item.ul_uarfcn
+            state.umts_uarfcn_dl = item.dl_uarfcn
+            state.umts_cell_id = psc
         return {'stdout': 'WCDMA Cell ID: UARFCN {}/{}, PSC {}, xCID/xLAC/xRAC {:x}/{:x}/{:x}, MCC {}, MNC {}'.format(item.dl_uarfcn,
             item.ul_uarfcn, psc, item.cell_id, item.lac, item.rac,
             binascii.hexlify(item.mcc).decode('utf-8'), binascii.hexlify(item.mnc).decode('utf-8'))}
 
+    # Broadcast channels and system information blocks, see BroadcastCache
+    broadcast_rrc_types = frozenset([util.gsmtap_umts_rrc_types.BCCH_FACH, util.gsmtap_umts_rrc_types.BCCH_BCH,
+        util.gsmtap_umts_rrc_types.SystemInformation_BCH] + [x for x in util.gsmtap_umts_rrc_types
+        if util.gsmtap_umts_rrc_types.MasterInformationBlock <= x <= util.gsmtap_umts_rrc_types.SysInfoTypeSB2])
+
     def parse_wcdma_rrc(self, pkt_header, pkt_body, args):
         item_struct = namedtuple('QcDiagWcdmaRrcOtaPacket', 'channel_type rbid len')
         item = item_struct._make(struct.unpack('<BBH', pkt_body[0:4]))
@@ -341,14 +357,16 @@ class DiagWcdmaLogParser:
         }
 
         if item.channel_type in channel_type_map.keys():
-            arfcn = self.parent.umts_last_uarfcn_dl[radio_id]
+            arfcn = self.parent.radio_states[radio_id].umts_uarfcn_dl
+            psc = self.parent.radio_states[radio_id].umts_cell_id
             if item.channel_type == 0 or item.channel_type == 1:
-                arfcn = self.parent.umts_last_uarfcn_ul[radio_id]
+                arfcn = self.parent.radio_states[radio_id].umts_uarfcn_ul
 
             subtype = channel_type_map[item.channel_type]
             msg_content = pkt_body[4:]
         elif item.channel_type in channel_type_map_extended_type.keys():
-            arfcn = self.parent.umts_last_uarfcn_dl[radio_id]
+            arfcn = self.parent.radio_states[radio_id].umts_uarfcn_dl
+            psc = self.parent.radio_states[radio_id].umts_cell_id
 
             # uint8 subtype, uint8 msg[]
             if pkt_body[4] in sib_type_map.keys():
@@ -378,6 +396,13 @@ class DiagWcdmaLogParser:
             self.parent.logger.log(logging.DEBUG, util.xxd(pkt_body))
             return None
 
+        repeats = 0
+        if subtype in self.broadcast_rrc_types and self.parent and self.parent.broadcast_cache is not None:
+            repeats = self.parent.broadcast_cache.check(radio_id, (psc, arfcn), subtype,
+                msg_content, util.parse_qxdm_ts_sec(pkt_header.timestamp))
+            if repeats is None:
+                return None
+
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
         ts_sec = calendar.timegm(pkt_ts.timetuple())
         ts_usec = pkt_ts.microsecond
@@ -390,4 +415,7 @@ class DiagWcdmaLogParser:
             device_sec = ts_sec,
             device_usec = ts_usec)
 
+        if repeats:
+            return {'cp': [gsmtap_hdr + msg_content], 'ts': pkt_ts,
+                'stdout': 'WCDMA RRC {}: PSC {}, UARFCN {}, {} repeats suppressed'.format(subtype.name, psc, arfcn, repeats)}
         return {'cp': [gsmtap_hdr + msg_content], 'ts': pkt_ts}
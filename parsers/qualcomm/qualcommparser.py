@@ -6,6 +6,11 @@
 # (C) 2013-2016 by Harald Welte <laforge@gnumonks.org>
 
 from . import diagcmd
+from .diagcmdchannel import DiagCommandChannel
+from .diagcapcache import DiagCapabilityCache
+from .diagqsrhash import QsrHashIndex
+from .diagmsgformat import get_message_format
+from .diagclock import DiagDeviceClock
 from .diaggsmlogparser import DiagGsmLogParser
 from .diagwcdmalogparser import DiagWcdmaLogParser
 from .diagumtslogparser import DiagUmtsLogParser
@@ -13,12 +18,11 @@ from .diagltelogparser import DiagLteLogParser
 from .diag1xlogparser import Diag1xLogParser
 from .diagnrlogparser import DiagNrLogParser
 
-from .diagcommoneventparser import DiagCommonEventParser
-from .diaglteeventparser import DiagLteEventParser
-from .diaggsmeventparser import DiagGsmEventParser
-from .diagfallbackeventparser import DiagFallbackEventParser
-
 import util
+import metrics
+import radiostate
+from broadcastcache import BroadcastCache
+import measurements
 import struct
 import datetime
 import logging
@@ -27,31 +31,42 @@ import binascii
 
 class QualcommParser:
     def __init__(self):
-        self.gsm_last_cell_id = [0, 0]
-        self.gsm_last_arfcn = [0, 0]
-
-        self.umts_last_cell_id = [0, 0]
-        self.umts_last_uarfcn_dl = [0, 0]
-        self.umts_last_uarfcn_ul = [0, 0]
-
-        self.lte_last_cell_id = [0, 0]
-        self.lte_last_earfcn_dl = [0, 0]
-        self.lte_last_earfcn_ul = [0, 0]
-        self.lte_last_earfcn_tdd = [0, 0]
-        self.lte_last_sfn = [0, 0]
-        self.lte_last_tx_ant = [0, 0]
-        self.lte_last_bw_dl = [0, 0]
-        self.lte_last_bw_ul = [0, 0]
-        self.lte_last_band_ind = [0, 0]
-        self.lte_last_tcrnti = [1, 1]
+        # Number of radios (SIMs or subscriptions), larger multi-SIM radio IDs are mapped to the last one
+        self.max_radios = 2
+        # Last serving cell per radio, see radiostate.RadioState
+        self.radio_states = radiostate.RadioStates(self.max_radios)
+        # Device time per radio, see DiagDeviceClock
+        self.device_clock = [DiagDeviceClock() for x in range(self.max_radios)]
+        # Suppresses repeated MIB/SIBs if set, see BroadcastCache
+        self.broadcast_cache = None
 
         self.io_device = None
         self.writer = None
         self.parse_msgs = False
         self.parse_events = False
+        # Print measurement records as text
+        self.meas_stdout = True
+        # measstore.MeasurementStore receiving the measurement records
+        self.meas_store = None
+        # Batch size of the fixed-size measurement logs, 0 to decode each log with its handler
+        self.meas_batch_size = 0
+        # diagbatch.DiagBatchDecoder, when batch decoding into the measurement store
+        self.meas_batch = None
         self.qsr_hash_filename = ''
         self.qsr4_hash_filename = ''
+        # QsrHashIndex, opened on the first QSR/QSR4 message
+        self.qsr_hash = None
+        self.qsr4_hash = None
         self.emr_id_range = []
+        # Last log item per equipment ID supported by the device, empty if unknown
+        self.log_id_range = {}
+        # Response timeout of DIAG commands in seconds
+        self.command_timeout = 1.0
+        # Capabilities of the connected device, see init_diag()
+        self.capability_cache = None
+        self.invalidate_capability_cache = False
+        self.device_id = None
+        self.capabilities = None
 
         self.name = 'qualcomm'
         self.shortname = 'qc'
@@ -71,19 +86,24 @@ class QualcommParser:
             except AttributeError:
                 pass
 
-        self.diag_event_parsers = [DiagCommonEventParser(self),
-            DiagGsmEventParser(self), DiagLteEventParser(self)]
-        self.diag_fallback_event_parser = DiagFallbackEventParser(self)
-
+        self.metric_frames = metrics.registry.counter('scat_frames_total', 'Frames read from the baseband', parser=self.shortname)
+        self.metric_crc_errors = metrics.registry.counter('scat_crc_errors_total', 'Frames with a CRC mismatch', parser=self.shortname)
+        self.metric_length_errors = metrics.registry.counter('scat_length_errors_total', 'Packets with a length mismatch', parser=self.shortname)
+        # Log ID -> per-RAT message counter
+        self.metric_rat_messages = { }
+        for p, rat in zip(self.diag_log_parsers, ('gsm', 'wcdma', 'umts', 'lte', '1x', 'nr')):
+            counter = metrics.registry.counter('scat_messages_total', 'Decoded messages per RAT', parser=self.shortname, rat=rat)
+            for log_id in p.process.keys():
+                self.metric_rat_messages[log_id] = counter
+
+        # Event parsers are loaded when event decoding is enabled, see init_event_parsers()
+        self.diag_event_parsers = None
+        self.diag_fallback_event_parser = None
         self.process_event = { }
         self.no_process_event = { }
-
-        for p in self.diag_event_parsers:
-            self.process_event.update(p.process)
-            try:
-                self.no_process_event.update(p.no_process)
-            except AttributeError:
-                pass
+        # Event ID -> (handler, name, suppressed), see build_event_dispatch()
+        self.event_dispatch = None
+        self.profiler = None
 
     def set_io_device(self, io_device):
         self.io_device = io_device
@@ -96,120 +116,283 @@ class QualcommParser:
             if p == 'log_level':
                 self.logger.setLevel(params[p])
             elif p == 'qsr-hash':
-                self.qsr_hash_filename = params[p]
-                self.parse_msgs = True
+                if params[p]:
+                    self.qsr_hash_filename = params[p]
+                    self.parse_msgs = True
             elif p == 'qsr4-hash':
-                self.qsr4_hash_filename = params[p]
-                self.parse_msgs = True
+                if params[p]:
+                    self.qsr4_hash_filename = params[p]
+                    self.parse_msgs = True
             elif p == 'events':
                 self.parse_events = params[p]
+                if self.parse_events:
+                    self.init_event_parsers()
             elif p == 'msgs':
-                self.parse_msgs = params[p]
+                # A QSR/QSR4 hash file implies decoding the messages, regardless of the order of the parameters
+                self.parse_msgs = bool(params[p] or self.qsr_hash_filename or self.qsr4_hash_filename)
+            elif p == 'meas-stdout':
+                self.meas_stdout = params[p]
+            elif p == 'meas-store':
+                self.meas_store = params[p]
+            elif p == 'meas-batch':
+                self.meas_batch_size = params[p]
+            elif p == 'profiler':
+                self.set_profiler(params[p])
+            elif p == 'capability-cache':
+                self.capability_cache = DiagCapabilityCache(params[p]) if params[p] else None
+            elif p == 'invalidate-capability-cache':
+                self.invalidate_capability_cache = params[p]
+            elif p == 'max-radios':
+                self.set_max_radios(params[p])
+            elif p == 'radio-states':
+                self.radio_states.restore(params[p])
+                self.set_max_radios(max(self.max_radios, len(self.radio_states)))
+            elif p == 'broadcast-window':
+                self.set_broadcast_window(params[p])
+
+        if self.meas_batch is None and self.meas_batch_size > 0 and self.meas_store is not None:
+            from .diagbatch import DiagBatchDecoder
+            self.meas_batch = DiagBatchDecoder(self.meas_store, self.meas_batch_size)
+
+    def set_max_radios(self, max_radios):
+        if max_radios < 1:
+            raise ValueError('At least one radio is required, got {}'.format(max_radios))
+        self.max_radios = max_radios
+        self.radio_states.resize(max_radios)
+        del self.radio_states[max_radios:]
+        while len(self.device_clock) < max_radios:
+            self.device_clock.append(DiagDeviceClock())
+        del self.device_clock[max_radios:]
+
+    def set_broadcast_window(self, window):
+        if window > 0:
+            self.broadcast_cache = BroadcastCache(window,
+                metric=metrics.registry.counter('scat_broadcast_suppressed_total', 'Repeated broadcast messages suppressed', parser=self.shortname))
+        else:
+            self.broadcast_cache = None
+
+    def flush_meas_batch(self):
+        if self.meas_batch is not None:
+            self.meas_batch.flush()
+
+    def set_profiler(self, profiler):
+        self.profiler = profiler
+        profiler.instrument_table(self.process, 'log')
+        if self.diag_event_parsers is not None:
+            self.instrument_event_parsers()
+
+    def instrument_event_parsers(self):
+        self.profiler.instrument_table(self.process_event, 'event', '{}')
+        fallback = self.diag_fallback_event_parser
+        fallback.parse_event_fallback = self.profiler.wrap('event fallback', fallback.parse_event_fallback)
+        self.build_event_dispatch()
+
+    def init_event_parsers(self):
+        # The fallback parser carries names of ~1,600 events, only import it when needed
+        if self.diag_event_parsers is not None:
+            return
+
+        from .diagcommoneventparser import DiagCommonEventParser
+        from .diaglteeventparser import DiagLteEventParser
+        from .diaggsmeventparser import DiagGsmEventParser
+        from .diagfallbackeventparser import DiagFallbackEventParser
+
+        self.diag_event_parsers = [DiagCommonEventParser(self),
+            DiagGsmEventParser(self), DiagLteEventParser(self)]
+        self.diag_fallback_event_parser = DiagFallbackEventParser(self)
+
+        for p in self.diag_event_parsers:
+            self.process_event.update(p.process)
+            try:
+                self.no_process_event.update(p.no_process)
+            except AttributeError:
+                pass
+
+        if self.profiler is not None:
+            self.instrument_event_parsers()
+        else:
+            self.build_event_dispatch()
+
+    def build_event_dispatch(self):
+        # One entry per 12-bit event ID, so that decoding an event is a single list index.
+        # Suppressed events have no handler, unknown events go to the fallback parser.
+        fallback = self.diag_fallback_event_parser
+        self.event_dispatch = [(fallback.parse_event_fallback, fallback.event_names.get(x), False) for x in range(0x1000)]
+        for event_id in self.no_process_event.keys():
+            self.event_dispatch[event_id & 0xfff] = (None, self.no_process_event[event_id], True)
+        for event_id in self.process_event.keys():
+            self.event_dispatch[event_id & 0xfff] = (self.process_event[event_id][0], self.process_event[event_id][1], False)
 
     def sanitize_radio_id(self, radio_id):
         if radio_id <= 0:
             return 0
-        elif radio_id > 2:
-            return 1
+        elif radio_id > self.max_radios:
+            return self.max_radios - 1
         else:
             return (radio_id - 1)
 
-    def init_diag(self):
-        self.logger.log(logging.INFO, 'Initializing diag')
-        # Disable static event reporting
-        self.io_device.read(0x1000)
-
-        self.io_device.write(util.generate_packet(struct.pack('<B', diagcmd.DIAG_VERNO_F)), False)
-        ver_buf = self.io_device.read(0x1000)
-        result = self.parse_diag(ver_buf[:-1])
-        if result:
-            self.postprocess_parse_result(result)
-
-        self.io_device.write(util.generate_packet(struct.pack('<B', diagcmd.DIAG_EXT_BUILD_ID_F)), False)
-        build_id_buf = self.io_device.read(0x1000)
-        result = self.parse_diag(build_id_buf[:-1])
+    # SSID ranges used when the device does not report its extended message ranges
+    default_emr_id_range = [
+        (0x0000, 0x0065),
+        (0x01f4, 0x01fa),
+        (0x03e8, 0x033f),
+        (0x07d0, 0x07d8),
+        (0x0bb8, 0x0bc6),
+        (0x0fa0, 0x0faa),
+        (0x1194, 0x11ae),
+        (0x11f8, 0x1206),
+        (0x1388, 0x13a6),
+        (0x157c, 0x158c),
+        (0x1770, 0x17c0),
+        (0x1964, 0x1979),
+        (0x1b58, 0x1b5b),
+        (0x1bbc, 0x1bc7),
+        (0x1c20, 0x1c21),
+        (0x1f40, 0x1f40),
+        (0x2134, 0x214c),
+        (0x2328, 0x2330),
+        (0x251c, 0x2525),
+        (0x27d8, 0x27e2),
+        (0x280b, 0x280f),
+        (0x283c, 0x283c),
+        (0x286e, 0x2886),
+    ]
+
+    def open_command_channel(self):
+        return DiagCommandChannel(self.io_device, self.logger, self.command_timeout)
+
+    def process_command_response(self, cmd):
+        # Parses the response of a DiagCommand and prints it like any other parse result
+        if cmd.response is None:
+            return None
+        result = self.parse_diag(cmd.response, hdlc_encoded=False, check_crc=False)
         if result:
             self.postprocess_parse_result(result)
+        return result
 
-        self.io_device.write_then_read_discard(util.generate_packet(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x00)), 0x1000, False)
+    def init_diag(self):
+        self.logger.log(logging.INFO, 'Initializing diag')
 
-        self.io_device.write(util.generate_packet(struct.pack('<LL', diagcmd.DIAG_LOG_CONFIG_F, diagcmd.LOG_CONFIG_RETRIEVE_ID_RANGES_OP)), False)
-        log_config_buf = self.io_device.read(0x1000)
-        result = self.parse_diag(log_config_buf[:-1])
-        if result:
-            self.postprocess_parse_result(result)
+        with self.open_command_channel() as channel:
+            ver_cmd = channel.send(struct.pack('<B', diagcmd.DIAG_VERNO_F), 'version')
+            build_id_cmd = channel.send(struct.pack('<B', diagcmd.DIAG_EXT_BUILD_ID_F), 'build ID')
+            # Disable static event reporting
+            channel.send(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x00), 'event report disable')
+
+            # Send empty masks
+            for name, mask in (('1x', diagcmd.log_mask_empty_1x()), ('WCDMA', diagcmd.log_mask_empty_wcdma()),
+                    ('GSM', diagcmd.log_mask_empty_gsm()), ('UMTS', diagcmd.log_mask_empty_umts()),
+                    ('DTV', diagcmd.log_mask_empty_dtv()), ('LTE', diagcmd.log_mask_empty_lte()),
+                    ('TD-SCDMA', diagcmd.log_mask_empty_tdscdma())):
+                channel.send(mask, '{} log mask clear'.format(name))
+            channel.wait()
+
+            self.process_command_response(ver_cmd)
+            self.process_command_response(build_id_cmd)
+
+            self.device_id = None
+            self.capabilities = None
+            if self.capability_cache is not None and ver_cmd.response is not None and build_id_cmd.response is not None:
+                self.device_id = (ver_cmd.response, build_id_cmd.response)
+                if self.invalidate_capability_cache:
+                    self.capability_cache.invalidate(*self.device_id)
+                else:
+                    self.capabilities = self.capability_cache.get(*self.device_id)
+
+            if self.capabilities is not None:
+                self.logger.log(logging.INFO, 'Using cached DIAG capabilities, skipping discovery')
+                self.emr_id_range = [tuple(x) for x in self.capabilities['emr_id_range']]
+                self.log_id_range = {x[0]: x[1] for x in self.capabilities['log_id_range']}
+                if not self.clear_ext_msg_masks(channel):
+                    self.logger.log(logging.WARNING, 'Device rejected cached DIAG capabilities, discovering again')
+                    self.capability_cache.invalidate(*self.device_id)
+                    self.capabilities = None
+
+            if self.capabilities is None:
+                self.discover_capabilities(channel)
+                self.clear_ext_msg_masks(channel)
+                self.store_capabilities()
+
+    def discover_capabilities(self, channel):
+        log_config_cmd = channel.send(struct.pack('<LL', diagcmd.DIAG_LOG_CONFIG_F, diagcmd.LOG_CONFIG_RETRIEVE_ID_RANGES_OP), 'log ID ranges')
+        ext_msg_cmd = channel.send(struct.pack('<BB', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x01), 'extended message ranges')
+        channel.wait([log_config_cmd, ext_msg_cmd])
+
+        self.process_command_response(log_config_cmd)
+        log_id_range = []
+        if log_config_cmd.response is not None:
+            # Last item ID per equipment ID, see parse_diag_log_config()
+            ranges = log_config_cmd.response[12:]
+            for i in range(len(ranges) // 4):
+                val = struct.unpack('<L', ranges[4*i:4*(i+1)])[0]
+                if val > 0:
+                    log_id_range.append((i, val))
+        self.log_id_range = dict(log_id_range)
+        result = self.process_command_response(ext_msg_cmd)
+        self.emr_id_range = result['id_range'] if result and 'id_range' in result else []
 
-        # Send empty masks
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_1x()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_wcdma()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_gsm()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_umts()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_dtv()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_lte()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_tdscdma()), 0x1000, False)
-
-        self.io_device.write(util.generate_packet(struct.pack('<BB', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x01)), False)
-        ext_msg_buf = self.io_device.read(0x1000)
-        result = self.parse_diag(ext_msg_buf[:-1])
-        if result:
-            self.postprocess_parse_result(result)
+        if log_config_cmd.response is not None and ext_msg_cmd.response is not None:
+            self.capabilities = {'log_id_range': log_id_range, 'emr_id_range': self.emr_id_range, 'emr_level': None}
 
-        emr = lambda x, y: diagcmd.create_extended_message_config_set_mask(x, y)
-        if 'id_range' in result:
-            self.emr_id_range = result['id_range']
-            for x in result['id_range']:
-                self.io_device.write_then_read_discard(util.generate_packet(emr(x[0], x[1])), 0x1000, False)
-        else:
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x0000, 0x0065)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x01f4, 0x01fa)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x03e8, 0x033f)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x07d0, 0x07d8)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x0bb8, 0x0bc6)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x0fa0, 0x0faa)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1194, 0x11ae)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x11f8, 0x1206)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1388, 0x13a6)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x157c, 0x158c)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1770, 0x17c0)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1964, 0x1979)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1b58, 0x1b5b)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1bbc, 0x1bc7)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1c20, 0x1c21)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1f40, 0x1f40)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x2134, 0x214c)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x2328, 0x2330)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x251c, 0x2525)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x27d8, 0x27e2)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x280b, 0x280f)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x283c, 0x283c)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x286e, 0x2886)), 0x1000, False)
+    def store_capabilities(self):
+        if self.capability_cache is None or self.device_id is None or self.capabilities is None:
+            return
+        self.capability_cache.put(self.device_id[0], self.device_id[1], self.capabilities)
+        try:
+            self.capability_cache.save()
+        except OSError as e:
+            self.logger.log(logging.WARNING, 'Cannot store DIAG capability cache: {}'.format(e))
+
+    def clear_ext_msg_masks(self, channel):
+        # Returns False if the device rejected any of the SSID ranges
+        id_range = self.emr_id_range if len(self.emr_id_range) > 0 else self.default_emr_id_range
+        cmds = []
+        for x in id_range:
+            cmds.append(channel.send(diagcmd.create_extended_message_config_set_mask(x[0], x[1]),
+                'extended message mask clear {}-{}'.format(x[0], x[1])))
+        failed = channel.wait(cmds)
+        return not any(cmd.error_code is not None for cmd in failed)
 
     def prepare_diag(self):
         self.logger.log(logging.INFO, 'Starting diag')
 
-        emr_level_range = []
-        if self.parse_msgs:
-            if len(self.emr_id_range) > 0:
-                for x in self.emr_id_range:
-                    self.io_device.write(util.generate_packet(struct.pack('<BBHH', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x02, x[0], x[1])), False)
-                    ext_msg_level_buf = self.io_device.read(0x1000)
-                    result = self.parse_diag(ext_msg_level_buf[:-1])
-                    if result:
-                        self.postprocess_parse_result(result)
-                    emr_level_range.append((result['start'], result['end'], result['level']))
-
-            if len(emr_level_range) > 0:
-                for x in emr_level_range:
-                    self.io_device.write_then_read_discard(util.generate_packet(diagcmd.create_extended_message_config_set_mask(x[0], x[1], *x[2])), 0x1000, False)
-
-        # Static event reporting Enable
-        self.io_device.write_then_read_discard(util.generate_packet(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x01)), 0x1000, False)
-
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_scat_1x()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_scat_wcdma()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_scat_gsm()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_scat_umts()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_scat_lte()), 0x1000, False)
+        with self.open_command_channel() as channel:
+            if self.parse_msgs and len(self.emr_id_range) > 0:
+                if self.capabilities is not None and self.capabilities['emr_level'] is not None:
+                    emr_level = [(x[0], x[1], [tuple(y) for y in x[2]]) for x in self.capabilities['emr_level']]
+                else:
+                    level_cmds = []
+                    for x in self.emr_id_range:
+                        level_cmds.append(channel.send(struct.pack('<BBHH', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x02, x[0], x[1]),
+                            'extended message levels {}-{}'.format(x[0], x[1])))
+                    channel.wait(level_cmds)
+
+                    emr_level = []
+                    for cmd in level_cmds:
+                        result = self.process_command_response(cmd)
+                        if result and 'level' in result:
+                            emr_level.append((result['start'], result['end'], result['level']))
+                    if self.capabilities is not None and len(emr_level) == len(level_cmds):
+                        self.capabilities['emr_level'] = emr_level
+                        self.store_capabilities()
+
+                for x in emr_level:
+                    channel.send(diagcmd.create_extended_message_config_set_mask(x[0], x[1], *x[2]),
+                        'extended message mask {}-{}'.format(x[0], x[1]))
+
+            # Static event reporting Enable
+            channel.send(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x01), 'event report enable')
+
+            for name, mask in (('1x', diagcmd.log_mask_scat_1x()), ('WCDMA', diagcmd.log_mask_scat_wcdma()),
+                    ('GSM', diagcmd.log_mask_scat_gsm()), ('UMTS', diagcmd.log_mask_scat_umts()),
+                    ('LTE', diagcmd.log_mask_scat_lte())):
+                # Skip equipment IDs without log items on the device, if its log ID ranges are known
+                equip_id = struct.unpack('<L', mask[8:12])[0]
+                if len(self.log_id_range) > 0 and self.log_id_range.get(equip_id, 0) == 0:
+                    self.logger.log(logging.INFO, 'Device has no {} log items, skipping log mask'.format(name))
+                    continue
+                channel.send(mask, '{} log mask'.format(name))
+            channel.wait()
 
     def parse_diag(self, pkt, hdlc_encoded = True, check_crc = True, args = None):
         # Should contain DIAG command and CRC16
@@ -228,6 +411,7 @@ class QualcommParser:
             crc = util.dm_crc16(pkt[:-2])
             crc_pkt = (pkt[-1] << 8) | pkt[-2]
             if crc != crc_pkt:
+                self.metric_crc_errors.value += 1
                 self.logger.log(logging.WARNING, "CRC mismatch: expected 0x{:04x}, got 0x{:04x}".format(crc, crc_pkt))
                 self.logger.log(logging.DEBUG, util.xxd(pkt))
             pkt = pkt[:-2]
@@ -235,7 +419,7 @@ class QualcommParser:
         if pkt[0] == diagcmd.DIAG_LOG_F:
             return self.parse_diag_log(pkt, args)
         elif pkt[0] == diagcmd.DIAG_EVENT_REPORT_F and self.parse_events:
-            return self.parse_diag_event(pkt)
+            return self.parse_diag_event(pkt, args)
         elif pkt[0] == diagcmd.DIAG_EXT_MSG_F and self.parse_msgs:
             return self.parse_diag_ext_msg(pkt)
         elif pkt[0] == diagcmd.DIAG_QSR_EXT_MSG_TERSE_F and self.parse_msgs:
@@ -279,6 +463,7 @@ class QualcommParser:
                 for pkt in buf_atom:
                     if len(pkt) == 0:
                         continue
+                    self.metric_frames.value += 1
                     parse_result = self.parse_diag(pkt)
 
                     if writer_qmdl:
@@ -291,12 +476,14 @@ class QualcommParser:
             return
 
     def stop_diag(self):
-        self.io_device.read(0x1000)
         self.logger.log(logging.INFO, 'Stopping diag')
-        # Static event reporting Disable
-        self.io_device.write_then_read_discard(util.generate_packet(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x00)), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(struct.pack('<LL', diagcmd.DIAG_LOG_CONFIG_F, diagcmd.LOG_CONFIG_DISABLE_OP)), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(struct.pack('<BBHHH', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x05, 0x0000, 0x0000, 0x0000)), 0x1000, False)
+        self.flush_meas_batch()
+        with self.open_command_channel() as channel:
+            # Static event reporting Disable
+            channel.send(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x00), 'event report disable')
+            channel.send(struct.pack('<LL', diagcmd.DIAG_LOG_CONFIG_F, diagcmd.LOG_CONFIG_DISABLE_OP), 'log mask disable')
+            channel.send(struct.pack('<BBHHH', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x05, 0x0000, 0x0000, 0x0000), 'extended message disable')
+            channel.wait()
 
     def parse_dlf(self):
         oldbuf = b''
@@ -362,6 +549,20 @@ class QualcommParser:
             if parse_result is not None:
                 self.postprocess_parse_result(parse_result)
 
+    def run_indexed(self, records, writer_qmdl = None):
+        # Parses only the frames referenced by the DumpIndex records of the current dump file
+        for x in records:
+            buf = self.io_device.read_at(x.offset, x.length)
+            if len(buf) < 2:
+                continue
+            if writer_qmdl:
+                writer_qmdl.write_cp(buf)
+
+            parse_result = self.parse_diag(buf[:-1])
+            if parse_result is not None:
+                self.postprocess_parse_result(parse_result)
+        self.flush_meas_batch()
+
     def read_dump(self):
         while self.io_device.file_available:
             self.logger.log(logging.INFO, "Reading from {}".format(self.io_device.fname))
@@ -375,6 +576,7 @@ class QualcommParser:
                 self.logger.log(logging.INFO, 'Unknown baseband dump type, assuming QMDL')
                 self.run_diag()
             self.io_device.open_next_file()
+        self.flush_meas_batch()
 
     def postprocess_parse_result(self, parse_result):
         if 'radio_id' in parse_result:
@@ -385,7 +587,7 @@ class QualcommParser:
         if 'ts' in parse_result:
             ts = parse_result['ts']
         else:
-            ts = datetime.datetime.now()
+            ts = self.device_time(radio_id)
 
         if 'cp' in parse_result:
             for sock_content in parse_result['cp']:
@@ -400,6 +602,30 @@ class QualcommParser:
                 for l in parse_result['stdout'].split('\n'):
                     print('Radio {}: {}'.format(radio_id, l))
 
+        if 'meas' in parse_result:
+            if self.meas_store is not None:
+                for meas in parse_result['meas']:
+                    self.meas_store.append(meas, radio_id, ts)
+            if self.meas_stdout:
+                for meas in parse_result['meas']:
+                    meas_text = measurements.format_meas(meas)
+                    if len(meas_text) > 0:
+                        for l in meas_text.split('\n'):
+                            print('Radio {}: {}'.format(radio_id, l))
+
+    def device_time(self, radio_id):
+        # Last device time of the radio, or of another radio before the first timestamp of this one.
+        # The wall clock is only used before any timestamp was received.
+        ts = self.device_clock[radio_id].now()
+        if ts is None:
+            for clock in self.device_clock:
+                ts = clock.now()
+                if ts is not None:
+                    break
+        if ts is None:
+            ts = datetime.datetime.now()
+        return ts
+
     log_header = namedtuple('QcDiagLogHeader', 'cmd_code reserved length1 length2 log_id timestamp')
 
     def parse_diag_log(self, pkt, args=None):
@@ -414,11 +640,18 @@ class QualcommParser:
 
         pkt_header = self.log_header._make(struct.unpack('<BBHHHQ', pkt[0:16]))
         pkt_body = pkt[16:]
+        radio_id = args['radio_id'] if args and 'radio_id' in args else 0
+        self.device_clock[radio_id].update(pkt_header.timestamp)
 
         if len(pkt_body) != (pkt_header.length2 - 12):
+            self.metric_length_errors.value += 1
             self.logger.log(logging.WARNING, "Packet length mismatch: expected {}, got {}".format(pkt_header.length2, len(pkt_body)+12))
 
         if pkt_header.log_id in self.process.keys():
+            self.metric_rat_messages[pkt_header.log_id].value += 1
+            if self.meas_batch is not None and pkt_header.log_id in self.meas_batch.log_ids:
+                if self.meas_batch.add(pkt_header.log_id, pkt_header.timestamp, pkt_body, radio_id):
+                    return None
             return self.process[pkt_header.log_id](pkt_header, pkt_body, args)
         elif pkt_header.log_id in self.no_process.keys():
             #print("Not handling XDM Header 0x%04x (%s)" % (xdm_hdr[1], self.no_process[xdm_hdr[1]]))
@@ -441,6 +674,8 @@ class QualcommParser:
         # Message: two null-terminated strings, one for log and another for filename
         pkt_header = self.ext_msg_header._make(struct.unpack('<BBBBQHHL', pkt[0:20]))
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
+        num_args = min(pkt_header.num_args, (len(pkt) - 20) // 4)
+        args = struct.unpack('<{}L'.format(num_args), pkt[20:20 + 4 * num_args])
         pkt_body = pkt[20 + 4 * pkt_header.num_args:]
         pkt_body = pkt_body.rstrip(b'\0').rsplit(b'\0', maxsplit=1)
 
@@ -451,6 +686,9 @@ class QualcommParser:
             src_fname = b''
             log_content = pkt_body[0]
 
+        # Format strings repeat at high rate, compile each one only once
+        log_content = get_message_format(log_content).format(args).encode('utf-8', errors='replace')
+
         osmocore_log_hdr = util.create_osmocore_logging_header(
             timestamp = pkt_ts,
             subsys_name = str(pkt_header.message_subsys_id).encode('utf-8'),
@@ -487,86 +725,154 @@ class QualcommParser:
         return ret
 
     event_header = namedtuple('QcDiagEventHeader', 'cmd_code msg_len')
+    event_id_struct = struct.Struct('<H')
+    event_ts_struct = struct.Struct('<Q')
 
-    def parse_diag_event(self, pkt):
+    def parse_diag_event(self, pkt, args=None):
         """Parses the DIAG_EVENT_REPORT_F packet.
 
         Parameters:
         pkt (bytes): DIAG_EVENT_REPORT_F data without trailing CRC
+        args (dict): 'radio_id' (int): used SIM or subscription ID on multi-SIM devices
         """
+        if self.diag_event_parsers is None:
+            self.init_event_parsers()
         pkt_header = self.event_header._make(struct.unpack('<BH', pkt[0:3]))
+        event_dispatch = self.event_dispatch
+        unpack_eid = self.event_id_struct.unpack_from
+        unpack_ts = self.event_ts_struct.unpack_from
 
+        # Events are decoded in place, only pascal string payloads are copied
+        view = memoryview(pkt)
         pos = 3
+        pkt_len = len(view)
         event_pkts = []
-        ts = datetime.datetime.now()
-        while pos < len(pkt):
+        radio_id = args['radio_id'] if args and 'radio_id' in args else 0
+        clock = self.device_clock[radio_id]
+        ts = None
+        while pos < pkt_len:
             # id 12b, _pad 1b, payload_len 2b, ts_trunc 1b
-            _eid = struct.unpack('<H', pkt[pos:pos+2])[0]
-            event_id = _eid & 0xfff
+            _eid = unpack_eid(view, pos)[0]
+            handler, _, suppressed = event_dispatch[_eid & 0xfff]
             payload_len = (_eid & 0x6000) >> 13
-            ts_trunc = (_eid & 0x8000) >> 15 # 0: 64bit, 1: 16bit TS
-            if ts_trunc == 0:
-                ts = struct.unpack('<Q', pkt[pos+2:pos+10])[0]
-                ts = util.parse_qxdm_ts(ts)
+            if _eid & 0x8000 == 0:
+                # 64-bit timestamp
+                clock.update(unpack_ts(view, pos + 2)[0])
+                ts = clock.now()
                 pos += 10
             else:
-                #ts = struct.unpack('<H', pkt[pos+2:pos+4])[0]
-                # TODO: correctly parse ts
-                ts = datetime.datetime.now()
+                # 16-bit timestamp, completed from the last full timestamp
+                if clock.extend(unpack_eid(view, pos + 2)[0]) is None:
+                    ts = self.device_time(radio_id)
+                else:
+                    ts = clock.now()
                 pos += 4
 
-            assert (payload_len >= 0) and (payload_len <= 3)
             if payload_len == 0:
                 # No payload
-                if event_id in self.process_event.keys():
-                    event_pkts.append(self.process_event[event_id][0](ts, event_id))
-                elif event_id in self.no_process_event.keys():
-                    pass
-                else:
-                    event_pkts.append(self.diag_fallback_event_parser.parse_event_fallback(ts, event_id))
+                event_args = ()
             elif payload_len == 1:
                 # 1x uint8
-                arg1 = pkt[pos]
-
-                if event_id in self.process_event.keys():
-                    event_pkts.append(self.process_event[event_id][0](ts, event_id, arg1))
-                elif event_id in self.no_process_event.keys():
-                    pass
-                else:
-                    event_pkts.append(self.diag_fallback_event_parser.parse_event_fallback(ts, event_id, arg1))
+                event_args = (view[pos], )
                 pos += 1
             elif payload_len == 2:
                 # 2x uint8
-                arg1 = pkt[pos]
-                arg2 = pkt[pos+1]
-
-                if event_id in self.process_event.keys():
-                    event_pkts.append(self.process_event[event_id][0](ts, event_id, arg1, arg2))
-                elif event_id in self.no_process_event.keys():
-                    pass
-                else:
-                    event_pkts.append(self.diag_fallback_event_parser.parse_event_fallback(ts, event_id, arg1, arg2))
+                event_args = (view[pos], view[pos+1])
                 pos += 2
-            elif payload_len == 3:
+            else:
                 # Pascal string
-                bin_len = pkt[pos]
-                arg_bin = pkt[pos+1:pos+1+bin_len]
+                bin_len = view[pos]
+                event_args = (bytes(view[pos+1:pos+1+bin_len]), )
+                pos += (1 + bin_len)
 
-                if event_id in self.process_event.keys():
-                    event_pkts.append(self.process_event[event_id][0](ts, event_id, arg_bin))
-                elif event_id in self.no_process_event.keys():
-                    pass
-                else:
-                    event_pkts.append(self.diag_fallback_event_parser.parse_event_fallback(ts, event_id, arg_bin))
-                pos += (1 + pkt[pos])
+            if not suppressed:
+                event_pkts.append(handler(ts, _eid & 0xfff, *event_args))
 
+        if ts is None:
+            ts = self.device_time(radio_id)
         return {'cp': event_pkts, 'ts': ts}
 
+    def open_qsr_hash(self, fname):
+        # Returns False if there is no usable database, so that it is not retried per message
+        if not fname:
+            return False
+        try:
+            return QsrHashIndex(fname)
+        except (OSError, ValueError) as e:
+            self.logger.log(logging.WARNING, 'Cannot open message hash database {}: {}'.format(fname, e))
+            return False
+
+    def create_qsr_msg(self, qsr_hash, msg_hash, pkt_ts, subsys_id, line_no, args):
+        msg = qsr_hash.lookup(msg_hash) if qsr_hash else None
+
+        if msg is None:
+            src_fname = b''
+            log_content = 'Unknown message hash 0x{:08x}, args: {}'.format(msg_hash,
+                ' '.join('0x{:08x}'.format(x) for x in args)).encode('utf-8')
+        else:
+            msg_format, src_fname, msg_line_no, ssid = msg
+            log_content = msg_format.format(args).encode('utf-8', errors='replace')
+            if line_no is None:
+                line_no = msg_line_no
+            if subsys_id is None:
+                subsys_id = ssid
+
+        osmocore_log_hdr = util.create_osmocore_logging_header(
+            timestamp = pkt_ts,
+            subsys_name = str(subsys_id).encode('utf-8'),
+            filename = src_fname,
+            line_number = line_no if line_no is not None else 0
+        )
+
+        gsmtap_hdr = util.create_gsmtap_header(
+            version = 2,
+            payload_type = util.gsmtap_type.OSMOCORE_LOG)
+
+        return {'cp': [gsmtap_hdr + osmocore_log_hdr + log_content], 'ts': pkt_ts}
+
+    qsr_ext_msg_header = namedtuple('QcDiagQsrExtMsgHeader', 'cmd_code ts_type num_args drop_cnt timestamp line_no message_subsys_id reserved1 msg_hash')
+
     def parse_diag_qsr_ext_msg(self, pkt):
-        return None
+        """Parses the DIAG_QSR_EXT_MSG_TERSE_F packet.
+
+        Parameters:
+        pkt (bytes): DIAG_QSR_EXT_MSG_TERSE_F data without trailing CRC
+        """
+        # Same header as DIAG_EXT_MSG_F followed by the message hash, then 32-bit arguments
+        if len(pkt) < 24:
+            return None
+        if self.qsr_hash is None:
+            self.qsr_hash = self.open_qsr_hash(self.qsr_hash_filename)
+
+        pkt_header = self.qsr_ext_msg_header._make(struct.unpack('<BBBBQHHLL', pkt[0:24]))
+        pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
+        num_args = min(pkt_header.num_args, (len(pkt) - 24) // 4)
+        args = struct.unpack('<{}L'.format(num_args), pkt[24:24 + 4 * num_args])
+
+        return self.create_qsr_msg(self.qsr_hash, pkt_header.msg_hash, pkt_ts,
+            pkt_header.message_subsys_id, pkt_header.line_no, args)
+
+    qsr4_ext_msg_header = namedtuple('QcDiagQsr4ExtMsgHeader', 'cmd_code ts_type num_args drop_cnt timestamp message_subsys_id reserved1 msg_hash')
 
     def parse_diag_qsr4_ext_msg(self, pkt):
-        return None
+        """Parses the DIAG_QSR4_EXT_MSG_TERSE_F packet.
+
+        Parameters:
+        pkt (bytes): DIAG_QSR4_EXT_MSG_TERSE_F data without trailing CRC
+        """
+        # Line number and file name are only available from the hash database
+        if len(pkt) < 20:
+            return None
+        if self.qsr4_hash is None:
+            self.qsr4_hash = self.open_qsr_hash(self.qsr4_hash_filename)
+
+        pkt_header = self.qsr4_ext_msg_header._make(struct.unpack('<BBBBQHHL', pkt[0:20]))
+        pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
+        num_args = min(pkt_header.num_args, (len(pkt) - 20) // 4)
+        args = struct.unpack('<{}L'.format(num_args), pkt[20:20 + 4 * num_args])
+
+        return self.create_qsr_msg(self.qsr4_hash, pkt_header.msg_hash, pkt_ts,
+            pkt_header.message_subsys_id, None, args)
 
     def parse_diag_version(self, pkt):
         header = namedtuple('QcDiagVersion', 'compile_date compile_time release_date release_time chipset')
@@ -2,6 +2,9 @@
 # coding: utf8
 
 import util
+import metrics
+import measurements
+import radiostate
 import struct
 import logging
 from .sdmcmd import *
@@ -20,24 +23,8 @@ class SamsungParser:
     pkg_header_len = 10
 
     def __init__(self):
-        self.gsm_last_cell_id = [0, 0]
-        self.gsm_last_arfcn = [0, 0]
-
-        self.umts_last_cell_id = [0, 0]
-        self.umts_last_psc = [0, 0]
-        self.umts_last_uarfcn_dl = [0, 0]
-        self.umts_last_uarfcn_ul = [0, 0]
-
-        self.lte_last_cell_id = [0, 0]
-        self.lte_last_pci = [0, 0]
-        self.lte_last_earfcn_dl = [0, 0]
-        self.lte_last_earfcn_ul = [0, 0]
-        self.lte_last_earfcn_tdd = [0, 0]
-        self.lte_last_sfn = [0, 0]
-        self.lte_last_tx_ant = [0, 0]
-        self.lte_last_bw_dl = [0, 0]
-        self.lte_last_bw_ul = [0, 0]
-        self.lte_last_band_ind = [0, 0]
+        # Last serving cell per radio, see radiostate.RadioState
+        self.radio_states = radiostate.RadioStates()
 
         # cmc221s: CMC221S: S3 (SHV-E210SK)
         # e300: Shannon 300: TODO
@@ -48,6 +35,10 @@ class SamsungParser:
 
         self.io_device = None
         self.writer = None
+        # Print measurement records as text
+        self.meas_stdout = True
+        # measstore.MeasurementStore receiving the measurement records
+        self.meas_store = None
 
         self.name = 'samsung'
         self.shortname = 'sec'
@@ -65,6 +56,9 @@ class SamsungParser:
         self.process = { }
         self.no_process = { }
 
+        # Handlers taking the frame as memoryview of the read buffer, other handlers get a copy
+        self.memoryview_cmds = {(sdm_command_group.CMD_IP_DATA << 8) | 0x00}
+
         for p in self.sdm_parsers:
             self.process.update(p.process)
             try:
@@ -72,6 +66,15 @@ class SamsungParser:
             except AttributeError:
                 pass
 
+        self.metric_frames = metrics.registry.counter('scat_frames_total', 'Frames read from the baseband', parser=self.shortname)
+        self.metric_length_errors = metrics.registry.counter('scat_length_errors_total', 'Packets with a length mismatch', parser=self.shortname)
+        self.metric_drops = metrics.registry.counter('scat_dropped_frames_total', 'Frames dropped as malformed', parser=self.shortname)
+        # SDM group -> per-RAT message counter
+        self.metric_rat_messages = { }
+        for group, rat in ((sdm_command_group.CMD_LTE_DATA, 'lte'), (sdm_command_group.CMD_EDGE_DATA, 'gsm'),
+                (sdm_command_group.CMD_HSPA_DATA, 'wcdma'), (sdm_command_group.CMD_IP_DATA, 'ip')):
+            self.metric_rat_messages[group] = metrics.registry.counter('scat_messages_total', 'Decoded messages per RAT', parser=self.shortname, rat=rat)
+
     def set_io_device(self, io_device):
         self.io_device = io_device
 
@@ -90,6 +93,14 @@ class SamsungParser:
                 self.logger.setLevel(params[p])
             elif p == 'start-magic':
                 self.start_magic = int(params[p], base=16)
+            elif p == 'profiler':
+                params[p].instrument_table(self.process, 'sdm')
+            elif p == 'meas-stdout':
+                self.meas_stdout = params[p]
+            elif p == 'meas-store':
+                self.meas_store = params[p]
+            elif p == 'radio-states':
+                self.radio_states.restore(params[p])
 
     def init_diag(self):
         self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.CONTROL_START, struct.pack('>L', self.start_magic)))
@@ -143,6 +154,7 @@ class SamsungParser:
                     else:
                         loop = False
                 buf = oldbuf + buf
+                buf_view = memoryview(buf)
 
                 cur_pos = 0
                 while cur_pos < len(buf):
@@ -167,16 +179,19 @@ class SamsungParser:
                         break
 
                     if buf[pos+1+sdm_pkt_hdr.length1] != 0x7e:
+                        self.metric_drops.value += 1
                         self.logger.log(logging.WARNING, 'Packet start {:02x} and end {:02x} does not match, dropping'.format(buf[pos], buf[pos+1+sdm_pkt_hdr.length1]))
                         cur_pos = pos + 2
                         continue
 
                     if sdm_pkt_hdr.length2 + 3 != sdm_pkt_hdr.length1:
+                        self.metric_length_errors.value += 1
+                        self.metric_drops.value += 1
                         self.logger.log(logging.WARNING, 'Inner and outer length does not match, dropping')
                         cur_pos = pos + 2
                         continue
 
-                    parse_result = self.parse_diag(buf[pos:pos + sdm_pkt_hdr.length1 + 2])
+                    parse_result = self.parse_diag(buf_view[pos:pos + sdm_pkt_hdr.length1 + 2])
 
                     if writer_sdmraw:
                         writer_sdmraw.write_cp(buf[pos:pos + sdm_pkt_hdr.length1 + 2])
@@ -287,6 +302,25 @@ class SamsungParser:
         except KeyboardInterrupt:
             return
 
+    def run_indexed(self, records, writer_sdmraw=None):
+        # Parses only the frames referenced by the DumpIndex records of the current dump file
+        is_logger = self.io_device.fname.find('.sdm') > 0 and self.io_device.fname.find('.sdmraw') < 0
+        for x in records:
+            buf = self.io_device.read_at(x.offset, x.length)
+            if writer_sdmraw:
+                writer_sdmraw.write_cp(buf)
+
+            if is_logger:
+                if len(buf) < 19:
+                    continue
+                magic, streamid, logger_version, seqnr, direction, group, command, timestamp = struct.unpack('<HLHHBBBL', buf[2:19])
+                parse_result = self.parse_diag(generate_sdm_packet(direction, group, command, buf[19:], timestamp))
+            else:
+                parse_result = self.parse_diag_log(buf)
+
+            if parse_result is not None:
+                self.postprocess_parse_result(parse_result)
+
     def read_dump(self):
         while self.io_device.file_available:
             self.logger.log(logging.INFO, "Reading from {}".format(self.io_device.fname))
@@ -323,35 +357,53 @@ class SamsungParser:
                 for l in parse_result['stdout'].split('\n'):
                     print('Radio {}: {}'.format(radio_id, l))
 
+        if 'meas' in parse_result:
+            if self.meas_store is not None:
+                for meas in parse_result['meas']:
+                    self.meas_store.append(meas, radio_id, ts)
+            if self.meas_stdout:
+                for meas in parse_result['meas']:
+                    meas_text = measurements.format_meas(meas)
+                    if len(meas_text) > 0:
+                        for l in meas_text.split('\n'):
+                            print('Radio {}: {}'.format(radio_id, l))
+
     def parse_diag_log(self, pkt):
+        self.metric_frames.value += 1
         if not (pkt[0] == 0x7f and pkt[-1] == 0x7e):
+            self.metric_drops.value += 1
             self.logger.log(logging.WARNING, 'Invalid packet structure')
             self.logger.log(logging.DEBUG, util.xxd(pkt))
             return None
 
         if len(pkt) < 11:
+            self.metric_drops.value += 1
             self.logger.log(logging.WARNING, 'Packet shorter than expected')
             return None
 
         sdm_pkt_hdr = parse_sdm_header(pkt[1:15])
 
-        if sdm_pkt_hdr.length2 + 3 != sdm_pkt_hdr.length1:
-            self.logger.log(logging.WARNING, 'Inner and outer length does not match, dropping')
-            return None
-
-        if len(pkt) != (sdm_pkt_hdr.length1 + 2):
+        if sdm_pkt_hdr.length2 + 3 != sdm_pkt_hdr.length1 or len(pkt) != (sdm_pkt_hdr.length1 + 2):
+            self.metric_length_errors.value += 1
+            self.metric_drops.value += 1
             self.logger.log(logging.WARNING, 'Inner and outer length does not match, dropping')
             return None
 
         if sdm_pkt_hdr.direction != sdm_command_type.IPC_DM_CMD and sdm_pkt_hdr.direction != sdm_command_type.IPC_CT_CMD:
+            self.metric_drops.value += 1
             self.logger.log(logging.WARNING, 'Unexpected direction ID 0x{:02x}'.format(sdm_pkt_hdr.direction))
             return None
 
-        self.logger.log(logging.DEBUG, 'SDM Header: radio id {}, group 0x{:02x}, command 0x{:02x}, timestamp {:04x}'.format(sdm_pkt_hdr.radio_id, sdm_pkt_hdr.group, sdm_pkt_hdr.command, sdm_pkt_hdr.timestamp))
-        self.logger.log(logging.DEBUG, 'Payload: {}'.format(util.xxd(pkt[15:-1])))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.log(logging.DEBUG, 'SDM Header: radio id {}, group 0x{:02x}, command 0x{:02x}, timestamp {:04x}'.format(sdm_pkt_hdr.radio_id, sdm_pkt_hdr.group, sdm_pkt_hdr.command, sdm_pkt_hdr.timestamp))
+            self.logger.log(logging.DEBUG, 'Payload: {}'.format(util.xxd(pkt[15:-1])))
 
         cmd_sig = (sdm_pkt_hdr.group << 8) | sdm_pkt_hdr.command
         if cmd_sig in self.process.keys():
+            if sdm_pkt_hdr.group in self.metric_rat_messages:
+                self.metric_rat_messages[sdm_pkt_hdr.group].value += 1
+            if type(pkt) == memoryview and cmd_sig not in self.memoryview_cmds:
+                pkt = pkt.tobytes()
             parse_result = self.process[cmd_sig](pkt)
         elif cmd_sig in self.no_process.keys():
             print("Not handling group 0x{:02x} command 0x{:02x}".format(sdm_pkt_hdr.group, sdm_pkt_hdr.command))
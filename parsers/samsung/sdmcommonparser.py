@@ -3,6 +3,7 @@
 from .sdmcmd import *
 from collections import namedtuple
 import util
+import channels
 import binascii
 
 import struct
@@ -79,13 +80,13 @@ class SdmCommonParser:
             if direction == 2:
                 gsmtap_subtype = chan_map_dl[subtype]
                 if self.parent:
-                    arfcn = self.parent.umts_last_uarfcn_dl[0]
+                    arfcn = self.parent.radio_states[0].umts_uarfcn_dl
                 else:
                     arfcn = 0
             elif direction == 1:
                 gsmtap_subtype = chan_map_ul[subtype]
                 if self.parent:
-                    arfcn = self.parent.umts_last_uarfcn_ul[0]
+                    arfcn = self.parent.radio_states[0].umts_uarfcn_ul
                 else:
                     arfcn = 0
             else:
@@ -102,9 +103,7 @@ class SdmCommonParser:
             return {'cp': [gsmtap_hdr + msg]}
         elif type == 0x01: # UMTS NAS
             # direction: 1: UL, 2: DL
-            arfcn = 0
-            if direction == 1:
-                arfcn = arfcn | (1 << 14)
+            arfcn = channels.gsmtap_arfcn(0, direction == 1)
 
             gsmtap_hdr = util.create_gsmtap_header(
                 version = 2,
@@ -114,9 +113,7 @@ class SdmCommonParser:
             return {'cp': [gsmtap_hdr + msg]}
         elif type == 0x20: # GSM RR
             # direction: 1: UL, 2: DL
-            arfcn = 0
-            if direction == 1:
-                arfcn = arfcn | (1 << 14)
+            arfcn = channels.gsmtap_arfcn(0, direction == 1)
 
             if msg[0] == 0b0110:
                 # GSM RR, regardless of direction
@@ -154,9 +151,7 @@ class SdmCommonParser:
             return {'cp': [gsmtap_hdr + msg]}
         elif type == 0x21: # GSM RLC/MAC
             # direction: 1: UL, 2: DL
-            arfcn = 0
-            if direction == 1:
-                arfcn = arfcn | (1 << 14)
+            arfcn = channels.gsmtap_arfcn(0, direction == 1)
 
             gsmtap_hdr = util.create_gsmtap_header(
                 version = 2,
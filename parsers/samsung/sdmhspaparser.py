@@ -2,6 +2,7 @@
 
 from .sdmcmd import *
 import util
+import measurements
 import binascii
 
 import struct
@@ -79,17 +80,12 @@ class SdmHspaParser:
         ul1_meas = header._make(struct.unpack('<HhhhH', pkt[0:10]))
         extra = pkt[10:]
 
-        stdout = 'HSPA UL1 Serving Cell: PSC {}, CPICH RSCP {:.2f}, Delta RSCP {:.2f}, Ec/No {:.2f}, DRX {} ms'.format(
-            ul1_meas.psc,
-            ul1_meas.cpich_rscp,
-            ul1_meas.cpich_delta_rscp,
-            ul1_meas.cpich_ecno,
-            ul1_meas.drx_cycle
-        )
+        meas = measurements.HspaServingCellMeas(ul1_meas.psc, ul1_meas.cpich_rscp,
+            ul1_meas.cpich_delta_rscp, ul1_meas.cpich_ecno, ul1_meas.drx_cycle)
         if len(extra) > 0:
-            stdout += "Extra: {}\n".format(binascii.hexlify(extra).decode('utf-8'))
+            return {'meas': [meas], 'stdout': "Extra: {}".format(binascii.hexlify(extra).decode('utf-8'))}
 
-        return {'stdout': stdout.rstrip()}
+        return {'meas': [meas]}
 
     def sdm_hspa_wcdma_rrc_status(self, pkt):
         # uint8: channel
@@ -122,7 +118,8 @@ class SdmHspaParser:
             scell_info.ul_uarfcn, scell_info.mcc, scell_info.mnc)
 
         if self.parent:
-            self.parent.umts_last_uarfcn_dl[sdm_pkt_hdr.radio_id] = scell_info.dl_uarfcn
-            self.parent.umts_last_uarfcn_ul[sdm_pkt_hdr.radio_id] = scell_info.ul_uarfcn
+            state = self.parent.radio_states[sdm_pkt_hdr.radio_id]
+            state.umts_uarfcn_dl = scell_info.dl_uarfcn
+            state.umts_uarfcn_ul = scell_info.ul_uarfcn
 
         return {'stdout': stdout}
@@ -24,12 +24,15 @@ class SdmIpParser:
     def set_model(self, model):
         self.model = model
 
+    ip_data_header = namedtuple('SdmIpData', 'seq_num direction unknown length')
+    ip_data_struct = struct.Struct('<HHHH')
+
     def sdm_ip_data(self, pkt):
         # Unknown: 0x0800, 0x150D
-        pkt = pkt[15:-1]
+        # The IP packet is passed to the writer as a view of the received frame
+        pkt = memoryview(pkt)[15:-1]
 
-        header_struct = namedtuple('SdmIpData', 'seq_num direction unknown length')
-        header = header_struct._make(struct.unpack('<HHHH', pkt[0:8]))
+        header = self.ip_data_header._make(self.ip_data_struct.unpack_from(pkt, 0))
         payload = pkt[8:]
 
         if header.length != len(payload):
@@ -2,6 +2,8 @@
 
 from .sdmcmd import *
 import util
+import channels
+import measurements
 
 import struct
 import logging
@@ -77,10 +79,13 @@ class SdmLteParser:
         extra = pkt[expected_len:]
 
         if self.parent:
-            self.parent.lte_last_earfcn_dl[sdm_pkt_hdr.radio_id] = cell_info.arfcn
-            self.parent.lte_last_pci[sdm_pkt_hdr.radio_id] = cell_info.pci
-        stdout = 'LTE PHY Cell Info: EARFCN {}, PCI {}, PLMN {}, RSRP: {:.2f}, RSRQ: {:.2f}\n'.format(cell_info.arfcn, cell_info.pci, cell_info.plmn, cell_info.rsrp / -100.0, cell_info.rsrq / -100.0)
+            state = self.parent.radio_states[sdm_pkt_hdr.radio_id]
+            state.lte_earfcn_dl = cell_info.arfcn
+            state.lte_earfcn_ul = channels.lte.ul_channel(cell_info.arfcn)
+            state.lte_pci = cell_info.pci
 
+        # Type, EARFCN, PCI, RSRP, RSRQ of the neighbor cells
+        ncells = [[] for x in range(5)]
         if cell_info.num_ncell > 0:
             if self.model == 'e5123' or self.model == 'e5300':
                 ncell_header_format = '<BLHHHLLH'
@@ -90,22 +95,18 @@ class SdmLteParser:
             if len(extra) == ncell_len * cell_info.num_ncell:
                 for i in range(cell_info.num_ncell):
                     ncell = ncell_header._make(struct.unpack(ncell_header_format, extra[i*ncell_len:(i+1)*ncell_len]))
-                    if ncell.type == 0:
-                        stdout += 'LTE PHY Cell Info: NCell {}: EARFCN {}, PCI {}, RSRP: {:.2f}, RSRQ: {:.2f}\n'.format(i, ncell.earfcn,
-                            ncell.pci, ncell.rsrp / -100.0, ncell.rsrq / -100.0)
-                    elif ncell.type == 1:
-                        stdout += 'LTE PHY Cell Info: NCell {} (WCDMA): UARFCN {}, PSC {}, RSRP: {:.2f}, RSRQ: {:.2f}\n'.format(i, ncell.earfcn,
-                            ncell.pci, ncell.rsrp / -100.0, ncell.rsrq / -100.0)
-                    elif ncell.type == 3:
-                        stdout += 'LTE PHY Cell Info: NCell {} (GSM): ARFCN {}, PCI {}, RSRP: {:.2f}, RSRQ: {:.2f}\n'.format(i, ncell.earfcn,
-                            ncell.pci, ncell.rsrp / -100.0, ncell.rsrq / -100.0)
-                    else:
-                        stdout += 'LTE PHY Cell Info: NCell {} (Type {}): ARFCN {}, PCI {}, RSRP: {:.2f}, RSRQ: {:.2f}\n'.format(i, ncell.type, ncell.earfcn,
-                            ncell.pci, ncell.rsrp / -100.0, ncell.rsrq / -100.0)
+                    ncells[0].append(ncell.type)
+                    ncells[1].append(ncell.earfcn)
+                    ncells[2].append(ncell.pci)
+                    ncells[3].append(ncell.rsrp / -100.0)
+                    ncells[4].append(ncell.rsrq / -100.0)
             else:
                 if self.parent:
                     self.parent.logger.log(logging.WARNING, 'Extra data length ({}) does not match with expected ({})'.format(len(extra), ncell_len * cell_info.num_ncell))
-        return {'stdout': stdout.rstrip()}
+
+        meas = measurements.LtePhyCellMeas(cell_info.arfcn, cell_info.pci, cell_info.plmn,
+            cell_info.rsrp / -100.0, cell_info.rsrq / -100.0, *[tuple(x) for x in ncells])
+        return {'meas': [meas]}
 
     def sdm_lte_l2_rach_info(self, pkt):
         pkt = pkt[15:-1]
@@ -208,12 +209,12 @@ class SdmLteParser:
 
         if direction == 0:
             if self.parent:
-                arfcn = self.parent.lte_last_earfcn_dl[sdm_pkt_hdr.radio_id]
+                arfcn = self.parent.radio_states[sdm_pkt_hdr.radio_id].lte_earfcn_dl
             else:
                 arfcn = 0
         else:
             if self.parent:
-                arfcn = self.parent.lte_last_earfcn_ul[sdm_pkt_hdr.radio_id]
+                arfcn = self.parent.radio_states[sdm_pkt_hdr.radio_id].lte_earfcn_ul
             else:
                 arfcn = 0
 
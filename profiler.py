@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import time
+import json
+import sys
+
+def handler_name(func):
+    # Process tables mostly hold lambdas calling a parser method, name them after the method
+    name = getattr(func, '__name__', repr(func))
+    if name == '<lambda>' and len(func.__code__.co_names) > 0:
+        name = func.__code__.co_names[-1]
+    return name
+
+def payload_len(args):
+    l = 0
+    for x in args:
+        if isinstance(x, (bytes, bytearray, memoryview)):
+            l += len(x)
+    return l
+
+def result_len(result):
+    l = 0
+    if type(result) == dict:
+        for k in ('cp', 'up'):
+            if k in result:
+                for x in result[k]:
+                    l += len(x)
+    return l
+
+class DecodeProfiler:
+    """Per-handler call counts, wall time, bytes in/out and exceptions.
+
+    Handlers are only wrapped when instrument_table() or wrap() is called,
+    so parsers without a profiler run without any overhead.
+    """
+    num_buckets = 64
+
+    def __init__(self):
+        # name -> [count, total_ns, max_ns, bytes_in, bytes_out, exceptions, log2 histogram]
+        self.handlers = {}
+
+    def handler_stat(self, name):
+        if name not in self.handlers:
+            self.handlers[name] = [0, 0, 0, 0, 0, 0, [0] * self.num_buckets]
+        return self.handlers[name]
+
+    def wrap(self, name, func):
+        stat = self.handler_stat(name)
+        hist = stat[6]
+        perf_counter_ns = time.perf_counter_ns
+
+        def profiled_handler(*args):
+            start = perf_counter_ns()
+            try:
+                result = func(*args)
+            except Exception:
+                stat[5] += 1
+                raise
+            finally:
+                elapsed = perf_counter_ns() - start
+                stat[0] += 1
+                stat[1] += elapsed
+                if elapsed > stat[2]:
+                    stat[2] = elapsed
+                hist[min(elapsed.bit_length(), self.num_buckets - 1)] += 1
+            stat[3] += payload_len(args)
+            stat[4] += result_len(result)
+            return result
+
+        profiled_handler.__wrapped__ = func
+        return profiled_handler
+
+    def instrument_table(self, table, prefix, id_format='0x{:04X}'):
+        """Wraps all handlers of a process table in place.
+
+        Parameters:
+        table (dict): ID -> handler, or ID -> (handler, name) as used by the event parsers
+        prefix (str): prefix of the handler names in the report, e.g. 'log'
+        """
+        for item_id in table.keys():
+            entry = table[item_id]
+            if type(entry) == tuple:
+                func = entry[0]
+            else:
+                func = entry
+            if hasattr(func, '__wrapped__'):
+                continue
+
+            name = '{} {} {}'.format(prefix, id_format.format(item_id), handler_name(func))
+            if type(entry) == tuple:
+                table[item_id] = (self.wrap(name, func), ) + entry[1:]
+            else:
+                table[item_id] = self.wrap(name, func)
+
+    def percentile(self, hist, count, p):
+        # Upper bound of the log2 bucket containing the percentile, in ns
+        target = count * p
+        acc = 0
+        for i in range(len(hist)):
+            acc += hist[i]
+            if acc >= target:
+                return (1 << i) if i > 0 else 0
+        return 0
+
+    def report(self):
+        result = []
+        for name, stat in self.handlers.items():
+            count, total_ns, max_ns, bytes_in, bytes_out, exceptions, hist = stat
+            if count == 0:
+                continue
+            result.append({
+                'handler': name,
+                'count': count,
+                'total_us': total_ns / 1000,
+                'mean_us': total_ns / count / 1000,
+                'p50_us': self.percentile(hist, count, 0.5) / 1000,
+                'p90_us': self.percentile(hist, count, 0.9) / 1000,
+                'p99_us': self.percentile(hist, count, 0.99) / 1000,
+                'max_us': max_ns / 1000,
+                'bytes_in': bytes_in,
+                'bytes_out': bytes_out,
+                'exceptions': exceptions,
+            })
+        result.sort(key=lambda x: x['total_us'], reverse=True)
+        return result
+
+    def format_report(self):
+        lines = ['{:<56} {:>9} {:>12} {:>9} {:>9} {:>9} {:>12} {:>12} {:>5}'.format(
+            'Handler', 'Count', 'Total (ms)', 'Mean(us)', 'p90 (us)', 'p99 (us)', 'Bytes in', 'Bytes out', 'Exc')]
+        for x in self.report():
+            lines.append('{:<56} {:>9} {:>12.3f} {:>9.2f} {:>9.2f} {:>9.2f} {:>12} {:>12} {:>5}'.format(
+                x['handler'][:56], x['count'], x['total_us'] / 1000, x['mean_us'],
+                x['p90_us'], x['p99_us'], x['bytes_in'], x['bytes_out'], x['exceptions']))
+        return '\n'.join(lines)
+
+    def dump(self, fname=None):
+        """Writes the report as JSON to fname, or as a table to stderr."""
+        if fname:
+            with open(fname, 'w') as f:
+                json.dump(self.report(), f, indent=2)
+        else:
+            sys.stderr.write(self.format_report() + '\n')
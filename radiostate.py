@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import json
+
+# Last serving cell seen on each radio (SIM or subscription) of a device.
+#
+# Sub-parsers update the state of a radio from cell info logs and read it
+# back to fill in the channel of messages which do not carry it, e.g. the
+# EARFCN of LTE RRC messages. A snapshot is a list with a dict of plain
+# values per radio, which can be stored as JSON and restored to seed the
+# parser of another process or a later capture.
+
+class RadioState:
+    """Cell state of one radio."""
+    __slots__ = (
+        'gsm_cell_id', 'gsm_arfcn',
+        'umts_cell_id', 'umts_psc', 'umts_uarfcn_dl', 'umts_uarfcn_ul',
+        'lte_cell_id', 'lte_pci', 'lte_earfcn_dl', 'lte_earfcn_ul', 'lte_earfcn_tdd',
+        'lte_sfn', 'lte_tx_ant', 'lte_bw_dl', 'lte_bw_ul', 'lte_band_ind',
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def snapshot(self):
+        """Returns the state as dict."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def restore(self, snapshot):
+        """Replaces the state with a snapshot. Missing fields are reset, unknown fields are ignored.
+
+        Parameters:
+        snapshot (dict): state returned by snapshot()
+        """
+        self.reset()
+        for name in self.__slots__:
+            if name in snapshot:
+                setattr(self, name, snapshot[name])
+
+    def __repr__(self):
+        return 'RadioState({})'.format(', '.join('{}={}'.format(name, getattr(self, name)) for name in self.__slots__))
+
+class RadioStates(list):
+    """States of all radios of a device, indexed by radio ID.
+
+    A plain list, so that indexing it on the decode path costs no more than
+    indexing the per-field lists it replaces.
+    """
+    __slots__ = ()
+
+    def __init__(self, num_radios=2):
+        super().__init__(RadioState() for x in range(num_radios))
+
+    def resize(self, num_radios):
+        """Adds radios until there are at least num_radios of them."""
+        while len(self) < num_radios:
+            self.append(RadioState())
+
+    def snapshot(self):
+        """Returns the states of all radios as list of dicts."""
+        return [x.snapshot() for x in self]
+
+    def restore(self, snapshot):
+        """Replaces the states with a snapshot, adding radios if the snapshot has more of them.
+        Radios missing in the snapshot are reset.
+
+        Parameters:
+        snapshot (list): states returned by snapshot()
+        """
+        self.resize(len(snapshot))
+        for radio_id, state in enumerate(self):
+            if radio_id < len(snapshot):
+                state.restore(snapshot[radio_id])
+            else:
+                state.reset()
+
+    def dumps(self):
+        """Returns the snapshot of all radios as JSON."""
+        return json.dumps(self.snapshot())
+
+    def loads(self, data):
+        """Restores the states from JSON returned by dumps()."""
+        self.restore(json.loads(data))
@@ -6,12 +6,19 @@ __version__ = "0.9"
 import iodevices
 import writers
 import parsers
+import util
+import profiler
+import metrics
+import measstore
 
 import os, sys
 import argparse
 import signal
 import faulthandler
 import logging
+import datetime
+import json
+import atexit
 
 current_parser = None
 logger = logging.getLogger('scat')
@@ -22,8 +29,42 @@ if os.name != 'nt':
 def sigint_handler(signal, frame):
     global current_parser
     current_parser.stop_diag()
+    close_writers()
     sys.exit(0)
 
+def replay_sigint_handler(signal, frame):
+    for writer in open_writers:
+        if isinstance(writer, writers.ReplayWriter):
+            writer.cancel()
+    close_writers()
+    sys.exit(0)
+
+open_writers = []
+
+def close_writers():
+    while len(open_writers) > 0:
+        open_writers.pop().__exit__(None, None, None)
+
+def open_file_writer(args, fname, writer_class, writer_args=()):
+    if args.rotate_size > 0 or args.rotate_interval > 0 or args.compress:
+        return writers.RotatingWriter(fname, writer_class, writer_args,
+            max_size=args.rotate_size * 1024 * 1024,
+            max_interval=args.rotate_interval,
+            compress=args.compress)
+    else:
+        return writer_class(fname, *writer_args)
+
+def device_ts(string, baseband_type):
+    if string == None:
+        return None
+    try:
+        return hexint(string)
+    except ValueError:
+        pass
+    if baseband_type != 'qc':
+        raise ValueError('Only raw device timestamps are supported for this baseband type')
+    return util.create_qxdm_ts(datetime.datetime.fromisoformat(string))
+
 def hexint(string):
     if string[0:2] == '0x' or string[0:2] == '0X':
         return int(string[2:], 16)
@@ -37,14 +78,8 @@ class ListUSBAction(argparse.Action):
         parser.exit()
 
 if __name__ == '__main__':
-    # Load parser modules
-    parser_dict = {}
-    for parser_module in dir(parsers):
-        if parser_module.startswith('__'):
-            continue
-        if type(getattr(parsers, parser_module)) == type:
-            c = getattr(parsers, parser_module)()
-            parser_dict[c.shortname] = c
+    # Parser modules are only imported for the selected baseband type
+    parser_dict = parsers.parser_registry
 
     parsers_desc = ', '.join(parser_dict.keys())
 
@@ -60,6 +95,15 @@ if __name__ == '__main__':
     input_group.add_argument('-u', '--usb', action='store_true', help='Use USB diagnostics port')
     input_group.add_argument('-d', '--dump', help='Read from baseband dump (QMDL, SDM, LPD)', nargs='*')
 
+    dump_group = parser.add_argument_group('Baseband dump settings')
+    dump_group.add_argument('--index', action='store_true', help='Build or update the sidecar packet index (<dump>.idx) of the dump files and exit')
+    dump_group.add_argument('--stats', help='Print per-ID packet counts, sizes and time span of the dump files as JSON (or store it to given file) and exit. Only packet headers are decoded', nargs='?', const='-', type=str)
+    dump_group.add_argument('--extract', action='store_true', help='Only decode the packets selected by --ts-start, --ts-end and --log-ids, using the sidecar packet index')
+    dump_group.add_argument('--ts-start', help='Start of the device time range to extract. Raw device timestamp, or ISO 8601 date and time (Qualcomm only)', type=str)
+    dump_group.add_argument('--ts-end', help='End of the device time range to extract. Raw device timestamp, or ISO 8601 date and time (Qualcomm only)', type=str)
+    dump_group.add_argument('--log-ids', help='Comma separated list of log IDs (Qualcomm) or (group << 8) | command (Samsung) to extract', type=str)
+    dump_group.add_argument('--extract-raw', help='Store the extracted packets as a trimmed dump file', type=str)
+
     serial_group = parser.add_argument_group('Serial device settings')
     serial_group.add_argument('-b', '--baudrate', help='Set the serial baud rate', type=int, default=115200)
     serial_group.add_argument('--no-rts', action='store_true', help='Do not enable the RTS/CTS')
@@ -75,10 +119,14 @@ if __name__ == '__main__':
     if 'qc' in parser_dict.keys():
         qc_group = parser.add_argument_group('Qualcomm specific settings')
         qc_group.add_argument('--qmdl', help='Store log as QMDL file (Qualcomm only)')
-        qc_group.add_argument('--qsr-hash', help='Specify QSR message hash file (usually QSRMessageHash.db), implies --msgs', type=str)
-        qc_group.add_argument('--qsr4-hash', help='Specify QSR4 message hash file (need to obtain from the device firmware), implies --msgs', type=str)
+        qc_group.add_argument('--qsr-hash', help='Specify QSR message hash file (usually QSRMessageHash.db), implies --msgs. Indexed to <file>.idx on first use', type=str)
+        qc_group.add_argument('--qsr4-hash', help='Specify QSR4 message hash file (need to obtain from the device firmware), implies --msgs. Indexed to <file>.idx on first use', type=str)
         qc_group.add_argument('--events', action='store_true', help='Decode Events as GSMTAP logging')
         qc_group.add_argument('--msgs', action='store_true', help='Decode Extended Message Reports and QSR Message Reports as GSMTAP logging')
+        qc_group.add_argument('--capability-cache', help='Cache file of the DIAG capabilities discovered per firmware build. Default: ~/.cache/scat/diag_capabilities.json', type=str)
+        qc_group.add_argument('--no-capability-cache', action='store_true', help='Always discover the DIAG capabilities of the device')
+        qc_group.add_argument('--invalidate-capability-cache', action='store_true', help='Discover the DIAG capabilities again and replace the cached ones')
+        qc_group.add_argument('--max-radios', help='Number of radios (SIMs or subscriptions) of multi-SIM devices to track separately. Default: 2', type=int, default=2)
 
     if 'sec' in parser_dict.keys():
         sec_group = parser.add_argument_group('Samsung specific settings')
@@ -100,7 +148,32 @@ if __name__ == '__main__':
 
     ip_group.add_argument('-F', '--pcap-file', help='Write GSMTAP packets directly to specified PCAP file')
 
+    replay_group = parser.add_argument_group('Replay settings (dump input only)')
+    replay_group.add_argument('--replay', action='store_true', help='Emit packets paced by their device timestamps instead of as fast as possible')
+    replay_group.add_argument('--replay-speed', help='Replay speed multiplier, 0 disables pacing. Default: 1.0', type=float, default=1.0)
+    replay_group.add_argument('--replay-max-rate', help='Maximum number of packets per second', type=int, default=0)
+    replay_group.add_argument('--replay-loop', action='store_true', help='Replay the dump files in a loop')
+
+    rotate_group = parser.add_argument_group('Output file rotation settings (applies to PCAP, QMDL and raw SDM files)')
+    rotate_group.add_argument('--rotate-size', help='Start a new output file segment after given size in megabytes', type=int, default=0)
+    rotate_group.add_argument('--rotate-interval', help='Start a new output file segment after given interval in seconds', type=int, default=0)
+    rotate_group.add_argument('--compress', help='Compress completed output file segments in background', choices=['gzip', 'xz'])
+
+    meas_group = parser.add_argument_group('Measurement settings')
+    meas_group.add_argument('--meas-store', help='Store serving and neighbor cell measurements as NumPy columns in given directory, or .npz files if it ends with .npz', type=str)
+    meas_group.add_argument('--meas-chunk-rows', help='Number of measurements per stored chunk. Default: 100000', type=int, default=100000)
+    meas_group.add_argument('--no-meas-stdout', action='store_true', help='Do not print the measurements')
+    meas_group.add_argument('--meas-batch', help='Decode fixed-size measurement logs and LTE neighbor cell measurements in batches of given number of packets into the measurement store (Qualcomm only). Batched measurements are not printed', type=int, default=0)
+
+    parser.add_argument('--dedup-broadcast', help='Suppress repeats of identical MIB/SIB messages of a cell within given number of seconds of device time and report the number of repeats (Qualcomm only, HiSilicon timestamps are not decoded yet)', type=float, default=0)
+    parser.add_argument('--metrics-port', help='Serve capture health metrics in Prometheus text format on http://127.0.0.1:PORT/metrics', type=int)
+    parser.add_argument('--profile', help='Profile the packet handlers. The report is printed on exit and on SIGUSR2, or stored to given file as JSON', nargs='?', const='-', type=str)
+
     args = parser.parse_args()
+    if args.meas_batch > 0 and not args.meas_store:
+        parser.error('--meas-batch requires --meas-store')
+    if args.type == 'qc' and args.max_radios < 1:
+        parser.error('--max-radios must be at least 1')
 
     GSMTAP_IP = args.hostname
     GSMTAP_PORT = args.port
@@ -139,9 +212,12 @@ if __name__ == '__main__':
     if args.pcap_file == None:
         writer = writers.SocketWriter(GSMTAP_IP, GSMTAP_PORT, IP_OVER_UDP_PORT)
     else:
-        writer = writers.PcapWriter(args.pcap_file, GSMTAP_PORT, IP_OVER_UDP_PORT)
+        writer = open_file_writer(args, args.pcap_file, writers.PcapWriter, (GSMTAP_PORT, IP_OVER_UDP_PORT))
+    if args.replay and args.dump:
+        writer = writers.ReplayWriter(writer, args.replay_speed, args.replay_max_rate)
+    open_writers.append(writer)
 
-    current_parser = parser_dict[args.type]
+    current_parser = parsers.create_parser(args.type)
     current_parser.set_io_device(io_device)
     current_parser.set_writer(writer)
 
@@ -156,12 +232,40 @@ if __name__ == '__main__':
     ch.setFormatter(f)
     logger.addHandler(ch)
 
+    if args.metrics_port is not None:
+        metrics_address = metrics.registry.serve(args.metrics_port)
+        logger.log(logging.INFO, 'Serving metrics on http://{}:{}/metrics'.format(*metrics_address))
+
+    if args.profile:
+        decode_profiler = profiler.DecodeProfiler()
+        profile_fname = None if args.profile == '-' else args.profile
+        current_parser.set_parameter({'profiler': decode_profiler})
+        atexit.register(decode_profiler.dump, profile_fname)
+        if os.name != 'nt':
+            signal.signal(signal.SIGUSR2, lambda signum, frame: decode_profiler.dump(profile_fname))
+
+    if args.meas_store:
+        meas_store = measstore.MeasurementStore(args.meas_store, args.meas_chunk_rows)
+        open_writers.append(meas_store)
+        current_parser.set_parameter({'meas-store': meas_store})
+    if args.no_meas_stdout:
+        current_parser.set_parameter({'meas-stdout': False})
+    if args.dedup_broadcast > 0:
+        current_parser.set_parameter({'broadcast-window': args.dedup_broadcast})
+
     if args.type == 'qc':
         current_parser.set_parameter({
             'qsr-hash': args.qsr_hash,
             'qsr4-hash': args.qsr4_hash,
             'events': args.events,
-            'msgs': args.msgs})
+            'msgs': args.msgs or bool(args.qsr_hash or args.qsr4_hash),
+            'meas-batch': args.meas_batch,
+            'max-radios': args.max_radios})
+        if (args.serial or args.usb) and not args.no_capability_cache:
+            from parsers.qualcomm.diagcapcache import default_cache_fname
+            current_parser.set_parameter({
+                'capability-cache': args.capability_cache if args.capability_cache else default_cache_fname(),
+                'invalidate-capability-cache': args.invalidate_capability_cache})
     elif args.type == 'sec':
         current_parser.set_parameter({
             'model': args.model,
@@ -178,16 +282,62 @@ if __name__ == '__main__':
 
         signal.signal(signal.SIGINT, sigint_handler)
 
-        if not (args.qmdl == None) and args.type == 'qc':
-            current_parser.run_diag(writers.RawWriter(args.qmdl))
-        if not (args.sdmraw == None) and args.type == 'sec':
-            current_parser.run_diag(writers.RawWriter(args.sdmraw))
+        raw_fname = None
+        if args.type == 'qc':
+            raw_fname = args.qmdl
+        elif args.type == 'sec':
+            raw_fname = args.sdmraw
+
+        if raw_fname != None:
+            raw_writer = open_file_writer(args, raw_fname, writers.RawWriter)
+            open_writers.append(raw_writer)
+            current_parser.run_diag(raw_writer)
         else:
             current_parser.run_diag()
 
         current_parser.stop_diag()
     elif args.dump:
-        current_parser.read_dump()
+        if args.index:
+            for fname in args.dump:
+                with iodevices.DumpIndex(fname) as dump_index:
+                    num_new = dump_index.update()
+                    logger.log(logging.INFO, 'Indexed {} new packets from {}, {} packets in total'.format(num_new, fname, len(dump_index)))
+        elif args.stats:
+            dump_stats = iodevices.DumpStats()
+            for fname in args.dump:
+                dump_stats.scan(fname)
+            if args.stats == '-':
+                print(json.dumps(dump_stats.to_dict(), indent=2))
+            else:
+                with open(args.stats, 'w') as f:
+                    json.dump(dump_stats.to_dict(), f, indent=2)
+        elif args.extract:
+            ts_start = device_ts(args.ts_start, args.type)
+            ts_end = device_ts(args.ts_end, args.type)
+            log_ids = None
+            if args.log_ids:
+                log_ids = set([hexint(x.strip()) for x in args.log_ids.split(',')])
+
+            raw_writer = None
+            if args.extract_raw:
+                raw_writer = open_file_writer(args, args.extract_raw, writers.RawWriter)
+                open_writers.append(raw_writer)
+
+            while io_device.file_available:
+                with iodevices.DumpIndex(io_device.fname) as dump_index:
+                    dump_index.update()
+                    logger.log(logging.INFO, 'Extracting from {}'.format(io_device.fname))
+                    current_parser.run_indexed(dump_index.select(ts_start=ts_start, ts_end=ts_end, ids=log_ids), raw_writer)
+                io_device.open_next_file()
+        else:
+            if args.replay:
+                signal.signal(signal.SIGINT, replay_sigint_handler)
+            current_parser.read_dump()
+            while args.replay and args.replay_loop:
+                current_parser.set_io_device(iodevices.FileIO(args.dump))
+                current_parser.read_dump()
     else:
         assert('Invalid input handler?')
         sys.exit(0)
+
+    close_writers()
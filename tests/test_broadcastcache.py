@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import metrics
+from broadcastcache import BroadcastCache
+
+class TestBroadcastCache(unittest.TestCase):
+    def test_window(self):
+        counter = metrics.Counter('test_suppressed_total', '', ())
+        cache = BroadcastCache(1.0, metric=counter)
+        sib1 = b'\x40\x85\x8e\xc4'
+        sib2 = b'\x00\x00\x01'
+
+        self.assertEqual(cache.check(0, (214, 6300), 3, sib1, 10.0), 0)
+        self.assertEqual(cache.check(0, (214, 6300), 3, sib2, 10.1), 0)
+        self.assertIsNone(cache.check(0, (214, 6300), 3, sib1, 10.2))
+        self.assertIsNone(cache.check(0, (214, 6300), 3, sib2, 10.3))
+        self.assertIsNone(cache.check(0, (214, 6300), 3, sib1, 10.5))
+        # Other radio, cell or channel
+        self.assertEqual(cache.check(1, (214, 6300), 3, sib1, 10.5), 0)
+        self.assertEqual(cache.check(0, (215, 6300), 3, sib1, 10.5), 0)
+        self.assertEqual(cache.check(0, (214, 6300), 1, sib1, 10.5), 0)
+        self.assertEqual(counter.value, 3)
+
+        # First copy after the window, with the number of suppressed copies
+        self.assertEqual(cache.check(0, (214, 6300), 3, sib1, 11.0), 2)
+        self.assertIsNone(cache.check(0, (214, 6300), 3, sib1, 11.5))
+        self.assertEqual(cache.check(0, (214, 6300), 3, sib1, 12.5), 1)
+        # Device time going backwards
+        self.assertEqual(cache.check(0, (214, 6300), 3, sib1, 5.0), 0)
+
+    def test_lru(self):
+        cache = BroadcastCache(10.0, max_entries=2)
+        self.assertEqual(cache.check(0, None, 8, b'\x01', 0.0), 0)
+        self.assertEqual(cache.check(0, None, 8, b'\x02', 0.0), 0)
+        self.assertIsNone(cache.check(0, None, 8, b'\x01', 1.0))
+        # Drops b'\x02', the least recently received message
+        self.assertEqual(cache.check(0, None, 8, b'\x03', 1.0), 0)
+        self.assertEqual(len(cache.entries), 2)
+        self.assertIsNone(cache.check(0, None, 8, b'\x01', 2.0))
+        self.assertEqual(cache.check(0, None, 8, b'\x02', 2.0), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import channels
+import util
+
+class TestChannels(unittest.TestCase):
+    tables = (channels.gsm, channels.umts, channels.lte, channels.nr)
+
+    def reference(self, table, uplink, max_channel):
+        # Band of every channel by painting the ranges in reverse order of precedence
+        bands = [None] * (max_channel + 1)
+        for band in reversed(table.bands):
+            first, last = (band.ul_first, band.ul_last) if uplink else (band.dl_first, band.dl_last)
+            if first is None:
+                continue
+            bands[first:last + 1] = [band] * (last - first + 1)
+        return bands
+
+    def channels_to_check(self, table, uplink):
+        segments = table.ul_segments if uplink else table.dl_segments
+        max_channel = segments[-1][1] + 2
+        if max_channel < 200000:
+            return range(max_channel + 1), max_channel
+        # NR: all segment bounds and a sample of the rest
+        checked = set(range(0, max_channel + 1, 101))
+        for start, end, band in segments:
+            checked |= set(range(start - 2, start + 3)) | set(range(end - 2, end + 3))
+        return sorted(checked), max_channel
+
+    def test_lookup_matches_table(self):
+        for table in self.tables:
+            for uplink in (False, True):
+                checked, max_channel = self.channels_to_check(table, uplink)
+                expected = self.reference(table, uplink, max_channel)
+                for channel in checked:
+                    self.assertIs(table.lookup(channel, uplink), expected[channel], (table.rat, uplink, channel))
+                self.assertIsNone(table.lookup(-1, uplink))
+                self.assertIsNone(table.lookup(max_channel + 1000000, uplink))
+
+    def test_segments(self):
+        for table in self.tables:
+            for starts, segments in ((table.dl_starts, table.dl_segments), (table.ul_starts, table.ul_segments)):
+                self.assertEqual(starts, [x[0] for x in segments])
+                for prev, cur in zip(segments, segments[1:]):
+                    self.assertLess(prev[1], cur[0])
+
+    def test_ul_dl_channel(self):
+        for table in self.tables:
+            for band in table.bands:
+                # Every channel, every 97th channel and the band edges of the large NR bands
+                step = 1 if band.dl_last - band.dl_first < 20000 else 97
+                for dl_channel in sorted(set(range(band.dl_first, band.dl_last + 1, step)) | {band.dl_last - 1, band.dl_last}):
+                    if table.lookup(dl_channel) is not band:
+                        continue
+                    ul_channel = table.ul_channel(dl_channel)
+                    if band.ul_first is None or dl_channel - band.dl_first > band.ul_last - band.ul_first:
+                        self.assertEqual(ul_channel, dl_channel)
+                        continue
+                    self.assertEqual(ul_channel - band.ul_first, dl_channel - band.dl_first)
+                    if table.lookup(ul_channel, True) is band:
+                        self.assertEqual(table.dl_channel(ul_channel), dl_channel)
+                        # Constant duplex spacing
+                        self.assertAlmostEqual(table.frequency(dl_channel) - table.frequency(ul_channel, True),
+                            band.dl_freq - band.ul_freq, places=3)
+
+    def test_frequency(self):
+        self.assertEqual(channels.gsm.frequency(1), 935.2)
+        self.assertEqual(channels.gsm.frequency(1, True), 890.2)
+        self.assertEqual(channels.gsm.frequency(975, True), 880.2)
+        self.assertEqual(channels.gsm.frequency(1023), 934.8)
+        self.assertEqual(channels.gsm.frequency(512), 1805.2)
+        self.assertEqual(channels.gsm.band(128), 850)
+        self.assertEqual(channels.umts.frequency(10700), 2140.0)
+        self.assertEqual(channels.umts.frequency(9750, True), 1950.0)
+        self.assertEqual(channels.umts.frequency(3000), 940.0)
+        self.assertEqual(channels.umts.frequency(1650), 2135.0)
+        self.assertEqual(channels.umts.frequency(1412, True), 1732.4)
+        self.assertEqual(channels.lte.frequency(1300), 1815.0)
+        self.assertEqual(channels.lte.frequency(19300, True), 1720.0)
+        self.assertEqual(channels.lte.frequency(6300), 806.0)
+        self.assertEqual(channels.lte.frequency(24300, True), 847.0)
+        self.assertEqual(channels.lte.frequency(38000), 2595.0)
+        self.assertEqual(channels.lte.frequency(66536), 2120.0)
+        self.assertEqual(channels.nr.frequency(632628), 3489.42)
+        self.assertEqual(channels.nr.frequency(428000), 2140.0)
+        self.assertEqual(channels.nr.frequency(2079167), 28000.08)
+        self.assertEqual(channels.nr.band(632628), 77)
+        self.assertEqual(channels.nr_frequency(632628), 3489.42)
+        self.assertIsNone(channels.lte.frequency(5000))
+
+    def test_calculate_ul_earfcn(self):
+        # Previous if/elif implementation, on the EARFCNs of the bands
+        def calculate_ul_earfcn(dl_earfcn):
+            if 0 <= dl_earfcn < 9660:
+                offset = 18000
+            elif 9769 < dl_earfcn < 9920:
+                offset = 17890
+            elif 65535 < dl_earfcn < 67136:
+                offset = 65536
+            elif 67535 < dl_earfcn < 67836:
+                offset = 65136
+            elif 68335 < dl_earfcn < 68486:
+                offset = 64636
+            elif 68585 < dl_earfcn < 69466:
+                offset = 64536
+            elif 70365 < dl_earfcn < 70596:
+                offset = 63636
+            elif 70595 < dl_earfcn < 70646:
+                offset = 63635
+            else:
+                offset = 0
+            return dl_earfcn + offset
+
+        for dl_earfcn in range(0, 71000):
+            if channels.lte.lookup(dl_earfcn) is None:
+                self.assertEqual(util.calculate_ul_earfcn(dl_earfcn), dl_earfcn)
+            else:
+                self.assertEqual(util.calculate_ul_earfcn(dl_earfcn), calculate_ul_earfcn(dl_earfcn), dl_earfcn)
+
+    def test_memoization(self):
+        table = channels.ChannelTable('LTE', channels.lte.bands)
+        table.cache_size = 4
+        self.assertEqual(table.ul_channel(300), 18300)
+        self.assertEqual(table.ul_channels, {300: 18300})
+        self.assertIsNone(table.band(5000))
+        self.assertEqual(table.dl_bands, {5000: None})
+        self.assertEqual(table.frequency(18300, True), 1950.0)
+        self.assertEqual(table.ul_frequencies, {18300: 1950.0})
+        for channel in range(10, 16):
+            self.assertEqual(table.ul_channel(channel), channel + 18000)
+        self.assertLessEqual(len(table.ul_channels), 4)
+
+    def test_gsm_helpers(self):
+        self.assertEqual(channels.unpack_arfcn_band(0x3017), (0x17, 3))
+        self.assertEqual(channels.gsmtap_arfcn(0x17, False), 0x17)
+        self.assertEqual(channels.gsmtap_arfcn(0x17, True), 0x4017)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import unittest
+import struct
+import datetime
+from collections import namedtuple
+
+from parsers.qualcomm.diag1xlogparser import Diag1xLogParser
+
+class TestDiag1xLogParser(unittest.TestCase):
+    log_header = namedtuple('QcDiagLogHeader', 'cmd_code reserved length1 length2 log_id timestamp')
+
+    def setUp(self):
+        self.parser = Diag1xLogParser(parent=None)
+
+    def ip_log(self, seq_num, segment_num, is_final, data, direction=0x40):
+        body = struct.pack('<BBBBHH', 0, 0x01, 2, direction, seq_num, segment_num | (0x8000 if is_final else 0)) + data
+        pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(body) + 12, length2=len(body) + 12, log_id=0x11eb, timestamp=0)
+        return pkt_header, body
+
+    def test_parse_ip(self):
+        ip_pkt = bytes(range(256)) * 4
+
+        result = self.parser.parse_ip(*self.ip_log(1, 0, True, ip_pkt), None)
+        self.assertEqual(result, {'up': [ip_pkt], 'ts': datetime.datetime(1980, 1, 6, 0, 0, 0)})
+
+        # Segments of two interleaved packets
+        self.assertIsNone(self.parser.parse_ip(*self.ip_log(2, 0, False, ip_pkt[0:300]), None))
+        self.assertIsNone(self.parser.parse_ip(*self.ip_log(3, 0, False, ip_pkt[0:10]), None))
+        self.assertIsNone(self.parser.parse_ip(*self.ip_log(2, 1, False, ip_pkt[300:600]), None))
+        result = self.parser.parse_ip(*self.ip_log(2, 2, True, ip_pkt[600:]), None)
+        self.assertEqual(result['up'], [ip_pkt])
+        result = self.parser.parse_ip(*self.ip_log(3, 1, True, ip_pkt[10:20]), None)
+        self.assertEqual(result['up'], [ip_pkt[0:20]])
+        self.assertEqual(self.parser.pending_pkts, {})
+
+        # Missing segment is skipped
+        self.assertIsNone(self.parser.parse_ip(*self.ip_log(4, 0, False, b'\x01\x02'), None))
+        result = self.parser.parse_ip(*self.ip_log(4, 2, True, b'\x05'), None)
+        self.assertEqual(result['up'], [b'\x01\x02\x05'])
+
+if __name__ == '__main__':
+    unittest.main()
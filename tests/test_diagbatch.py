@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import unittest
+import binascii
+import struct
+
+import measstore
+from parsers.qualcomm.qualcommparser import QualcommParser
+
+try:
+    import numpy
+    from parsers.qualcomm import diagbatch
+except ImportError:
+    numpy = None
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestDiagBatchDecoder(unittest.TestCase):
+    scell_meas_v4 = binascii.unhexlify('040100009C18D60AECC44E00E2244E00FFFCE30FFED80A0047AD56021D310100A2624100')
+    scell_meas_v5 = binascii.unhexlify('05010000160d0000d40e00004bb444005444450039e514133149070048adfe019f310100a23f0000')
+    burst_metric = binascii.unhexlify('03c30407002580985c3f0036fb2b0048fe040000008e6e00c4040700258066a8390031fbfe00e2fd02000000af4f0000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000ff0000')
+    new_burst_metric = binascii.unhexlify('0403c30407002580985c3f0036fb2b0048fe040000008e6e00003ed6a5000000605f0000000000c4040700258066a8390031fbfe00e2fd02000000af4f0000088777000000ad0000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000050500000000000ff0000')
+
+    ncell_v4 = binascii.unhexlify('040100009C1847008348E44DDEA44C00CAB4CC32B6D8420300000000FF773301FF77330122020100')
+    ncell_v5 = binascii.unhexlify('05010000160d0000480000006cea413bb4433b00b4f3cc33cf3c130200000000ffefc00fffefc00f45081600')
+
+    def ncell_body(self, pcis):
+        # Version 4 body with one cell per PCI, other fields copied from ncell_v4
+        cells = b''.join(struct.pack('<L', (struct.unpack('<L', self.ncell_v4[8:12])[0] & ~0x1ff) | pci) + self.ncell_v4[12:40] for pci in pcis)
+        return self.ncell_v4[0:6] + struct.pack('<H', (len(pcis) << 6) | (self.ncell_v4[6] & 0x3f)) + cells
+
+    def log_pkt(self, log_id, ts, body):
+        return struct.pack('<BBHHHQ', 0x10, 0, len(body) + 12, len(body) + 12, log_id, ts) + body
+
+    def create_parser(self, batch_size):
+        store = measstore.MeasurementStore()
+        parser = QualcommParser()
+        parser.set_parameter({'meas-store': store, 'meas-stdout': False, 'meas-batch': batch_size})
+        return parser, store
+
+    def decode(self, parser, pkts):
+        for pkt in pkts:
+            parse_result = parser.parse_diag_log(pkt)
+            if parse_result is not None:
+                parser.postprocess_parse_result(parse_result)
+        parser.flush_meas_batch()
+
+    def test_batch_matches_handlers(self):
+        pkts = []
+        for i in range(10):
+            ts = (1000000 + i * 8) << 16
+            pkts.append(self.log_pkt(0xB17F, ts, self.scell_meas_v4 if i % 3 else self.scell_meas_v5))
+            pkts.append(self.log_pkt(0x506C, ts + 1, self.burst_metric))
+            pkts.append(self.log_pkt(0x506A, ts + 2, self.new_burst_metric))
+            pkts.append(self.log_pkt(0xB180, ts + 3, (self.ncell_v4, self.ncell_v5, self.ncell_body(range(i)))[i % 3]))
+
+        batch_parser, batch_store = self.create_parser(4)
+        self.decode(batch_parser, pkts)
+        self.assertEqual(len(batch_parser.meas_batch.buckets), 0)
+        parser, store = self.create_parser(0)
+        self.assertIsNone(parser.meas_batch)
+        self.decode(parser, pkts)
+
+        expected = store.to_numpy()
+        result = batch_store.to_numpy()
+        self.assertEqual(sorted(result.keys()), sorted(expected.keys()))
+        self.assertIn('GsmBurstMetrics.r0.cells', result)
+        self.assertIn('LteNcellMeas.r0.cells', result)
+        for table_name, columns in expected.items():
+            self.assertEqual(list(result[table_name].keys()), list(columns.keys()))
+            for column_name, column in columns.items():
+                self.assertEqual(result[table_name][column_name].dtype, column.dtype, column_name)
+                numpy.testing.assert_allclose(result[table_name][column_name], column, rtol=0, atol=1e-6, err_msg=column_name)
+
+    def test_timestamp_order(self):
+        parser, store = self.create_parser(3)
+        pkts = [self.log_pkt(0xB17F, x << 16, self.scell_meas_v4) for x in (5, 3, 4, 1, 2)]
+        # Unknown version and truncated body are decoded by the handler
+        pkts.append(self.log_pkt(0xB17F, 6 << 16, b'\x06' + self.scell_meas_v4[1:]))
+        self.assertFalse(parser.meas_batch.add(0xB17F, 0, self.scell_meas_v4[:20]))
+        self.decode(parser, pkts)
+
+        ts = store.to_numpy()['LteScellMeas.r0']['ts']
+        self.assertEqual(len(ts), 5)
+        # First bucket is sorted on its own, then the rest at the final flush
+        self.assertTrue(ts[0] < ts[1] < ts[2])
+        self.assertTrue(ts[3] < ts[4])
+
+    def test_ncell_meas(self):
+        parser, store = self.create_parser(3)
+        bodies = [self.ncell_body(range(10, 13)), self.ncell_body([]), self.ncell_body([20]), self.ncell_body([30, 31])]
+        pkts = [self.log_pkt(0xB180, x << 16, y) for x, y in zip((4, 3, 2, 1), bodies)]
+        # Unknown version and truncated body are decoded by the handler
+        self.assertFalse(parser.meas_batch.add(0xB180, 0, b'\x06' + self.ncell_v4[1:]))
+        self.assertFalse(parser.meas_batch.add(0xB180, 0, self.ncell_body([1, 2])[:60]))
+        self.decode(parser, pkts)
+
+        result = store.to_numpy()
+        ts = result['LteNcellMeas.r0']['ts']
+        self.assertTrue(ts[0] < ts[1] < ts[2])
+        self.assertEqual(result['LteNcellMeas.r0']['earfcn'].tolist(), [6300] * 4)
+        cells = result['LteNcellMeas.r0.cells']
+        # First bucket sorted by timestamp, then the last body at the final flush
+        self.assertEqual(cells['pci'].tolist(), [20, 10, 11, 12, 30, 31])
+        self.assertEqual(cells['row'].tolist(), [0, 2, 2, 2, 3, 3])
+
+    def test_layouts(self):
+        for (log_id, version), layout in diagbatch.batch_layouts.items():
+            self.assertGreaterEqual(layout.min_size, max(x[1] + numpy.dtype(x[2]).itemsize for x in layout.fields))
+
+if __name__ == '__main__':
+    unittest.main()
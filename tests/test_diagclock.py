@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import util
+from parsers.qualcomm.diagclock import DiagDeviceClock
+
+class TestDiagDeviceClock(unittest.TestCase):
+    def test_extend(self):
+        clock = DiagDeviceClock()
+        self.assertIsNone(clock.extend(0x1234))
+        self.assertIsNone(clock.now())
+
+        clock.update(0x12345678abcd)
+        self.assertEqual(clock.now(), util.parse_qxdm_ts(0x12345678abcd))
+        self.assertEqual(clock.extend(0x5680), 0x123456800000)
+        # Slightly older than the last timestamp
+        self.assertEqual(clock.extend(0x5600), 0x123456000000)
+
+    def test_wrap_around(self):
+        clock = DiagDeviceClock()
+        clock.update(0x1234fff00000)
+        self.assertEqual(clock.extend(0x0010), 0x123500100000)
+        self.assertEqual(clock.extend(0xfff8), 0x1234fff80000)
+        self.assertEqual(clock.now(), util.parse_qxdm_ts(0x1234fff80000))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import tempfile
+import queue
+import struct
+
+import util
+from parsers.qualcomm import diagcmd
+from parsers.qualcomm.diagcmdchannel import DiagCommandChannel
+from parsers.qualcomm.diagcapcache import DiagCapabilityCache
+from parsers.qualcomm.qualcommparser import QualcommParser
+
+class FakeDiagDevice:
+    # Answers DIAG commands from a table: command code -> list of raw responses (None for no response),
+    # or a function returning the response to a command
+    def __init__(self, responses):
+        self.responses = responses
+        self.rx = queue.Queue()
+        self.written = []
+        self.block_until_data = True
+
+    def write(self, write_buf, encode_hdlc=False):
+        pkt = util.unwrap(write_buf[:-1])[:-2]
+        self.written.append(pkt)
+        resp = None
+        if callable(self.responses.get(pkt[0])):
+            resp = self.responses[pkt[0]](pkt)
+        elif pkt[0] in self.responses and len(self.responses[pkt[0]]) > 0:
+            resp = self.responses[pkt[0]].pop(0)
+        if resp is not None:
+            self.rx.put(util.generate_packet(resp))
+
+    def read(self, read_size, decode_hdlc=False):
+        try:
+            return self.rx.get(timeout=0.05)
+        except queue.Empty:
+            return b''
+
+class TestDiagCommandChannel(unittest.TestCase):
+    def test_matching(self):
+        log_pkt = struct.pack('<BBHHHQ', 0x10, 0, 12, 12, 0xb0c0, 0)
+        device = FakeDiagDevice({
+            diagcmd.DIAG_VERNO_F: [b'\x00version'],
+            diagcmd.DIAG_EXT_MSG_CONFIG_F: [b'\x7d\x01first', b'\x7d\x01second'],
+            diagcmd.DIAG_LOG_CONFIG_F: [b'\x13\x73\x00\x00\x00'],
+            diagcmd.DIAG_EVENT_REPORT_F: [None],
+        })
+        unsolicited = []
+        # A log packet left over from a previous session
+        device.rx.put(util.generate_packet(log_pkt))
+
+        with DiagCommandChannel(device, timeout=0.2, unsolicited=unsolicited.append) as channel:
+            ver_cmd = channel.send(b'\x00', 'version')
+            first_cmd = channel.send(b'\x7d\x01', 'first')
+            second_cmd = channel.send(b'\x7d\x01', 'second')
+            log_config_cmd = channel.send(struct.pack('<LL', diagcmd.DIAG_LOG_CONFIG_F, 0), 'log config')
+            event_cmd = channel.send(b'\x60\x00', 'event report')
+            failed = channel.wait()
+
+        self.assertEqual(ver_cmd.response, b'\x00version')
+        self.assertEqual(first_cmd.response, b'\x7d\x01first')
+        self.assertEqual(second_cmd.response, b'\x7d\x01second')
+        self.assertEqual(log_config_cmd.error, 'error response 0x13')
+        self.assertTrue(event_cmd.error.startswith('timeout'))
+        self.assertEqual(set(failed), {log_config_cmd, event_cmd})
+        self.assertEqual(unsolicited, [log_pkt])
+
+    def test_init_diag(self):
+        device = FakeDiagDevice({
+            diagcmd.DIAG_EXT_MSG_CONFIG_F: [struct.pack('<BBHHHHHHH', 0x7d, 0x01, 0, 2, 0, 0, 10, 500, 510)] + [b'\x7d\x04'] * 2,
+        })
+        parser = QualcommParser()
+        parser.set_io_device(device)
+        parser.command_timeout = 0.1
+        parser.init_diag()
+
+        self.assertEqual(parser.emr_id_range, [(0, 10), (500, 510)])
+        # Masks of both reported ranges are cleared after the range query
+        ext_msg_masks = [x for x in device.written if x[0:2] == b'\x7d\x04']
+        self.assertEqual([struct.unpack('<HH', x[2:6]) for x in ext_msg_masks], [(0, 10), (500, 510)])
+
+class TestDiagCapabilityCache(unittest.TestCase):
+    ext_msg_ranges = struct.pack('<BBHHHHHHH', 0x7d, 0x01, 0, 2, 0, 0, 10, 500, 510)
+
+    def create_device(self, ext_msg_config):
+        def log_config(pkt):
+            if struct.unpack('<L', pkt[4:8])[0] == diagcmd.LOG_CONFIG_RETRIEVE_ID_RANGES_OP:
+                return pkt[0:8] + struct.pack('<LLL', 0, 0x1000, 0x0200)
+            return pkt[0:8] + b'\x00' * 4
+
+        return FakeDiagDevice({
+            diagcmd.DIAG_VERNO_F: lambda pkt: b'\x00' + b'Jan 01 2023' + b'12:00:00' + b'Jan 01 2023' + b'12:00:00' + b'MSM8996 ',
+            diagcmd.DIAG_EXT_BUILD_ID_F: lambda pkt: b'\x7c' + b'\x00' * 11 + b'TEST.BUILD.1\x00\x00',
+            diagcmd.DIAG_LOG_CONFIG_F: log_config,
+            diagcmd.DIAG_EXT_MSG_CONFIG_F: ext_msg_config,
+        })
+
+    def ext_msg_config(self, pkt):
+        if pkt[1] == 0x01:
+            return self.ext_msg_ranges
+        elif pkt[1] == 0x02:
+            start, end = struct.unpack('<HH', pkt[2:6])
+            return struct.pack('<BBHHH', 0x7d, 0x02, start, end, 0) + struct.pack('<L', 0x1f) * (end - start + 1)
+        return pkt[0:2]
+
+    def run_session(self, device, cache_fname, params={}):
+        parser = QualcommParser()
+        parser.set_io_device(device)
+        parser.command_timeout = 0.1
+        parser.set_parameter(dict({'capability-cache': cache_fname, 'msgs': True}, **params))
+        parser.init_diag()
+        parser.prepare_diag()
+        return parser
+
+    def discovery_cmds(self, device):
+        return [x for x in device.written if x[0:2] == b'\x7d\x01' or x[0:2] == b'\x7d\x02' or x[0:8] == struct.pack('<LL', 0x73, 1)]
+
+    def log_mask_equip_ids(self, device):
+        # Equipment IDs of the non-empty log masks, the empty ones are sent by init_diag()
+        return [struct.unpack('<L', x[8:12])[0] for x in device.written
+            if x[0:8] == struct.pack('<LL', 0x73, diagcmd.LOG_CONFIG_SET_MASK_OP) and any(x[16:])]
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_fname = os.path.join(tmpdir, 'caps.json')
+
+            device = self.create_device(self.ext_msg_config)
+            self.run_session(device, cache_fname)
+            self.assertEqual(len(self.discovery_cmds(device)), 4)
+            # Only equipment IDs with log items get a log mask
+            self.assertEqual(self.log_mask_equip_ids(device), [diagcmd.DIAG_SUBSYS_ID_1X])
+            cache = DiagCapabilityCache(cache_fname)
+            self.assertEqual(len(cache.entries), 1)
+            capabilities = list(cache.entries.values())[0]['capabilities']
+            self.assertEqual(capabilities['log_id_range'], [[0, 0x1000], [1, 0x200]])
+            self.assertEqual(capabilities['emr_id_range'], [[0, 10], [500, 510]])
+
+            # Same firmware: masks are pushed without discovery
+            device = self.create_device(self.ext_msg_config)
+            parser = self.run_session(device, cache_fname)
+            self.assertEqual(self.discovery_cmds(device), [])
+            self.assertEqual(parser.emr_id_range, [(0, 10), (500, 510)])
+            ext_msg_masks = [x for x in device.written if x[0:2] == b'\x7d\x04' and struct.unpack('<L', x[8:12])[0] == 0x1f]
+            self.assertEqual(len(ext_msg_masks), 2)
+            self.assertEqual(parser.log_id_range, {0: 0x1000, 1: 0x200})
+            self.assertEqual(self.log_mask_equip_ids(device), [diagcmd.DIAG_SUBSYS_ID_1X])
+
+            # Invalidate flag forces discovery
+            device = self.create_device(self.ext_msg_config)
+            self.run_session(device, cache_fname, {'invalidate-capability-cache': True})
+            self.assertEqual(len(self.discovery_cmds(device)), 4)
+
+    def test_cache_mismatch(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_fname = os.path.join(tmpdir, 'caps.json')
+            self.run_session(self.create_device(self.ext_msg_config), cache_fname)
+
+            # The device rejects the cached SSID ranges
+            self.ext_msg_ranges = struct.pack('<BBHHHHH', 0x7d, 0x01, 0, 1, 0, 0, 20)
+            def ext_msg_config(pkt):
+                if pkt[1] == 0x04 and struct.unpack('<H', pkt[2:4])[0] == 500:
+                    return b'\x14' + pkt
+                return self.ext_msg_config(pkt)
+            device = self.create_device(ext_msg_config)
+            parser = self.run_session(device, cache_fname)
+            self.assertEqual(parser.emr_id_range, [(0, 20)])
+            capabilities = list(DiagCapabilityCache(cache_fname).entries.values())[0]['capabilities']
+            self.assertEqual(capabilities['emr_id_range'], [[0, 20]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,8 @@ import binascii
 import datetime
 from collections import namedtuple
 
+import measurements
+
 from parsers.qualcomm.diaggsmlogparser import DiagGsmLogParser
 
 class TestDiagGsmLogParser(unittest.TestCase):
@@ -26,20 +28,24 @@ class TestDiagGsmLogParser(unittest.TestCase):
     def test_parse_gsm_l1_burst_metric(self):
         payload = binascii.unhexlify('03c30407002580985c3f0036fb2b0048fe040000008e6e00c4040700258066a8390031fbfe00e2fd02000000af4f0000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000ff0000')
         result = self.parser.parse_gsm_l1_burst_metric(None, payload, None)
-        expected = {'stdout': 'GSM Serving Cell Burst Metric: ARFCN 37/BC 8, RSSI 4152472, RxPwr -76.62\nGSM Serving Cell Burst Metric: ARFCN 37/BC 8, RSSI 3778662, RxPwr -76.94'}
-        self.assertDictEqual(result, expected)
+        expected = 'GSM Serving Cell Burst Metric: ARFCN 37/BC 8, RSSI 4152472, RxPwr -76.62\nGSM Serving Cell Burst Metric: ARFCN 37/BC 8, RSSI 3778662, RxPwr -76.94'
+        self.assertEqual(measurements.format_meas(result['meas'][0]), expected)
+        self.assertEqual(result['meas'][0].channel, 3)
+        self.assertEqual(result['meas'][0].rxpwr, (-76.625, -76.9375, 0.0, 0.0))
 
     def test_parse_gsm_l1_new_burst_metric(self):
         payload = binascii.unhexlify('0403c30407002580985c3f0036fb2b0048fe040000008e6e00003ed6a5000000605f0000000000c4040700258066a8390031fbfe00e2fd02000000af4f0000088777000000ad0000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000050500000000000ff0000')
         result = self.parser.parse_gsm_l1_new_burst_metric(None, payload, None)
-        expected = {'stdout': 'GSM Serving Cell New Burst Metric: ARFCN 37/BC 8, RSSI 4152472, RxPwr -76.62\nGSM Serving Cell New Burst Metric: ARFCN 37/BC 8, RSSI 3778662, RxPwr -76.94'}
-        self.assertDictEqual(result, expected)
+        expected = 'GSM Serving Cell New Burst Metric: ARFCN 37/BC 8, RSSI 4152472, RxPwr -76.62\nGSM Serving Cell New Burst Metric: ARFCN 37/BC 8, RSSI 3778662, RxPwr -76.94'
+        self.assertEqual(measurements.format_meas(result['meas'][0]), expected)
+        self.assertEqual(result['meas'][0].arfcn, (37, 37, 0, 0))
 
     def test_parse_gsm_l1_serv_aux_meas(self):
         payload = binascii.unhexlify('34fb00')
         result = self.parser.parse_gsm_l1_serv_aux_meas(None, payload, None)
-        expected = {'stdout': 'GSM Serving Cell Aux Measurement: RxPwr -76.75'}
+        expected = {'meas': [measurements.GsmServAuxMeas(rxpwr=-76.75, snr_is_bad=0)]}
         self.assertDictEqual(result, expected)
+        self.assertEqual(measurements.format_meas(result['meas'][0]), 'GSM Serving Cell Aux Measurement: RxPwr -76.75')
 
     def test_parse_gsm_l1_surround_cell_ba(self):
         payload = binascii.unhexlify('0a048020f900000000000000000a8020f900000000000000000c8020f90000000000000000108020f900000000000000001f8020f900000000000000002a8020f900000000000000002b8020f900000000000000002d8020f900000000000000002f8020f90000000000000000318020f90000000000000000')
@@ -50,13 +56,14 @@ class TestDiagGsmLogParser(unittest.TestCase):
     def test_parse_gsm_l1_neig_aux_meas(self):
         payload = binascii.unhexlify('062a806cf9318058f92b805df92d805df92f805cf90c80dcf8')
         result = self.parser.parse_gsm_l1_neig_aux_meas(None, payload, None)
-        expected = {'stdout': 'GSM Neighbor Cell Aux: 6 cells\nGSM Neighbor Cell Aux 0: ARFCN 42/BC 8, RxPwr -105.25\nGSM Neighbor Cell Aux 1: ARFCN 49/BC 8, RxPwr -106.50\nGSM Neighbor Cell Aux 2: ARFCN 43/BC 8, RxPwr -106.19\nGSM Neighbor Cell Aux 3: ARFCN 45/BC 8, RxPwr -106.19\nGSM Neighbor Cell Aux 4: ARFCN 47/BC 8, RxPwr -106.25\nGSM Neighbor Cell Aux 5: ARFCN 12/BC 8, RxPwr -114.25'}
-        self.assertDictEqual(result, expected)
+        self.assertEqual(result['meas'][0].arfcn, (42, 49, 43, 45, 47, 12))
+        expected = 'GSM Neighbor Cell Aux: 6 cells\nGSM Neighbor Cell Aux 0: ARFCN 42/BC 8, RxPwr -105.25\nGSM Neighbor Cell Aux 1: ARFCN 49/BC 8, RxPwr -106.50\nGSM Neighbor Cell Aux 2: ARFCN 43/BC 8, RxPwr -106.19\nGSM Neighbor Cell Aux 3: ARFCN 45/BC 8, RxPwr -106.19\nGSM Neighbor Cell Aux 4: ARFCN 47/BC 8, RxPwr -106.25\nGSM Neighbor Cell Aux 5: ARFCN 12/BC 8, RxPwr -114.25'
+        self.assertEqual(measurements.format_meas(result['meas'][0]), expected)
 
         payload = binascii.unhexlify('030a80fff80c8019f910800af9')
         result = self.parser.parse_gsm_l1_neig_aux_meas(None, payload, None)
-        expected = {'stdout': 'GSM Neighbor Cell Aux: 3 cells\nGSM Neighbor Cell Aux 0: ARFCN 10/BC 8, RxPwr -112.06\nGSM Neighbor Cell Aux 1: ARFCN 12/BC 8, RxPwr -110.44\nGSM Neighbor Cell Aux 2: ARFCN 16/BC 8, RxPwr -111.38'}
-        self.assertDictEqual(result, expected)
+        expected = 'GSM Neighbor Cell Aux: 3 cells\nGSM Neighbor Cell Aux 0: ARFCN 10/BC 8, RxPwr -112.06\nGSM Neighbor Cell Aux 1: ARFCN 12/BC 8, RxPwr -110.44\nGSM Neighbor Cell Aux 2: ARFCN 16/BC 8, RxPwr -111.38'
+        self.assertEqual(measurements.format_meas(result['meas'][0]), expected)
 
     def test_parse_gsm_rr_msg(self):
         payload = binascii.unhexlify('811b1749061b761762f2200141c8010a156544b800004e072b2b')
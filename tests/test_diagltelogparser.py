@@ -5,6 +5,8 @@ import binascii
 import datetime
 from collections import namedtuple
 
+import measurements
+
 from parsers.qualcomm.diagltelogparser import DiagLteLogParser
 
 class TestDiagLteLogParser(unittest.TestCase):
@@ -14,26 +16,29 @@ class TestDiagLteLogParser(unittest.TestCase):
     # LTE ML1
     def test_parse_lte_ml1_scell_meas(self):
         result = self.parser.parse_lte_ml1_scell_meas(None, binascii.unhexlify('040100009C18D60AECC44E00E2244E00FFFCE30FFED80A0047AD56021D310100A2624100'), None)
-        self.assertEqual(result['stdout'], 'LTE SCell: EARFCN 6300, PCI 214, Measured RSRP -101.25, Measured RSSI -66.62')
+        self.assertEqual(measurements.format_meas(result['meas'][0]), 'LTE SCell: EARFCN 6300, PCI 214, Measured RSRP -101.25, Measured RSSI -66.62')
+        self.assertEqual((result['meas'][0].earfcn, result['meas'][0].pci, result['meas'][0].rsrp), (6300, 214, -101.25))
 
         result = self.parser.parse_lte_ml1_scell_meas(None, binascii.unhexlify('05010000160d0000d40e00004bb444005444450039e514133149070048adfe019f310100a23f0000'), None)
-        self.assertEqual(result['stdout'], 'LTE SCell: EARFCN 3350, PCI 212, Measured RSRP -111.31, Measured RSSI -80.88')
+        self.assertEqual(measurements.format_meas(result['meas'][0]), 'LTE SCell: EARFCN 3350, PCI 212, Measured RSRP -111.31, Measured RSSI -80.88')
 
     def test_parse_lte_ml1_ncell_meas(self):
         result = self.parser.parse_lte_ml1_ncell_meas(None, binascii.unhexlify('040100009C1847008348E44DDEA44C00CAB4CC32B6D8420300000000FF773301FF77330122020100'), None)
-        self.assertEqual(result['stdout'], 'LTE NCell: EARFCN 6300, number of cells: 1\n└── Neighbor cell 0: PCI 131, RSRP -102.12, RSSI -75.75')
+        self.assertEqual(measurements.format_meas(result['meas'][0]), 'LTE NCell: EARFCN 6300, number of cells: 1\n└── Neighbor cell 0: PCI 131, RSRP -102.12, RSSI -75.75')
+        self.assertEqual(result['meas'][0].pci, (131, ))
+        self.assertEqual(result['meas'][0].rsrp, (-102.125, ))
 
         result = self.parser.parse_lte_ml1_ncell_meas(None, binascii.unhexlify('05010000160d0000480000006cea413bb4433b00b4f3cc33cf3c130200000000ffefc00fffefc00f45081600'), None)
-        self.assertEqual(result['stdout'], 'LTE NCell: EARFCN 3350, number of cells: 1\n└── Neighbor cell 0: PCI 108, RSRP -120.75, RSSI -94.69')
+        self.assertEqual(measurements.format_meas(result['meas'][0]), 'LTE NCell: EARFCN 3350, number of cells: 1\n└── Neighbor cell 0: PCI 108, RSRP -120.75, RSSI -94.69')
 
     def test_parse_lte_ml1_scell_meas_response(self):
         payload = binascii.unhexlify('0101ffff19240c024006000001000300a01100008f2200000acc030005e6811490ca1200b2a445005a04000000202300b2744a00fef8930449000000fef8e30e440a150000000000a10200000000fbff2c002e000100586412770000ca0c0000a78c0000000000006f00000004000000a428000000000000b7fffffffe0000005ffcfffff0edffff0000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000')
         result = self.parser.parse_lte_ml1_scell_meas_response(None, payload, None)
-        self.assertEqual(result['stdout'], 'LTE ML1 SCell Meas Response: EARFCN 1600, Number of cells = 1, Valid RX = 3\nLTE ML1 SCell Meas Response (Cell 0): PCI 416, Serving cell index 0, is_serving_cell = 1')
+        self.assertEqual(measurements.format_meas(result['meas'][0]), 'LTE ML1 SCell Meas Response: EARFCN 1600, Number of cells = 1, Valid RX = 3\nLTE ML1 SCell Meas Response (Cell 0): PCI 416, Serving cell index 0, is_serving_cell = 1')
 
         payload = binascii.unhexlify('0101e4a419302801a4050000020003000001ffff5e120000ed070000f2150500f98a6a1fed9f1200a8e44300390400006009960000702200a7844a001861640ff6000000186154111fc20e00000000001f02000005000a00000000002c00360000000000000068186b0d0a002ee806002d3902000000000049070000870400001f150200000000005700000018010000990800008506000000000000000000005d020000ed0b0000ee150500f78a6a1fedc71100a8943a00390400006009960000101f0071644700e594e3088e000000e594830d1c5a0d00000000001c02000005000a00000000002c00360000000000000070189bc100002e310000bc020100000000006f00000010000000a4a000000000000057000000e50000009c0800008a0600000000000000000000')
         result = self.parser.parse_lte_ml1_scell_meas_response(None, payload, None)
-        self.assertEqual(result['stdout'], 'LTE ML1 SCell Meas Response: EARFCN 1444, Number of cells = 2, Valid RX = 3\nLTE ML1 SCell Meas Response (Cell 0): PCI 94, Serving cell index 1, is_serving_cell = 1\nLTE ML1 SCell Meas Response (Cell 1): PCI 93, Serving cell index 1, is_serving_cell = 0')
+        self.assertEqual(measurements.format_meas(result['meas'][0]), 'LTE ML1 SCell Meas Response: EARFCN 1444, Number of cells = 2, Valid RX = 3\nLTE ML1 SCell Meas Response (Cell 0): PCI 94, Serving cell index 1, is_serving_cell = 1\nLTE ML1 SCell Meas Response (Cell 1): PCI 93, Serving cell index 1, is_serving_cell = 0')
 
     def test_parse_lte_ml1_cell_info(self):
         payload = binascii.unhexlify('0164A4011405244241050000D32D000080533D00000000000000A4A91DFF0100')
@@ -106,10 +111,47 @@ class TestDiagLteLogParser(unittest.TestCase):
         self.assertDictEqual(result, expected)
 
     def test_parse_lte_mac_ul_block(self):
-        binascii.unhexlify('01010000080244000302000100372771000147000304093e3a21211f0000001702000200462757000052000204053e1f00000002000700512779000074000004053e1f0000005700')
-        binascii.unhexlify('0101fc91080248011401000700d32735000100000000010401000000d42741000100000000010401000100d52735000100000000010401000200d62735000100000000010401000300d72735000100000000033a040701000400d82735000100000000010401000500d92735000100000000010401000600e02735000100000000010401000700e12741000100000103033d041b01000000e22741000100000000010401000100e32747000100000000010401000200e42741000100000000010401000300e52741000100000000010401000400e62741000100000000010401000500e72741000100000005033d041401000600e82741000100000000010401000700e92741000100000000010401000000f02751000106000004073e24441f00000001000100f12747000140000203053d24021f0001000700532820000117000203073d3a24021f000c00')
+        payload = binascii.unhexlify('01010000080244000302000100372771000147000304093e3a21211f0000001702000200462757000052000204053e1f00000002000700512779000074000004053e1f0000005700')
+        pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb064, timestamp=0)
+        result = self.parser.parse_lte_mac_ul_block(pkt_header, payload, None)
+        expected = {'cp': [binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010003042737013e3a21211f00000017'),
+            binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010003042746013e1f000000'),
+            binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010003042751013e1f000000')],
+            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
+        self.assertDictEqual(result, expected)
+
+        payload = binascii.unhexlify('0101fc91080248011401000700d32735000100000000010401000000d42741000100000000010401000100d52735000100000000010401000200d62735000100000000010401000300d72735000100000000033a040701000400d82735000100000000010401000500d92735000100000000010401000600e02735000100000000010401000700e12741000100000103033d041b01000000e22741000100000000010401000100e32747000100000000010401000200e42741000100000000010401000300e52741000100000000010401000400e62741000100000000010401000500e72741000100000005033d041401000600e82741000100000000010401000700e92741000100000000010401000000f02751000106000004073e24441f00000001000100f12747000140000203053d24021f0001000700532820000117000203073d3a24021f000c00')
+        pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb064, timestamp=0)
+        result = self.parser.parse_lte_mac_ul_block(pkt_header, payload, None)
+        self.assertEqual(len(result['cp']), 20)
+        self.assertEqual(result['cp'][0], binascii.unhexlify('03070e000000000000000000000000000000000012d53d80000000000100030427d30104'))
+        self.assertEqual(result['cp'][19], binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010003042853013d3a24021f000c'))
+        # GSMTAP header is shared by all samples, MAC-LTE header prefix by direction and RNTI type
+        self.assertTrue(all(x[:32] == result['cp'][0][:32] for x in result['cp']))
+        self.assertIs(self.parser.lte_mac_header(False, 0), self.parser.lte_mac_header(False, 0))
+        # T-C-RNTI is sent as C-RNTI
+        self.assertEqual(self.parser.lte_mac_header(False, 0), self.parser.lte_mac_header(False, 4))
 
     # LTE PDCP
+    def test_parse_lte_pdcp_dl_cip(self):
+        payload = binascii.unhexlify('01012200c31848008e578abfbe9db23813be851295189a29554c9b9c2d35a9f8d9284dcf08eb094003030200214008000300172202000000'
+            '0002f4ce224207000300172200000000000028e0')
+        pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0a3, timestamp=0)
+        result = self.parser.parse_lte_pdcp_dl_cip(pkt_header, payload, None)
+        ws_hdr = binascii.unhexlify('00010002050301040101')
+        self.assertEqual(result['up'], [b'pdcp-lte' + ws_hdr + b'\x02\xf4\xce', b'pdcp-lte' + ws_hdr + b'\x00\x28\xe0'])
+        self.assertEqual(result['ts'], datetime.datetime(1980, 1, 6, 0, 0, 0))
+
+    def test_parse_lte_pdcp_ul_cip(self):
+        payload = binascii.unhexlify('01010000c31a4c008e578abfbe9db23813be851295189a29554c9b9c2d35a9f8d9284dcf08eb0940030302000447'
+            '2e0404001022000000000080006000'
+            '04472e04040018220100000000800160008000')
+        pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0b3, timestamp=0)
+        result = self.parser.parse_lte_pdcp_ul_cip(pkt_header, payload, None)
+        ws_hdr = binascii.unhexlify('000200020c030001')
+        self.assertEqual(result['up'], [b'pdcp-lte' + ws_hdr + b'\x80\x00\x60\x00', b'pdcp-lte' + ws_hdr + b'\x80\x01\x60\x00'])
+        self.assertIs(self.parser.pdcp_lte_header(3, 0, 2), self.parser.pdcp_lte_header(3, 0, 2))
+
 
     # LTE RRC
     def test_parse_lte_rrc(self):
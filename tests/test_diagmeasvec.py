@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import unittest
+import binascii
+import struct
+
+import measstore
+from parsers.qualcomm.diagltelogparser import DiagLteLogParser
+
+try:
+    from parsers.qualcomm import diagmeasvec
+except ImportError:
+    diagmeasvec = None
+
+@unittest.skipIf(diagmeasvec is None, 'NumPy is not installed')
+class TestDiagMeasVec(unittest.TestCase):
+    ncell_v4 = binascii.unhexlify('040100009C1847008348E44DDEA44C00CAB4CC32B6D8420300000000FF773301FF77330122020100')
+    ncell_v5 = binascii.unhexlify('05010000160d0000480000006cea413bb4433b00b4f3cc33cf3c130200000000ffefc00fffefc00f45081600')
+    scell_response_v48 = binascii.unhexlify('0101e4a419302801a4050000020003000001ffff5e120000ed070000f2150500f98a6a1fed9f1200a8e44300390400006009960000702200a7844a001861640ff6000000186154111fc20e00000000001f02000005000a00000000002c00360000000000000068186b0d0a002ee806002d3902000000000049070000870400001f150200000000005700000018010000990800008506000000000000000000005d020000ed0b0000ee150500f78a6a1fedc71100a8943a00390400006009960000101f0071644700e594e3088e000000e594830d1c5a0d00000000001c02000005000a00000000002c00360000000000000070189bc100002e310000bc020100000000006f00000010000000a4a000000000000057000000e50000009c0800008a0600000000000000000000')
+
+    def setUp(self):
+        self.parser = DiagLteLogParser(parent=None)
+        self.fallback_parser = DiagLteLogParser(parent=None)
+        self.fallback_parser.meas_vec = False
+
+    def ncell_body(self, pcis):
+        # Version 4 body with one cell per PCI, other fields copied from ncell_v4
+        cells = b''
+        for i, pci in enumerate(pcis):
+            val0 = (struct.unpack('<L', self.ncell_v4[8:12])[0] & ~0x1ff) | pci
+            cells += struct.pack('<L', val0) + self.ncell_v4[12:28] + struct.pack('<LL', i, i << 11) + self.ncell_v4[36:40]
+        q_rxlevmin_n_cells = (len(pcis) << 6) | (self.ncell_v4[6] & 0x3f)
+        return self.ncell_v4[0:6] + struct.pack('<H', q_rxlevmin_n_cells) + cells
+
+    def test_ncell_meas(self):
+        for payload in (self.ncell_v4, self.ncell_v5, self.ncell_body([]), self.ncell_body(range(0, 504, 7))):
+            result = self.parser.parse_lte_ml1_ncell_meas(None, payload, None)
+            expected = self.fallback_parser.parse_lte_ml1_ncell_meas(None, payload, None)
+            self.assertEqual(result, expected)
+            self.assertTrue(all(type(x) == tuple for x in result['meas'][0][2:]))
+
+    def test_scell_meas_response(self):
+        result = self.parser.parse_lte_ml1_scell_meas_response(None, self.scell_response_v48, None)
+        expected = self.fallback_parser.parse_lte_ml1_scell_meas_response(None, self.scell_response_v48, None)
+        self.assertEqual(result, expected)
+        self.assertEqual(result['meas'][0].pci, (94, 93))
+
+    def test_ncell_meas_batch(self):
+        payloads = [self.ncell_v4, b'\x03' + self.ncell_v4[1:], self.ncell_body(range(10)), self.ncell_v5,
+            # Truncated in the middle of the second cell
+            self.ncell_body([1, 2])[:60]]
+        result = diagmeasvec.decode_ncell_meas_batch(payloads)
+        self.assertEqual(len(result), len(payloads))
+        self.assertIsNone(result[1])
+        for payload, meas in zip(payloads[0:1] + payloads[2:4], result[0:1] + result[2:4]):
+            expected = self.fallback_parser.parse_lte_ml1_ncell_meas(None, payload, None)['meas'][0]
+            self.assertEqual(tuple(x if type(x) == int else tuple(x.tolist()) for x in meas), expected)
+        self.assertEqual(result[4].pci.tolist(), [1])
+
+        store = measstore.MeasurementStore()
+        for meas in result[0:1] + result[2:]:
+            store.append(meas)
+        cells = store.to_numpy()['LteNcellMeas.r0.cells']
+        self.assertEqual(cells['row'].tolist(), [0] + [1] * 10 + [2, 3])
+        self.assertEqual(cells['rsrp'].dtype.kind, 'f')
+        self.assertEqual(cells['pci'].tolist(), [131] + list(range(10)) + [108, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import struct
+import tempfile
+
+import util
+from parsers.qualcomm.diagmsgformat import MessageFormat
+from parsers.qualcomm.diagqsrhash import QsrHashIndex, convert_hash_db
+from parsers.qualcomm.qualcommparser import QualcommParser
+
+hash_db = '''# test database
+305419896:5000:123:ds_profile.c:Profile %d apn %s rat 0x%x
+0x0000beef:RRC state %u -> %u
+16:1:44:lte_ml1.c:100%% done: %lld us, %c%c
+'''
+
+class TestMessageFormat(unittest.TestCase):
+    def test_format(self):
+        self.assertEqual(MessageFormat('%d %i %u %x %X %o').format([0xffffffff, 5, 0xffffffff, 255, 255, 8]),
+            '-1 5 4294967295 ff FF 10')
+        self.assertEqual(MessageFormat('%hd %hhu %lu %ld').format([0xffff, 0x1ff, 7, 0xfffffffe]), '-1 255 7 -2')
+        self.assertEqual(MessageFormat('%08x|%-4d|%5s').format([0xabc, 3, 0x1000]), '00000abc|3   |0x00001000')
+        self.assertEqual(MessageFormat('%llu %d').format([1, 1, 9]), '4294967297 9')
+        self.assertEqual(MessageFormat('%*d %c%%').format([4, 42, 0x41]), '42 A%')
+        # Missing arguments are substituted by 0
+        self.assertEqual(MessageFormat('%d %d').format([1]), '1 0')
+        self.assertEqual(MessageFormat('rate 50%.').format([1]), 'rate 50%.')
+
+    def test_format_c_flags(self):
+        # Alternate form and zero padding as in C printf, not Python %
+        self.assertEqual(MessageFormat('%#o %#o %#.3o').format([8, 0, 8]), '010 0 010')
+        self.assertEqual(MessageFormat('%#x %#x %#X %#hhx').format([0, 255, 255, 0x1ff]), '0 0xff 0XFF 0xff')
+        self.assertEqual(MessageFormat('%#08x|%-#6x|%#6o').format([255, 255, 8]), '0x0000ff|0xff  |   010')
+        self.assertEqual(MessageFormat('%08.3d|%08.3x|%08d').format([5, 255, 5]), '     005|     0ff|00000005')
+        self.assertEqual(MessageFormat('%#llx %d').format([0, 0, 7]), '0 7')
+
+class TestQsrHashIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_fname = os.path.join(self.tmpdir.name, 'QSRMessageHash.db')
+        with open(self.db_fname, 'w') as f:
+            f.write(hash_db)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_lookup(self):
+        with QsrHashIndex(self.db_fname) as index:
+            self.assertEqual(len(index), 3)
+            self.assertTrue(os.path.exists(self.db_fname + '.idx'))
+            fmt, filename, line, ssid = index.lookup(0x12345678)
+            self.assertEqual(fmt.format([1, 0x2000, 3]), 'Profile 1 apn 0x00002000 rat 0x3')
+            self.assertEqual((filename, line, ssid), (b'ds_profile.c', 123, 5000))
+            fmt, filename, line, ssid = index.lookup(0xbeef)
+            self.assertEqual(fmt.format([1, 2]), 'RRC state 1 -> 2')
+            self.assertEqual((filename, line, ssid), (b'', 0, 0))
+            self.assertIsNone(index.lookup(17))
+            self.assertIs(index.lookup(0xbeef), index.lookup(0xbeef))
+
+        # A converted index can be passed directly
+        with QsrHashIndex(self.db_fname + '.idx') as index:
+            self.assertEqual(index.lookup(16)[0].format([10, 0, 0x4f, 0x4b]), '100% done: 10 us, OK')
+
+    def test_parse_qsr_msgs(self):
+        parser = QualcommParser()
+        parser.set_parameter({'qsr-hash': self.db_fname, 'qsr4-hash': self.db_fname})
+        ts = util.create_qxdm_ts(util.parse_qxdm_ts(0).replace(year=2023))
+
+        pkt = struct.pack('<BBBBQHHLL', 0x92, 0, 2, 0, ts, 77, 9, 0, 0xbeef) + struct.pack('<LL', 3, 4)
+        result = parser.parse_diag(pkt, hdlc_encoded=False, check_crc=False)
+        self.assertTrue(result['cp'][0].endswith(b'RRC state 3 -> 4'))
+        self.assertEqual(result['ts'], util.parse_qxdm_ts(ts))
+
+        pkt = struct.pack('<BBBBQHHL', 0x99, 0, 3, 0, ts, 5000, 0, 0x12345678) + struct.pack('<LLL', 7, 0, 1)
+        result = parser.parse_diag(pkt, hdlc_encoded=False, check_crc=False)
+        self.assertTrue(result['cp'][0].endswith(b'Profile 7 apn 0x00000000 rat 0x1'))
+        self.assertIn(b'ds_profile.c', result['cp'][0])
+
+        pkt = struct.pack('<BBBBQHHL', 0x99, 0, 1, 0, ts, 5000, 0, 0x99) + struct.pack('<L', 1)
+        result = parser.parse_diag(pkt, hdlc_encoded=False, check_crc=False)
+        self.assertTrue(result['cp'][0].endswith(b'Unknown message hash 0x00000099, args: 0x00000001'))
+
+if __name__ == '__main__':
+    unittest.main()
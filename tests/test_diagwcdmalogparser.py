@@ -5,6 +5,8 @@ import binascii
 import datetime
 from collections import namedtuple
 
+import measurements
+
 from parsers.qualcomm.diagwcdmalogparser import DiagWcdmaLogParser
 
 class TestDiagWcdmaLogParser(unittest.TestCase):
@@ -15,7 +17,9 @@ class TestDiagWcdmaLogParser(unittest.TestCase):
         payload = binascii.unhexlify('82000000000000f1293200b6a5fff1f5ff000000000000f1293100b39effdedeff040000008000')
         result = self.parser.parse_wcdma_search_cell_reselection(None, payload, None)
         expected = 'WCDMA Search Cell: 2 3G cells, 0 2G cells\nWCDMA Search Cell: 3G Cell 0: UARFCN 10737, PSC  50, RSCP -95, Ec/Io -7.50\nWCDMA Search Cell: 3G Cell 1: UARFCN 10737, PSC  49, RSCP -98, Ec/Io -17.00'
-        self.assertEqual(result['stdout'], expected)
+        self.assertEqual(measurements.format_meas(result['meas'][0]), expected)
+        self.assertEqual(result['meas'][0].psc, (50, 49))
+        self.assertEqual(result['meas'][0].rscp, (-95, -98))
 
     def test_parse_wcdma_rlc_dl_am_signaling_pdu(self):
         payload = binascii.unhexlify('0111010090000200201400')
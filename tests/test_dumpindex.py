@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import unittest
+import binascii
+import tempfile
+import struct
+import os
+
+import datetime
+
+import util
+from iodevices import DumpIndex, FileIO
+from parsers.qualcomm.qualcommparser import QualcommParser
+from parsers.samsung.sdmcmd import generate_sdm_packet
+
+def qc_log_packet(log_id, ts, body, radio_id=None):
+    pkt = struct.pack('<BBHHHQ', 0x10, 0, len(body) + 12, len(body) + 12, log_id, ts) + body
+    if radio_id is not None:
+        pkt = struct.pack('<BBHL', 0x98, 0x01, 0, radio_id) + pkt
+    return util.generate_packet(pkt)
+
+class TestDumpIndex(unittest.TestCase):
+    def test_qmdl(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.qmdl')
+            pkts = [qc_log_packet(0xb0c0, 0x1000 << 16, b'\x7e\x7d' * 8),
+                qc_log_packet(0xb0ed, 0x2000 << 16, b'\x01\x02', radio_id=2),
+                qc_log_packet(0xb0c0, 0x3000 << 16, b'\x03')]
+            with open(fname, 'wb') as f:
+                f.write(pkts[0] + pkts[1])
+
+            index = DumpIndex(fname)
+            self.assertEqual(index.update(), 2)
+            self.assertEqual(len(index), 2)
+            self.assertEqual(index[0].offset, 0)
+            self.assertEqual(index[0].length, len(pkts[0]))
+            self.assertEqual(index[1].offset, len(pkts[0]))
+            self.assertEqual((index[1].id, index[1].ts, index[1].cmd, index[1].radio_id), (0xb0ed, 0x2000 << 16, 0x10, 1))
+            index.close()
+
+            # Growing file: the incomplete last packet is indexed on the next update
+            with open(fname, 'ab') as f:
+                f.write(pkts[2][:-3])
+            self.assertEqual(index.update(), 0)
+            with open(fname, 'ab') as f:
+                f.write(pkts[2][-3:])
+            self.assertEqual(index.update(), 1)
+
+            index = DumpIndex(fname)
+            self.assertEqual(len(index), 3)
+            self.assertEqual([x.ts >> 16 for x in index.select(ids={0xb0c0})], [0x1000, 0x3000])
+            self.assertEqual([x.id for x in index.select(ts_start=0x2000 << 16)], [0xb0ed, 0xb0c0])
+
+            io_device = FileIO([fname])
+            x = index[2]
+            self.assertEqual(io_device.read_at(x.offset, x.length), pkts[2])
+            index.close()
+
+    def test_qmdl_radio_id(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.qmdl')
+            with open(fname, 'wb') as f:
+                for subscription_id in (None, 1, 2, 3, 4, 0, 0x1000):
+                    f.write(qc_log_packet(0xb0c0, 0x1000 << 16, b'\x01', radio_id=subscription_id))
+
+            # Raw 0-based radio IDs, not limited to two radios
+            with DumpIndex(fname) as index:
+                index.update()
+                self.assertEqual([x.radio_id for x in index], [0, 0, 1, 2, 3, 0, 0xff])
+                self.assertEqual(len(list(index.select(radio_id=2))), 1)
+                self.assertEqual(len(list(index.select(radio_id=3))), 1)
+
+    def test_qmdl_replaced(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'cap.qmdl')
+            with open(fname, 'wb') as f:
+                f.write(b''.join([qc_log_packet(0xb0c0, (0x1000 + i) << 16, b'\x01') for i in range(3)]))
+            with DumpIndex(fname) as index:
+                self.assertEqual(index.update(), 3)
+
+            # A larger capture under the same name: the index is rebuilt instead of extended
+            pkts = [qc_log_packet(0xb0ed, (0x2000 + i) << 16, bytes(range(40))) for i in range(3)]
+            with open(fname, 'wb') as f:
+                f.write(b''.join(pkts))
+            with DumpIndex(fname) as index:
+                self.assertEqual(index.update(), 3)
+                self.assertEqual([(x.offset, x.id) for x in index], [(0, 0xb0ed), (len(pkts[0]), 0xb0ed), (len(pkts[0]) * 2, 0xb0ed)])
+
+    def test_qmdl_extract(self):
+        class ListWriter:
+            def __init__(self):
+                self.pkts = []
+
+            def write_cp(self, sock_content, radio_id=0, ts=None):
+                self.pkts.append(sock_content)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.qmdl')
+            base = datetime.datetime(2023, 1, 1, 12, 0, 0)
+            pkts = [qc_log_packet(0xb0c0 + (i % 2), util.create_qxdm_ts(base + datetime.timedelta(seconds=i)), bytes([i])) for i in range(10)]
+            with open(fname, 'wb') as f:
+                f.write(b''.join(pkts))
+
+            self.assertEqual(util.parse_qxdm_ts(util.create_qxdm_ts(base)), base)
+
+            parser = QualcommParser()
+            parser.set_io_device(FileIO([fname]))
+            raw_writer = ListWriter()
+            with DumpIndex(fname) as index:
+                index.update()
+                records = index.select(ts_start=util.create_qxdm_ts(base + datetime.timedelta(seconds=3)),
+                    ts_end=util.create_qxdm_ts(base + datetime.timedelta(seconds=7)), ids={0xb0c1})
+                parser.run_indexed(records, raw_writer)
+            self.assertEqual(raw_writer.pkts, [pkts[3], pkts[5], pkts[7]])
+
+    def test_sdmraw(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.sdmraw')
+            payload = binascii.unhexlify('7f290000260020ffa00202f7f42335d0af0000000000000e067b0100007ce370fea028000078050000007e')
+            with open(fname, 'wb') as f:
+                f.write(b'\x00' + payload + generate_sdm_packet(0xa0, 0x27, 0x00, b'\x01\x02', timestamp=1234))
+
+            with DumpIndex(fname) as index:
+                self.assertEqual(index.update(), 2)
+                self.assertEqual(index[0].offset, 1)
+                self.assertEqual(index[0].length, len(payload))
+                self.assertEqual(index[0].id, 0x0202)
+                self.assertEqual((index[1].id, index[1].ts, index[1].radio_id), (0x0700, 1234, 0))
+
+    def test_sdm_radio_id(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # Radio ID in the upper 3 bits of the group, base 1
+            fname = os.path.join(tmpdir, 'test.sdmraw')
+            with open(fname, 'wb') as f:
+                for radio in range(5):
+                    f.write(generate_sdm_packet(0xa0, (radio << 5) | 0x07, 0x00, b'\x01\x02', timestamp=radio))
+            with DumpIndex(fname) as index:
+                index.update()
+                self.assertEqual([(x.id, x.radio_id) for x in index], [(0x0700, 0), (0x0700, 0), (0x0700, 1), (0x0700, 2), (0x0700, 3)])
+
+            fname = os.path.join(tmpdir, 'test.sdm')
+            with open(fname, 'wb') as f:
+                for radio in range(5):
+                    pkt = struct.pack('<HLHHBBBL', 0x7f39, 0, 0, radio, 0xa0, (radio << 5) | 0x07, 0x00, radio)
+                    f.write(struct.pack('<H', len(pkt)) + pkt)
+            with DumpIndex(fname) as index:
+                index.update()
+                self.assertEqual([x.radio_id for x in index], [0, 0, 1, 2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
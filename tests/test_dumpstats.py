@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import unittest
+import tempfile
+import struct
+import os
+
+import util
+from iodevices import DumpStats
+
+class TestDumpStats(unittest.TestCase):
+    def test_qmdl(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.qmdl')
+            with open(fname, 'wb') as f:
+                for i in range(3):
+                    pkt = struct.pack('<BBHHHQ', 0x10, 0, 13, 13, 0xb0c0, (1000 + i) << 16) + b'\x7e'
+                    f.write(util.generate_packet(pkt))
+                # Event 0x0100 with 64-bit timestamp and 1 byte payload, event 0x0101 with 16-bit timestamp and pascal string
+                events = struct.pack('<HQB', 0x0100 | (1 << 13), 2000 << 16, 0x01) + struct.pack('<HHB', 0x0101 | (3 << 13) | 0x8000, 0, 2) + b'\xaa\xbb'
+                f.write(util.generate_packet(struct.pack('<BH', 0x60, len(events)) + events))
+                f.write(util.generate_packet(b'\x7c' + b'\x00' * 11))
+
+            dump_stats = DumpStats()
+            dump_stats.scan(fname)
+            result = dump_stats.to_dict()
+
+            self.assertEqual(result['log']['0xb0c0']['count'], 3)
+            self.assertEqual(result['log']['0xb0c0']['first_ts'], util.parse_qxdm_ts(1000 << 16).isoformat())
+            self.assertEqual(result['log']['0xb0c0']['last_ts'], util.parse_qxdm_ts(1002 << 16).isoformat())
+            self.assertEqual(result['event']['0x0100'], {'count': 1, 'bytes': 11, 'first_ts': util.parse_qxdm_ts(2000 << 16).isoformat(), 'last_ts': util.parse_qxdm_ts(2000 << 16).isoformat()})
+            self.assertEqual(result['event']['0x0101']['bytes'], 7)
+            self.assertEqual(result['cmd']['0x007c']['count'], 1)
+            self.assertEqual(result['packets'], 6)
+            self.assertEqual(result['last_ts'], util.parse_qxdm_ts(2000 << 16).isoformat())
+
+if __name__ == '__main__':
+    unittest.main()
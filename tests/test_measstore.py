@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import unittest
+import datetime
+import tempfile
+import os
+
+import measurements
+import measstore
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class TestMeasurementStore(unittest.TestCase):
+    ts = datetime.datetime(2024, 1, 1, 12, 0, 0)
+
+    def ncell_meas(self, pcis, rsrps):
+        n = len(pcis)
+        return measurements.LteNcellMeas(6300, 22, tuple(pcis), (-75.0, ) * n, tuple(rsrps), (-100.0, ) * n,
+            (-10.0, ) * n, (-10.0, ) * n, (20, ) * n, (0, ) * n, (0, ) * n, (0, ) * n, (0, ) * n)
+
+    def test_append(self):
+        store = measstore.MeasurementStore()
+        store.append(measurements.GsmServAuxMeas(-76.75, 0), 0, self.ts)
+        store.append(measurements.GsmServAuxMeas(-77, 1), 0, None)
+        store.append(measurements.GsmServAuxMeas(-80.0, 0), 1, self.ts)
+
+        table = store.tables[(measurements.GsmServAuxMeas, 0)]
+        self.assertEqual(table.columns['rxpwr'].typecode, 'd')
+        self.assertEqual(list(table.columns['rxpwr']), [-76.75, -77.0])
+        self.assertEqual(list(table.columns['snr_is_bad']), [0, 1])
+        self.assertEqual(table.columns['ts'][0], self.ts.timestamp())
+
+        wcdma = measurements.WcdmaCellMeas(2, 1, (10737, 10737), (50, 49), (-95, -98), (1, 2), (-7.5, -17.0), (3, 4), (12, ), (5, ), (-100, ), (1, ))
+        store.append(wcdma, 0, self.ts)
+        table = store.tables[(measurements.WcdmaCellMeas, 0)]
+        self.assertEqual(list(table.cell_columns['cells']['psc']), [50, 49])
+        self.assertEqual(list(table.cell_columns['cells']['row']), [0, 0])
+        self.assertEqual(list(table.cell_columns['gsm_cells']['arfcn']), [12])
+        self.assertEqual(list(table.columns['num_wcdma_cells']), [2])
+
+    @unittest.skipIf(numpy is None, 'NumPy is not available')
+    def test_flush_and_load(self):
+        for suffix in ('', '.npz'):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = os.path.join(tmpdir, 'meas' + suffix)
+                with measstore.MeasurementStore(path, chunk_rows=2) as store:
+                    store.append(self.ncell_meas([131, 132], [-102.0, -110.0]), 0, self.ts)
+                    store.append(self.ncell_meas([], []), 0, self.ts)
+                    store.append(self.ncell_meas([131], [-104.0]), 0, self.ts)
+
+                result = measstore.load_measurements(path)
+                self.assertEqual(list(result['LteNcellMeas.r0']['earfcn']), [6300] * 3)
+                cells = result['LteNcellMeas.r0.cells']
+                self.assertEqual(list(cells['row']), [0, 0, 2])
+                self.assertEqual(list(cells['rsrp'][cells['pci'] == 131]), [-102.0, -104.0])
+
+        # Columns of a single .npy chunk are memory-mapped
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with measstore.MeasurementStore(tmpdir) as store:
+                store.append(self.ncell_meas([131, 132], [-102.0, -110.0]), 1, self.ts)
+            result = measstore.load_measurements(tmpdir)
+            self.assertIsInstance(result['LteNcellMeas.r1.cells']['rsrp'], numpy.memmap)
+            self.assertEqual(numpy.percentile(result['LteNcellMeas.r1.cells']['rsrp'], 50), -106.0)
+
+if __name__ == '__main__':
+    unittest.main()
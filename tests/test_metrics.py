@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import unittest
+import binascii
+import struct
+import urllib.request
+
+import metrics
+import parsers
+import util
+
+class TestMetrics(unittest.TestCase):
+    def test_registry_format(self):
+        registry = metrics.MetricsRegistry()
+        frames = registry.counter('scat_frames_total', 'Frames read', parser='qc')
+        frames.value += 3
+        self.assertIs(registry.counter('scat_frames_total', 'Frames read', parser='qc'), frames)
+        registry.counter('scat_frames_total', 'Frames read', parser='sec').value += 1
+        registry.gauge('scat_writer_queue_depth', 'Queue depth', func=lambda: 7)
+
+        self.assertEqual(registry.format(), '\n'.join([
+            '# HELP scat_frames_total Frames read',
+            '# TYPE scat_frames_total counter',
+            'scat_frames_total{parser="qc"} 3',
+            'scat_frames_total{parser="sec"} 1',
+            '# HELP scat_writer_queue_depth Queue depth',
+            '# TYPE scat_writer_queue_depth gauge',
+            'scat_writer_queue_depth 7',
+        ]) + '\n')
+
+    def test_serve(self):
+        registry = metrics.MetricsRegistry()
+        registry.counter('scat_crc_errors_total', 'CRC errors').value += 2
+        host, port = registry.serve(0)
+        try:
+            with urllib.request.urlopen('http://{}:{}/metrics'.format(host, port)) as f:
+                body = f.read().decode()
+        finally:
+            registry.shutdown()
+        self.assertIn('scat_crc_errors_total 2\n', body)
+
+    def test_qualcomm_counters(self):
+        parser = parsers.QualcommParser()
+        crc_errors = parser.metric_crc_errors.value
+        length_errors = parser.metric_length_errors.value
+        lte_messages = metrics.registry.counter('scat_messages_total', '', parser='qc', rat='lte').value
+
+        # LTE RRC OTA with a wrong length field and a broken CRC
+        body = binascii.unhexlify('1a0f400f40010e011307000000000b0000000002001015')
+        pkt = struct.pack('<BBHHHQ', 0x10, 0, len(body) + 13, len(body) + 13, 0xb0c0, 0) + body
+        parser.parse_diag(util.wrap(pkt + struct.pack('<H', util.dm_crc16(pkt) ^ 0x0101)))
+
+        self.assertEqual(parser.metric_crc_errors.value, crc_errors + 1)
+        self.assertEqual(parser.metric_length_errors.value, length_errors + 1)
+        self.assertEqual(metrics.registry.counter('scat_messages_total', '', parser='qc', rat='lte').value, lte_messages + 1)
+
+if __name__ == '__main__':
+    unittest.main()
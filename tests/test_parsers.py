@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import parsers
+
+class TestParserRegistry(unittest.TestCase):
+    def test_registry(self):
+        for shortname in parsers.parser_registry.keys():
+            current_parser = parsers.create_parser(shortname)
+            self.assertEqual(current_parser.shortname, shortname)
+        self.assertIs(parsers.QualcommParser, parsers.get_parser_class('qc'))
+        with self.assertRaises(AttributeError):
+            parsers.UnknownParser
+
+    def test_lazy_event_parsers(self):
+        current_parser = parsers.create_parser('qc')
+        self.assertIsNone(current_parser.diag_fallback_event_parser)
+        self.assertEqual(len(current_parser.process_event), 0)
+
+        current_parser.set_parameter({'events': True})
+        self.assertIsNotNone(current_parser.diag_fallback_event_parser)
+        self.assertIn(1605, current_parser.process_event)
+
+if __name__ == '__main__':
+    unittest.main()
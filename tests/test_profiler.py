@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from profiler import DecodeProfiler
+
+class TestDecodeProfiler(unittest.TestCase):
+    def parse_ok(self, pkt):
+        return {'cp': [pkt + b'\x00']}
+
+    def parse_fail(self, pkt):
+        raise ValueError('broken packet')
+
+    def test_instrument_table(self):
+        profiler = DecodeProfiler()
+        process = {
+            0x0201: lambda x: self.parse_ok(x),
+            0x0202: lambda x: self.parse_fail(x),
+        }
+        process_event = {
+            1682: (self.parse_ok, 'IPV6_SM_EVENT'),
+        }
+        profiler.instrument_table(process, 'sdm')
+        profiler.instrument_table(process_event, 'event', '{}')
+        # Instrumenting twice does not wrap the handlers again
+        profiler.instrument_table(process, 'sdm')
+
+        for i in range(3):
+            self.assertEqual(process[0x0201](b'\x01\x02'), {'cp': [b'\x01\x02\x00']})
+        with self.assertRaises(ValueError):
+            process[0x0202](b'\x01')
+        self.assertEqual(process_event[1682][1], 'IPV6_SM_EVENT')
+        process_event[1682][0](b'\x01')
+
+        report = {x['handler']: x for x in profiler.report()}
+        self.assertEqual(set(report.keys()), {'sdm 0x0201 parse_ok', 'sdm 0x0202 parse_fail', 'event 1682 parse_ok'})
+        self.assertEqual(report['sdm 0x0201 parse_ok']['count'], 3)
+        self.assertEqual(report['sdm 0x0201 parse_ok']['bytes_in'], 6)
+        self.assertEqual(report['sdm 0x0201 parse_ok']['bytes_out'], 9)
+        self.assertEqual(report['sdm 0x0202 parse_fail']['exceptions'], 1)
+        self.assertLessEqual(report['sdm 0x0201 parse_ok']['p50_us'], report['sdm 0x0201 parse_ok']['p99_us'])
+
+if __name__ == '__main__':
+    unittest.main()
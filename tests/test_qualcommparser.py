@@ -2,10 +2,13 @@
 
 import unittest
 import binascii
+import struct
 import datetime
 from collections import namedtuple
 
+import util
 from parsers.qualcomm.qualcommparser import QualcommParser
+from parsers.qualcomm.diagltelogparser import DiagLteLogParser
 
 class TestQualcommParser(unittest.TestCase):
     parser = QualcommParser()
@@ -35,5 +38,131 @@ class TestQualcommParser(unittest.TestCase):
         expected = {'stdout': 'Extended message range: 0-134, 500-506, 1000-1200, 2000-2008, 3000-3014, 4000-4010, 4500-4584, 4600-4616, 5000-5036, 5500-5517, 6000-6081, 6500-6521, 7000-7003, 7100-7111, 7200-7201, 8000-8000, 8500-8532, 9000-9008, 9500-9521, 10200-10210, 10251-10255, 10300-10300, 10350-10377, 10400-10416, 10500-10505, 49152-49251, '}
         self.assertEqual(result['stdout'], expected['stdout'])
 
+    def test_parse_ext_msg(self):
+        payload = struct.pack('<BBBBQHHL', 0x79, 0, 3, 0, 0, 1234, 5000, 0) + struct.pack('<LLL', 0xffffffff, 0x20, 0x7f000001)
+        payload += b'Cell %d PCI %u addr 0x%08x\x00ds_rrc.c\x00'
+        result = self.parser.parse_diag_ext_msg(payload)
+        self.assertTrue(result['cp'][0].endswith(b'Cell -1 PCI 32 addr 0x7f000001'))
+        self.assertIn(b'ds_rrc.c', result['cp'][0])
+
+    def test_parse_event(self):
+        parser = QualcommParser()
+        parser.set_parameter({'events': True})
+        parser.no_process_event[300] = 'INACTIVITY_TIMER_EXPIRED'
+        parser.build_event_dispatch()
+
+        # LTE RRC state change, suppressed event, unknown events with 2x uint8 and pascal string
+        events = struct.pack('<HQB', 1606 | (1 << 13), 2000 << 16, 4)
+        events += struct.pack('<HQ', 300, 2000 << 16)
+        events += struct.pack('<HQBB', 256 | (2 << 13), 2000 << 16, 1, 2)
+        events += struct.pack('<HQB', 4000 | (3 << 13), 2000 << 16, 2) + b'\xaa\xbb'
+        result = parser.parse_diag_event(struct.pack('<BH', 0x60, len(events)) + events)
+
+        self.assertEqual(len(result['cp']), 3)
+        self.assertIn(b'RRC_CONNECTED', result['cp'][0])
+        self.assertTrue(result['cp'][1].endswith(b'EVENT_BAND_CLASS_CHANGE: 0x1 0x2'))
+        self.assertTrue(result['cp'][2].endswith(b'Event 4000: aa bb'))
+        self.assertEqual(result['ts'], util.parse_qxdm_ts(2000 << 16))
+
+        # Prebuilt header matches the generic one
+        ts = util.parse_qxdm_ts(2000 << 16)
+        expected = util.create_gsmtap_header(version = 2, payload_type = util.gsmtap_type.OSMOCORE_LOG)
+        expected += util.create_osmocore_logging_header(timestamp = ts, process_name = b'Event', pid = 4000)
+        self.assertEqual(result['cp'][2], expected + b'Event 4000: aa bb')
+
+    def test_qsr_hash_implies_msgs(self):
+        # Parameters as set by scat.py with --qsr-hash and without --msgs
+        parser = QualcommParser()
+        parser.set_parameter({'qsr-hash': 'QSRMessageHash.db', 'qsr4-hash': None, 'events': False, 'msgs': False, 'meas-batch': 0, 'max-radios': 2})
+        self.assertTrue(parser.parse_msgs)
+
+        parser = QualcommParser()
+        parser.set_parameter({'qsr-hash': None, 'qsr4-hash': 'qdb.bin', 'events': False, 'msgs': False, 'meas-batch': 0, 'max-radios': 2})
+        self.assertTrue(parser.parse_msgs)
+
+        parser = QualcommParser()
+        parser.set_parameter({'qsr-hash': None, 'qsr4-hash': None, 'events': False, 'msgs': False, 'meas-batch': 0, 'max-radios': 2})
+        self.assertFalse(parser.parse_msgs)
+
+    def test_max_radios(self):
+        parser = QualcommParser()
+        self.assertEqual(parser.sanitize_radio_id(0), 0)
+        self.assertEqual(parser.sanitize_radio_id(2), 1)
+        self.assertEqual(parser.sanitize_radio_id(3), 1)
+
+        parser.set_parameter({'max-radios': 3})
+        self.assertEqual(parser.sanitize_radio_id(3), 2)
+        self.assertEqual(parser.sanitize_radio_id(4), 2)
+        self.assertEqual(len(parser.radio_states), 3)
+        self.assertEqual(len(parser.device_clock), 3)
+
+        # Device time of another radio before the first timestamp of the radio
+        parser.device_clock[1].update(2000 << 16)
+        self.assertEqual(parser.device_time(2), parser.device_clock[1].now())
+
+        parser.set_parameter({'radio-states': [{}, {}, {}, {'lte_earfcn_dl': 1300}]})
+        self.assertEqual(parser.max_radios, 4)
+        self.assertEqual(len(parser.device_clock), 4)
+        self.assertEqual(parser.radio_states[3].lte_earfcn_dl, 1300)
+
+        # Single radio
+        parser.set_parameter({'max-radios': 1})
+        self.assertEqual(parser.sanitize_radio_id(2), 0)
+        self.assertEqual(len(parser.radio_states), 1)
+        self.assertEqual(len(parser.device_clock), 1)
+        with self.assertRaises(ValueError):
+            parser.set_parameter({'max-radios': 0})
+
+    def test_broadcast_window(self):
+        parser = QualcommParser()
+        parser.set_parameter({'broadcast-window': 1.0})
+        lte_parser = [x for x in parser.diag_log_parsers if type(x) == DiagLteLogParser][0]
+
+        def lte_rrc(pdu_num, msg, ts):
+            # Version 24, PCI 214, EARFCN 6300
+            payload = struct.pack('<BBB BHLH BLH', 24, 15, 0, 0, 214, 6300, 0, pdu_num, 0, len(msg)) + msg
+            pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=int(ts * 800) << 16)
+            return lte_parser.parse_lte_rrc(pkt_header, payload, None)
+
+        sib = binascii.unhexlify('40858ec4e5bfe050dc29151600')
+        self.assertNotIn('stdout', lte_rrc(2, sib, 10.0))
+        self.assertIsNone(lte_rrc(2, sib, 10.4))
+        self.assertIsNone(lte_rrc(2, sib, 10.8))
+        # Dedicated messages are not suppressed
+        self.assertIsNotNone(lte_rrc(6, sib, 10.8))
+        self.assertIsNotNone(lte_rrc(6, sib, 10.9))
+        result = lte_rrc(2, sib, 11.2)
+        self.assertEqual(len(result['cp']), 1)
+        self.assertEqual(result['stdout'], 'LTE RRC BCCH_DL_SCH: PCI 214, EARFCN 6300, 2 repeats suppressed')
+
+        # MIB without the frame number
+        mib = binascii.unhexlify('010001140554000264')
+        self.assertEqual(lte_parser.parse_lte_mib(self.log_header(0x10, 0, 0, 0, 0xb113, 0), mib, None)['stdout'],
+            'LTE MIB Info: EARFCN 1300, SFN   84, Bandwidth 20 MHz, TX antennas 2')
+        self.assertIsNone(lte_parser.parse_lte_mib(self.log_header(0x10, 0, 0, 0, 0xb113, 400 << 16), mib[:5] + b'\x55' + mib[6:], None))
+
+        parser.set_parameter({'broadcast-window': 0})
+        self.assertIsNone(parser.broadcast_cache)
+        self.assertIsNotNone(lte_rrc(2, sib, 11.3))
+
+    def test_parse_event_truncated_ts(self):
+        parser = QualcommParser()
+        parser.set_parameter({'events': True})
+
+        # 64-bit timestamp followed by 16-bit ones, the last one wrapping around
+        events = struct.pack('<HQB', 256 | (1 << 13), 0x1234fff00000, 1)
+        events += struct.pack('<HHB', 257 | (1 << 13) | 0x8000, 0xfff8, 2)
+        events += struct.pack('<HHB', 258 | (1 << 13) | 0x8000, 0x0002, 3)
+        result = parser.parse_diag_event(struct.pack('<BH', 0x60, len(events)) + events)
+        self.assertEqual(result['ts'], util.parse_qxdm_ts(0x123500020000))
+
+        # Clock is kept per radio and shared with log packets
+        events = struct.pack('<HHB', 256 | (1 << 13) | 0x8000, 0x0010, 1)
+        result = parser.parse_diag_event(struct.pack('<BH', 0x60, len(events)) + events, {'radio_id': 0})
+        self.assertEqual(result['ts'], util.parse_qxdm_ts(0x123500100000))
+        parser.parse_diag_log(struct.pack('<BBHHHQ', 0x10, 0, 12, 12, 0x0001, 0x567800000000), {'radio_id': 1})
+        result = parser.parse_diag_event(struct.pack('<BH', 0x60, len(events)) + events, {'radio_id': 1})
+        self.assertEqual(result['ts'], util.parse_qxdm_ts(0x567800100000))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from radiostate import RadioState, RadioStates
+
+class TestRadioState(unittest.TestCase):
+    def test_snapshot_restore(self):
+        state = RadioState()
+        self.assertEqual(state.lte_earfcn_dl, 0)
+        state.lte_earfcn_dl = 1300
+        state.lte_earfcn_ul = 19300
+        state.gsm_arfcn = 17
+        with self.assertRaises(AttributeError):
+            state.lte_earfcn = 1300
+
+        snapshot = state.snapshot()
+        self.assertEqual(snapshot['lte_earfcn_dl'], 1300)
+        self.assertEqual(len(snapshot), len(RadioState.__slots__))
+
+        restored = RadioState()
+        restored.umts_psc = 100
+        restored.restore({'lte_earfcn_dl': 1300, 'gsm_arfcn': 17, 'nr_arfcn': 632628})
+        self.assertEqual(restored.lte_earfcn_dl, 1300)
+        self.assertEqual(restored.gsm_arfcn, 17)
+        self.assertEqual(restored.lte_earfcn_ul, 0)
+        self.assertEqual(restored.umts_psc, 0)
+        self.assertFalse(hasattr(restored, 'nr_arfcn'))
+
+    def test_radio_states(self):
+        states = RadioStates()
+        self.assertEqual(len(states), 2)
+        states[1].lte_pci = 42
+        states.resize(4)
+        self.assertEqual(len(states), 4)
+        self.assertEqual(states[1].lte_pci, 42)
+        states[3].umts_uarfcn_dl = 10713
+
+        copy = RadioStates()
+        copy[0].gsm_arfcn = 17
+        copy.loads(states.dumps())
+        self.assertEqual(len(copy), 4)
+        self.assertEqual(copy[1].lte_pci, 42)
+        self.assertEqual(copy[3].umts_uarfcn_dl, 10713)
+        self.assertEqual(copy[0].gsm_arfcn, 0)
+        self.assertIsNot(copy[1], states[1])
+
+        states.restore([{'lte_pci': 7}])
+        self.assertEqual(len(states), 4)
+        self.assertEqual(states[0].lte_pci, 7)
+        self.assertEqual(states[1].lte_pci, 0)
+        self.assertEqual(states[3].umts_uarfcn_dl, 0)
+
+if __name__ == '__main__':
+    unittest.main()
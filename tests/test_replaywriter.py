@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import unittest
+import datetime
+import time
+
+from writers import ReplayWriter
+
+class ListWriter:
+    def __init__(self):
+        self.pkts = []
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        self.pkts.append((time.monotonic(), sock_content))
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        self.pkts.append((time.monotonic(), sock_content))
+
+class TestReplayWriter(unittest.TestCase):
+    def test_pacing(self):
+        writer = ListWriter()
+        base = datetime.datetime(2023, 1, 1, 12, 0, 0)
+        with ReplayWriter(writer, speed=2.0) as replay_writer:
+            start = time.monotonic()
+            for i in range(5):
+                replay_writer.write_cp(bytes([i]), 0, base + datetime.timedelta(milliseconds=100 * i))
+            replay_writer.write_up(b'\xff', 0, None)
+        self.assertEqual([x[1] for x in writer.pkts], [b'\x00', b'\x01', b'\x02', b'\x03', b'\x04', b'\xff'])
+        # 400 ms of device time at double speed
+        self.assertGreaterEqual(writer.pkts[4][0] - start, 0.19)
+        self.assertLess(writer.pkts[4][0] - start, 1.0)
+        self.assertEqual(replay_writer.num_sent, 6)
+
+    def test_max_rate(self):
+        writer = ListWriter()
+        ts = datetime.datetime(2023, 1, 1, 12, 0, 0)
+        with ReplayWriter(writer, speed=0, max_rate=100) as replay_writer:
+            start = time.monotonic()
+            for i in range(11):
+                replay_writer.write_cp(bytes([i]), 0, ts)
+        self.assertEqual(len(writer.pkts), 11)
+        self.assertGreaterEqual(writer.pkts[-1][0] - start, 0.09)
+
+    def test_loop_rebase(self):
+        writer = ListWriter()
+        base = datetime.datetime(2023, 1, 1, 12, 0, 0)
+        with ReplayWriter(writer, speed=1.0) as replay_writer:
+            start = time.monotonic()
+            # Device clock restarts: the second round must not be sent before the first one ends
+            for loop in range(2):
+                for i in range(3):
+                    replay_writer.write_cp(bytes([i]), 0, base + datetime.timedelta(seconds=-100 + 0.05 * i) if loop == 0 else base - datetime.timedelta(seconds=200 - 0.05 * i))
+        self.assertEqual(len(writer.pkts), 6)
+        self.assertGreaterEqual(writer.pkts[-1][0] - start, 0.19)
+        self.assertLess(writer.pkts[-1][0] - start, 1.0)
+
+    def test_cancel(self):
+        writer = ListWriter()
+        base = datetime.datetime(2023, 1, 1, 12, 0, 0)
+        replay_writer = ReplayWriter(writer, speed=1.0)
+        replay_writer.write_cp(b'\x00', 0, base)
+        replay_writer.write_cp(b'\x01', 0, base + datetime.timedelta(seconds=60))
+        start = time.monotonic()
+        replay_writer.__exit__(KeyboardInterrupt, None, None)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertLessEqual(len(writer.pkts), 1)
+
+if __name__ == '__main__':
+    unittest.main()
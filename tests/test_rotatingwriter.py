@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import unittest
+import datetime
+import tempfile
+import os
+import gzip
+import json
+
+from writers import RotatingWriter, PcapWriter, RawWriter
+
+class TestRotatingWriter(unittest.TestCase):
+    def test_rotate_size(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'capture.pcap')
+            ts = datetime.datetime(2023, 1, 1, 12, 0, 0)
+            with RotatingWriter(fname, PcapWriter, (4729, 47290), max_size=200) as writer:
+                for i in range(10):
+                    writer.write_cp(b'\x02\x04\x01\x00' + bytes(60), 0, ts)
+
+            with open(os.path.join(tmpdir, 'capture.manifest.json')) as f:
+                manifest = json.load(f)
+            segments = manifest['segments']
+            self.assertEqual(len(segments), 5)
+            self.assertEqual(sum(x['packets'] for x in segments), 10)
+            self.assertEqual(segments[0]['file'], os.path.join(tmpdir, 'capture.0000.pcap'))
+            self.assertEqual(segments[0]['start'], '2023-01-01T12:00:00')
+            for segment in segments:
+                self.assertEqual(os.path.getsize(segment['file']), segment['bytes'])
+
+    def test_compress(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'capture.qmdl')
+            with RotatingWriter(fname, RawWriter, max_size=8, compress='gzip') as writer:
+                for i in range(4):
+                    writer.write_cp(b'\x10\x00\x08\x00\x7e' * 2)
+
+            with open(os.path.join(tmpdir, 'capture.manifest.json')) as f:
+                segments = json.load(f)['segments']
+            self.assertEqual(len(segments), 4)
+            for segment in segments:
+                self.assertTrue(segment['compressed'])
+                self.assertTrue(segment['file'].endswith('.qmdl.gz'))
+                with gzip.open(segment['file']) as f:
+                    self.assertEqual(f.read(), b'\x10\x00\x08\x00\x7e' * 2)
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, 'capture.0000.qmdl')))
+
+if __name__ == '__main__':
+    unittest.main()
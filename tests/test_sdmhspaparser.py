@@ -3,6 +3,8 @@
 import unittest
 import binascii
 
+import measurements
+
 from parsers.samsung import sdmcmd
 from parsers.samsung.sdmhspaparser import SdmHspaParser
 
@@ -48,14 +50,16 @@ class TestSdmHspaParser(unittest.TestCase):
         payload = binascii.unhexlify('d501c6ff0000fdff5000')
         packet = sdmcmd.generate_sdm_packet(0xa0, sdmcmd.sdm_command_group.CMD_HSPA_DATA, sdmcmd.sdm_hspa_data.HSPA_UL1_SERV_CELL, payload, timestamp=0x0)
         result = self.parser.sdm_hspa_ul1_serving_cell(packet)
-        expected = {'stdout': 'HSPA UL1 Serving Cell: PSC 469, CPICH RSCP -58.00, Delta RSCP 0.00, Ec/No -3.00, DRX 80 ms'}
+        expected = {'meas': [measurements.HspaServingCellMeas(psc=469, rscp=-58, delta_rscp=0, ecno=-3, drx_cycle=80)]}
         self.assertDictEqual(result, expected)
+        self.assertEqual(measurements.format_meas(result['meas'][0]), 'HSPA UL1 Serving Cell: PSC 469, CPICH RSCP -58.00, Delta RSCP 0.00, Ec/No -3.00, DRX 80 ms')
 
         payload = binascii.unhexlify('d501c7ff0000fcff8002')
         packet = sdmcmd.generate_sdm_packet(0xa0, sdmcmd.sdm_command_group.CMD_HSPA_DATA, sdmcmd.sdm_hspa_data.HSPA_UL1_SERV_CELL, payload, timestamp=0x0)
         result = self.parser.sdm_hspa_ul1_serving_cell(packet)
-        expected = {'stdout': 'HSPA UL1 Serving Cell: PSC 469, CPICH RSCP -57.00, Delta RSCP 0.00, Ec/No -4.00, DRX 640 ms'}
+        expected = {'meas': [measurements.HspaServingCellMeas(psc=469, rscp=-57, delta_rscp=0, ecno=-4, drx_cycle=640)]}
         self.assertDictEqual(result, expected)
+        self.assertEqual(measurements.format_meas(result['meas'][0]), 'HSPA UL1 Serving Cell: PSC 469, CPICH RSCP -57.00, Delta RSCP 0.00, Ec/No -4.00, DRX 640 ms')
 
     def test_sdm_hspa_wcdma_rrc_status(self):
         payload = binascii.unhexlify('7f1300001000c0ffa004205b942c0f00000000007e')
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+import unittest
+import struct
+
+from parsers.samsung import sdmcmd
+from parsers.samsung.sdmipparser import SdmIpParser
+
+class TestSdmIpParser(unittest.TestCase):
+    parser = SdmIpParser(parent=None, model='e5123')
+
+    def test_sdm_ip_data(self):
+        ip_pkt = struct.pack('!BBHHHBBHLL', 0x45, 0, 28, 1, 0, 64, 17, 0, 0x0a000001, 0x0a000002) + b'\x00\x35\x00\x35\x00\x08\x00\x00'
+        packet = sdmcmd.generate_sdm_packet(0xa0, sdmcmd.sdm_command_group.CMD_IP_DATA, 0x00, struct.pack('<HHHH', 1, 0, 0, len(ip_pkt)) + ip_pkt, timestamp=0x0)
+        result = self.parser.sdm_ip_data(packet)
+        self.assertEqual(result, {'up': [ip_pkt]})
+
+        # View into a larger read buffer
+        buf = memoryview(b'\x00' * 3 + packet + b'\x00')
+        result = self.parser.sdm_ip_data(buf[3:3 + len(packet)])
+        self.assertIs(result['up'][0].obj, buf.obj)
+        self.assertEqual(bytes(result['up'][0]), ip_pkt)
+
+        packet = sdmcmd.generate_sdm_packet(0xa0, sdmcmd.sdm_command_group.CMD_IP_DATA, 0x00, struct.pack('<HHHH', 1, 0, 0, len(ip_pkt) + 1) + ip_pkt, timestamp=0x0)
+        self.assertIsNone(self.parser.sdm_ip_data(packet))
+
+if __name__ == '__main__':
+    unittest.main()
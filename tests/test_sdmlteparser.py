@@ -3,6 +3,8 @@
 import unittest
 import binascii
 
+import measurements
+
 from parsers.samsung.sdmlteparser import SdmLteParser
 from parsers.samsung import sdmcmd
 
@@ -14,29 +16,30 @@ class TestSdmLteParser(unittest.TestCase):
         payload = binascii.unhexlify('7f3c0000390087ffa002020b418b35d0af0000000000000e067b010000ecc850fb14370000d007000001000e0615010000bc1bcc290000a406000000007e')
         result = self.parser.sdm_lte_phy_cell_info(payload)
         expected = 'LTE PHY Cell Info: EARFCN 1550, PCI 379, PLMN 45008, RSRP: -141.00, RSRQ: -20.00\nLTE PHY Cell Info: NCell 0: EARFCN 1550, PCI 277, RSRP: -107.00, RSRQ: -17.00'
-        self.assertEqual(result['stdout'], expected)
+        self.assertEqual(measurements.format_meas(result['meas'][0]), expected)
 
         payload = binascii.unhexlify('7f290000260020ffa00202f7f42335d0af0000000000000e067b0100007ce370fea028000078050000007e')
         result = self.parser.sdm_lte_phy_cell_info(payload)
         expected = 'LTE PHY Cell Info: EARFCN 1550, PCI 379, PLMN 45008, RSRP: -104.00, RSRQ: -14.00'
-        self.assertEqual(result['stdout'], expected)
+        self.assertEqual(measurements.format_meas(result['meas'][0]), expected)
 
         payload = binascii.unhexlify('7f2900002600265ca00202f15b1b22ceaf00000000000032000b0000005ce084036829000058020000007e')
         result = self.parser.sdm_lte_phy_cell_info(payload)
         expected = 'LTE PHY Cell Info: EARFCN 50, PCI 11, PLMN 45006, RSRP: -106.00, RSRQ: -6.00'
-        self.assertEqual(result['stdout'], expected)
+        self.assertEqual(measurements.format_meas(result['meas'][0]), expected)
 
         self.parser.model = 'e5123'
         payload = binascii.unhexlify('ceaf000000000000640000000b00000050e21405d8270000e803000000')
         packet = sdmcmd.generate_sdm_packet(0xa0, sdmcmd.sdm_command_group.CMD_LTE_DATA, sdmcmd.sdm_lte_data.LTE_PHY_NCELL_INFO, payload, timestamp=0x0)
         result = self.parser.sdm_lte_phy_cell_info(packet)
         expected = 'LTE PHY Cell Info: EARFCN 100, PCI 11, PLMN 45006, RSRP: -102.00, RSRQ: -10.00'
-        self.assertEqual(result['stdout'], expected)
+        self.assertEqual(measurements.format_meas(result['meas'][0]), expected)
         payload = binascii.unhexlify('ceaf000000000000640000000b00000018e37805d8270000e80300000102ea0b00000b0000007017c4220000840300000000')
         packet = sdmcmd.generate_sdm_packet(0xa0, sdmcmd.sdm_command_group.CMD_LTE_DATA, sdmcmd.sdm_lte_data.LTE_PHY_NCELL_INFO, payload, timestamp=0x0)
         result = self.parser.sdm_lte_phy_cell_info(packet)
         expected = 'LTE PHY Cell Info: EARFCN 100, PCI 11, PLMN 45006, RSRP: -102.00, RSRQ: -10.00\nLTE PHY Cell Info: NCell 0 (Type 2): ARFCN 3050, PCI 11, RSRP: -89.00, RSRQ: -9.00'
-        self.assertEqual(result['stdout'], expected)
+        self.assertEqual(result['meas'][0].ncell_rsrp, (-89.0, ))
+        self.assertEqual(measurements.format_meas(result['meas'][0]), expected)
 
     def test_sdm_lte_rrc_serving_cell(self):
         self.parser.model = 'e333'
@@ -7,6 +7,8 @@ import sys
 import string
 from enum import IntEnum, unique
 
+import channels
+
 XXD_SET = string.ascii_letters + string.digits + string.punctuation
 
 crc_table = [
@@ -83,6 +85,19 @@ def parse_qxdm_ts(ts):
         date = epoch + datetime.timedelta(seconds=0)
     return date
 
+def parse_qxdm_ts_sec(ts):
+    # Seconds since the epoch of parse_qxdm_ts(), at 1/800s resolution, for time differences
+    return (ts >> 16) / 800
+
+def create_qxdm_ts(date):
+    # Inverse of parse_qxdm_ts, lower 16 bits are left as zero
+    epoch = datetime.datetime(1980, 1, 6, 0, 0, 0)
+    ts_delta = date - epoch
+    ts_upper = (ts_delta // datetime.timedelta(microseconds=1250))
+    if ts_upper < 0:
+        ts_upper = 0
+    return ts_upper << 16
+
 def xxd(buf, stdout = False):
     xxd_str = ''
     i = 0
@@ -454,28 +469,9 @@ class wcdma_rlc_tags(IntEnum):
     RLC_LI_SIZE_TAG = 0x07 # 1 byte, enum rlc_li_size value
 
 # Calculates the equivalent UL-EARFCN of a given DL-EARFCN,
-# if the input is an SDL or unknown EARFCN the output will be equal to the input
-# Based on 3GPP TS 36.101 V16.6.0 Table 5.7.3-1
-def calculate_ul_earfcn(dl_earfcn):
-    if 0 <= dl_earfcn < 9660:        # B1-B28
-        offset = 18000
-    elif 9769 < dl_earfcn < 9920:    # B30-31
-        offset = 17890
-    elif 65535 < dl_earfcn < 67136:  # B65-66
-        offset = 65536
-    elif 67535 < dl_earfcn < 67836:  # B68
-        offset = 65136
-    elif 68335 < dl_earfcn < 68486:  # B70
-        offset = 64636
-    elif 68585 < dl_earfcn < 69466:  # B71-74
-        offset = 64536
-    elif 70365 < dl_earfcn < 70596:  # B85-87
-        offset = 63636
-    elif 70595 < dl_earfcn < 70646:  # B88
-        offset = 63635
-    else:
-        offset = 0
-    return dl_earfcn + offset
+# if the input is an SDL, TDD or unknown EARFCN the output will be equal to the input
+# See channels.lte for the band table
+calculate_ul_earfcn = channels.lte.ul_channel
 
 def unpack_mcc_mnc(mcc_mnc_bin):
     mcc = 0
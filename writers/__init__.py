@@ -5,3 +5,5 @@ from .pcapwriter import PcapWriter
 from .socketwriter import SocketWriter
 from .rawwriter import RawWriter
 from .nullwriter import NullWriter
+from .rotatingwriter import RotatingWriter
+from .replaywriter import ReplayWriter
@@ -26,7 +26,10 @@ class PcapWriter:
     def __enter__(self):
         return self
 
-    def write_pkt(self, sock_content, port, radio_id=0, ts=datetime.datetime.now()):
+    def write_pkt(self, sock_content, port, radio_id=0, ts=None):
+        if ts is None:
+            ts = datetime.datetime.now()
+
         pcap_hdr = struct.pack('<LLLL',
                 int(ts.timestamp()),
                 ts.microsecond,
@@ -63,11 +66,14 @@ class PcapWriter:
         if self.ip_id > 65535:
             self.ip_id = 0
 
-    def write_cp(self, sock_content, radio_id=0, ts=datetime.datetime.now()):
+    def write_cp(self, sock_content, radio_id=0, ts=None):
         self.write_pkt(sock_content, self.port_cp, radio_id, ts)
 
-    def write_up(self, sock_content, radio_id=0, ts=datetime.datetime.now()):
+    def write_up(self, sock_content, radio_id=0, ts=None):
         self.write_pkt(sock_content, self.port_up, radio_id, ts)
 
+    def tell(self):
+        return self.pcap_file.tell()
+
     def __exit__(self, exc_type, exc_value, traceback):
         self.pcap_file.close()
@@ -18,6 +18,9 @@ class RawWriter:
     def write_up(self, sock_content, radio_id=0, ts=datetime.datetime.now()):
         self.raw_file.write(sock_content)
 
+    def tell(self):
+        return self.raw_file.tell()
+
     def __exit__(self, exc_type, exc_value, traceback):
         self.raw_file.write(self.trailer)
         self.raw_file.close()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import datetime
+import time
+import queue
+import threading
+
+import metrics
+
+class ReplayWriter:
+    """Paces packets to another writer following their device timestamps.
+
+    Packets are queued by the parser and emitted by a sender thread. Packets
+    whose due time falls within the tolerance window are sent as one batch, so
+    the sender sleeps at most once per window instead of once per packet.
+
+    Parameters:
+    writer: downstream writer, e.g. SocketWriter
+    speed (float): replay speed multiplier, 0 to disable device clock pacing
+    max_rate (int): maximum packets per second, 0 for no limit
+    tolerance (float): batching window in seconds
+    max_queue (int): maximum number of queued packets before the parser blocks
+    """
+    def __init__(self, writer, speed=1.0, max_rate=0, tolerance=0.002, max_queue=10000):
+        self.writer = writer
+        self.speed = speed
+        self.max_rate = max_rate
+        self.tolerance = tolerance
+
+        self.base_dev = None
+        self.base_wall = 0.0
+        self.last_dev = None
+        self.last_due = 0.0
+        self.num_sent = 0
+
+        self.stop_item = object()
+        self.queue = queue.Queue(max_queue)
+        self.cancelled = threading.Event()
+        self.metric_dropped = metrics.registry.counter('scat_writer_dropped_total', 'Packets dropped by the writer', writer='replay')
+        metrics.registry.gauge('scat_writer_queue_depth', 'Packets waiting to be written', func=self.queue_depth, writer='replay')
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def schedule(self, ts):
+        # Returns the time.monotonic() based due time of a packet
+        now = time.monotonic()
+        if isinstance(ts, datetime.datetime):
+            dev = ts.timestamp()
+        elif self.last_dev is not None:
+            # No device timestamp: send right after the previous packet
+            dev = self.last_dev
+        else:
+            dev = 0.0
+
+        # Start, or device clock going back by more than a second (e.g. looped dump)
+        if self.base_dev is None or dev < self.last_dev - 1.0:
+            self.base_dev = dev
+            self.base_wall = max(now, self.last_due)
+
+        if self.speed > 0:
+            due = self.base_wall + (dev - self.base_dev) / self.speed
+        else:
+            due = now
+        if self.max_rate > 0:
+            due = max(due, self.last_due + 1.0 / self.max_rate)
+
+        self.last_dev = dev
+        self.last_due = due
+        return due
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        self.queue.put((self.schedule(ts), True, sock_content, radio_id, ts))
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        self.queue.put((self.schedule(ts), False, sock_content, radio_id, ts))
+
+    def send(self, batch):
+        for i, (due, is_cp, sock_content, radio_id, ts) in enumerate(batch):
+            if self.cancelled.is_set():
+                self.metric_dropped.value += len(batch) - i
+                return
+            if is_cp:
+                self.writer.write_cp(sock_content, radio_id, ts)
+            else:
+                self.writer.write_up(sock_content, radio_id, ts)
+        self.num_sent += len(batch)
+
+    def run(self):
+        pending = None
+        while True:
+            if pending is not None:
+                item = pending
+                pending = None
+            else:
+                item = self.queue.get()
+            if item is self.stop_item:
+                break
+
+            delay = item[0] - time.monotonic()
+            if delay > self.tolerance:
+                # Returns early when cancelled
+                self.cancelled.wait(delay)
+
+            # Send every packet due within the tolerance window in one go
+            deadline = time.monotonic() + self.tolerance
+            batch = [item]
+            while True:
+                try:
+                    next_item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_item is self.stop_item or next_item[0] > deadline:
+                    pending = next_item
+                    break
+                batch.append(next_item)
+            self.send(batch)
+
+    def cancel(self):
+        # Drop queued packets, used when interrupted
+        self.cancelled.set()
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self.stop_item:
+                self.metric_dropped.value += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.cancel()
+        self.queue.put(self.stop_item)
+        self.thread.join()
+        if hasattr(self.writer, '__exit__'):
+            self.writer.__exit__(exc_type, exc_value, traceback)
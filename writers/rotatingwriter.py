@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import datetime
+import time
+import os
+import json
+import gzip, lzma
+import shutil
+
+compress_methods = {
+    'gzip': ('.gz', gzip.open),
+    'xz': ('.xz', lzma.open),
+}
+
+def compress_segment(fname, method):
+    # Runs inside the worker process: compress a finished segment and
+    # remove the uncompressed original
+    ext, open_func = compress_methods[method]
+    out_fname = fname + ext
+    with open(fname, 'rb') as f_in:
+        with open_func(out_fname + '.tmp', 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out, 0x100000)
+    os.replace(out_fname + '.tmp', out_fname)
+    os.remove(fname)
+    return out_fname
+
+class RotatingWriter:
+    """Splits the output of a file-backed writer into numbered segments.
+
+    Parameters:
+    fname (str): base file name, segment number is inserted before the extension
+    writer_class: PcapWriter or RawWriter, instantiated as writer_class(segment_fname, *writer_args)
+    writer_args (tuple): additional arguments passed to the writer
+    max_size (int): rotate after the segment reaches this many bytes, 0 to disable
+    max_interval (int): rotate after the segment is open for this many seconds, 0 to disable
+    compress (str): None, 'gzip' or 'xz' to compress completed segments in a worker process
+    """
+    def __init__(self, fname, writer_class, writer_args=(), max_size=0, max_interval=0, compress=None):
+        if compress is not None and compress not in compress_methods:
+            raise ValueError('Unknown compression method {}'.format(compress))
+
+        self.base, self.ext = os.path.splitext(fname)
+        self.writer_class = writer_class
+        self.writer_args = writer_args
+        self.max_size = max_size
+        self.max_interval = max_interval
+        self.compress = compress
+
+        self.manifest_fname = self.base + '.manifest.json'
+        self.segments = []
+        self.pending = {}
+        self.executor = None
+        self.writer = None
+
+        self.open_segment()
+
+    def __enter__(self):
+        return self
+
+    def segment_fname(self, num):
+        return '{}.{:04d}{}'.format(self.base, num, self.ext)
+
+    def open_segment(self):
+        fname = self.segment_fname(len(self.segments))
+        self.writer = self.writer_class(fname, *self.writer_args)
+        self.segment_opened = time.monotonic()
+        self.segments.append({'file': fname, 'start': None, 'end': None,
+            'packets': 0, 'bytes': 0, 'compressed': False})
+
+    def close_segment(self):
+        segment = self.segments[-1]
+        self.writer.__exit__(None, None, None)
+        segment['bytes'] = os.path.getsize(segment['file'])
+
+        if self.compress:
+            if self.executor is None:
+                # Imported on first use, multiprocessing is slow to import
+                from concurrent.futures import ProcessPoolExecutor
+                self.executor = ProcessPoolExecutor(max_workers=1)
+            self.pending[len(self.segments) - 1] = self.executor.submit(compress_segment, segment['file'], self.compress)
+
+    def collect_compressed(self, wait=False):
+        for num in list(self.pending.keys()):
+            future = self.pending[num]
+            if not (wait or future.done()):
+                continue
+            del self.pending[num]
+            self.segments[num]['file'] = future.result()
+            self.segments[num]['compressed'] = True
+
+    def write_manifest(self):
+        manifest = {'segments': self.segments}
+        with open(self.manifest_fname + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(self.manifest_fname + '.tmp', self.manifest_fname)
+
+    def rotate(self):
+        self.close_segment()
+        self.collect_compressed()
+        self.write_manifest()
+        self.open_segment()
+
+    def check_rotate(self):
+        if self.segments[-1]['packets'] == 0:
+            return False
+        if self.max_size > 0 and self.writer.tell() >= self.max_size:
+            return True
+        if self.max_interval > 0 and (time.monotonic() - self.segment_opened) >= self.max_interval:
+            return True
+        return False
+
+    def update_segment(self, ts):
+        if not isinstance(ts, datetime.datetime):
+            ts = datetime.datetime.now()
+        ts = ts.isoformat()
+
+        segment = self.segments[-1]
+        if segment['start'] is None:
+            segment['start'] = ts
+        segment['end'] = ts
+        segment['packets'] += 1
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        if self.check_rotate():
+            self.rotate()
+        self.update_segment(ts)
+        if ts is None:
+            self.writer.write_cp(sock_content, radio_id)
+        else:
+            self.writer.write_cp(sock_content, radio_id, ts)
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        if self.check_rotate():
+            self.rotate()
+        self.update_segment(ts)
+        if ts is None:
+            self.writer.write_up(sock_content, radio_id)
+        else:
+            self.writer.write_up(sock_content, radio_id, ts)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_segment()
+        self.collect_compressed(wait=True)
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        self.write_manifest()